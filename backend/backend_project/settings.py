@@ -26,6 +26,10 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # outermost so its timings include the other middleware (users/instrumentation.py)
+    'users.instrumentation.RequestTimingMiddleware',
+    # development / staging only, see NPLUSONE below
+    'users.nplusone.NPlusOneMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     # keep CorsMiddleware as high as possible
     'django.middleware.security.SecurityMiddleware',
@@ -96,7 +100,7 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 # DRF config
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework.authentication.TokenAuthentication',
+        'users.authentication.CachedTokenAuthentication',
         'rest_framework.authentication.SessionAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': (
@@ -104,6 +108,33 @@ REST_FRAMEWORK = {
     ),
 }
 
+# token → 用户/角色认证缓存，见 users/authentication.py；
+# 多进程部署可把 SHARED_CACHE 指向共享缓存（如 Redis）的别名
+TOKEN_AUTH_CACHE = {
+    'MAXSIZE': 10000,
+    'TTL': 60,
+    'SHARED_CACHE': None,
+    'SHARED_TTL': 300,
+}
+
+# Per-request timing (users/instrumentation.py): Server-Timing header + one JSON log line per request
+# (logger users.instrumentation, INFO); requests slower than SLOW_MS are logged as WARNING with their SQL
+REQUEST_TIMING = {
+    'ENABLED': True,
+    'HEADER': True,
+    'SLOW_MS': 1000,
+    'SQL_LIMIT': 500,
+}
+
+# Runtime N+1 detection (users/nplusone.py): walks the stack for every SELECT, keep it off in production.
+# MODE: 'log' (WARNING on users.nplusone), 'header' (X-N-Plus-One response header) or 'raise'
+NPLUSONE = {
+    'ENABLED': DEBUG,
+    'MODE': 'log',
+    'THRESHOLD': 3,
+    'IGNORE': [],
+}
+
 # CORS (for frontend dev server)
 # Allow the Vite dev server origins; adjust in production
 CORS_ALLOWED_ORIGINS = [
@@ -127,3 +158,57 @@ CORS_ALLOW_HEADERS = list(default_headers) + [
 # Media files configuration
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
+
+# Uploaded files are stored once per SHA-256 under MEDIA_ROOT/blobs/ (users/storage.py);
+# FileField names are unchanged. Existing files: `python manage.py rehome_media`
+STORAGES = {
+    'default': {'BACKEND': 'users.storage.ContentAddressedStorage'},
+    'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+}
+
+# Permission-checked downloads (users/downloads.py):
+# 'python' streams from Django (supports Range); 'nginx' returns X-Accel-Redirect to
+# MEDIA_ACCEL_REDIRECT_PREFIX (an `internal` location aliased to MEDIA_ROOT); 'sendfile' returns X-Sendfile
+MEDIA_DOWNLOAD_BACKEND = 'python'
+MEDIA_ACCEL_REDIRECT_PREFIX = '/protected-media/'
+# signed file_url links in API responses stay valid for this many seconds
+MEDIA_DOWNLOAD_URL_MAX_AGE = 3600
+
+# Resumable chunked uploads (users/uploads.py); partial files live outside MEDIA_ROOT
+CHUNKED_UPLOAD_DIR = BASE_DIR / 'upload_sessions'
+CHUNKED_UPLOAD_MAX_SIZE = 200 * 1024 * 1024
+CHUNKED_UPLOAD_CHUNK_SIZE = 8 * 1024 * 1024
+# per student: open sessions and total declared bytes they may reserve
+CHUNKED_UPLOAD_MAX_SESSIONS = 3
+CHUNKED_UPLOAD_MAX_RESERVED = 2 * CHUNKED_UPLOAD_MAX_SIZE
+# sessions without progress for this many seconds are removed by `manage.py cleanup_uploads`
+CHUNKED_UPLOAD_EXPIRY = 24 * 3600
+
+# Post-upload processing (users/processing.py): size, SHA-256, page count, text, first-page preview.
+# poppler-utils (pdfinfo, pdftotext, pdftoppm) are preferred; pypdf / PyMuPDF are the in-process fallback.
+SUBMISSION_PROCESSING = {
+    'ASYNC': True,
+    # e.g. 'processing' to hand the work to `manage.py run_jobs --queue processing` instead of a thread pool
+    'QUEUE': None,
+    'WORKERS': 2,
+    'MAX_TEXT_CHARS': 2_000_000,
+    'PREVIEW_WIDTH': 600,
+    'TIMEOUT': 120,
+}
+
+# Near-duplicate detection (users/similarity.py); changing these requires `manage.py reindex_similarity`
+SIMILARITY_INDEX = {
+    'SHINGLE_SIZE': 5,
+    'NUM_PERM': 192,
+    'BANDS': 64,     # 64 bands x 3 rows: candidate threshold ~0.25, see users/similarity.py
+}
+
+# Database-backed job queue (users/jobs.py), run with `manage.py run_jobs --processes N`
+JOB_QUEUE = {
+    'POLL_INTERVAL': 1.0,
+    'VISIBILITY_TIMEOUT': 600,
+    'RETRY_BASE': 10,
+    'RETRY_MAX': 3600,
+    'MAX_ATTEMPTS': 5,
+    'KEEP_DONE': 7 * 24 * 3600,
+}
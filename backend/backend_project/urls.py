@@ -8,5 +8,6 @@ urlpatterns = [
     path('api/auth/', include('users.urls')),
 ]
 
+# 仅供开发调试：不做权限检查。接口返回的 file_url 走受控下载视图 /api/auth/files/<kind>/<id>/
 if settings.DEBUG:
     urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
@@ -1,8 +1,9 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
 from django.contrib.auth.models import User
+from django.utils import timezone
 
-from .models import Profile
+from .models import Profile, AllocationRound, Job
 
 
 class ProfileInline(admin.StackedInline):
@@ -38,3 +39,21 @@ class ProfileAdmin(admin.ModelAdmin):
     list_display = ('user', 'role')
     search_fields = ('user__username', 'user__email')
     list_filter = ('role',)
+
+
+@admin.register(AllocationRound)
+class AllocationRoundAdmin(admin.ModelAdmin):
+    list_display = ('name', 'opens_at', 'closes_at', 'max_preferences', 'allocated_at')
+    readonly_fields = ('allocated_at',)
+
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ('id', 'task', 'queue', 'priority', 'status', 'attempts', 'run_at', 'locked_by', 'finished_at')
+    list_filter = ('status', 'queue')
+    search_fields = ('task',)
+    actions = ('retry',)
+
+    @admin.action(description='Retry selected jobs now')
+    def retry(self, request, queryset):
+        queryset.exclude(status='running').update(status='queued', run_at=timezone.now(), attempts=0, finished_at=None)
@@ -0,0 +1,126 @@
+"""按志愿批量分配课题。
+
+学生在 ``AllocationRound`` 开放期内提交有序志愿（``TopicPreference``），截止后
+``allocate`` 一次性完成分配：
+
+* 算法是随机串行独裁（random serial dictatorship）：用轮次种子打乱学生顺序，依次让每个
+  学生拿到其志愿中仍有名额的最靠前课题。课题对学生没有偏好时，它与“单一抽签序的学生提议
+  延迟接受算法”结果相同，因此分配是稳定的、帕累托最优的，且学生如实填报志愿是占优策略；
+* 复杂度与志愿总条数成线性，1 万学生 × 2 千课题在内存中只需几十毫秒；
+* 已有选题记录的学生不参与分配，课题剩余名额按 ``max_students - selected_students`` 计算；
+* 写入阶段在一个事务内用 ``bulk_create`` 写选题记录，按增量分组用 ``F()`` 更新课题计数，
+  再批量刷新进度快照与教师可见范围（``bulk_create`` 不触发信号）。
+"""
+import random
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Topic, TopicPreference, TopicSelection
+from .progress import refresh_many
+from .scope import sync_student_scope
+
+
+def load_preferences(round):
+    """``{student_id: [topic_id, ...]}``，按志愿顺序排列。"""
+    preferences = defaultdict(list)
+    rows = (
+        TopicPreference.objects.filter(round=round)
+        .order_by('student_id', 'rank')
+        .values_list('student_id', 'topic_id')
+    )
+    for student_id, topic_id in rows.iterator(chunk_size=5000):
+        preferences[student_id].append(topic_id)
+    return dict(preferences)
+
+
+def remaining_capacity(topic_ids):
+    """``{topic_id: 剩余名额}``；``max_students`` 为 0 时按 1 个名额处理（与选题接口一致）。"""
+    rows = Topic.objects.filter(pk__in=topic_ids).values_list('id', 'max_students', 'selected_students')
+    return {pk: max((max_students or 1) - selected, 0) for pk, max_students, selected in rows}
+
+
+def serial_dictatorship(preferences, capacity, seed):
+    """纯内存分配，返回 ``({student_id: (topic_id, rank)}, [未分配的 student_id])``。
+
+    ``capacity`` 会被就地扣减；学生按 id 排序后再用 ``seed`` 打乱，保证结果可复现。
+    """
+    order = sorted(preferences)
+    random.Random(seed).shuffle(order)
+    assignment = {}
+    unassigned = []
+    for student_id in order:
+        for rank, topic_id in enumerate(preferences[student_id], start=1):
+            if capacity.get(topic_id, 0) > 0:
+                capacity[topic_id] -= 1
+                assignment[student_id] = (topic_id, rank)
+                break
+        else:
+            unassigned.append(student_id)
+    return assignment, unassigned
+
+
+def rank_histogram(assignment):
+    histogram = defaultdict(int)
+    for _, rank in assignment.values():
+        histogram[rank] += 1
+    return dict(sorted(histogram.items()))
+
+
+def allocate(round, seed=None, dry_run=False, batch_size=1000):
+    """执行一轮分配并返回统计信息；``dry_run`` 时只计算不写库。"""
+    seed = round.seed if seed is None else seed
+    with transaction.atomic():
+        preferences = load_preferences(round)
+        already_selected = set(
+            TopicSelection.objects.filter(student_id__in=list(preferences)).values_list('student_id', flat=True)
+        ) if preferences else set()
+        for student_id in already_selected:
+            preferences.pop(student_id)
+
+        topic_ids = {topic_id for ranked in preferences.values() for topic_id in ranked}
+        # PostgreSQL 下锁住涉及的课题行，防止分配期间计数被其他写入改动
+        list(Topic.objects.select_for_update().filter(pk__in=topic_ids).values_list('id', flat=True))
+        assignment, unassigned = serial_dictatorship(preferences, remaining_capacity(topic_ids), seed)
+
+        if not dry_run:
+            _write(assignment, batch_size)
+            round.seed = seed
+            round.allocated_at = timezone.now()
+            round.save(update_fields=['seed', 'allocated_at'])
+
+    return {
+        'students': len(preferences),
+        'skipped': len(already_selected),
+        'assigned': len(assignment),
+        'unassigned': unassigned,
+        'ranks': rank_histogram(assignment),
+    }
+
+
+def _write(assignment, batch_size):
+    TopicSelection.objects.bulk_create(
+        [TopicSelection(student_id=student_id, topic_id=topic_id) for student_id, (topic_id, _) in assignment.items()],
+        batch_size=batch_size,
+    )
+
+    # 按“本轮新增人数”分组，每组一条 UPDATE ... SET selected_students = selected_students + n
+    added = defaultdict(int)
+    for topic_id, _ in assignment.values():
+        added[topic_id] += 1
+    by_increment = defaultdict(list)
+    for topic_id, count in added.items():
+        by_increment[count].append(topic_id)
+    now = timezone.now()
+    for count, topic_ids in by_increment.items():
+        for start in range(0, len(topic_ids), batch_size):
+            Topic.objects.filter(pk__in=topic_ids[start:start + batch_size]).update(
+                selected_students=F('selected_students') + count, updated_at=now,
+            )
+
+    student_ids = sorted(assignment)
+    for start in range(0, len(student_ids), batch_size):
+        sync_student_scope(student_ids[start:start + batch_size])
+    refresh_many(student_ids, batch_size=500)
@@ -0,0 +1,203 @@
+"""带缓存的 Token 认证。
+
+DRF 的 ``TokenAuthentication`` 每个请求都要连表查 ``authtoken_token`` 与 ``auth_user``，
+视图里的 ``request.user.profile.role`` 还要再查一次。``CachedTokenAuthentication`` 把
+token → (用户, 角色) 缓存起来，命中时认证与角色判断都不访问数据库：
+
+* 第一层是进程内 LRU（带 TTL），第二层是可选的共享缓存（Django cache 别名，如 Redis），
+  两层都未命中才查库（一次 ``select_related('user__profile')``）；
+* 缓存里只存字段值（不含密码哈希），每次命中都重建新的模型实例，请求之间互不影响；
+* Token 删除、User / Profile 保存或删除时，由 ``models.py`` 中的信号在事务提交后调用
+  ``invalidate_user`` 清除两层缓存（提交前清除的话，并发认证的请求会把旧的 ``is_active``、
+  角色或已删除的 token 重新缓存一个 TTL）。其他进程的进程内缓存最多在 TTL 后过期，
+  因此部署多个进程时进程内 TTL 应保持较短。
+
+配置见 ``settings.TOKEN_AUTH_CACHE``::
+
+    TOKEN_AUTH_CACHE = {
+        'MAXSIZE': 10000,      # 进程内最多缓存的 token 数
+        'TTL': 60,             # 进程内缓存秒数
+        'SHARED_CACHE': None,  # 共享缓存别名，如 'default'；None 表示不用
+        'SHARED_TTL': 300,
+    }
+"""
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.db import DEFAULT_DB_ALIAS
+from django.utils.translation import gettext_lazy as _
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+
+from .models import Profile
+
+
+DEFAULTS = {
+    'MAXSIZE': 10000,
+    'TTL': 60,
+    'SHARED_CACHE': None,
+    'SHARED_TTL': 300,
+}
+SHARED_KEY_PREFIX = 'users:token-auth:'
+
+# 不缓存密码哈希；需要时（极少）按延迟字段从库里取
+USER_FIELDS = [f.attname for f in User._meta.concrete_fields if f.attname != 'password']
+PROFILE_FIELDS = [f.attname for f in Profile._meta.concrete_fields]
+
+
+def get_config():
+    return {**DEFAULTS, **getattr(settings, 'TOKEN_AUTH_CACHE', {})}
+
+
+class LRUCache:
+    """线程安全的 LRU + TTL 缓存，另按用户 id 记录其 token，便于按用户失效。"""
+
+    def __init__(self):
+        self._data = OrderedDict()
+        self._by_user = {}
+        self._lock = threading.Lock()
+        # 每次失效加一；查库期间发生过失效的结果不回填，避免把旧数据写回缓存
+        self.generation = 0
+
+    def get(self, key):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            expires, value = entry
+            if expires <= now:
+                self._remove(key)
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl, maxsize, generation=None):
+        with self._lock:
+            if generation is not None and generation != self.generation:
+                return
+            self._remove(key)
+            self._data[key] = (time.monotonic() + ttl, value)
+            self._by_user.setdefault(value['user'][0], set()).add(key)
+            while len(self._data) > maxsize:
+                self._remove(next(iter(self._data)))
+
+    def _remove(self, key):
+        entry = self._data.pop(key, None)
+        if entry is None:
+            return
+        user_id = entry[1]['user'][0]
+        keys = self._by_user.get(user_id)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._by_user[user_id]
+
+    def delete(self, key):
+        with self._lock:
+            self.generation += 1
+            self._remove(key)
+
+    def delete_user(self, user_id):
+        with self._lock:
+            self.generation += 1
+            for key in list(self._by_user.get(user_id, ())):
+                self._remove(key)
+
+    def clear(self):
+        with self._lock:
+            self.generation += 1
+            self._data.clear()
+            self._by_user.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+local_cache = LRUCache()
+
+
+def _shared_cache(config):
+    alias = config['SHARED_CACHE']
+    return caches[alias] if alias else None
+
+
+def _pack(token):
+    user = token.user
+    profile = getattr(user, 'profile', None)
+    # USER_FIELDS 的第一个是 id，LRUCache 依赖这一点按用户建索引
+    return {
+        'token': (token.key, token.user_id, token.created),
+        'user': tuple(getattr(user, name) for name in USER_FIELDS),
+        'profile': tuple(getattr(profile, name) for name in PROFILE_FIELDS) if profile else None,
+    }
+
+
+def _unpack(entry):
+    user = User.from_db(DEFAULT_DB_ALIAS, USER_FIELDS, entry['user'])
+    if entry['profile'] is not None:
+        profile = Profile.from_db(DEFAULT_DB_ALIAS, PROFILE_FIELDS, entry['profile'])
+        Profile.user.field.set_cached_value(profile, user)
+        User.profile.related.set_cached_value(user, profile)
+    token = Token.from_db(DEFAULT_DB_ALIAS, ['key', 'user_id', 'created'], entry['token'])
+    Token.user.field.set_cached_value(token, user)
+    return user, token
+
+
+def lookup(key):
+    """返回 token 的缓存条目，必要时查库并回填缓存；token 不存在时返回 ``None``。"""
+    config = get_config()
+    entry = local_cache.get(key)
+    if entry is not None:
+        return entry
+
+    generation = local_cache.generation
+    shared = _shared_cache(config)
+    if shared is not None:
+        entry = shared.get(SHARED_KEY_PREFIX + key)
+    if entry is None:
+        token = Token.objects.select_related('user__profile').filter(key=key).first()
+        if token is None:
+            return None
+        entry = _pack(token)
+        if shared is not None:
+            shared.set(SHARED_KEY_PREFIX + key, entry, config['SHARED_TTL'])
+    local_cache.set(key, entry, config['TTL'], config['MAXSIZE'], generation)
+    return entry
+
+
+def invalidate_token(key):
+    local_cache.delete(key)
+    shared = _shared_cache(get_config())
+    if shared is not None:
+        shared.delete(SHARED_KEY_PREFIX + key)
+
+
+def invalidate_user(user_id):
+    local_cache.delete_user(user_id)
+    shared = _shared_cache(get_config())
+    if shared is not None:
+        keys = Token.objects.filter(user_id=user_id).values_list('key', flat=True)
+        shared.delete_many([SHARED_KEY_PREFIX + key for key in keys])
+
+
+def clear():
+    local_cache.clear()
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """与 ``TokenAuthentication`` 行为一致（同样的请求头与错误信息），但缓存 token → 用户与角色。"""
+
+    def authenticate_credentials(self, key):
+        entry = lookup(key)
+        if entry is None:
+            raise exceptions.AuthenticationFailed(_('Invalid token.'))
+        user, token = _unpack(entry)
+        if not user.is_active:
+            raise exceptions.AuthenticationFailed(_('User inactive or deleted.'))
+        return (user, token)
@@ -0,0 +1,286 @@
+"""序列化器与视图热点的微基准（``manage.py bench_serializers``）。
+
+夹具为固定规模（默认 10 / 1 000 / 10 000 行，每行两条评审和一条文件元数据），在一个最后回滚的事务里写入，
+不改动数据库。每项基准先预热一次并记录 SQL 条数，再关闭 GC 重复计时（至少 ``repeat`` 次、累计至少
+``min_time`` 秒），最后单独跑一次 ``tracemalloc`` 记录内存峰值——开着 tracemalloc 会明显变慢，不和计时混在一起。
+
+结果为 JSON，可以存成基准线，之后用 ``compare`` 对比：最短耗时或内存峰值超出容差、SQL 条数增加均算回归。
+"""
+import gc
+import platform
+import statistics
+import time
+import tracemalloc
+from collections import namedtuple
+from datetime import timedelta
+
+import django
+from django.contrib.auth.models import User
+from django.db import connection, transaction
+from django.db.models import Max
+from django.test import override_settings
+from django.utils import timezone
+from rest_framework.request import Request
+from rest_framework.test import APIClient, APIRequestFactory, force_authenticate
+
+from .loadtest import git_revision
+from .models import (
+    MidtermCheck, MidtermReview, Profile, Proposal, ProposalReview, StudentProgress, SubmissionMetadata, Thesis,
+    ThesisReview, Topic, TopicSelection,
+)
+from .progress import compute_progress, refresh_progress
+from .querylog import QueryRecorder
+from .serializers import MidtermCheckSerializer, ProposalSerializer, ThesisSerializer, TopicSerializer
+from .synthetic import insert_rows
+from .views import StudentProgressAPIView, topic_queryset
+
+
+SIZES = (10, 1000, 10000)
+REVIEWS_PER_ROW = 2
+# 每个夹具学生的提交数（行数 / 该值 = 学生数）
+ROWS_PER_STUDENT = 4
+MAX_RUNS = 1000
+# 对比时绝对差值低于这些值不算回归，避免极快的基准因计时抖动误报
+MIN_REGRESSION_MS = 0.05
+MIN_REGRESSION_KB = 16
+
+Benchmark = namedtuple('Benchmark', 'name rows func')
+Fixture = namedtuple('Fixture', 'admin student first_ids')
+
+
+class BenchmarkError(ValueError):
+    pass
+
+
+class Rollback(Exception):
+    pass
+
+
+# -- 夹具 -----------------------------------------------------------------------
+
+def next_ids(*models):
+    return {model: (model.objects.aggregate(top=Max('pk'))['top'] or 0) + 1 for model in models}
+
+
+def build_fixtures(size):
+    """写入 ``size`` 行论文 / 开题 / 中期（各带评审与文件元数据）和 ``size`` 个课题，返回 ``Fixture``。"""
+    now = timezone.now()
+    first = next_ids(User, Thesis, Proposal, MidtermCheck, Topic)
+    user_id = first[User]
+    students = max(1, size // ROWS_PER_STUDENT)
+    users = [
+        {'id': user_id + n, 'username': f'bench-{user_id + n}', 'first_name': f'同学{n}', 'last_name': '基准',
+         'email': f'bench-{user_id + n}@example.edu', 'password': '!', 'date_joined': now}
+        for n in range(students + 2)
+    ]
+    admin_id, teacher_id = user_id, user_id + 1
+    users[1]['first_name'], users[1]['last_name'] = '老师', '基准'
+    insert_rows(User, users)
+    insert_rows(Profile, [
+        {'user_id': user['id'], 'role': 'admin' if n == 0 else 'teacher' if n == 1 else 'student'}
+        for n, user in enumerate(users)
+    ])
+    student_ids = [user['id'] for user in users[2:]]
+
+    topics = [
+        {'id': first[Topic] + n, 'teacher_id': teacher_id, 'title': f'基准课题 {n}', 'max_students': 3,
+         'description': '课题简介' * 20, 'requirements': '要求' * 10, 'created_at': now - timedelta(minutes=n)}
+        for n in range(size)
+    ]
+    insert_rows(Topic, topics)
+    insert_rows(TopicSelection, [{'topic_id': first[Topic], 'student_id': student_ids[0], 'selected_at': now}])
+
+    def submissions(model, review_model, kind, extra):
+        fk = f'{kind}_id'
+        rows = [
+            {'id': first[model] + n, 'student_id': student_ids[n % students],
+             'file': f'{kind}/2026/05/bench_{n}.pdf', 'submitted_at': now - timedelta(minutes=n), **extra(n)}
+            for n in range(size)
+        ]
+        insert_rows(model, rows)
+        insert_rows(review_model, [
+            {fk: row['id'], 'reviewer_id': teacher_id, 'feedback': '评审意见' * 10, 'score': 80 + r,
+             'result': 'pass' if r else 'revise', 'reviewed_at': now, **({'stage': row['stage']} if 'stage' in row else {})}
+            for row in rows for r in range(REVIEWS_PER_ROW)
+        ])
+        insert_rows(SubmissionMetadata, [
+            {f'{kind}_id': row['id'], 'file_name': row['file'], 'status': 'done', 'size': 1024 * 1024,
+             'sha256': f'{row["id"]:064x}', 'page_count': 30, 'processed_at': now}
+            for row in rows
+        ])
+
+    stages = [choice for choice, _ in Thesis.STAGE_CHOICES]
+    submissions(Thesis, ThesisReview, 'thesis', lambda n: {
+        'title': f'基准论文 {n}', 'version': f'v{n % 4 + 1}', 'status': 'submitted', 'stage': stages[n % len(stages)],
+    })
+    submissions(Proposal, ProposalReview, 'proposal', lambda n: {'title': f'开题报告 {n}'})
+    submissions(MidtermCheck, MidtermReview, 'midterm', lambda n: {'title': f'中期检查 {n}'})
+
+    # 与线上一样，进度接口读的是已有的快照；缺快照的路径单独测
+    refresh_progress(student_ids[0])
+    admin = User.objects.select_related('profile').get(pk=admin_id)
+    student = User.objects.select_related('profile').get(pk=student_ids[0])
+    return Fixture(admin, student, {model._meta.model_name: pk for model, pk in first.items()})
+
+
+# -- 基准项 ---------------------------------------------------------------------
+
+def serializer_request(user):
+    request = Request(APIRequestFactory().get('/api/auth/'))
+    request.user = user
+    return request
+
+
+def benchmarks(fixture, size):
+    """规模为 ``size`` 的各项基准；每次调用都重新构造查询集，不复用预取结果。"""
+    context = {'request': serializer_request(fixture.admin)}
+    first = fixture.first_ids
+
+    def serialize(serializer, model):
+        def run():
+            queryset = serializer.setup_eager_loading(model.objects.filter(pk__gte=first[model._meta.model_name]))
+            return serializer(queryset.order_by('-submitted_at', '-id')[:size], many=True, context=context).data
+        return run
+
+    def topics():
+        queryset = topic_queryset(fixture.student).filter(pk__gte=first['topic']).order_by('-created_at', '-id')
+        return TopicSerializer(queryset[:size], many=True, context={'request': serializer_request(fixture.student)}).data
+
+    return [
+        Benchmark(f'serializer.thesis[{size}]', size, serialize(ThesisSerializer, Thesis)),
+        Benchmark(f'serializer.proposal[{size}]', size, serialize(ProposalSerializer, Proposal)),
+        Benchmark(f'serializer.midterm[{size}]', size, serialize(MidtermCheckSerializer, MidtermCheck)),
+        Benchmark(f'serializer.topic[{size}]', size, topics),
+    ]
+
+
+def progress_benchmarks(fixture):
+    view = StudentProgressAPIView.as_view()
+    factory = APIRequestFactory()
+
+    def progress_view():
+        request = factory.get('/api/auth/progress/')
+        force_authenticate(request, user=fixture.student)
+        return view(request).data
+
+    def progress_missing_snapshot():
+        StudentProgress.objects.filter(student=fixture.student).delete()
+        return progress_view()
+
+    return [
+        Benchmark('view.student_progress', 1, progress_view),
+        Benchmark('view.student_progress[no snapshot]', 1, progress_missing_snapshot),
+        Benchmark('progress.compute', 1, lambda: compute_progress(fixture.student)),
+    ]
+
+
+def request_benchmarks(fixture, size):
+    """经过完整中间件栈的列表请求，``RequestTimingMiddleware`` 开 / 关各一项，两者之差即其开销。"""
+    rows = min(size, 50)
+    url = f'/api/auth/thesis/all-theses/?page_size={rows}'
+
+    def client(enabled):
+        # 中间件在首个请求时按当时的配置加载，之后沿用
+        with override_settings(REQUEST_TIMING={'ENABLED': enabled}):
+            api = APIClient()
+            api.force_authenticate(user=fixture.admin)
+            api.get(url)
+        return lambda: api.get(url).content
+
+    return [
+        Benchmark(f'view.all_theses[{rows}]', rows, client(False)),
+        Benchmark(f'view.all_theses[{rows}]+timing', rows, client(True)),
+    ]
+
+
+# -- 计时与报告 -------------------------------------------------------------------
+
+def measure(func, repeat=3, min_time=0.5):
+    # 第一次调用兼作预热；不用 CaptureQueriesContext，它读的 queries_log 会被 request_started 信号清空
+    with QueryRecorder(sites=False) as captured:
+        func()
+    timings = []
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        started = time.perf_counter()
+        while len(timings) < MAX_RUNS and (len(timings) < repeat or time.perf_counter() - started < min_time):
+            begin = time.perf_counter_ns()
+            func()
+            timings.append((time.perf_counter_ns() - begin) / 1e6)
+    finally:
+        if enabled:
+            gc.enable()
+
+    gc.collect()
+    tracemalloc.start()
+    try:
+        baseline = tracemalloc.get_traced_memory()[0]
+        func()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return {
+        'queries': len(captured),
+        'runs': len(timings),
+        'median_ms': round(statistics.median(timings), 3),
+        'min_ms': round(min(timings), 3),
+        'mean_ms': round(statistics.fmean(timings), 3),
+        'peak_kb': round((peak - baseline) / 1024, 1),
+    }
+
+
+def run(sizes=SIZES, only=None, repeat=3, min_time=0.5, progress=None):
+    """建夹具、跑全部基准并回滚，返回报告（可直接 ``json.dump``）。``only`` 为名称子串过滤。"""
+    sizes = sorted(set(sizes))
+    if not sizes or sizes[0] < 1:
+        raise BenchmarkError('规模必须是正整数')
+    results = {}
+    try:
+        with transaction.atomic():
+            fixture = build_fixtures(sizes[-1])
+            cases = [bench for size in sizes for bench in benchmarks(fixture, size)]
+            cases += progress_benchmarks(fixture) + request_benchmarks(fixture, sizes[-1])
+            cases = [bench for bench in cases if not only or only in bench.name]
+            if not cases:
+                raise BenchmarkError(f'没有名称包含 {only} 的基准')
+            for bench in cases:
+                result = measure(bench.func, repeat=repeat, min_time=min_time)
+                result['rows'] = bench.rows
+                result['per_row_us'] = round(result['median_ms'] * 1000 / bench.rows, 2)
+                results[bench.name] = result
+                if progress is not None:
+                    progress(bench.name, result)
+            raise Rollback
+    except Rollback:
+        pass
+    return {
+        'meta': {
+            'started_at': timezone.now().isoformat(),
+            'revision': git_revision(),
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'database': connection.vendor,
+            'options': {'sizes': sizes, 'only': only, 'repeat': repeat, 'min_time': min_time},
+        },
+        'benchmarks': results,
+    }
+
+
+def compare(baseline, report, tolerance=0.15):
+    """逐项对比，返回 ``[(基准, 指标, 之前, 之后, 是否回归)]``。
+
+    最短耗时、内存峰值超过 ``tolerance``（比例）且差值超过 ``MIN_REGRESSION_MS`` / ``MIN_REGRESSION_KB`` 算回归，
+    SQL 条数只要增加就算；只在一边出现的基准不比较。耗时取最短而不是中位数：机器上其他负载只会让单次变慢，
+    最短的一次最接近代码本身的开销，重复运行时也最稳定。
+    """
+    rows = []
+    for name, after in report['benchmarks'].items():
+        before = baseline.get('benchmarks', {}).get(name)
+        if before is None:
+            continue
+        for metric, floor in (('min_ms', MIN_REGRESSION_MS), ('peak_kb', MIN_REGRESSION_KB)):
+            old, new = before[metric], after[metric]
+            rows.append((name, metric, old, new, new > old * (1 + tolerance) and new - old >= floor))
+        rows.append((name, 'queries', before['queries'], after['queries'], after['queries'] > before['queries']))
+    return rows
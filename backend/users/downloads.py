@@ -0,0 +1,182 @@
+"""论文 / 开题 / 中期文件的受控下载。
+
+``static()`` 只在 ``DEBUG`` 下可用，不做权限检查，每个字节都经过 Python 进程。这里的下载
+视图先做权限检查，然后：
+
+* 处理条件请求：``ETag``（文件大小 + 修改时间）与 ``Last-Modified``，命中时返回 304；
+* 支持单段 ``Range`` / ``If-Range``，审阅者在 PDF 阅读器里跳页只取需要的字节；
+* ``MEDIA_DOWNLOAD_BACKEND`` 为 ``'nginx'`` 时返回 ``X-Accel-Redirect``、为 ``'sendfile'``
+  时返回 ``X-Sendfile``（Apache / lighttpd），由前端服务器直接发送文件（也由它处理 Range），
+  Python 进程只负责鉴权；默认 ``'python'`` 自己分块发送。
+
+浏览器直接打开的链接带不了 ``Authorization`` 头，因此序列化器里的 ``file_url`` 是带签名、
+限时有效的下载地址（``signed_download_url``），签名里绑定了签发对象的用户 id。
+"""
+import mimetypes
+import os
+import re
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core import signing
+from django.http import FileResponse, HttpResponse, HttpResponseRedirect, StreamingHttpResponse
+from django.urls import reverse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, parse_http_date_safe
+
+from .models import MidtermCheck, Proposal, Thesis
+from .scope import teacher_has_student
+
+
+MODELS = {
+    'thesis': Thesis,
+    'proposal': Proposal,
+    'midterm': MidtermCheck,
+}
+SIGNING_SALT = 'users.downloads'
+READ_SIZE = 64 * 1024
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+def backend():
+    return getattr(settings, 'MEDIA_DOWNLOAD_BACKEND', 'python')
+
+
+def url_max_age():
+    return getattr(settings, 'MEDIA_DOWNLOAD_URL_MAX_AGE', 3600)
+
+
+def signed_download_url(request, kind, obj, preview=False):
+    """签名链接；``preview=True`` 时指向首页预览图（users.processing 生成），签名相同。"""
+    token = signing.TimestampSigner(salt=SIGNING_SALT).sign(f'{kind}:{obj.pk}:{request.user.pk}')
+    if preview:
+        path = reverse('file_preview', kwargs={'kind': kind, 'pk': obj.pk})
+    else:
+        path = reverse('file_download_named', kwargs={
+            'kind': kind, 'pk': obj.pk, 'filename': os.path.basename(obj.file.name),
+        })
+    return request.build_absolute_uri(f'{path}?sig={quote(token)}')
+
+
+def user_from_signature(kind, pk, token):
+    """校验签名并返回签发时的用户 id；签名无效或过期返回 ``None``。"""
+    try:
+        value = signing.TimestampSigner(salt=SIGNING_SALT).unsign(token, max_age=url_max_age())
+    except signing.BadSignature:
+        return None
+    signed_kind, signed_pk, user_id = value.split(':')
+    if signed_kind != kind or int(signed_pk) != pk:
+        return None
+    return int(user_id)
+
+
+def can_download(user, obj):
+    role = user.profile.role
+    if role == 'admin':
+        return True
+    if role == 'teacher':
+        return teacher_has_student(user, obj.student_id)
+    return obj.student_id == user.pk
+
+
+def etag_for(stat):
+    return f'"{stat.st_size:x}-{stat.st_mtime_ns:x}"'
+
+
+def parse_range(header, size):
+    """解析单段 Range，返回 ``(start, end)``（含 end）；不支持的写法返回 ``None``（按整文件处理），
+    不可满足时返回 ``False``。"""
+    match = RANGE_RE.match(header.strip())
+    if not match:
+        return None
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if not first:
+        length = int(last)
+        if length == 0:
+            return False
+        return max(size - length, 0), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        return False
+    return start, end
+
+
+def _if_range_matches(request, etag, last_modified):
+    value = request.headers.get('If-Range')
+    if value is None:
+        return True
+    if value.startswith('"') or value.startswith('W/'):
+        return value == etag
+    return parse_http_date_safe(value) == last_modified
+
+
+def _read_range(path, start, length):
+    with open(path, 'rb') as f:
+        f.seek(start)
+        while length > 0:
+            data = f.read(min(READ_SIZE, length))
+            if not data:
+                break
+            length -= len(data)
+            yield data
+
+
+def serve(request, field):
+    """为一个 FieldFile 生成下载响应（已通过权限检查）。"""
+    try:
+        path = field.path
+    except NotImplementedError:
+        # 远程存储（如对象存储）没有本地路径，交给存储生成的地址
+        return HttpResponseRedirect(field.url)
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+
+    etag = etag_for(stat)
+    last_modified = int(stat.st_mtime)
+    conditional = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if conditional is not None:
+        return conditional
+
+    filename = os.path.basename(field.name)
+    content_type = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+    mode = backend()
+    if mode in ('nginx', 'sendfile'):
+        response = HttpResponse(content_type=content_type)
+        if mode == 'nginx':
+            prefix = getattr(settings, 'MEDIA_ACCEL_REDIRECT_PREFIX', '/protected-media/')
+            # 用实际落盘路径（内容寻址存储下是 blobs/ab/cd/<sha256>），而不是 FileField 里的名字
+            relative = os.path.relpath(path, settings.MEDIA_ROOT).replace(os.sep, '/')
+            response['X-Accel-Redirect'] = prefix + quote(relative)
+        else:
+            response['X-Sendfile'] = path
+    else:
+        size = stat.st_size
+        byte_range = None
+        if 'Range' in request.headers and _if_range_matches(request, etag, last_modified):
+            byte_range = parse_range(request.headers['Range'], size)
+        if byte_range is False:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{size}'
+            return response
+        if byte_range is None:
+            # 整文件：FileResponse 会在 WSGI 服务器支持时使用 wsgi.file_wrapper（sendfile）
+            response = FileResponse(open(path, 'rb'), content_type=content_type)
+        else:
+            start, end = byte_range
+            response = StreamingHttpResponse(
+                _read_range(path, start, end - start + 1), status=206, content_type=content_type,
+            )
+            response['Content-Range'] = f'bytes {start}-{end}/{size}'
+            response['Content-Length'] = str(end - start + 1)
+        response['Accept-Ranges'] = 'bytes'
+
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+    response['Content-Disposition'] = f"inline; filename*=UTF-8''{quote(filename)}"
+    response['Cache-Control'] = 'private, max-age=0, must-revalidate'
+    return response
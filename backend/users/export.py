@@ -0,0 +1,269 @@
+"""论文 / 开题 / 中期文件的流式 ZIP 导出。
+
+ZIP 边生成边发送，不落临时文件，内存占用与导出总量无关：
+
+* ``zipfile`` 写入一个不可 seek 的缓冲区（使用数据描述符，无需回填本地文件头），每写出一段
+  就把缓冲区里的字节交给 ``StreamingHttpResponse`` / 输出文件；
+* 记录用 ``iterator()`` 分批读取，文件按 64 KiB 分块复制，PDF 本身已压缩，用 ZIP_STORED 存储；
+* 清单放在最前面（``manifest.csv`` 每份提交一行，附最新评审；``reviews.csv`` 列出全部评审），
+  响应在查询第一批记录后即开始输出。磁盘上缺失的文件不写入 ZIP，清单里 ``file`` 留空、
+  ``file_status`` 为 ``missing``。
+"""
+import csv
+import io
+import os
+import zipfile
+from datetime import datetime, time as dt_time, timedelta
+
+from django.core.files.storage import FileSystemStorage
+from django.db.models import Count, OuterRef, Subquery
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from .models import (
+    MidtermCheck, MidtermReview, Proposal, ProposalReview, StoredFile, Thesis, ThesisReview,
+)
+from .scope import scope_to_teacher
+
+
+READ_SIZE = 64 * 1024
+
+KINDS = {
+    # kind: (提交模型, 评审模型, 评审指向提交的外键名)
+    'thesis': (Thesis, ThesisReview, 'thesis'),
+    'proposal': (Proposal, ProposalReview, 'proposal'),
+    'midterm': (MidtermCheck, MidtermReview, 'midterm'),
+}
+
+MANIFEST_HEADER = [
+    'kind', 'id', 'student_id', 'student_name', 'title', 'stage', 'version', 'status', 'submitted_at',
+    'file', 'review_count', 'latest_result', 'latest_score', 'latest_feedback', 'latest_reviewer',
+    'latest_reviewed_at', 'file_status',
+]
+REVIEWS_HEADER = ['kind', 'submission_id', 'student_id', 'stage', 'result', 'score', 'feedback', 'reviewer',
+                  'reviewed_at']
+
+
+class ExportFilterError(ValueError):
+    pass
+
+
+def _parse_bound(value, end=False):
+    parsed = parse_datetime(value)
+    if parsed is None:
+        day = parse_date(value)
+        if day is None:
+            raise ExportFilterError(f'无法解析日期: {value}')
+        # 只给日期时，until 包含当天
+        parsed = datetime.combine(day + timedelta(days=1) if end else day, dt_time.min)
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
+
+
+def build_filters(kinds=None, stage=None, teacher=None, since=None, until=None):
+    """校验并规整导出条件；``teacher`` 为 User 对象或 None。
+
+    ``stage`` 是论文阶段，给出时只导出论文；与其他提交类型同时指定时报错。
+    """
+    if stage and not kinds:
+        kinds = ['thesis']
+    kinds = list(kinds or KINDS)
+    unknown = set(kinds) - set(KINDS)
+    if unknown:
+        raise ExportFilterError(f'未知的提交类型: {", ".join(sorted(unknown))}')
+    if stage and stage not in dict(Thesis.STAGE_CHOICES):
+        raise ExportFilterError(f'未知的论文阶段: {stage}')
+    if stage and set(kinds) != {'thesis'}:
+        raise ExportFilterError('stage 只适用于论文（kind=thesis）')
+    return {
+        'kinds': kinds,
+        'stage': stage or None,
+        'teacher': teacher,
+        'since': _parse_bound(since) if since else None,
+        'until': _parse_bound(until, end=True) if until else None,
+    }
+
+
+def submissions(kind, filters):
+    model, review_model, parent = KINDS[kind]
+    qs = model.objects.all()
+    if filters['teacher'] is not None:
+        qs = scope_to_teacher(qs, filters['teacher'])
+    if filters['since']:
+        qs = qs.filter(submitted_at__gte=filters['since'])
+    if filters['until']:
+        qs = qs.filter(submitted_at__lt=filters['until'])
+    if filters['stage']:
+        qs = qs.filter(stage=filters['stage'])
+    return qs
+
+
+def with_stored_blob(qs):
+    # 内容寻址存储的 blob 随查询一并取出，不再逐个文件按名字查 StoredFile
+    return qs.annotate(stored_blob=Subquery(StoredFile.objects.filter(name=OuterRef('file')).values('blob_id')[:1]))
+
+
+def _manifest_rows(kind, filters):
+    model, review_model, parent = KINDS[kind]
+    latest = review_model.objects.filter(**{parent: OuterRef('pk')}).order_by('-reviewed_at', '-id')
+    qs = (
+        with_stored_blob(submissions(kind, filters))
+        .select_related('student')
+        .annotate(
+            review_count=Subquery(
+                review_model.objects.filter(**{parent: OuterRef('pk')}).order_by()
+                .values(parent).annotate(n=Count('id')).values('n')[:1]
+            ),
+            latest_result=Subquery(latest.values('result')[:1]),
+            latest_score=Subquery(latest.values('score')[:1]),
+            latest_feedback=Subquery(latest.values('feedback')[:1]),
+            latest_reviewer=Subquery(latest.values('reviewer__username')[:1]),
+            latest_reviewed_at=Subquery(latest.values('reviewed_at')[:1]),
+        )
+        .order_by('id')
+    )
+    return qs.iterator(chunk_size=500)
+
+
+def _student_name(student):
+    return (student.last_name + student.first_name).strip() or student.username
+
+
+def arcname(kind, obj):
+    return f'{kind}/{obj.student.username}/{obj.pk}_{os.path.basename(obj.file.name)}'
+
+
+class _Sink(io.RawIOBase):
+    """zipfile 的输出端：只追加、不可 seek，写入的字节由 ``drain`` 取走。"""
+
+    def __init__(self):
+        self._chunks = []
+        self._size = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        self._size += len(data)
+        return len(data)
+
+    def drain(self, force=False):
+        """取出缓冲的字节；不足 ``READ_SIZE`` 时攒着（返回空串），避免逐行发送很小的块。"""
+        if not force and self._size < READ_SIZE:
+            return b''
+        data = b''.join(self._chunks)
+        self._chunks.clear()
+        self._size = 0
+        return data
+
+
+def _csv_line(row):
+    buffer = io.StringIO()
+    csv.writer(buffer).writerow(['' if value is None else value for value in row])
+    return buffer.getvalue().encode('utf-8')
+
+
+def stream_zip(filters):
+    """生成 ZIP 字节块的迭代器。"""
+    return (chunk for chunk in _stream_zip(filters) if chunk)
+
+
+def _stream_zip(filters):
+    sink = _Sink()
+    archive = zipfile.ZipFile(sink, mode='w', compression=zipfile.ZIP_STORED, allowZip64=True)
+
+    # 1. 清单：每份提交一行
+    with archive.open(zipfile.ZipInfo('manifest.csv', _now_tuple()), mode='w', force_zip64=True) as entry:
+        entry.write(b'\xef\xbb\xbf' + _csv_line(MANIFEST_HEADER))  # BOM，Excel 直接打开不乱码
+        # 第一批记录查出后立即发出首个数据块，客户端马上开始接收
+        first = True
+        for kind in filters['kinds']:
+            for obj in _manifest_rows(kind, filters):
+                file_status = ('ok' if _file_exists(obj) else 'missing') if obj.file else ''
+                entry.write(_csv_line([
+                    kind, obj.pk, obj.student.username, _student_name(obj.student),
+                    getattr(obj, 'title', ''), getattr(obj, 'stage', ''), getattr(obj, 'version', ''),
+                    obj.status, obj.submitted_at.isoformat(),
+                    arcname(kind, obj) if file_status == 'ok' else '', obj.review_count or 0,
+                    obj.latest_result, obj.latest_score, obj.latest_feedback, obj.latest_reviewer,
+                    obj.latest_reviewed_at.isoformat() if obj.latest_reviewed_at else '', file_status,
+                ]))
+                yield sink.drain(force=first)
+                first = False
+
+    # 2. 全部评审
+    with archive.open(zipfile.ZipInfo('reviews.csv', _now_tuple()), mode='w', force_zip64=True) as entry:
+        entry.write(b'\xef\xbb\xbf' + _csv_line(REVIEWS_HEADER))
+        for kind in filters['kinds']:
+            model, review_model, parent = KINDS[kind]
+            reviews = (
+                review_model.objects.filter(**{f'{parent}__in': submissions(kind, filters).values('pk')})
+                .select_related(f'{parent}__student', 'reviewer')
+                .order_by(parent, 'reviewed_at', 'id')
+            )
+            for review in reviews.iterator(chunk_size=1000):
+                submission = getattr(review, parent)
+                entry.write(_csv_line([
+                    kind, submission.pk, submission.student.username, getattr(review, 'stage', ''),
+                    review.result, review.score, review.feedback,
+                    review.reviewer.username if review.reviewer else '', review.reviewed_at.isoformat(),
+                ]))
+                yield sink.drain()
+
+    # 3. 文件本身
+    for kind in filters['kinds']:
+        qs = (
+            with_stored_blob(submissions(kind, filters).exclude(file='').exclude(file__isnull=True))
+            .select_related('student').order_by('id')
+        )
+        for obj in qs.only('id', 'file', 'submitted_at', 'student__username').iterator(chunk_size=500):
+            try:
+                source = _open_file(obj)
+            except FileNotFoundError:
+                continue
+            info = zipfile.ZipInfo(arcname(kind, obj), _timestamp(obj.submitted_at))
+            with source, archive.open(info, mode='w', force_zip64=True) as entry:
+                for data in iter(lambda: source.read(READ_SIZE), b''):
+                    entry.write(data)
+                    yield sink.drain()
+
+    archive.close()
+    yield sink.drain(force=True)
+
+
+def _open_file(obj):
+    storage = obj.file.storage
+    if obj.stored_blob and hasattr(storage, 'blob_path'):
+        return open(storage.blob_path(obj.stored_blob), 'rb')
+    return obj.file.open('rb')
+
+
+def _file_exists(obj):
+    storage = obj.file.storage
+    if hasattr(storage, 'blob_path'):
+        # 不在 StoredFile 表里的是未迁移的旧文件，按普通文件路径检查
+        if obj.stored_blob:
+            return os.path.exists(storage.blob_path(obj.stored_blob))
+        return os.path.exists(FileSystemStorage.path(storage, obj.file.name))
+    return storage.exists(obj.file.name)
+
+
+def _timestamp(value):
+    # ZIP 的 DOS 时间戳不能早于 1980 年
+    value = timezone.localtime(value).replace(tzinfo=None) if timezone.is_aware(value) else value
+    return max(value, datetime(1980, 1, 1)).timetuple()[:6]
+
+
+def _now_tuple():
+    return timezone.localtime().timetuple()[:6]
+
+
+def export_filename(filters):
+    parts = ['submissions'] + filters['kinds']
+    if filters['stage']:
+        parts.append(filters['stage'])
+    if filters['teacher'] is not None:
+        parts.append(filters['teacher'].username)
+    return '-'.join(parts) + f'-{timezone.localdate():%Y%m%d}.zip'
@@ -0,0 +1,192 @@
+"""请求级性能记录（``RequestTimingMiddleware``）。
+
+每个请求记录总耗时、SQL 条数与耗时、序列化耗时、渲染耗时和响应字节数：
+
+* 写进 ``Server-Timing`` 响应头，浏览器开发者工具的 Timing 面板直接显示各段耗时；
+* 以一行 JSON 记到本模块的日志（INFO）；总耗时超过 ``SLOW_MS`` 的请求记为 WARNING，并附上全部 SQL 及各自耗时。
+
+SQL 由 ``querylog.QueryRecorder(sites=False)`` 记录，不取调用栈。序列化耗时是最外层 ``serializer.data`` 的耗时
+减去其间执行 SQL 的时间（逐行懒加载算在 db 里，不重复计入）；渲染是 DRF 把数据编码成 JSON 的时间。
+流式响应（ZIP 导出）的响应头只能反映视图阶段，日志在最后一块发出后才写，包含流式阶段的 SQL 与字节数。
+
+开销：每条 SQL 多两次计时和一次列表追加，每个请求多一次 JSON 编码，
+``bench_serializers --only view.all_theses`` 可对比开启前后的耗时。
+
+配置见 ``settings.REQUEST_TIMING``::
+
+    REQUEST_TIMING = {
+        'ENABLED': True,
+        'HEADER': True,     # 是否输出 Server-Timing 响应头
+        'SLOW_MS': 1000,    # 慢请求阈值（毫秒），None 表示不单独记录慢请求
+        'SQL_LIMIT': 500,   # 慢请求日志里最多列出的 SQL 条数
+    }
+"""
+import json
+import logging
+import time
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from rest_framework.serializers import BaseSerializer
+
+from .querylog import QueryRecorder
+
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    'ENABLED': True,
+    'HEADER': True,
+    'SLOW_MS': 1000,
+    'SQL_LIMIT': 500,
+}
+HEADER = 'Server-Timing'
+
+_current = ContextVar('request_metrics', default=None)
+
+
+def get_config():
+    return {**DEFAULTS, **getattr(settings, 'REQUEST_TIMING', {})}
+
+
+class RequestMetrics:
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.recorder = QueryRecorder(sites=False)
+        self.serializer = 0.0
+        self.render = 0.0
+        self.elapsed = None
+        self.bytes = None
+        self._serializing = False
+
+    def finish(self, size):
+        self.elapsed = time.perf_counter() - self.started
+        self.bytes = size
+
+    def server_timing(self):
+        elapsed = self.elapsed if self.elapsed is not None else time.perf_counter() - self.started
+        return (
+            f'db;dur={self.recorder.duration * 1000:.1f};desc="{len(self.recorder)} queries", '
+            f'serialize;dur={self.serializer * 1000:.1f}, render;dur={self.render * 1000:.1f}, '
+            f'total;dur={elapsed * 1000:.1f}'
+        )
+
+
+def _timed_data(fget):
+    def data(self):
+        metrics = _current.get()
+        # 嵌套序列化器（SerializerMethodField 里再取 .data）算在外层里
+        if metrics is None or metrics._serializing:
+            return fget(self)
+        metrics._serializing = True
+        first_query = len(metrics.recorder.queries)
+        started = time.perf_counter()
+        try:
+            return fget(self)
+        finally:
+            db = sum(query.duration for query in metrics.recorder.queries[first_query:])
+            metrics.serializer += time.perf_counter() - started - db
+            metrics._serializing = False
+    data.timed = True
+    return data
+
+
+def install_serializer_timing():
+    """给 DRF ``BaseSerializer.data`` 加上计时（幂等）。
+
+    ``Serializer.data`` / ``ListSerializer.data`` 都经由 ``super().data``，包一处即可覆盖所有序列化器；
+    不在中间件处理的请求里（管理命令、任务）时只多一次 ContextVar 读取。
+    """
+    if not getattr(BaseSerializer.data.fget, 'timed', False):
+        BaseSerializer.data = property(_timed_data(BaseSerializer.data.fget))
+
+
+class RequestTimingMiddleware:
+    """记录每个请求的耗时构成，见模块说明。应放在 ``MIDDLEWARE`` 最前面，以覆盖其他中间件的耗时。"""
+
+    def __init__(self, get_response):
+        config = get_config()
+        if not config['ENABLED']:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.header = config['HEADER']
+        self.slow = config['SLOW_MS'] / 1000 if config['SLOW_MS'] is not None else None
+        self.sql_limit = config['SQL_LIMIT']
+        install_serializer_timing()
+
+    def __call__(self, request):
+        metrics = RequestMetrics()
+        token = _current.set(metrics)
+        try:
+            with metrics.recorder:
+                response = self.get_response(request)
+        finally:
+            _current.reset(token)
+
+        if response.streaming:
+            if self.header:
+                response[HEADER] = metrics.server_timing()
+            response.streaming_content = self._stream(request, response, response.streaming_content, metrics)
+            return response
+        metrics.finish(len(response.content))
+        if self.header:
+            response[HEADER] = metrics.server_timing()
+        self.log(request, response, metrics)
+        return response
+
+    def process_template_response(self, request, response):
+        # 本中间件在最外层，这个钩子最后被调用，之后紧接着就是 response.render()
+        metrics = _current.get()
+        if metrics is not None:
+            started = time.perf_counter()
+
+            def rendered(response):
+                metrics.render += time.perf_counter() - started
+            response.add_post_render_callback(rendered)
+        return response
+
+    def _stream(self, request, response, content, metrics):
+        # 逐块进出 execute_wrapper，不在 yield 期间一直挂着，避免与其他 wrapper 的进出顺序交错
+        content = iter(content)
+        size = 0
+        try:
+            while True:
+                with metrics.recorder:
+                    chunk = next(content, None)
+                if chunk is None:
+                    break
+                size += len(chunk)
+                yield chunk
+        finally:
+            metrics.finish(size)
+            self.log(request, response, metrics)
+
+    def log(self, request, response, metrics):
+        slow = self.slow is not None and metrics.elapsed >= self.slow
+        if not slow and not logger.isEnabledFor(logging.INFO):
+            return
+        match = request.resolver_match
+        record = {
+            'method': request.method,
+            'path': request.path,
+            'view': match.view_name if match else None,
+            'status': response.status_code,
+            'duration_ms': round(metrics.elapsed * 1000, 1),
+            'db_queries': len(metrics.recorder),
+            'db_ms': round(metrics.recorder.duration * 1000, 1),
+            'serializer_ms': round(metrics.serializer * 1000, 1),
+            'render_ms': round(metrics.render * 1000, 1),
+            'bytes': metrics.bytes,
+        }
+        if slow:
+            queries = metrics.recorder.queries
+            record['slow'] = True
+            record['sql'] = [
+                {'sql': query.sql, 'ms': round(query.duration * 1000, 2)} for query in queries[:self.sql_limit]
+            ]
+            if len(queries) > self.sql_limit:
+                record['sql_omitted'] = len(queries) - self.sql_limit
+        logger.log(logging.WARNING if slow else logging.INFO, json.dumps(record, ensure_ascii=False),
+                   extra={'request_metrics': record})
@@ -0,0 +1,172 @@
+"""基于数据库的后台任务队列，不依赖外部消息中间件。
+
+* ``enqueue(func, *args, **kwargs)`` 写一行 ``Job``。在调用方的事务里入队，提交回滚时任务随之
+  消失，不会出现"任务已发出、数据却没写进去"的情况；
+* ``dequeue`` 取出最高优先级、已到执行时间的任务并标记为 running。数据库支持
+  ``SELECT ... FOR UPDATE SKIP LOCKED``（PostgreSQL / MySQL 8）时用行锁，多个工作进程互不阻塞；
+  SQLite 没有行锁，用带状态条件的 UPDATE 抢占，抢不到就换下一条；
+* 任务抛出异常时按指数退避（带随机抖动）重新排队，达到 ``max_attempts`` 后标记为 failed；
+* 工作进程意外退出时，running 超过 ``VISIBILITY_TIMEOUT`` 的任务由其他工作进程放回队列，
+  因此任务须可重复执行（幂等）；
+* ``manage.py run_jobs --processes N`` 启动 N 个工作进程，可以与 Web 进程分开扩缩。
+
+配置见 ``settings.JOB_QUEUE``。
+"""
+import logging
+import os
+import random
+import signal
+import socket
+import time
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections, connection, transaction
+from django.db.models import F
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import Job
+
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    'POLL_INTERVAL': 1.0,           # 队列为空时的轮询间隔（秒）
+    'VISIBILITY_TIMEOUT': 600,      # running 超过这么久视为工作进程已丢失
+    'RETRY_BASE': 10,               # 第 n 次失败后等待 RETRY_BASE * 2^(n-1) 秒
+    'RETRY_MAX': 3600,
+    'MAX_ATTEMPTS': 5,
+    'KEEP_DONE': 7 * 24 * 3600,     # 完成的任务保留多久
+    'MAINTENANCE_INTERVAL': 30,
+}
+
+
+def get_config():
+    return {**DEFAULTS, **getattr(settings, 'JOB_QUEUE', {})}
+
+
+def task_path(func):
+    if isinstance(func, str):
+        return func
+    return f'{func.__module__}.{func.__qualname__}'
+
+
+def enqueue(func, *args, queue='default', priority=0, delay=None, max_attempts=None, **kwargs):
+    """把 ``func(*args, **kwargs)`` 放入队列，返回 ``Job``。``func`` 为模块级函数或其点分路径。"""
+    path = task_path(func)
+    import_string(path)  # 入队时就发现拼错的路径
+    return Job.objects.create(
+        queue=queue, task=path, args=list(args), kwargs=kwargs, priority=priority,
+        run_at=timezone.now() + (delay or timedelta(0)),
+        max_attempts=max_attempts or get_config()['MAX_ATTEMPTS'],
+    )
+
+
+def dequeue(worker, queues=('default',), now=None):
+    """取出一个可执行的任务并标记为 running；没有时返回 ``None``。"""
+    now = now or timezone.now()
+    ready = (
+        Job.objects.filter(status='queued', queue__in=queues, run_at__lte=now)
+        .order_by('-priority', 'run_at', 'id')
+    )
+    claim = {'status': 'running', 'locked_by': worker, 'locked_at': now, 'attempts': F('attempts') + 1}
+    if connection.features.has_select_for_update_skip_locked:
+        with transaction.atomic():
+            pk = ready.select_for_update(skip_locked=True).values_list('pk', flat=True).first()
+            if pk is None:
+                return None
+            Job.objects.filter(pk=pk).update(**claim)
+    else:
+        for pk in ready.values_list('pk', flat=True)[:10]:
+            if Job.objects.filter(pk=pk, status='queued').update(**claim):
+                break
+        else:
+            return None
+    return Job.objects.get(pk=pk)
+
+
+def retry_delay(attempts):
+    config = get_config()
+    delay = min(config['RETRY_BASE'] * 2 ** (attempts - 1), config['RETRY_MAX'])
+    return timedelta(seconds=delay * random.uniform(1, 1.25))
+
+
+def execute(job):
+    """执行一个已取出的任务并记录结果，返回是否成功。"""
+    mine = Job.objects.filter(pk=job.pk, status='running', locked_by=job.locked_by)
+    try:
+        import_string(job.task)(*job.args, **job.kwargs)
+    except Exception as exc:
+        error = ''.join(traceback.format_exception(exc))[-4000:]
+        now = timezone.now()
+        if job.attempts >= job.max_attempts:
+            logger.error('job %s (%s) failed after %s attempts: %s', job.pk, job.task, job.attempts, exc)
+            mine.update(status='failed', last_error=error, locked_by='', finished_at=now)
+        else:
+            logger.warning('job %s (%s) attempt %s failed: %s', job.pk, job.task, job.attempts, exc)
+            mine.update(status='queued', last_error=error, locked_by='', locked_at=None,
+                        run_at=now + retry_delay(job.attempts))
+        return False
+    mine.update(status='done', locked_by='', finished_at=timezone.now())
+    return True
+
+
+def requeue_stale(now=None):
+    """把工作进程丢失后卡在 running 的任务放回队列（已用尽次数的标记为 failed），返回处理数。"""
+    now = now or timezone.now()
+    stale = Job.objects.filter(
+        status='running', locked_at__lt=now - timedelta(seconds=get_config()['VISIBILITY_TIMEOUT']),
+    )
+    failed = stale.filter(attempts__gte=F('max_attempts')).update(
+        status='failed', last_error='worker lost', locked_by='', finished_at=now,
+    )
+    requeued = stale.update(status='queued', last_error='worker lost', locked_by='', locked_at=None, run_at=now)
+    return failed + requeued
+
+
+def purge_finished(now=None):
+    now = now or timezone.now()
+    cutoff = now - timedelta(seconds=get_config()['KEEP_DONE'])
+    return Job.objects.filter(status='done', finished_at__lt=cutoff).delete()[0]
+
+
+def worker_name():
+    return f'{socket.gethostname()}:{os.getpid()}'
+
+
+def work(queues=('default',), burst=False, max_jobs=None):
+    """工作进程主循环：收到 SIGTERM / SIGINT 后做完当前任务再退出。返回执行的任务数。
+
+    ``burst=True`` 时队列取空即退出。
+    """
+    config = get_config()
+    name = worker_name()
+    stopping = []
+
+    def stop(signum, frame):
+        stopping.append(signum)
+
+    previous = {sig: signal.signal(sig, stop) for sig in (signal.SIGTERM, signal.SIGINT)}
+    done = 0
+    last_maintenance = 0.0
+    try:
+        while not stopping and (max_jobs is None or done < max_jobs):
+            if time.monotonic() - last_maintenance > config['MAINTENANCE_INTERVAL']:
+                requeue_stale()
+                purge_finished()
+                last_maintenance = time.monotonic()
+            close_old_connections()
+            job = dequeue(name, queues)
+            if job is None:
+                if burst:
+                    break
+                time.sleep(config['POLL_INTERVAL'])
+                continue
+            execute(job)
+            done += 1
+    finally:
+        for sig, handler in previous.items():
+            signal.signal(sig, handler)
+    return done
@@ -0,0 +1,452 @@
+"""API 压测（``manage.py loadtest_api``）：按学生 / 教师 / 管理员的场景比例并发访问真实 HTTP 接口。
+
+默认在后台线程里启动与 ``runserver`` 相同的多线程 WSGI 服务，每个响应带 ``X-Query-Count`` 头（本次请求执行的
+SQL 条数）；也可以用 ``url`` 指向已经运行的服务（没有该响应头时不统计 SQL）。账号取自 ``generate_data`` 生成的
+数据（按用户名前缀），每个会话先登录再按角色走一遍常用页面。
+
+结果按端点统计 p50 / p95 / p99 延迟、吞吐、错误率（5xx 与连接失败；4xx 单独计数）和 SQL 条数，输出为 JSON。
+会话的角色、账号和每一步的选择只取决于 ``seed`` 与会话序号，与线程调度无关，同一份数据上的两次运行
+发出同一串请求，可以用 ``compare`` 对比两次结果找出回归。写操作（选题、提交、评审）会改变数据，
+需要严格对比时用 ``read_only`` 或每次从同一份数据开始。
+"""
+import http.client
+import json
+import math
+import os
+import platform
+import random
+import subprocess
+import threading
+import time
+import uuid
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack
+from urllib.parse import urlencode, urlsplit
+
+import django
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.servers.basehttp import ThreadedWSGIServer, WSGIRequestHandler, get_internal_wsgi_application
+from django.db import connections
+from django.utils import timezone
+
+from .models import MidtermCheck, Proposal, Thesis, Topic, TopicSelection
+
+
+API_PREFIX = '/api/auth/'
+QUERY_COUNT_HEADER = 'X-Query-Count'
+DEFAULT_MIX = {'student': 90, 'teacher': 8, 'admin': 2}
+PERCENTILES = (50, 95, 99)
+# 对比时 p95 至少变慢这么多毫秒才算回归，避免很快的端点因抖动误报
+MIN_REGRESSION_MS = 2.0
+# 样本太少时 p95 就是个别请求的耗时，不据此判断延迟回归（SQL 条数与错误率照常比较）
+MIN_SAMPLES = 20
+# 学生提交用的最小 PDF（内容随机，避免被查重当成同一份）
+PDF_HEADER = b'%PDF-1.4\n'
+
+
+class LoadTestError(ValueError):
+    pass
+
+
+def parse_mix(text):
+    """``student=90,teacher=8,admin=2`` → ``{'student': 90, ...}``。"""
+    mix = {}
+    for part in filter(None, (p.strip() for p in text.split(','))):
+        role, _, weight = part.partition('=')
+        if role not in DEFAULT_MIX:
+            raise LoadTestError(f'未知角色：{role}（可选 {", ".join(DEFAULT_MIX)}）')
+        try:
+            mix[role] = float(weight)
+        except ValueError:
+            raise LoadTestError(f'比例不是数字：{part}')
+    if not mix or sum(mix.values()) <= 0 or min(mix.values()) < 0:
+        raise LoadTestError('场景比例至少要有一个正数')
+    return mix
+
+
+# -- 本地服务 -------------------------------------------------------------------
+
+def count_queries(app):
+    """包装 WSGI 应用：把本次请求执行的 SQL 条数写进响应头 ``X-Query-Count``。"""
+    def wrapped(environ, start_response):
+        executed = 0
+
+        def count(execute, sql, params, many, context):
+            nonlocal executed
+            executed += 1
+            return execute(sql, params, many, context)
+
+        def start(status, headers, exc_info=None):
+            return start_response(status, [*headers, (QUERY_COUNT_HEADER, str(executed))], exc_info)
+
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(count))
+            return app(environ, start)
+    return wrapped
+
+
+class QuietRequestHandler(WSGIRequestHandler):
+    # wsgiref 分两次写响应头和响应体，开着 Nagle 时每个长连接上的请求都要多等一个延迟 ACK（约 40ms）
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+
+class LocalServer:
+    """在后台线程里运行的多线程 WSGI 服务（``runserver`` 的同一实现），用作上下文管理器。
+
+    ``connections_override`` 与 ``LiveServerTestCase`` 相同，测试里用来共享内存数据库连接。
+    """
+
+    def __init__(self, host='127.0.0.1', port=0, connections_override=None):
+        self.host, self.port = host, port
+        self.connections_override = connections_override
+
+    def __enter__(self):
+        self.httpd = ThreadedWSGIServer(
+            (self.host, self.port), QuietRequestHandler, allow_reuse_address=False,
+            connections_override=self.connections_override,
+        )
+        self.httpd.set_app(count_queries(get_internal_wsgi_application()))
+        self.thread = threading.Thread(target=self.httpd.serve_forever, name='loadtest-server', daemon=True)
+        self.thread.start()
+        self.url = f'http://{self.host}:{self.httpd.server_address[1]}'
+        return self
+
+    def __exit__(self, *exc_info):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        self.thread.join()
+
+
+# -- 客户端与场景 -----------------------------------------------------------------
+
+class Session:
+    """一个虚拟用户的一次访问：一条长连接、登录得到的 token、按会话序号播种的随机数。"""
+
+    def __init__(self, base_url, rng, username, password, writes, timeout):
+        parts = urlsplit(base_url)
+        self.host, self.port = parts.hostname, parts.port
+        self.prefix = parts.path.rstrip('/') + API_PREFIX
+        self.rng, self.username, self.password = rng, username, password
+        self.writes, self.timeout = writes, timeout
+        self.token = None
+        self.connection = None
+        self.samples = []
+
+    def close(self):
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
+
+    def send(self, method, path, body, headers):
+        """发一个请求；服务端关掉了空闲长连接时重连一次。返回 ``(status, headers, body)``。"""
+        for attempt in range(2):
+            if self.connection is None:
+                self.connection = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+            try:
+                self.connection.request(method, path, body=body, headers=headers)
+                response = self.connection.getresponse()
+                data = response.read()
+            except (http.client.RemoteDisconnected, BrokenPipeError, ConnectionResetError):
+                self.close()
+                if attempt:
+                    raise
+                continue
+            if response.will_close:
+                self.close()
+            return response.status, response, data
+
+    def call(self, method, path, label, params=None, json_body=None, multipart=None):
+        """请求 ``/api/auth/<path>`` 并记录一条样本；``label`` 是归并统计用的端点名。返回解析后的 JSON 或 None。"""
+        url = path if path.startswith('/') else self.prefix + path
+        if params:
+            url = f'{url}?{urlencode(params)}'
+        headers = {'Accept': 'application/json'}
+        if self.token:
+            headers['Authorization'] = f'Token {self.token}'
+        body = None
+        if json_body is not None:
+            body = json.dumps(json_body).encode()
+            headers['Content-Type'] = 'application/json'
+        elif multipart is not None:
+            boundary = uuid.uuid4().hex
+            body = encode_multipart(boundary, *multipart)
+            headers['Content-Type'] = f'multipart/form-data; boundary={boundary}'
+
+        started = time.perf_counter()
+        try:
+            status, response, data = self.send(method, url, body, headers)
+        except (OSError, http.client.HTTPException):
+            self.samples.append((f'{method} {label}', 0, time.perf_counter() - started, None))
+            return None
+        elapsed = time.perf_counter() - started
+        queries = response.getheader(QUERY_COUNT_HEADER)
+        self.samples.append((f'{method} {label}', status, elapsed, int(queries) if queries is not None else None))
+        if status >= 400 or not data:
+            return None
+        try:
+            return json.loads(data)
+        except ValueError:
+            return None
+
+    def get(self, path, label=None, **params):
+        return self.call('GET', path, label or path, params=params)
+
+    def follow(self, page, label):
+        """沿分页响应的 ``next`` 链接翻一页（游标分页与页码分页都一样）。"""
+        if not page or not page.get('next'):
+            return None
+        parts = urlsplit(page['next'])
+        return self.call('GET', f'{parts.path}?{parts.query}', label)
+
+    def login(self):
+        data = self.call('POST', 'login/', 'login/', json_body={'identifier': self.username, 'password': self.password})
+        self.token = data['token'] if data else None
+        return self.token is not None
+
+
+def encode_multipart(boundary, fields, files):
+    lines = []
+    for name, value in fields.items():
+        lines.append(f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'.encode())
+    for name, (filename, content, content_type) in files.items():
+        lines.append(
+            f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"; filename="{filename}"\r\n'
+            f'Content-Type: {content_type}\r\n\r\n'.encode() + content + b'\r\n'
+        )
+    lines.append(f'--{boundary}--\r\n'.encode())
+    return b''.join(lines)
+
+
+def results(page):
+    if isinstance(page, dict):
+        return page.get('results') or []
+    return page or []
+
+
+def student_scenario(session):
+    """学生：看进度、浏览课题（偶尔翻页）、查看自己的各阶段提交；写操作为选题和提交论文。"""
+    rng = session.rng
+    session.get('me/')
+    session.get('progress/')
+    page = session.get('topics/', page_size=20)
+    if rng.random() < 0.3:
+        session.follow(page, 'topics/')
+    for path in ('proposal/my-proposals/', 'midterm/my-midterms/', 'thesis/my-thesis/'):
+        session.get(path)
+    if not session.writes:
+        return
+    topics = results(page)
+    if topics and rng.random() < 0.2:
+        topic = rng.choice(topics)
+        session.call('POST', f'topics/{topic["id"]}/select/', 'topics/<pk>/select/')
+    if rng.random() < 0.1:
+        content = PDF_HEADER + rng.randbytes(rng.randint(16, 256) * 1024)
+        session.call('POST', 'thesis/submit/', 'thesis/submit/', multipart=(
+            {'title': f'压测论文 {session.username}', 'stage': 'first_review', 'version': 'loadtest'},
+            {'file': ('loadtest.pdf', content, 'application/pdf')},
+        ))
+
+
+def teacher_scenario(session):
+    """教师：自己的课题与选课学生、学生进度、三类提交列表；写操作为评审论文和开题报告。"""
+    rng = session.rng
+    session.get('me/')
+    topics = session.get('topics/my-topics/')
+    if topics:
+        session.get(f'topics/{rng.choice(topics)["id"]}/students/', 'topics/<pk>/students/')
+    session.get('progress/cohort/', page_size=50)
+    theses = session.get('thesis/all-theses/', page_size=20)
+    if rng.random() < 0.3:
+        session.follow(theses, 'thesis/all-theses/')
+    proposals = session.get('proposal/all-proposals/', page_size=20)
+    session.get('midterm/all-midterms/', page_size=20)
+    if not session.writes:
+        return
+    if results(theses) and rng.random() < 0.3:
+        thesis = rng.choice(results(theses))
+        session.call('POST', f'thesis/{thesis["id"]}/review/', 'thesis/<id>/review/', json_body={
+            'stage': thesis['stage'], 'result': rng.choice(['pass', 'revise']), 'score': rng.randint(60, 95),
+            'feedback': '压测评审',
+        })
+    if results(proposals) and rng.random() < 0.2:
+        proposal = rng.choice(results(proposals))
+        session.call('POST', f'proposal/{proposal["id"]}/review/', 'proposal/<id>/review/', json_body={
+            'result': 'pass', 'score': rng.randint(60, 95), 'feedback': '压测评审',
+        })
+
+
+def admin_scenario(session):
+    """管理员：全部课题、全体进度（随机页）、三类提交列表的深翻页与按学生搜索。"""
+    rng = session.rng
+    session.get('me/')
+    session.get('topics/', page_size=50)
+    session.get('progress/cohort/', page=rng.randint(1, 5), page_size=50)
+    page = session.get('thesis/all-theses/', page_size=50)
+    for _ in range(2):
+        page = session.follow(page, 'thesis/all-theses/')
+    session.get('thesis/all-theses/', 'thesis/all-theses/?username', username=rng.choice('张王李赵刘陈'))
+    session.get('proposal/all-proposals/', page_size=50)
+    session.get('midterm/all-midterms/', page_size=50)
+
+
+SCENARIOS = {'student': student_scenario, 'teacher': teacher_scenario, 'admin': admin_scenario}
+
+
+# -- 运行与统计 -------------------------------------------------------------------
+
+def accounts(prefix):
+    """按角色列出前缀为 ``<prefix>-`` 的账号（按主键排序，保证同一数据上的选择稳定）。"""
+    found = defaultdict(list)
+    rows = (User.objects.filter(username__startswith=f'{prefix}-', is_active=True)
+            .order_by('pk').values_list('username', 'profile__role'))
+    for username, role in rows:
+        found[role].append(username)
+    return found
+
+
+def dataset_size():
+    return {
+        'users': User.objects.count(), 'topics': Topic.objects.count(),
+        'selections': TopicSelection.objects.count(), 'proposals': Proposal.objects.count(),
+        'midterms': MidtermCheck.objects.count(), 'theses': Thesis.objects.count(),
+    }
+
+
+def percentile(ordered, p):
+    """最近秩法：``ordered`` 已升序。"""
+    return ordered[max(0, math.ceil(p / 100 * len(ordered)) - 1)]
+
+
+def summarize(samples, elapsed):
+    grouped = defaultdict(list)
+    for label, status, seconds, queries in samples:
+        grouped[label].append((status, seconds, queries))
+
+    def stats(rows):
+        latencies = sorted(seconds * 1000 for _, seconds, _ in rows)
+        statuses = Counter(status for status, _, _ in rows)
+        errors = sum(count for status, count in statuses.items() if status == 0 or status >= 500)
+        queries = [q for _, _, q in rows if q is not None]
+        return {
+            'requests': len(rows),
+            'throughput': round(len(rows) / elapsed, 2),
+            'latency_ms': {
+                **{f'p{p}': round(percentile(latencies, p), 2) for p in PERCENTILES},
+                'mean': round(sum(latencies) / len(latencies), 2),
+                'max': round(latencies[-1], 2),
+            },
+            'errors': errors,
+            'error_rate': round(errors / len(rows), 4),
+            'client_errors': sum(count for status, count in statuses.items() if 400 <= status < 500),
+            'status': {str(status): count for status, count in sorted(statuses.items())},
+            'queries': {
+                'mean': round(sum(queries) / len(queries), 2), 'max': max(queries),
+            } if queries else None,
+        }
+
+    return {
+        'total': {**stats([row for rows in grouped.values() for row in rows]), 'elapsed_s': round(elapsed, 3)},
+        'endpoints': {label: stats(rows) for label, rows in sorted(grouped.items())},
+    }
+
+
+def git_revision():
+    try:
+        revision = subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=settings.BASE_DIR, capture_output=True,
+                                  text=True, timeout=10).stdout.strip()
+        dirty = subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], cwd=settings.BASE_DIR,
+                               capture_output=True, text=True, timeout=10).stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        return None
+    return {'commit': revision or None, 'dirty': bool(dirty)}
+
+
+def run(url=None, sessions=200, concurrency=10, mix=None, seed=0, prefix='syn', password='miku1314',
+        read_only=False, warmup=0, timeout=60, connections_override=None, progress=None):
+    """跑一轮压测并返回报告（可直接 ``json.dump``）。``url`` 为空时启动本地服务。"""
+    mix = mix or dict(DEFAULT_MIX)
+    found = accounts(prefix)
+    roles = [role for role, weight in mix.items() if weight > 0]
+    missing = [role for role in roles if not found.get(role)]
+    if missing:
+        raise LoadTestError(f'没有前缀为 {prefix}- 的{"、".join(missing)}账号，请先运行 generate_data')
+    weights = [mix[role] for role in roles]
+
+    def session(index, base_url):
+        rng = random.Random(f'{seed}:{index}')
+        role = rng.choices(roles, weights)[0]
+        current = Session(base_url, rng, rng.choice(found[role]), password, not read_only, timeout)
+        try:
+            if current.login():
+                SCENARIOS[role](current)
+        finally:
+            current.close()
+        return role, current.samples
+
+    def drive(base_url):
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            list(pool.map(lambda i: session(-1 - i, base_url), range(warmup)))
+            samples, roles_run = [], Counter()
+            started = time.perf_counter()
+            for done, (role, rows) in enumerate(pool.map(lambda i: session(i, base_url), range(sessions)), 1):
+                samples.extend(rows)
+                roles_run[role] += 1
+                if progress is not None:
+                    progress(done, sessions)
+            return samples, roles_run, time.perf_counter() - started
+
+    started_at = timezone.now()
+    if url:
+        samples, roles_run, elapsed = drive(url)
+    else:
+        with LocalServer(connections_override=connections_override) as server:
+            samples, roles_run, elapsed = drive(server.url)
+    if not samples:
+        raise LoadTestError('没有发出任何请求')
+    return {
+        'meta': {
+            'started_at': started_at.isoformat(),
+            'server': url or 'local',
+            'revision': git_revision(),
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'database': connections['default'].vendor,
+            'cpus': os.cpu_count(),
+            'dataset': dataset_size(),
+            'options': {
+                'sessions': sessions, 'concurrency': concurrency, 'mix': mix, 'seed': seed, 'prefix': prefix,
+                'read_only': read_only, 'warmup': warmup,
+            },
+            'sessions_by_role': dict(sorted(roles_run.items())),
+        },
+        **summarize(samples, elapsed),
+    }
+
+
+def compare(baseline, report, threshold=0.2):
+    """逐端点对比两份报告，返回 ``[(端点, 指标, 之前, 之后, 是否回归)]``。
+
+    p95 延迟变慢超过 ``threshold``（比例）且至少 ``MIN_REGRESSION_MS`` 毫秒（两边都有 ``MIN_SAMPLES`` 个样本时）、
+    平均 SQL 条数增加半条以上、错误率上升，均算回归；只在一边出现的端点不比较。
+    """
+    rows = []
+    for label, after in report['endpoints'].items():
+        before = baseline.get('endpoints', {}).get(label)
+        if before is None:
+            continue
+        old, new = before['latency_ms']['p95'], after['latency_ms']['p95']
+        enough = min(before['requests'], after['requests']) >= MIN_SAMPLES
+        rows.append((label, 'p95_ms', old, new,
+                     enough and new > old * (1 + threshold) and new - old >= MIN_REGRESSION_MS))
+        if before['queries'] and after['queries']:
+            old, new = before['queries']['mean'], after['queries']['mean']
+            rows.append((label, 'queries', old, new, new - old >= 0.5))
+        old, new = before['error_rate'], after['error_rate']
+        rows.append((label, 'error_rate', old, new, new > old))
+    return rows
@@ -0,0 +1,49 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from users.allocation import allocate
+from users.models import AllocationRound
+
+
+class Command(BaseCommand):
+    help = 'Allocate topics for a preference round (random serial dictatorship, deterministic seed).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--round', type=int, help='轮次 id，默认取最近一个已截止、未分配的轮次')
+        parser.add_argument('--seed', type=int, help='覆盖轮次保存的抽签种子')
+        parser.add_argument('--dry-run', action='store_true', help='只计算分配结果，不写库')
+        parser.add_argument('--force', action='store_true', help='允许在填报截止前分配')
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        now = timezone.now()
+        if options['round']:
+            round = AllocationRound.objects.filter(pk=options['round']).first()
+            if round is None:
+                raise CommandError(f'轮次 {options["round"]} 不存在')
+        else:
+            round = AllocationRound.objects.pending(now).filter(closes_at__lte=now).first()
+            if round is None:
+                raise CommandError('没有已截止、待分配的轮次')
+        if round.allocated_at is not None:
+            raise CommandError(f'轮次「{round}」已于 {round.allocated_at:%Y-%m-%d %H:%M} 分配')
+        if round.closes_at > now and not options['force']:
+            raise CommandError(f'轮次「{round}」尚未截止，使用 --force 提前分配')
+
+        started = time.perf_counter()
+        stats = allocate(round, seed=options['seed'], dry_run=options['dry_run'],
+                         batch_size=options['batch_size'])
+        elapsed = time.perf_counter() - started
+
+        ranks = '，'.join(f'第{rank}志愿 {count}' for rank, count in stats['ranks'].items()) or '无'
+        self.stdout.write(
+            f'轮次「{round}」：{stats["students"]} 名学生参与，{stats["assigned"]} 名分配成功，'
+            f'{len(stats["unassigned"])} 名未分配，{stats["skipped"]} 名已有选题跳过'
+        )
+        self.stdout.write(f'志愿命中：{ranks}')
+        if options['dry_run']:
+            self.stdout.write(self.style.WARNING(f'试运行，未写入数据库（{elapsed:.2f}s）'))
+            return
+        self.stdout.write(self.style.SUCCESS(f'分配完成，耗时 {elapsed:.2f}s'))
@@ -0,0 +1,79 @@
+import os
+import random
+import time
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.files.base import ContentFile
+from django.core.management.base import BaseCommand
+from django.test import override_settings
+from django.views.static import serve as static_serve
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from users.models import Profile, Thesis
+from users.views import SubmissionFileDownloadAPIView
+
+
+class Command(BaseCommand):
+    help = 'Compare static() media serving with the permission-checked download view (full file and Range).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--size-mb', type=int, default=20, help='测试文件大小（MB）')
+        parser.add_argument('--requests', type=int, default=30, help='每个场景的请求数')
+        parser.add_argument('--range-kb', type=int, default=256, help='Range 场景每次读取的大小（KB）')
+
+    def handle(self, *args, **options):
+        factory = APIRequestFactory()
+        view = SubmissionFileDownloadAPIView.as_view()
+        student = User.objects.create_user(username='bench-media-student')
+        Profile.objects.filter(user=student).update(role='student')
+        student.refresh_from_db()
+        thesis = Thesis(student=student, title='bench', stage='first_review')
+        thesis.file.save('bench.pdf', ContentFile(os.urandom(options['size_mb'] * 1024 * 1024)))
+        size = thesis.file.size
+        rng = random.Random(0)
+        span = options['range_kb'] * 1024
+
+        def ranges():
+            start = rng.randrange(0, size - span)
+            return {'HTTP_RANGE': f'bytes={start}-{start + span - 1}'}
+
+        def static_request(headers):
+            request = factory.get(f'/media/{thesis.file.name}', **headers)
+            return static_serve(request, thesis.file.name, document_root=settings.MEDIA_ROOT)
+
+        def view_request(headers):
+            request = factory.get(f'/api/auth/files/thesis/{thesis.pk}/', **headers)
+            force_authenticate(request, user=student)
+            return view(request, kind='thesis', pk=thesis.pk)
+
+        scenarios = [
+            ('static() 整文件', static_request, dict, 'python'),
+            ('下载视图 整文件', view_request, dict, 'python'),
+            ('static() 跳页（忽略 Range）', static_request, ranges, 'python'),
+            ('下载视图 跳页（Range）', view_request, ranges, 'python'),
+            ('下载视图 X-Accel-Redirect', view_request, dict, 'nginx'),
+        ]
+        try:
+            self.stdout.write(f'文件 {size / 1024 / 1024:.0f} MB，每场景 {options["requests"]} 次请求')
+            for name, send, headers, mode in scenarios:
+                with override_settings(MEDIA_DOWNLOAD_BACKEND=mode):
+                    self.run(name, send, headers, options['requests'])
+        finally:
+            thesis.file.delete(save=False)
+            student.delete()
+
+    def run(self, name, send, headers, count):
+        sent = 0
+        started = time.perf_counter()
+        for _ in range(count):
+            response = send(headers())
+            body = response.streaming_content if response.streaming else [response.content]
+            for chunk in body:
+                sent += len(chunk)
+            response.close()
+        elapsed = time.perf_counter() - started
+        self.stdout.write(
+            f'{name:<28} {count / elapsed:8.1f} req/s  {sent / elapsed / 1024 / 1024:8.1f} MB/s  '
+            f'每请求 {sent / count / 1024:8.0f} KB 经过 Python'
+        )
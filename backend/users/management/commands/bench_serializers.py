@@ -0,0 +1,64 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from users import benchmarks
+
+
+class Command(BaseCommand):
+    help = 'Microbenchmark serializers and the progress view on fixed-size fixtures (rolled back afterwards).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', default=','.join(map(str, benchmarks.SIZES)), help='夹具行数，逗号分隔')
+        parser.add_argument('--only', help='只跑名称包含该子串的基准（如 thesis、progress）')
+        parser.add_argument('--repeat', type=int, default=3, help='每项至少计时的次数')
+        parser.add_argument('--min-time', type=float, default=0.5, help='每项至少累计计时的秒数')
+        parser.add_argument('--output', help='把 JSON 结果写入文件（可作为之后的 --baseline）')
+        parser.add_argument('--baseline', help='与之前保存的 JSON 结果对比')
+        parser.add_argument('--tolerance', type=float, default=0.15, help='耗时 / 内存峰值超过该比例算回归')
+        parser.add_argument('--fail-on-regression', action='store_true', help='有回归时以非零状态退出')
+
+    def handle(self, *args, **options):
+        try:
+            sizes = [int(size) for size in options['sizes'].split(',') if size.strip()]
+        except ValueError:
+            raise CommandError(f'无效的 --sizes：{options["sizes"]}')
+        baseline = None
+        if options['baseline']:
+            try:
+                with open(options['baseline'], encoding='utf-8') as f:
+                    baseline = json.load(f)
+            except (OSError, ValueError) as exc:
+                raise CommandError(f'无法读取基准线：{exc}')
+
+        self.stdout.write(f'{"基准":<40} {"SQL":>5} {"中位数 ms":>11} {"最小 ms":>9} {"每行 µs":>9} {"峰值 KB":>10} {"次数":>5}')
+
+        def progress(name, result):
+            self.stdout.write(
+                f'{name:<40} {result["queries"]:>5} {result["median_ms"]:>11.3f} {result["min_ms"]:>9.3f} '
+                f'{result["per_row_us"]:>9.1f} {result["peak_kb"]:>10.1f} {result["runs"]:>5}'
+            )
+
+        try:
+            report = benchmarks.run(sizes=sizes, only=options['only'], repeat=options['repeat'],
+                                    min_time=options['min_time'], progress=progress)
+        except benchmarks.BenchmarkError as exc:
+            raise CommandError(str(exc))
+
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as f:
+                json.dump(report, f, ensure_ascii=False, indent=2)
+                f.write('\n')
+        if baseline is None:
+            return
+
+        regressions = 0
+        for name, metric, before, after, regressed in benchmarks.compare(baseline, report, options['tolerance']):
+            if not regressed:
+                continue
+            regressions += 1
+            self.stdout.write(self.style.ERROR(f'{name:<40} {metric:<10} {before:>10} → {after}'))
+        if not regressions:
+            self.stdout.write(self.style.SUCCESS('与基准线相比没有回归'))
+        elif options['fail_on_regression']:
+            raise CommandError(f'{regressions} 项指标回归')
@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from users.progress import find_inconsistent, refresh_progress
+
+
+class Command(BaseCommand):
+    help = 'Compare student progress snapshots with the live computation.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--fix', action='store_true', help='重新计算不一致的快照')
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        mismatches = find_inconsistent(batch_size=options['batch_size'])
+        if not mismatches:
+            self.stdout.write(self.style.SUCCESS('所有进度快照与实时计算一致'))
+            return
+
+        for student_id, stored, live in mismatches:
+            if stored is None:
+                self.stdout.write(self.style.WARNING(f'学生 {student_id}: 缺少快照'))
+                continue
+            stages = sorted(k for k in live if stored.get(k) != live[k])
+            self.stdout.write(self.style.WARNING(f'学生 {student_id}: 不一致阶段 {", ".join(stages)}'))
+
+        if options['fix']:
+            for student_id, _, _ in mismatches:
+                refresh_progress(student_id)
+            self.stdout.write(self.style.SUCCESS(f'已修复 {len(mismatches)} 个快照'))
+            return
+        raise CommandError(f'{len(mismatches)} 个进度快照与实时计算不一致')
@@ -0,0 +1,17 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+
+from users.uploads import collect_garbage, session_expiry
+
+
+class Command(BaseCommand):
+    help = 'Delete abandoned chunked-upload sessions and their temporary files.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--hours', type=float, help='超过多少小时无进展视为放弃，默认 CHUNKED_UPLOAD_EXPIRY')
+
+    def handle(self, *args, **options):
+        max_age = timedelta(hours=options['hours']) if options['hours'] is not None else session_expiry()
+        sessions, files = collect_garbage(max_age)
+        self.stdout.write(self.style.SUCCESS(f'已清理 {sessions} 个上传会话、{files} 个临时文件'))
@@ -0,0 +1,51 @@
+import sys
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from users.export import KINDS, ExportFilterError, build_filters, stream_zip
+
+
+class Command(BaseCommand):
+    help = 'Stream a ZIP of submission files plus a manifest of reviews and scores.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('output', help='输出的 ZIP 文件路径，"-" 表示标准输出')
+        parser.add_argument('--kind', action='append', choices=sorted(KINDS), help='提交类型，可重复，默认全部')
+        parser.add_argument('--stage', help='论文阶段，给出时只导出论文')
+        parser.add_argument('--teacher', help='只导出该教师（工号）范围内的学生')
+        parser.add_argument('--since', help='提交时间下限（含），日期或日期时间')
+        parser.add_argument('--until', help='提交时间上限（只给日期时含当天）')
+
+    def handle(self, *args, **options):
+        teacher = None
+        if options['teacher']:
+            teacher = User.objects.filter(username=options['teacher'], profile__role='teacher').first()
+            if teacher is None:
+                raise CommandError(f'教师不存在: {options["teacher"]}')
+        try:
+            filters = build_filters(
+                kinds=options['kind'], stage=options['stage'], teacher=teacher,
+                since=options['since'], until=options['until'],
+            )
+        except ExportFilterError as exc:
+            raise CommandError(str(exc))
+
+        to_stdout = options['output'] == '-'
+        out = sys.stdout.buffer if to_stdout else open(options['output'], 'wb')
+        started = time.perf_counter()
+        written = 0
+        try:
+            for chunk in stream_zip(filters):
+                if chunk:
+                    out.write(chunk)
+                    written += len(chunk)
+        finally:
+            if not to_stdout:
+                out.close()
+        if not to_stdout:
+            elapsed = time.perf_counter() - started
+            self.stdout.write(self.style.SUCCESS(
+                f'已写入 {options["output"]}：{written / 1024 / 1024:.1f} MB，用时 {elapsed:.1f}s'
+            ))
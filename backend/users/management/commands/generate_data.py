@@ -0,0 +1,42 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from users.synthetic import GeneratorError, generate
+
+
+class Command(BaseCommand):
+    help = 'Generate production-scale synthetic users, topics, selections, submissions and reviews for load testing.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--students', type=int, default=2000)
+        parser.add_argument('--teachers', type=int, default=50)
+        parser.add_argument('--topics', type=int, default=150)
+        parser.add_argument('--admins', type=int, default=2, help='管理员账号数（<prefix>-a000001 …）')
+        parser.add_argument('--versions', type=int, default=4, help='每个阶段最多提交的版本数')
+        parser.add_argument('--seed', type=int, default=0, help='随机种子，相同种子生成相同数据')
+        parser.add_argument('--prefix', default='syn', help='生成账号的用户名前缀（<prefix>-s000001 / <prefix>-t000001）')
+        parser.add_argument('--password', default='miku1314', help='所有生成账号的密码')
+        parser.add_argument('--blobs', type=int, default=8, help='每种提交实际写入磁盘的不同文件数')
+        parser.add_argument('--max-file-mb', type=int, default=30)
+        parser.add_argument('--batch-size', type=int, default=5000, help='每批写入的学生数')
+
+    def handle(self, *args, **options):
+        def progress(done, total):
+            elapsed = time.perf_counter() - started
+            self.stdout.write(f'  学生 {done} / {total}（{elapsed:.1f}s）')
+
+        started = time.perf_counter()
+        try:
+            counts = generate(
+                options['students'], options['teachers'], options['topics'], versions=options['versions'],
+                seed=options['seed'], prefix=options['prefix'], password=options['password'],
+                blobs=options['blobs'], max_file_mb=options['max_file_mb'], batch_size=options['batch_size'],
+                admins=options['admins'],
+                progress=progress,
+            )
+        except GeneratorError as exc:
+            raise CommandError(str(exc))
+        elapsed = time.perf_counter() - started
+        summary = ', '.join(f'{key}: {value}' for key, value in counts.items())
+        self.stdout.write(self.style.SUCCESS(f'合成数据生成完成（{elapsed:.1f}s）：{summary}'))
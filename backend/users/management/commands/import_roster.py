@@ -0,0 +1,49 @@
+import os
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from users.roster import ROLES, RosterError, import_roster
+
+
+class Command(BaseCommand):
+    help = 'Create or update accounts in bulk from a registrar roster (CSV or XLSX).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('file', help='名单文件（.csv / .xlsx），列：学号、姓名、邮箱、角色、密码')
+        parser.add_argument('--role', default='student', choices=sorted(set(ROLES.values())),
+                            help='名单没有角色列时使用的角色')
+        parser.add_argument('--default-password', help='没有单独密码的新账号的初始密码；不给时设为不可登录')
+        parser.add_argument('--no-update', action='store_true', help='已存在的账号保持不变')
+        parser.add_argument('--dry-run', action='store_true', help='只校验并统计，不写数据库')
+        parser.add_argument('--workers', type=int, default=os.cpu_count(), help='哈希密码的进程数，默认 CPU 核数')
+        parser.add_argument('--batch-size', type=int, default=1000, help='每批写入的账号数')
+
+    def handle(self, *args, **options):
+        try:
+            with open(options['file'], 'rb') as f:
+                data = f.read()
+        except OSError as exc:
+            raise CommandError(str(exc))
+
+        def progress(done, total):
+            self.stdout.write(f'  已写入 {done} / {total}')
+
+        started = time.perf_counter()
+        try:
+            stats = import_roster(
+                data, filename=options['file'], default_role=options['role'],
+                default_password=options['default_password'], update_existing=not options['no_update'],
+                dry_run=options['dry_run'], workers=options['workers'], batch_size=options['batch_size'],
+                progress=progress,
+            )
+        except RosterError as exc:
+            raise CommandError(str(exc))
+        for line, reason in stats['errors']:
+            self.stdout.write(self.style.WARNING(f'第 {line} 行：{reason}'))
+        elapsed = time.perf_counter() - started
+        prefix = '校验完成（未写入）' if options['dry_run'] else '导入完成'
+        self.stdout.write(self.style.SUCCESS(
+            f'{prefix}！新建: {stats["created"]}, 更新: {stats["updated"]}, 未变: {stats["unchanged"]}, '
+            f'跳过: {stats["skipped"]}, 错误: {len(stats["errors"])}，用时 {elapsed:.1f}s'
+        ))
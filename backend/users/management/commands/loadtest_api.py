@@ -0,0 +1,91 @@
+import json
+import logging
+
+from django.core.management.base import BaseCommand, CommandError
+
+from users import loadtest
+
+
+class Command(BaseCommand):
+    help = 'Drive the real HTTP API with concurrent student/teacher/admin sessions and report per-endpoint latency.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', help='已运行服务的地址（如 http://127.0.0.1:8000）；不给时在本进程内启动服务')
+        parser.add_argument('--sessions', type=int, default=200, help='会话数（每个会话登录后按角色走一遍场景）')
+        parser.add_argument('--concurrency', type=int, default=10, help='并发会话数')
+        parser.add_argument('--mix', default='student=90,teacher=8,admin=2', help='各角色会话的比例')
+        parser.add_argument('--seed', type=int, default=0, help='随机种子，相同种子发出相同的请求序列')
+        parser.add_argument('--prefix', default='syn', help='generate_data 生成账号的前缀')
+        parser.add_argument('--password', default='miku1314', help='生成账号的密码')
+        parser.add_argument('--read-only', action='store_true', help='不选题、不提交、不评审')
+        parser.add_argument('--warmup', type=int, default=0, help='正式计时前先跑的会话数（不计入结果）')
+        parser.add_argument('--output', help='把 JSON 报告写入文件（不给时输出到终端）')
+        parser.add_argument('--compare', help='与之前的 JSON 报告逐端点对比')
+        parser.add_argument('--threshold', type=float, default=0.2, help='p95 变慢超过该比例算回归')
+        parser.add_argument('--fail-on-regression', action='store_true', help='有回归时以非零状态退出')
+
+    def handle(self, *args, **options):
+        baseline = None
+        if options['compare']:
+            try:
+                with open(options['compare'], encoding='utf-8') as f:
+                    baseline = json.load(f)
+            except (OSError, ValueError) as exc:
+                raise CommandError(f'无法读取基准报告：{exc}')
+
+        def progress(done, total):
+            if done % max(1, total // 10) == 0 or done == total:
+                self.stderr.write(f'  会话 {done} / {total}')
+
+        # 重复选题等 4xx 是场景里的预期结果，不逐条打印（计入报告的 client_errors）
+        logging.getLogger('django.request').setLevel(logging.ERROR)
+        try:
+            report = loadtest.run(
+                url=options['url'], sessions=options['sessions'], concurrency=options['concurrency'],
+                mix=loadtest.parse_mix(options['mix']), seed=options['seed'], prefix=options['prefix'],
+                password=options['password'], read_only=options['read_only'], warmup=options['warmup'],
+                progress=progress,
+            )
+        except loadtest.LoadTestError as exc:
+            raise CommandError(str(exc))
+
+        text = json.dumps(report, ensure_ascii=False, indent=2)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as f:
+                f.write(text + '\n')
+            self.print_table(report)
+        else:
+            self.stdout.write(text)
+
+        if baseline is not None:
+            self.print_comparison(baseline, report, options['threshold'], options['fail_on_regression'])
+
+    def print_table(self, report):
+        self.stdout.write(f'{"端点":<40} {"请求":>6} {"p50":>8} {"p95":>8} {"p99":>8} {"错误率":>7} {"SQL":>6}')
+        for label, stats in [*report['endpoints'].items(), ('合计', report['total'])]:
+            latency = stats['latency_ms']
+            queries = f'{stats["queries"]["mean"]:.1f}' if stats['queries'] else '-'
+            self.stdout.write(
+                f'{label:<40} {stats["requests"]:>6} {latency["p50"]:>8.1f} {latency["p95"]:>8.1f} '
+                f'{latency["p99"]:>8.1f} {stats["error_rate"]:>7.2%} {queries:>6}'
+            )
+        total = report['total']
+        self.stdout.write(f'吞吐 {total["throughput"]:.1f} req/s，用时 {total["elapsed_s"]:.1f}s（延迟单位 ms）')
+
+    def print_comparison(self, baseline, report, threshold, fail):
+        if baseline.get('meta', {}).get('dataset') != report['meta']['dataset']:
+            self.stdout.write(self.style.WARNING('两次运行的数据规模不同，结果不可直接比较'))
+        regressions = 0
+        for label, metric, before, after, regressed in loadtest.compare(baseline, report, threshold):
+            if before == after and not regressed:
+                continue
+            line = f'{label:<40} {metric:<10} {before:>10} → {after:<10}'
+            if regressed:
+                regressions += 1
+                self.stdout.write(self.style.ERROR(line + ' 回归'))
+            else:
+                self.stdout.write(line)
+        if not regressions:
+            self.stdout.write(self.style.SUCCESS('与基准相比没有回归'))
+        elif fail:
+            raise CommandError(f'{regressions} 项指标回归')
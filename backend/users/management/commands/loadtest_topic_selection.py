@@ -0,0 +1,96 @@
+import logging
+import statistics
+import threading
+import time
+import uuid
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.test import Client
+from rest_framework.authtoken.models import Token
+
+from users.models import Profile, Topic, TopicSelection
+
+
+class Command(BaseCommand):
+    help = 'Load-test TopicSelectAPIView: many concurrent students selecting one hot topic.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--students', type=int, default=1000, help='参与抢课的学生人数')
+        parser.add_argument('--capacity', type=int, default=30, help='热门课题名额')
+        parser.add_argument('--concurrency', type=int, default=100, help='并发线程数')
+        parser.add_argument('--repeat', type=int, default=2, help='每个学生重复点击次数（模拟连点）')
+        parser.add_argument('--keep', action='store_true', help='测试结束后保留生成的数据')
+
+    def handle(self, *args, **options):
+        run_id = uuid.uuid4().hex[:8]
+        n = options['students']
+        teacher, topic, tokens = self.setup(run_id, n, options['capacity'])
+        self.stdout.write(f'[{run_id}] {n} 名学生 × {options["repeat"]} 次，{options["concurrency"]} 并发，'
+                          f'名额 {topic.max_students}')
+
+        local = threading.local()
+        url = f'/api/auth/topics/{topic.pk}/select/'
+
+        def fire(token):
+            client = getattr(local, 'client', None)
+            if client is None:
+                client = local.client = Client()
+            start = time.perf_counter()
+            resp = client.post(url, HTTP_AUTHORIZATION=f'Token {token}')
+            return resp.status_code, time.perf_counter() - start
+
+        jobs = [token for _ in range(options['repeat']) for token in tokens]
+        # 满员/重复选课的 400 是预期结果，不逐条打印
+        logging.getLogger('django.request').setLevel(logging.ERROR)
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options['concurrency']) as pool:
+            results = list(pool.map(fire, jobs))
+            # each worker thread opened its own connection; the barrier makes every thread close one
+            barrier = threading.Barrier(options['concurrency'])
+            list(pool.map(lambda _: (barrier.wait(), connections.close_all()), range(options['concurrency'])))
+        elapsed = time.perf_counter() - started
+
+        codes = Counter(code for code, _ in results)
+        latencies = sorted(latency for _, latency in results)
+        topic.refresh_from_db()
+        selected = TopicSelection.objects.filter(topic=topic).count()
+        per_student = TopicSelection.objects.filter(student__username__startswith=f'lt{run_id}-s').count()
+        expected = min(n, topic.max_students)
+
+        self.stdout.write(f'状态码分布: {dict(sorted(codes.items()))}')
+        self.stdout.write(
+            f'吞吐: {len(results) / elapsed:.1f} req/s，耗时 {elapsed:.2f}s，'
+            f'p50 {statistics.median(latencies) * 1000:.1f} ms，'
+            f'p99 {latencies[int(len(latencies) * 0.99) - 1] * 1000:.1f} ms'
+        )
+        self.stdout.write(f'计数器 {topic.selected_students}，选课记录 {selected}，期望 {expected}')
+
+        ok = (topic.selected_students == selected == expected == codes.get(201, 0) == per_student)
+        if not options['keep']:
+            User.objects.filter(username__startswith=f'lt{run_id}-').delete()
+            teacher.delete()
+        if not ok:
+            raise CommandError('正确性校验失败：名额超卖或计数器漂移')
+        self.stdout.write(self.style.SUCCESS('正确性校验通过：无超卖，计数器与选课记录一致'))
+
+    def setup(self, run_id, n, capacity):
+        password = make_password(None)
+        teacher = User.objects.create_user(username=f'lt{run_id}-teacher')
+        teacher.profile.role = 'teacher'
+        teacher.profile.save()
+        topic = Topic.objects.create(teacher=teacher, title=f'压测课题 {run_id}', max_students=capacity)
+
+        # bulk_create skips the per-user signals, so create profiles and tokens explicitly
+        User.objects.bulk_create(
+            [User(username=f'lt{run_id}-s{i:06d}', password=password) for i in range(n)], batch_size=1000,
+        )
+        students = list(User.objects.filter(username__startswith=f'lt{run_id}-s'))
+        Profile.objects.bulk_create([Profile(user=u, role='student') for u in students], batch_size=1000)
+        tokens = [Token(user=u, key=Token.generate_key()) for u in students]
+        Token.objects.bulk_create(tokens, batch_size=1000)
+        return teacher, topic, [t.key for t in tokens]
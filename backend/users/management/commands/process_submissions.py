@@ -0,0 +1,42 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db.models import F, Q
+
+from users.downloads import MODELS
+from users.processing import get_config, run
+from users.models import SubmissionMetadata
+
+
+class Command(BaseCommand):
+    help = 'Extract metadata, text and previews for submissions that are unprocessed, failed or stale.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--kind', action='append', choices=sorted(MODELS), help='提交类型，可重复，默认全部')
+        parser.add_argument('--all', action='store_true', help='全部重新处理，而不只是缺失 / 失败 / 过期的')
+        parser.add_argument('--workers', type=int, help='并行线程数，默认 SUBMISSION_PROCESSING["WORKERS"]')
+
+    def handle(self, *args, **options):
+        jobs = []
+        for kind in options['kind'] or MODELS:
+            qs = MODELS[kind].objects.exclude(file='').exclude(file__isnull=True)
+            if not options['all']:
+                qs = qs.filter(
+                    Q(metadata__isnull=True) | ~Q(metadata__status='done') | ~Q(metadata__file_name=F('file'))
+                )
+            for pk, name in qs.values_list('pk', 'file').iterator():
+                SubmissionMetadata.objects.update_or_create(
+                    **{f'{kind}_id': pk}, defaults={'file_name': name, 'status': 'pending', 'error': ''},
+                )
+                jobs.append((kind, pk))
+
+        workers = options['workers'] or get_config()['WORKERS']
+        if workers > 1:
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                list(pool.map(lambda job: run(*job), jobs))
+        else:
+            for job in jobs:
+                run(*job)
+
+        failed = SubmissionMetadata.objects.filter(status='failed').count()
+        self.stdout.write(self.style.SUCCESS(f'已处理 {len(jobs)} 份提交，当前失败 {failed} 份'))
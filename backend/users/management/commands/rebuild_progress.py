@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from users.progress import rebuild_all
+
+
+class Command(BaseCommand):
+    help = 'Rebuild every student progress snapshot from scratch.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500, help='每批写入的快照数量')
+
+    def handle(self, *args, **options):
+        total = rebuild_all(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'进度快照重建完成：{total} 名学生'))
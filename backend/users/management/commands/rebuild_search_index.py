@@ -0,0 +1,25 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+
+from users.models import UserSearchKey, UserSearchToken
+from users.search import index_users
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the normalized student name search index for every user.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        UserSearchToken.objects.all().delete()
+        UserSearchKey.objects.all().delete()
+        batch, total = [], 0
+        users = User.objects.only('id', 'username', 'first_name', 'last_name').order_by('id')
+        for user in users.iterator(chunk_size=options['batch_size']):
+            batch.append(user)
+            if len(batch) >= options['batch_size']:
+                total += index_users(batch)
+                batch = []
+        total += index_users(batch)
+        self.stdout.write(self.style.SUCCESS(f'搜索索引重建完成：{total} 个用户'))
@@ -0,0 +1,69 @@
+import os
+
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Count, F
+
+from users.models import MidtermCheck, Proposal, StoredBlob, StoredFile, Thesis
+
+
+class Command(BaseCommand):
+    help = 'Move existing submission files into the content-addressed blob store (names in the DB are unchanged).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='只统计，不移动文件')
+        parser.add_argument('--verify', action='store_true', help='核对并修正引用计数，删除无主内容文件')
+
+    def handle(self, *args, **options):
+        if not hasattr(default_storage, 'adopt'):
+            raise CommandError('默认存储不是 ContentAddressedStorage，请先配置 STORAGES["default"]')
+        if options['verify']:
+            return self.verify()
+
+        names = set()
+        for model in (Thesis, Proposal, MidtermCheck):
+            names.update(model.objects.exclude(file='').exclude(file__isnull=True).values_list('file', flat=True))
+        names -= set(StoredFile.objects.filter(name__in=names).values_list('name', flat=True))
+
+        moved = missing = new_blobs = 0
+        total_bytes = 0
+        for name in sorted(names):
+            path = default_storage.path(name)
+            if not os.path.isfile(path):
+                missing += 1
+                self.stdout.write(self.style.WARNING(f'文件缺失: {name}'))
+                continue
+            total_bytes += os.path.getsize(path)
+            if options['dry_run']:
+                moved += 1
+                continue
+            new_blobs += default_storage.adopt(name)
+            moved += 1
+
+        if options['dry_run']:
+            self.stdout.write(f'待迁移 {moved} 个文件（{total_bytes / 1024 / 1024:.1f} MB），缺失 {missing} 个')
+            return
+        stored_bytes = sum(StoredBlob.objects.filter(files__name__in=names).distinct().values_list('size', flat=True))
+        self.stdout.write(self.style.SUCCESS(
+            f'已迁移 {moved} 个文件，新增内容块 {new_blobs} 个；'
+            f'原占用 {total_bytes / 1024 / 1024:.1f} MB，现占用 {stored_bytes / 1024 / 1024:.1f} MB；缺失 {missing} 个'
+        ))
+
+    def verify(self):
+        wrong = StoredBlob.objects.annotate(actual=Count('files')).exclude(refcount=F('actual'))
+        fixed = 0
+        for blob in wrong:
+            StoredBlob.objects.filter(pk=blob.pk).update(refcount=blob.actual)
+            fixed += 1
+        missing = [
+            sha256 for sha256 in StoredBlob.objects.values_list('sha256', flat=True).iterator()
+            if not os.path.exists(default_storage.blob_path(sha256))
+        ]
+        for sha256 in missing:
+            self.stdout.write(self.style.WARNING(f'内容文件缺失: {sha256}'))
+        orphans = default_storage.orphan_blobs()
+        for path in orphans:
+            os.remove(path)
+        self.stdout.write(self.style.SUCCESS(
+            f'已修正 {fixed} 个引用计数，缺失内容文件 {len(missing)} 个，删除无主内容文件 {len(orphans)} 个'
+        ))
@@ -0,0 +1,69 @@
+import multiprocessing
+import signal
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from users import jobs
+
+
+def _child(queues, burst, max_jobs):
+    try:
+        jobs.work(queues, burst=burst, max_jobs=max_jobs)
+    finally:
+        connections.close_all()
+
+
+class Command(BaseCommand):
+    help = 'Run background job workers (database-backed queue, see users.jobs).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processes', type=int, default=1, help='工作进程数')
+        parser.add_argument('--queue', action='append', help='处理的队列，可重复，默认 default')
+        parser.add_argument('--burst', action='store_true', help='队列取空后退出')
+        parser.add_argument('--max-jobs', type=int, help='每个进程执行这么多任务后退出（由主进程重启，防止内存增长）')
+
+    def handle(self, *args, **options):
+        queues = options['queue'] or ['default']
+        if options['processes'] <= 1:
+            done = jobs.work(queues, burst=options['burst'], max_jobs=options['max_jobs'])
+            self.stdout.write(self.style.SUCCESS(f'已执行 {done} 个任务'))
+            return
+        self.supervise(options['processes'], queues, options['burst'], options['max_jobs'])
+
+    def supervise(self, processes, queues, burst, max_jobs):
+        """主进程只负责启动、重启和停止子进程；子进程 fork 前关闭数据库连接，各自重新建立。"""
+        context = multiprocessing.get_context('fork')
+        stopping = []
+
+        def start():
+            process = context.Process(target=_child, args=(queues, burst, max_jobs))
+            process.start()
+            return process
+
+        def stop(signum, frame):
+            stopping.append(signum)
+            for process in children:
+                if process.is_alive():
+                    process.terminate()  # SIGTERM：做完当前任务再退出
+
+        connections.close_all()
+        children = [start() for _ in range(processes)]
+        signal.signal(signal.SIGTERM, stop)
+        signal.signal(signal.SIGINT, stop)
+        self.stdout.write(f'已启动 {processes} 个工作进程，队列：{", ".join(queues)}')
+
+        while children:
+            time.sleep(0.5)
+            for process in list(children):
+                if process.is_alive():
+                    continue
+                process.join()
+                children.remove(process)
+                # burst 模式正常退出即结束；否则（崩溃或达到 max_jobs）补一个新进程
+                if not stopping and not (burst and process.exitcode == 0):
+                    if process.exitcode != 0:
+                        self.stderr.write(f'工作进程 {process.pid} 异常退出（{process.exitcode}），重新启动')
+                    children.append(start())
+        self.stdout.write(self.style.SUCCESS('工作进程已全部退出'))
@@ -0,0 +1,39 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:17
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("users", "0008_studentprogress"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="midtermcheck",
+            index=models.Index(
+                fields=["-submitted_at", "-id"], name="midterm_submitted_keyset_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="proposal",
+            index=models.Index(
+                fields=["-submitted_at", "-id"], name="proposal_submitted_keyset_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="thesis",
+            index=models.Index(
+                fields=["-submitted_at", "-id"], name="thesis_submitted_keyset_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="topic",
+            index=models.Index(
+                fields=["-created_at", "-id"], name="topic_created_keyset_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,132 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:18
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def create_trigram_index(apps, schema_editor):
+    # substring search on PostgreSQL goes through a pg_trgm GIN index instead of the token table
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    schema_editor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    schema_editor.execute(
+        "CREATE INDEX IF NOT EXISTS users_usersearchkey_key_trgm "
+        "ON users_usersearchkey USING gin (key gin_trgm_ops)"
+    )
+
+
+def drop_trigram_index(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    schema_editor.execute("DROP INDEX IF EXISTS users_usersearchkey_key_trgm")
+
+
+# Frozen copies of the users.search helpers as of this migration, so later changes to
+# normalization or n-gram logic (or moving that module) don't change what it writes.
+MAX_GRAM = 3
+KEY_SEPARATOR = "\n"
+
+
+def normalize(text):
+    return "".join((text or "").split()).casefold()
+
+
+def search_keys(username, first_name, last_name):
+    keys = []
+    for key in (username, (last_name or "") + (first_name or ""), (first_name or "") + (last_name or "")):
+        key = normalize(key)
+        if key and key not in keys:
+            keys.append(key)
+    return keys
+
+
+def ngrams(keys):
+    grams = set()
+    for key in keys:
+        for size in range(1, MAX_GRAM + 1):
+            for i in range(len(key) - size + 1):
+                grams.add(key[i : i + size])
+    return grams
+
+
+def backfill_search_index(apps, schema_editor):
+    User = apps.get_model("auth", "User")
+    UserSearchKey = apps.get_model("users", "UserSearchKey")
+    UserSearchToken = apps.get_model("users", "UserSearchToken")
+    use_tokens = schema_editor.connection.vendor != "postgresql"
+
+    keys, tokens = [], []
+    for user_id, username, first_name, last_name in User.objects.values_list(
+        "id", "username", "first_name", "last_name"
+    ).iterator():
+        user_keys = search_keys(username, first_name, last_name)
+        keys.append(UserSearchKey(user_id=user_id, key=KEY_SEPARATOR.join(user_keys)))
+        if use_tokens:
+            tokens.extend(UserSearchToken(user_id=user_id, token=t) for t in ngrams(user_keys))
+        if len(keys) >= 1000:
+            UserSearchKey.objects.bulk_create(keys)
+            UserSearchToken.objects.bulk_create(tokens, batch_size=2000)
+            keys, tokens = [], []
+    UserSearchKey.objects.bulk_create(keys)
+    UserSearchToken.objects.bulk_create(tokens, batch_size=2000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("auth", "0012_alter_user_first_name_max_length"),
+        ("users", "0009_submission_keyset_indexes"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="UserSearchKey",
+            fields=[
+                (
+                    "user",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="search_key",
+                        serialize=False,
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+                ("key", models.TextField()),
+            ],
+        ),
+        migrations.CreateModel(
+            name="UserSearchToken",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("token", models.CharField(max_length=3)),
+                (
+                    "user",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="search_tokens",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+            options={
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("token", "user"), name="unique_user_search_token"
+                    )
+                ],
+            },
+        ),
+        migrations.RunPython(create_trigram_index, drop_trigram_index),
+        migrations.RunPython(backfill_search_index, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,64 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:22
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def backfill_scope(apps, schema_editor):
+    TopicSelection = apps.get_model("users", "TopicSelection")
+    TeacherStudent = apps.get_model("users", "TeacherStudent")
+    pairs = TopicSelection.objects.values_list("topic__teacher_id", "student_id").distinct()
+    TeacherStudent.objects.bulk_create(
+        (TeacherStudent(teacher_id=t, student_id=s) for t, s in pairs), batch_size=1000
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("users", "0010_user_search_index"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="TeacherStudent",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "student",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="scoped_teachers",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+                (
+                    "teacher",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="scoped_students",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+            options={
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("teacher", "student"),
+                        name="unique_teacher_student_scope",
+                    )
+                ],
+            },
+        ),
+        migrations.RunPython(backfill_scope, migrations.RunPython.noop),
+    ]
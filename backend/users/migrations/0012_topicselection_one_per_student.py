@@ -0,0 +1,85 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:24
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Min, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def topic_selection_progress(selection):
+    # frozen copy of users.progress.topic_selection_progress as of this migration
+    teacher = selection.topic.teacher
+    full_name = f"{teacher.first_name} {teacher.last_name}".strip()
+    return {
+        "status": "completed",
+        "topic_title": selection.topic.title,
+        "teacher_name": full_name or teacher.username,
+        "selected_at": selection.selected_at.isoformat() if selection.selected_at else None,
+    }
+
+
+def refresh_snapshots(apps, student_ids):
+    # the snapshot's topic_selection entry is the only part that depends on the
+    # selection; rewrite it for students whose extra selections were dropped
+    TopicSelection = apps.get_model("users", "TopicSelection")
+    StudentProgress = apps.get_model("users", "StudentProgress")
+    snapshots = StudentProgress.objects.filter(student_id__in=student_ids)
+    selections = {
+        selection.student_id: selection
+        for selection in TopicSelection.objects.filter(student_id__in=student_ids)
+        .select_related("topic__teacher")
+    }
+    for snapshot in snapshots:
+        snapshot.data["topic_selection"] = topic_selection_progress(selections[snapshot.student_id])
+        snapshot.save(update_fields=["data", "updated_at"])
+
+
+def dedupe_selections(apps, schema_editor):
+    # earlier non-atomic selection could leave a student with several selections and
+    # drifted counters; keep each student's first selection and recount every topic
+    TopicSelection = apps.get_model("users", "TopicSelection")
+    Topic = apps.get_model("users", "Topic")
+    keep = (
+        TopicSelection.objects.values("student_id")
+        .annotate(first_id=Min("id"), n=Count("id"))
+        .filter(n__gt=1)
+    )
+    student_ids = []
+    for row in keep:
+        TopicSelection.objects.filter(student_id=row["student_id"]).exclude(
+            id=row["first_id"]
+        ).delete()
+        student_ids.append(row["student_id"])
+    refresh_snapshots(apps, student_ids)
+    counts = (
+        TopicSelection.objects.filter(topic_id=OuterRef("pk"))
+        .values("topic_id")
+        .annotate(n=Count("id"))
+        .values("n")
+    )
+    Topic.objects.update(selected_students=Coalesce(Subquery(counts), 0))
+
+    TeacherStudent = apps.get_model("users", "TeacherStudent")
+    TeacherStudent.objects.all().delete()
+    pairs = TopicSelection.objects.values_list("topic__teacher_id", "student_id").distinct()
+    TeacherStudent.objects.bulk_create(
+        (TeacherStudent(teacher_id=t, student_id=s) for t, s in pairs), batch_size=1000
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("users", "0011_teacherstudent"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(dedupe_selections, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name="topicselection",
+            constraint=models.UniqueConstraint(
+                fields=("student",), name="unique_topic_selection_per_student"
+            ),
+        ),
+    ]
@@ -0,0 +1,92 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:28
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("users", "0012_topicselection_one_per_student"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="AllocationRound",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("name", models.CharField(max_length=255)),
+                ("opens_at", models.DateTimeField()),
+                ("closes_at", models.DateTimeField()),
+                ("max_preferences", models.PositiveSmallIntegerField(default=5)),
+                ("seed", models.BigIntegerField(default=0)),
+                ("allocated_at", models.DateTimeField(blank=True, null=True)),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                "ordering": ["-opens_at"],
+            },
+        ),
+        migrations.CreateModel(
+            name="TopicPreference",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("rank", models.PositiveSmallIntegerField()),
+                (
+                    "round",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="preferences",
+                        to="users.allocationround",
+                    ),
+                ),
+                (
+                    "student",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="topic_preferences",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+                (
+                    "topic",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="preferences",
+                        to="users.topic",
+                    ),
+                ),
+            ],
+            options={
+                "ordering": ["round", "student", "rank"],
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("round", "student", "rank"),
+                        name="unique_preference_rank",
+                    ),
+                    models.UniqueConstraint(
+                        fields=("round", "student", "topic"),
+                        name="unique_preference_topic",
+                    ),
+                ],
+            },
+        ),
+    ]
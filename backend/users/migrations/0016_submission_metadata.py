@@ -0,0 +1,114 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:44
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("users", "0015_content_addressed_storage"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="SubmissionMetadata",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("file_name", models.CharField(blank=True, max_length=255)),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[
+                            ("pending", "Pending"),
+                            ("done", "Done"),
+                            ("failed", "Failed"),
+                        ],
+                        default="pending",
+                        max_length=20,
+                    ),
+                ),
+                ("size", models.BigIntegerField(blank=True, null=True)),
+                (
+                    "sha256",
+                    models.CharField(blank=True, db_index=True, max_length=64),
+                ),
+                (
+                    "page_count",
+                    models.PositiveIntegerField(blank=True, null=True),
+                ),
+                ("text", models.TextField(blank=True)),
+                ("text_length", models.PositiveIntegerField(default=0)),
+                (
+                    "preview",
+                    models.FileField(blank=True, upload_to="previews/%Y/%m/"),
+                ),
+                ("error", models.TextField(blank=True)),
+                ("processed_at", models.DateTimeField(blank=True, null=True)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+                (
+                    "midterm",
+                    models.OneToOneField(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="metadata",
+                        to="users.midtermcheck",
+                    ),
+                ),
+                (
+                    "proposal",
+                    models.OneToOneField(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="metadata",
+                        to="users.proposal",
+                    ),
+                ),
+                (
+                    "thesis",
+                    models.OneToOneField(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="metadata",
+                        to="users.thesis",
+                    ),
+                ),
+            ],
+            options={
+                "constraints": [
+                    models.CheckConstraint(
+                        condition=models.Q(
+                            models.Q(
+                                ("midterm__isnull", True),
+                                ("proposal__isnull", True),
+                                ("thesis__isnull", False),
+                            ),
+                            models.Q(
+                                ("midterm__isnull", True),
+                                ("proposal__isnull", False),
+                                ("thesis__isnull", True),
+                            ),
+                            models.Q(
+                                ("midterm__isnull", False),
+                                ("proposal__isnull", True),
+                                ("thesis__isnull", True),
+                            ),
+                            _connector="OR",
+                        ),
+                        name="submission_metadata_one_parent",
+                    )
+                ],
+            },
+        ),
+    ]
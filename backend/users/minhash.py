@@ -0,0 +1,94 @@
+"""MinHash 签名与 LSH 分桶。
+
+纯函数、不依赖 Django，``reindex_similarity`` 在子进程里直接调用。
+
+* 分片：文本去掉空白和标点后取连续 ``size`` 个字符（中文没有空格分词，按字更稳定），
+  按 UTF-32 编码后每个分片定长，直接对字节切片取 CRC32（C 实现，比逐个编码后做加密哈希快一倍）；
+* 签名：单次排列 MinHash（one permutation hashing）——哈希值按 ``h % num_perm`` 分到各桶，
+  每桶留最小值，空桶向右借最近的非空桶（rotation densification）。只扫一遍分片，
+  比 ``num_perm`` 次独立哈希快两个数量级；
+* 两份签名相同位置取值相等的比例即 Jaccard 相似度的估计；
+* LSH：签名切成 ``bands`` 段，每段哈希成一个 64 位桶键，任一段相同即为候选。
+  ``rows = num_perm / bands`` 时，相似度 s 的两份文档成为候选的概率为 ``1 - (1 - s^rows)^bands``。
+"""
+import hashlib
+import re
+import struct
+import zlib
+from array import array
+
+
+NORMALIZE_RE = re.compile(r'[\W_]+')
+MASK32 = 0xFFFFFFFF
+EMPTY = MASK32
+
+
+def _hash64(data):
+    return int.from_bytes(hashlib.blake2b(data, digest_size=8).digest(), 'little')
+
+
+def shingles(text, size):
+    """文本的分片哈希集合（32 位）。"""
+    data = NORMALIZE_RE.sub('', text.lower()).encode('utf-32-le')
+    width = 4 * size
+    crc32 = zlib.crc32
+    return {crc32(data[i:i + width]) for i in range(0, len(data) - width + 1, 4)}
+
+
+def signature(hashes, num_perm):
+    """由分片哈希集合计算签名（``array('I')``）；集合为空时返回 ``None``。"""
+    if not hashes:
+        return None
+    sig = [EMPTY] * num_perm
+    for h in hashes:
+        bucket = h % num_perm
+        value = h // num_perm
+        if value < sig[bucket]:
+            sig[bucket] = value
+    # 空桶借用右侧最近的非空桶，按距离加偏移，避免不同空桶取到相同的值
+    original = sig[:]
+    for i in range(num_perm):
+        if original[i] != EMPTY:
+            continue
+        distance = 1
+        while original[(i + distance) % num_perm] == EMPTY:
+            distance += 1
+        sig[i] = (original[(i + distance) % num_perm] + distance * 0x9E3779B1) & MASK32
+    return array('I', sig)
+
+
+def band_keys(sig, bands):
+    """签名各段的 LSH 桶键（有符号 64 位，可直接存 BigIntegerField）。"""
+    rows = len(sig) // bands
+    keys = []
+    for band in range(bands):
+        chunk = sig[band * rows:(band + 1) * rows]
+        key = _hash64(struct.pack(f'<H{rows}I', band, *chunk))
+        keys.append(key - (1 << 64) if key >= 1 << 63 else key)
+    return keys
+
+
+def estimate(a, b):
+    """两份签名估计的 Jaccard 相似度。"""
+    return sum(1 for x, y in zip(a, b) if x == y) / len(a)
+
+
+def compute(text, size, num_perm, bands):
+    """``(签名字节, 分片数, 桶键列表)``；文本过短时返回 ``None``。"""
+    hashes = shingles(text, size)
+    sig = signature(hashes, num_perm)
+    if sig is None:
+        return None
+    return sig.tobytes(), len(hashes), band_keys(sig, bands)
+
+
+def compute_job(job):
+    """进程池的任务入口：``(id, text, size, num_perm, bands)`` → ``(id, compute 的结果)``。"""
+    pk, text, size, num_perm, bands = job
+    return pk, compute(text, size, num_perm, bands)
+
+
+def from_bytes(data):
+    sig = array('I')
+    sig.frombytes(bytes(data))
+    return sig
@@ -1,8 +1,14 @@
+import uuid
+from functools import partial
+
 from django.db import models
 from django.contrib.auth.models import User
-from django.db.models.signals import post_save
+from rest_framework.authtoken.models import Token
+from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
-from django.db import OperationalError
+from django.db import OperationalError, transaction
+from django.db.models import QuerySet
+from django.utils import timezone
 
 
 class Profile(models.Model):
@@ -40,6 +46,38 @@ def save_user_profile(sender, instance, **kwargs):
         pass
 
 
+class UserSearchKey(models.Model):
+    """规范化的姓名/学工号搜索键，见 users.search"""
+    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name='search_key')
+    key = models.TextField()
+
+    def __str__(self):
+        return f'{self.user_id} search key'
+
+
+class UserSearchToken(models.Model):
+    """搜索键的 1~3 字符 n-gram，供不支持 trigram 索引的数据库（SQLite）检索"""
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='search_tokens')
+    token = models.CharField(max_length=3)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['token', 'user'], name='unique_user_search_token'),
+        ]
+
+
+@receiver(post_save, sender=User)
+def index_user_search_key(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    from .search import index_user
+    try:
+        index_user(instance)
+    except OperationalError:
+        # search tables may not exist yet (e.g. createsuperuser before migrate)
+        pass
+
+
 class Thesis(models.Model):
     STATUS_CHOICES = (
         ('draft', 'Draft'),
@@ -72,6 +110,10 @@ class Thesis(models.Model):
 
     class Meta:
         ordering = ['-submitted_at']
+        indexes = [
+            # keyset pagination on (submitted_at, id), see users.pagination
+            models.Index(fields=['-submitted_at', '-id'], name='thesis_submitted_keyset_idx'),
+        ]
 
 
 class ThesisReview(models.Model):
@@ -109,6 +151,10 @@ class Proposal(models.Model):
 
     class Meta:
         ordering = ['-submitted_at']
+        indexes = [
+            # keyset pagination on (submitted_at, id), see users.pagination
+            models.Index(fields=['-submitted_at', '-id'], name='proposal_submitted_keyset_idx'),
+        ]
 
 
 class MidtermCheck(models.Model):
@@ -124,6 +170,10 @@ class MidtermCheck(models.Model):
 
     class Meta:
         ordering = ['-submitted_at']
+        indexes = [
+            # keyset pagination on (submitted_at, id), see users.pagination
+            models.Index(fields=['-submitted_at', '-id'], name='midterm_submitted_keyset_idx'),
+        ]
 
 
 class ProposalReview(models.Model):
@@ -193,6 +243,9 @@ class Topic(models.Model):
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['-created_at', '-id'], name='topic_created_keyset_idx'),
+        ]
 
 
 class TopicSelection(models.Model):
@@ -202,6 +255,414 @@ class TopicSelection(models.Model):
 
     class Meta:
         unique_together = ('topic', 'student')
+        constraints = [
+            # 每个学生只能选一个课题；并发选题时由数据库兜底，见 TopicSelectAPIView
+            models.UniqueConstraint(fields=['student'], name='unique_topic_selection_per_student'),
+        ]
 
     def __str__(self):
         return f'{self.student.username} -> {self.topic.title}'
+
+
+class TeacherStudent(models.Model):
+    """教师可见的学生范围（学生选了该教师的课题），由 TopicSelection / Topic 信号维护，见 users.scope"""
+    teacher = models.ForeignKey(User, on_delete=models.CASCADE, related_name='scoped_students')
+    student = models.ForeignKey(User, on_delete=models.CASCADE, related_name='scoped_teachers')
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['teacher', 'student'], name='unique_teacher_student_scope'),
+        ]
+
+    def __str__(self):
+        return f'{self.teacher_id} -> {self.student_id}'
+
+
+class StudentProgress(models.Model):
+    """学生六阶段进度快照，一名学生一行，由下方信号保持与提交/评审数据同步。"""
+    student = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name='progress_snapshot')
+    data = models.JSONField(default=dict)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f'{self.student_id} progress'
+
+
+class AllocationRoundQuerySet(models.QuerySet):
+    def pending(self, now=None):
+        """已开放填报、尚未分配的轮次（截止后等待分配的也算在内）。"""
+        return self.filter(opens_at__lte=now or timezone.now(), allocated_at__isnull=True)
+
+    def accepting(self, now=None):
+        """正在接受志愿填报的轮次。"""
+        now = now or timezone.now()
+        return self.pending(now).filter(closes_at__gt=now)
+
+
+class AllocationRound(models.Model):
+    """志愿填报轮次：开放期内学生提交有序志愿，截止后由 ``allocate_topics`` 命令统一分配。
+
+    轮次开放到分配完成之间，先到先得的选题接口关闭，见 TopicSelectAPIView。
+    """
+    name = models.CharField(max_length=255)
+    opens_at = models.DateTimeField()
+    closes_at = models.DateTimeField()
+    max_preferences = models.PositiveSmallIntegerField(default=5)
+    # 随机串行独裁的抽签种子，同一份志愿与种子总是得到同样的分配结果
+    seed = models.BigIntegerField(default=0)
+    allocated_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    objects = AllocationRoundQuerySet.as_manager()
+
+    class Meta:
+        ordering = ['-opens_at']
+
+    def __str__(self):
+        return self.name
+
+
+class TopicPreference(models.Model):
+    """学生在某一轮次中的一条志愿，``rank`` 从 1 开始，越小越优先。"""
+    round = models.ForeignKey(AllocationRound, on_delete=models.CASCADE, related_name='preferences')
+    student = models.ForeignKey(User, on_delete=models.CASCADE, related_name='topic_preferences')
+    topic = models.ForeignKey(Topic, on_delete=models.CASCADE, related_name='preferences')
+    rank = models.PositiveSmallIntegerField()
+
+    class Meta:
+        ordering = ['round', 'student', 'rank']
+        constraints = [
+            models.UniqueConstraint(fields=['round', 'student', 'rank'], name='unique_preference_rank'),
+            models.UniqueConstraint(fields=['round', 'student', 'topic'], name='unique_preference_topic'),
+        ]
+
+    def __str__(self):
+        return f'{self.student_id} #{self.rank} -> {self.topic_id}'
+
+
+class UploadSession(models.Model):
+    """分块续传会话：客户端按偏移量逐块上传，完成后生成 Thesis / Proposal / MidtermCheck，见 users.uploads"""
+    KIND_CHOICES = (
+        ('thesis', 'Thesis'),
+        ('proposal', 'Proposal'),
+        ('midterm', 'Midterm Check'),
+    )
+    STATUS_CHOICES = (
+        ('uploading', 'Uploading'),
+        ('completed', 'Completed'),
+    )
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    student = models.ForeignKey(User, on_delete=models.CASCADE, related_name='upload_sessions')
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    filename = models.CharField(max_length=255)
+    size = models.BigIntegerField()
+    # 已连续收到的字节数，即下一块的偏移量；与 crc32 一起用条件更新推进
+    received = models.BigIntegerField(default=0)
+    crc32 = models.BigIntegerField(default=0)
+    # 完成时传给对应序列化器的其他字段（title、stage、version）
+    metadata = models.JSONField(default=dict)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='uploading')
+    object_id = models.BigIntegerField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'updated_at'], name='upload_session_gc_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.student_id} {self.kind} {self.filename} ({self.received}/{self.size})'
+
+
+class StoredBlob(models.Model):
+    """按 SHA-256 去重保存的文件内容，``refcount`` 为引用它的 StoredFile 数，见 users.storage"""
+    sha256 = models.CharField(max_length=64, primary_key=True)
+    size = models.BigIntegerField()
+    refcount = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f'{self.sha256[:12]} x{self.refcount}'
+
+
+class StoredFile(models.Model):
+    """FileField 中保存的文件名 → 内容块；文件名保持 upload_to 生成的样子，不随存储方式变化"""
+    name = models.CharField(max_length=255, primary_key=True)
+    blob = models.ForeignKey(StoredBlob, on_delete=models.PROTECT, related_name='files')
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return self.name
+
+
+
+class SubmissionMetadata(models.Model):
+    """上传后在后台提取的文件信息（大小、哈希、页数、全文、首页预览），见 users.processing。
+
+    三个外键恰好有一个非空；列表序列化器通过 select_related 读取，不访问文件系统。
+    """
+    STATUS_CHOICES = (
+        ('pending', 'Pending'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    )
+
+    thesis = models.OneToOneField(Thesis, on_delete=models.CASCADE, null=True, blank=True, related_name='metadata')
+    proposal = models.OneToOneField(Proposal, on_delete=models.CASCADE, null=True, blank=True, related_name='metadata')
+    midterm = models.OneToOneField(MidtermCheck, on_delete=models.CASCADE, null=True, blank=True,
+                                   related_name='metadata')
+    # 处理时的文件名；与提交记录当前的文件名不同说明文件已被替换、结果过期
+    file_name = models.CharField(max_length=255, blank=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    size = models.BigIntegerField(null=True, blank=True)
+    sha256 = models.CharField(max_length=64, blank=True, db_index=True)
+    page_count = models.PositiveIntegerField(null=True, blank=True)
+    text = models.TextField(blank=True)
+    text_length = models.PositiveIntegerField(default=0)
+    preview = models.FileField(upload_to='previews/%Y/%m/', blank=True)
+    error = models.TextField(blank=True)
+    processed_at = models.DateTimeField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.CheckConstraint(
+                condition=(
+                    models.Q(thesis__isnull=False, proposal__isnull=True, midterm__isnull=True)
+                    | models.Q(thesis__isnull=True, proposal__isnull=False, midterm__isnull=True)
+                    | models.Q(thesis__isnull=True, proposal__isnull=True, midterm__isnull=False)
+                ),
+                name='submission_metadata_one_parent',
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.file_name} ({self.status})'
+
+
+
+class SimilaritySignature(models.Model):
+    """论文 / 开题全文的 MinHash 签名，见 users.similarity"""
+    metadata = models.OneToOneField(SubmissionMetadata, on_delete=models.CASCADE, primary_key=True,
+                                    related_name='signature')
+    # num_perm 个 uint32（小端），生成参数变化后须用 reindex_similarity 重建
+    signature = models.BinaryField()
+    shingle_count = models.PositiveIntegerField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f'{self.metadata_id} ({self.shingle_count} shingles)'
+
+
+class LSHBucket(models.Model):
+    """LSH 分段桶键：与目标文档有任一段桶键相同的文档才参与相似度估计"""
+    signature = models.ForeignKey(SimilaritySignature, on_delete=models.CASCADE, related_name='buckets')
+    key = models.BigIntegerField(db_index=True)
+
+    def __str__(self):
+        return f'{self.signature_id}:{self.key}'
+
+
+
+class Job(models.Model):
+    """数据库里的后台任务队列，由 ``manage.py run_jobs`` 的工作进程执行，见 users.jobs"""
+    STATUS_CHOICES = (
+        ('queued', 'Queued'),
+        ('running', 'Running'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    )
+
+    queue = models.CharField(max_length=50, default='default')
+    # 要执行的函数的点分路径，参数须可 JSON 序列化
+    task = models.CharField(max_length=255)
+    args = models.JSONField(default=list, blank=True)
+    kwargs = models.JSONField(default=dict, blank=True)
+    # 数值越大越先执行
+    priority = models.SmallIntegerField(default=0)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='queued')
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=5)
+    # 最早执行时间；延迟任务与失败重试（退避）都通过它实现
+    run_at = models.DateTimeField(default=timezone.now)
+    locked_by = models.CharField(max_length=100, blank=True)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['queue', 'status', '-priority', 'run_at'], name='job_dequeue_idx'),
+            models.Index(fields=['status', 'locked_at'], name='job_stale_idx'),
+        ]
+
+    def __str__(self):
+        return f'#{self.pk} {self.task} ({self.status})'
+
+
+def _deleted_with(origin, *models):
+    """级联删除是否由 ``models`` 之一的删除引起；``origin`` 可能是实例，也可能是 QuerySet。"""
+    model = origin.model if isinstance(origin, QuerySet) else type(origin)
+    return model in models
+
+
+def _student_being_deleted(origin, student_id):
+    if isinstance(origin, User):
+        return origin.pk == student_id
+    if isinstance(origin, QuerySet) and origin.model is User:
+        return origin.filter(pk=student_id).exists()
+    return False
+
+
+def _refresh_student_progress(student_id, origin=None):
+    # 删除学生账号时级联删除其提交，此时无需（也不能）再写快照；
+    # 删除的是教师账号时，其课题/评审被级联删除，学生快照仍需刷新
+    if student_id is None or _student_being_deleted(origin, student_id):
+        return
+    from .progress import refresh_progress
+    refresh_progress(student_id)
+
+
+@receiver(post_save, sender=Proposal)
+@receiver(post_save, sender=MidtermCheck)
+@receiver(post_save, sender=Thesis)
+@receiver(post_save, sender=TopicSelection)
+def submission_saved(sender, instance, raw=False, **kwargs):
+    if not raw:
+        _refresh_student_progress(instance.student_id)
+
+
+@receiver(post_delete, sender=Proposal)
+@receiver(post_delete, sender=MidtermCheck)
+@receiver(post_delete, sender=Thesis)
+@receiver(post_delete, sender=TopicSelection)
+def submission_deleted(sender, instance, origin=None, **kwargs):
+    _refresh_student_progress(instance.student_id, origin)
+
+
+@receiver(post_delete, sender=Proposal)
+@receiver(post_delete, sender=MidtermCheck)
+@receiver(post_delete, sender=Thesis)
+def submission_file_released(sender, instance, **kwargs):
+    # 内容寻址存储按引用计数回收磁盘；其他存储与未迁移的旧文件保持原行为（不删文件）
+    _release_file(instance.file)
+
+
+@receiver(post_delete, sender=SubmissionMetadata)
+def preview_released(sender, instance, **kwargs):
+    _release_file(instance.preview)
+
+
+def _release_file(field):
+    if field:
+        release_file_name(field.storage, field.name)
+
+
+def release_file_name(storage, name):
+    """提交后释放内容寻址存储里的文件名（替换或删除提交的文件时）；其他存储不删文件。"""
+    if hasattr(storage, 'release'):
+        transaction.on_commit(lambda: storage.release(name))
+
+
+def _review_student_id(review):
+    if isinstance(review, ProposalReview):
+        parent_model, parent_id = Proposal, review.proposal_id
+    elif isinstance(review, MidtermReview):
+        parent_model, parent_id = MidtermCheck, review.midterm_id
+    else:
+        parent_model, parent_id = Thesis, review.thesis_id
+    return parent_model.objects.filter(pk=parent_id).values_list('student_id', flat=True).first()
+
+
+@receiver(post_save, sender=ProposalReview)
+@receiver(post_save, sender=MidtermReview)
+@receiver(post_save, sender=ThesisReview)
+def review_saved(sender, instance, raw=False, **kwargs):
+    if not raw:
+        _refresh_student_progress(_review_student_id(instance))
+
+
+@receiver(post_delete, sender=ProposalReview)
+@receiver(post_delete, sender=MidtermReview)
+@receiver(post_delete, sender=ThesisReview)
+def review_deleted(sender, instance, origin=None, **kwargs):
+    # 提交被删除时其评审随之级联删除，提交本身的信号会负责刷新
+    if _deleted_with(origin, Proposal, MidtermCheck, Thesis):
+        return
+    _refresh_student_progress(_review_student_id(instance), origin)
+
+
+@receiver(post_save, sender=Topic)
+def topic_saved(sender, instance, created, raw=False, update_fields=None, **kwargs):
+    # 课题标题或指导教师变化会影响已选学生的选题进度与教师可见范围
+    if created or raw:
+        return
+    if update_fields is not None and not {'title', 'teacher'} & set(update_fields):
+        return
+    student_ids = list(instance.selections.values_list('student_id', flat=True))
+    # 一个课题可能有多名学生，批量重算，查询条数不随人数增长
+    from .progress import refresh_many
+    refresh_many(student_ids)
+    if update_fields is None or 'teacher' in update_fields:
+        from .scope import sync_student_scope
+        sync_student_scope(student_ids)
+
+
+@receiver(post_save, sender=TopicSelection)
+def topic_selection_saved(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    from .scope import sync_student_scope
+    sync_student_scope([instance.student_id])
+
+
+@receiver(post_delete, sender=TopicSelection)
+def topic_selection_deleted(sender, instance, origin=None, **kwargs):
+    # 删除学生账号时其范围记录随账号级联删除
+    if _student_being_deleted(origin, instance.student_id):
+        return
+    from .scope import sync_student_scope
+    sync_student_scope([instance.student_id])
+
+
+def _invalidate_token_auth(user_id):
+    # 提交后再清除，见 users.authentication
+    from .authentication import invalidate_user
+    transaction.on_commit(partial(invalidate_user, user_id))
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def user_changed(sender, instance, **kwargs):
+    # 认证缓存里带着用户字段（is_active 等），用户变动后清除
+    _invalidate_token_auth(instance.pk)
+
+
+@receiver(post_save, sender=User)
+def teacher_renamed(sender, instance, created, raw=False, update_fields=None, **kwargs):
+    # 选题进度快照里存着指导教师姓名，教师改名后重算其名下学生
+    if created or raw:
+        return
+    if update_fields is not None and not {'first_name', 'last_name', 'username'} & set(update_fields):
+        return
+    student_ids = list(
+        TopicSelection.objects.filter(topic__teacher_id=instance.pk).values_list('student_id', flat=True)
+    )
+    if student_ids:
+        from .progress import refresh_many
+        refresh_many(student_ids)
+
+
+@receiver(post_save, sender=Profile)
+@receiver(post_delete, sender=Profile)
+def profile_changed(sender, instance, **kwargs):
+    _invalidate_token_auth(instance.user_id)
+
+
+@receiver(post_delete, sender=Token)
+def token_deleted(sender, instance, **kwargs):
+    from .authentication import invalidate_token
+    transaction.on_commit(partial(invalidate_token, instance.key))
@@ -0,0 +1,227 @@
+"""运行时 N+1 查询检测（开发 / 预发环境）。
+
+``NPlusOneDetector`` 在块内观察执行的 SELECT：同一条 SQL（参数位置化，``IN (...)`` 按任意长度归一）从同一处
+项目代码（调用栈里最靠近查询的项目帧，如 ``users/serializers.py:142 in get_student_name``）以 ``THRESHOLD``
+组以上不同的参数执行，就记一次检测——典型的是循环里逐行访问没有预取的外键 / 反向关联。
+
+每次检测附调用栈摘要（项目代码帧）、正在输出的序列化器字段（如 ``ThesisSerializer.student_id``）和建议：
+
+* 正向外键 / 一对一（``obj.student``）：从调用栈里的 Django 关联描述符得到字段，建议为
+  ``Thesis: select_related('student')``（在 Thesis 查询集上预取）；反向一对一（``thesis.metadata``）同理；
+* 反向外键（``thesis.reviews.all()``）：按 SQL 的 ``WHERE "表"."外键列" = %s`` 找到外键，建议为
+  ``Thesis: prefetch_related('reviews')``。
+
+``NPlusOneMiddleware`` 对每个请求启用检测，按 ``MODE`` 处理结果：``log`` 记 WARNING 日志；``header`` 写入响应头
+``X-N-Plus-One``；``raise`` 在达到阈值的那条查询处抛出 ``NPlusOneError``（开发时直接得到指向问题代码的 traceback）。
+每条 SELECT 都要遍历一次调用栈，不要在生产环境开启。流式响应只检测视图阶段。
+
+配置见 ``settings.NPLUSONE``::
+
+    NPLUSONE = {
+        'ENABLED': False,
+        'MODE': 'log',       # log / header / raise
+        'THRESHOLD': 3,      # 同一位置、同一形状、不同参数的执行次数达到该值即报告
+        'IGNORE': [],        # 调用位置包含其中任一子串（如 'users/progress.py'）时不报告
+    }
+"""
+import logging
+import os
+import re
+import sys
+from collections import namedtuple
+from contextlib import ExitStack
+
+from django.apps import apps
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.db.models.fields.related_descriptors import ForwardManyToOneDescriptor, ReverseOneToOneDescriptor
+from rest_framework.fields import Field
+
+from .querylog import format_site, project_frames
+
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    'ENABLED': False,
+    'MODE': 'log',
+    'THRESHOLD': 3,
+    'IGNORE': [],
+}
+MODES = ('log', 'header', 'raise')
+HEADER = 'X-N-Plus-One'
+STACK_DEPTH = 6
+# 调用栈摘要里去掉本模块的中间件帧
+_THIS_FILE = os.path.relpath(__file__, settings.BASE_DIR)
+
+Detection = namedtuple('Detection', 'site sql count stack suggestion field')
+
+_IN_LIST = re.compile(r'IN \((?:%s, )*%s\)')
+# 单表按外键列过滤：SELECT ... FROM "users_thesisreview" WHERE ("users_thesisreview"."thesis_id" = %s ...
+_FK_FILTER = re.compile(r'FROM "(?P<table>\w+)" WHERE \(?"(?P=table)"\."(?P<column>\w+)" = %s')
+
+
+class NPlusOneError(Exception):
+    pass
+
+
+def get_config():
+    return {**DEFAULTS, **getattr(settings, 'NPLUSONE', {})}
+
+
+def query_shape(sql):
+    return _IN_LIST.sub('IN (...)', sql)
+
+
+def _descriptor_suggestion(frame):
+    # 懒加载正向外键 / 反向一对一时，调用栈里有 Django 关联描述符的 __get__ / get_object
+    while frame is not None:
+        if frame.f_code.co_filename.endswith('related_descriptors.py'):
+            descriptor = frame.f_locals.get('self')
+            if isinstance(descriptor, ForwardManyToOneDescriptor):
+                field = descriptor.field
+                return f"{field.model.__name__}: select_related('{field.name}')"
+            if isinstance(descriptor, ReverseOneToOneDescriptor):
+                related = descriptor.related
+                return f"{related.model.__name__}: select_related('{related.get_accessor_name()}')"
+        frame = frame.f_back
+    return None
+
+
+def _sql_suggestion(sql):
+    match = _FK_FILTER.search(sql)
+    if not match:
+        return None
+    models = {model._meta.db_table: model for model in apps.get_models()}
+    model = models.get(match['table'])
+    if model is None:
+        return None
+    for field in model._meta.concrete_fields:
+        if field.column == match['column'] and field.many_to_one:
+            accessor = field.remote_field.get_accessor_name()
+            return f"{field.related_model.__name__}: prefetch_related('{accessor}')"
+    return None
+
+
+def serializer_field(frame):
+    """正在输出的 DRF 字段，如 ``ThesisSerializer.student_id``。
+
+    ``source='student.username'`` 这类字段在 DRF 内部取值，调用栈里离查询最近的项目代码可能只是视图或中间件，
+    字段名才指向要改的地方。
+    """
+    while frame is not None:
+        if 'rest_framework' in frame.f_code.co_filename:
+            candidate = frame.f_locals.get('self')
+            if isinstance(candidate, Field) and candidate.parent is not None and candidate.field_name:
+                return f'{type(candidate.parent).__name__}.{candidate.field_name}'
+        frame = frame.f_back
+    return None
+
+
+def suggest(sql, frame=None):
+    """对一次懒加载给出预取建议；认不出关联时返回 ``None``。"""
+    return _descriptor_suggestion(frame or sys._getframe(1)) or _sql_suggestion(sql)
+
+
+class NPlusOneDetector:
+    """上下文管理器：块内同一位置、同一形状的 SELECT 以 ``threshold`` 组以上不同参数执行即记为检测。
+
+    ``raise_on_detect`` 为真时在达到阈值的那条查询执行前抛出 ``NPlusOneError``。
+    """
+
+    def __init__(self, threshold=3, ignore=(), raise_on_detect=False):
+        self.threshold = threshold
+        self.ignore = list(ignore)
+        self.raise_on_detect = raise_on_detect
+        self._params = {}
+        self._detections = {}
+
+    def __call__(self, execute, sql, params, many, context):
+        if not many and sql.lstrip()[:6].upper() == 'SELECT':
+            self._observe(sql, params)
+        return execute(sql, params, many, context)
+
+    def _observe(self, sql, params):
+        frames = project_frames(limit=1, query=True)
+        site = frames[0] if frames else None
+        key = (query_shape(sql), site)
+        seen = self._params.setdefault(key, set())
+        seen.add(repr(params))
+        if len(seen) < self.threshold:
+            return
+        detection = self._detections.get(key)
+        if detection is not None:
+            self._detections[key] = detection._replace(count=len(seen))
+            return
+        if site is not None and any(pattern in format_site(site) for pattern in self.ignore):
+            return
+        stack = [frame for frame in project_frames(limit=STACK_DEPTH + 2, query=True) if frame[0] != _THIS_FILE]
+        caller = sys._getframe(2)
+        detection = Detection(site, key[0], len(seen), stack[:STACK_DEPTH], suggest(sql, caller),
+                              serializer_field(caller))
+        self._detections[key] = detection
+        if self.raise_on_detect:
+            raise NPlusOneError(format_detection(detection))
+
+    def __enter__(self):
+        self.stack = ExitStack()
+        for connection in connections.all():
+            self.stack.enter_context(connection.execute_wrapper(self))
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stack.close()
+
+    @property
+    def detections(self):
+        return list(self._detections.values())
+
+
+def format_detection(detection, sql_length=200):
+    where = format_site(detection.site) + (f'（序列化字段 {detection.field}）' if detection.field else '')
+    lines = [f'N+1：{where} 同一查询以 {detection.count} 组不同参数执行',
+             f'  SQL: {detection.sql[:sql_length]}']
+    if detection.suggestion:
+        lines.append(f'  建议在 {detection.suggestion}')
+    lines.append('  调用栈:')
+    lines.extend(f'    {format_site(site)}' for site in detection.stack)
+    return '\n'.join(lines)
+
+
+def header_value(detections):
+    # 响应头不能换行：每项为“位置 ×次数 -> 建议”，多项用 | 分隔
+    return ' | '.join(
+        f'{format_site(d.site)}' + (f' [{d.field}]' if d.field else '') + f' x{d.count}'
+        + (f' -> {d.suggestion}' if d.suggestion else '')
+        for d in detections
+    )
+
+
+class NPlusOneMiddleware:
+    """按 ``settings.NPLUSONE`` 对每个请求做 N+1 检测，见模块说明。"""
+
+    def __init__(self, get_response):
+        config = get_config()
+        if not config['ENABLED']:
+            raise MiddlewareNotUsed
+        if config['MODE'] not in MODES:
+            raise ValueError(f"NPLUSONE['MODE'] 必须是 {' / '.join(MODES)} 之一，而不是 {config['MODE']!r}")
+        self.get_response = get_response
+        self.mode = config['MODE']
+        self.threshold = config['THRESHOLD']
+        self.ignore = config['IGNORE']
+
+    def __call__(self, request):
+        detector = NPlusOneDetector(self.threshold, self.ignore, raise_on_detect=self.mode == 'raise')
+        with detector:
+            response = self.get_response(request)
+        detections = detector.detections
+        if not detections:
+            return response
+        if self.mode == 'header':
+            response[HEADER] = header_value(detections)
+        else:
+            for detection in detections:
+                logger.warning('%s %s\n%s', request.method, request.path, format_detection(detection))
+        return response
@@ -0,0 +1,118 @@
+import base64
+import json
+from collections import OrderedDict
+
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class CohortProgressPagination(PageNumberPagination):
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 500
+
+
+class KeysetPagination(BasePagination):
+    """按 ``(时间字段, id)`` 倒序的键集（游标）分页。
+
+    游标里保存上一页边界行的 ``(时间, id)``，翻页条件是
+    ``时间 < v OR (时间 = v AND id < pk)``，配合同序的联合索引，第 N 页与第 1 页代价相同。
+    不带 ``cursor`` 参数时返回第一页，单页大小受 ``max_page_size`` 限制。
+    """
+    ordering_field = 'submitted_at'
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 200
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return max(1, min(size, self.max_page_size))
+
+    def decode_cursor(self, request, queryset):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            payload = json.loads(base64.urlsafe_b64decode(encoded.encode('ascii')))
+            field = queryset.model._meta.get_field(self.ordering_field)
+            value = field.to_python(payload['v'])
+            pk = int(payload['id'])
+            reverse = bool(payload.get('r'))
+        except Exception:
+            raise NotFound(self.invalid_cursor_message)
+        if value is None:
+            raise NotFound(self.invalid_cursor_message)
+        return reverse, value, pk
+
+    def encode_cursor(self, row, reverse):
+        value = getattr(row, self.ordering_field)
+        payload = {'v': value.isoformat() if hasattr(value, 'isoformat') else value, 'id': row.pk}
+        if reverse:
+            payload['r'] = 1
+        encoded = base64.urlsafe_b64encode(json.dumps(payload).encode('utf-8')).decode('ascii')
+        return replace_query_param(self.base_url, self.cursor_query_param, encoded)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.base_url = request.build_absolute_uri()
+        self.page_size_value = self.get_page_size(request)
+        field = self.ordering_field
+        cursor = self.decode_cursor(request, queryset)
+
+        if cursor is None:
+            reverse = False
+            queryset = queryset.order_by(f'-{field}', '-id')
+        else:
+            reverse, value, pk = cursor
+            if reverse:
+                # 向前翻页：取比边界行更新的记录，按正序取出后再翻转
+                queryset = queryset.filter(Q(**{f'{field}__gt': value}) | Q(**{field: value, 'id__gt': pk}))
+                queryset = queryset.order_by(field, 'id')
+            else:
+                queryset = queryset.filter(Q(**{f'{field}__lt': value}) | Q(**{field: value, 'id__lt': pk}))
+                queryset = queryset.order_by(f'-{field}', '-id')
+
+        rows = list(queryset[:self.page_size_value + 1])
+        has_more = len(rows) > self.page_size_value
+        rows = rows[:self.page_size_value]
+        if reverse:
+            rows.reverse()
+            self.has_next, self.has_previous = True, has_more
+        else:
+            self.has_next, self.has_previous = has_more, cursor is not None
+        self.page = rows
+        return rows
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(self.page[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if not self.page:
+            return remove_query_param(self.base_url, self.cursor_query_param)
+        return self.encode_cursor(self.page[0], reverse=True)
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('results', data),
+        ]))
+
+
+class SubmissionKeysetPagination(KeysetPagination):
+    ordering_field = 'submitted_at'
+
+
+class TopicKeysetPagination(KeysetPagination):
+    ordering_field = 'created_at'
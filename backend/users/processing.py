@@ -0,0 +1,276 @@
+"""上传后的后台处理：大小、SHA-256、页数、全文与首页预览，结果存入 ``SubmissionMetadata``。
+
+提交视图在 ``perform_create`` 后调用 ``schedule``：先同步写一行 ``pending``，事务提交后把处理
+任务交给进程内的线程池（或配置 ``QUEUE`` 后放进 users.jobs 的任务队列），请求本身不等待。
+
+PDF 解析按可用程度选择后端，均为可选依赖：
+
+* 页数 / 全文：poppler 的 ``pdfinfo`` / ``pdftotext``，否则 ``pypdf``；都没有时页数用
+  ``/Count`` 扫描估计，全文留空；
+* 预览：``pdftoppm``，否则 ``PyMuPDF``；都没有时不生成。
+
+poppler 命令在子进程里运行，不占 GIL，线程池里多个文件可以真正并行，也不拖慢同一进程里的请求线程；
+``pypdf`` 是纯 Python，只在没有 poppler 时使用——这种部署建议配置 ``QUEUE``，让解析在 ``run_jobs``
+进程里进行。同一内容（SHA-256 相同）已经处理过时直接复用结果，不再解析。论文与开题报告的全文随后写入查重索引（users.similarity）。
+进程重启丢失的任务仍是 ``pending``，可用 ``process_submissions`` 命令补做。配置见
+``settings.SUBMISSION_PROCESSING``。
+"""
+import hashlib
+import logging
+import os
+import re
+import shutil
+import subprocess
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+
+from . import jobs, similarity
+from .downloads import MODELS
+from .models import SubmissionMetadata
+
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    'ASYNC': True,             # False 时在事务提交后同步处理（测试、单进程调试）
+    'QUEUE': None,             # 设为队列名时改由任务队列（users.jobs / run_jobs）处理，不用进程内线程池
+    'WORKERS': 2,              # 线程池大小
+    'MAX_TEXT_CHARS': 2_000_000,
+    'PREVIEW_WIDTH': 600,      # 预览图宽度（像素）
+    'TIMEOUT': 120,            # 单个外部命令的超时秒数
+}
+READ_SIZE = 64 * 1024
+COUNT_RE = re.compile(rb'/Type\s*/Pages\b[^>]*?/Count\s+(\d+)|/Count\s+(\d+)[^>]*?/Type\s*/Pages\b', re.S)
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_config():
+    return {**DEFAULTS, **getattr(settings, 'SUBMISSION_PROCESSING', {})}
+
+
+def executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=get_config()['WORKERS'],
+                                           thread_name_prefix='submission-processing')
+        return _executor
+
+
+def schedule(kind, obj):
+    """登记待处理并在事务提交后派发；无文件的记录（中期检查可不传文件）忽略。"""
+    if not obj.file:
+        return
+    SubmissionMetadata.objects.update_or_create(
+        **{kind: obj}, defaults={'file_name': obj.file.name, 'status': 'pending', 'error': ''},
+    )
+    queue = get_config()['QUEUE']
+    if queue:
+        # 与提交记录在同一事务里入队
+        jobs.enqueue(process, kind, obj.pk, queue=queue)
+    else:
+        transaction.on_commit(partial(_dispatch, kind, obj.pk))
+
+
+def _dispatch(kind, pk):
+    if get_config()['ASYNC']:
+        executor().submit(run, kind, pk)
+    else:
+        process(kind, pk)
+
+
+def run(kind, pk):
+    """工作线程入口：前后关闭过期的数据库连接，异常只记日志。"""
+    close_old_connections()
+    try:
+        process(kind, pk)
+    except Exception:
+        logger.exception('processing %s %s failed', kind, pk)
+    finally:
+        close_old_connections()
+
+
+def process(kind, pk):
+    """处理一份提交的文件并保存结果，返回 ``SubmissionMetadata``（记录不存在或无文件时返回 ``None``）。"""
+    obj = MODELS[kind].objects.filter(pk=pk).only('id', 'file').first()
+    if obj is None or not obj.file:
+        return None
+    name = obj.file.name
+    meta, _ = SubmissionMetadata.objects.get_or_create(**{kind: obj}, defaults={'file_name': name})
+
+    preview = None
+    try:
+        with _local_copy(obj.file) as (path, size, sha256):
+            reused = (
+                SubmissionMetadata.objects.filter(sha256=sha256, status='done')
+                .exclude(pk=meta.pk).order_by('-processed_at').first()
+            )
+            if reused is not None:
+                page_count, text = reused.page_count, reused.text
+                preview = _read_preview(reused)
+            elif _is_pdf(path):
+                page_count = pdf_page_count(path)
+                text = pdf_text(path)[:get_config()['MAX_TEXT_CHARS']]
+                preview = pdf_preview(path)
+            else:
+                page_count, text = None, ''
+    except Exception as exc:
+        logger.warning('processing %s %s failed: %s', kind, pk, exc)
+        SubmissionMetadata.objects.filter(pk=meta.pk, file_name=name).update(
+            status='failed', error=str(exc)[:1000], processed_at=timezone.now(),
+        )
+        return meta
+
+    fields = {
+        'status': 'done', 'error': '', 'size': size, 'sha256': sha256, 'page_count': page_count,
+        'text': text, 'text_length': len(text), 'processed_at': timezone.now(),
+    }
+    old_preview = meta.preview.name
+    if preview:
+        meta.preview.save(f'{kind}-{pk}.png', ContentFile(preview), save=False)
+        fields['preview'] = meta.preview.name
+    # 只在文件没有被再次替换时写入（file_name 条件），否则这次的结果已经过期
+    updated = SubmissionMetadata.objects.filter(pk=meta.pk, file_name=name).update(**fields)
+    if updated and old_preview and old_preview != fields.get('preview'):
+        meta.preview.storage.delete(old_preview)
+    elif not updated and fields.get('preview'):
+        meta.preview.storage.delete(fields['preview'])
+    meta.refresh_from_db()
+    if updated and kind in similarity.KINDS:
+        similarity.index(meta)
+    return meta
+
+
+class _local_copy:
+    """得到文件的本地路径，并顺带计算大小与 SHA-256；非本地存储时复制到临时文件。"""
+
+    def __init__(self, field):
+        self.field = field
+        self.tmp = None
+
+    def __enter__(self):
+        digest = hashlib.sha256()
+        size = 0
+        try:
+            path = self.field.path
+        except NotImplementedError:
+            path = None
+        if path is None:
+            fd, self.tmp = tempfile.mkstemp(suffix=os.path.splitext(self.field.name)[1])
+            out = os.fdopen(fd, 'wb')
+        with self.field.storage.open(self.field.name, 'rb') as source:
+            for data in iter(lambda: source.read(READ_SIZE), b''):
+                digest.update(data)
+                size += len(data)
+                if path is None:
+                    out.write(data)
+        if path is None:
+            out.close()
+            path = self.tmp
+        return path, size, digest.hexdigest()
+
+    def __exit__(self, *exc_info):
+        if self.tmp:
+            os.remove(self.tmp)
+
+
+def _is_pdf(path):
+    with open(path, 'rb') as f:
+        return f.read(1024).lstrip().startswith(b'%PDF-')
+
+
+def _read_preview(meta):
+    if not meta.preview:
+        return None
+    try:
+        with meta.preview.open('rb') as f:
+            return f.read()
+    except FileNotFoundError:
+        return None
+
+
+def _command(*args):
+    """运行 poppler 命令并返回 stdout；命令不存在时返回 ``None``。"""
+    if shutil.which(args[0]) is None:
+        return None
+    result = subprocess.run(args, capture_output=True, timeout=get_config()['TIMEOUT'], check=True)
+    return result.stdout
+
+
+# --- PDF 后端 ---
+
+# 都是先用 poppler 子进程，再用进程内的库：见模块说明
+
+def pdf_page_count(path):
+    output = _command('pdfinfo', path)
+    if output is not None:
+        match = re.search(rb'^Pages:\s+(\d+)', output, re.M)
+        return int(match.group(1)) if match else None
+    try:
+        import pypdf
+    except ImportError:
+        pypdf = None
+    if pypdf is not None:
+        return len(pypdf.PdfReader(path).pages)
+    return _scan_page_count(path)
+
+
+def _scan_page_count(path):
+    """没有解析库时的估计：页树根节点的 ``/Count`` 是各 ``/Pages`` 节点里最大的。
+
+    对象流被压缩的 PDF 里找不到，返回 ``None``。
+    """
+    best = None
+    tail = b''
+    with open(path, 'rb') as f:
+        for data in iter(lambda: f.read(1024 * 1024), b''):
+            block = tail + data
+            for match in COUNT_RE.finditer(block):
+                count = int(match.group(1) or match.group(2))
+                best = count if best is None else max(best, count)
+            tail = block[-256:]
+    return best
+
+
+def pdf_text(path):
+    output = _command('pdftotext', '-enc', 'UTF-8', '-q', path, '-')
+    if output is not None:
+        return output.decode('utf-8', 'replace')
+    try:
+        import pypdf
+    except ImportError:
+        pypdf = None
+    if pypdf is not None:
+        return '\n'.join(page.extract_text() or '' for page in pypdf.PdfReader(path).pages)
+    return ''
+
+
+def pdf_preview(path):
+    """首页 PNG 字节；没有可用的渲染后端时返回 ``None``。"""
+    width = get_config()['PREVIEW_WIDTH']
+    if shutil.which('pdftoppm') is not None:
+        with tempfile.TemporaryDirectory() as tmp:
+            prefix = os.path.join(tmp, 'preview')
+            _command('pdftoppm', '-png', '-f', '1', '-l', '1', '-singlefile', '-scale-to-x', str(width),
+                     '-scale-to-y', '-1', path, prefix)
+            with open(prefix + '.png', 'rb') as f:
+                return f.read()
+    try:
+        import fitz
+    except ImportError:
+        fitz = None
+    if fitz is None:
+        return None
+    with fitz.open(path) as document:
+        page = document[0]
+        zoom = width / page.rect.width
+        return page.get_pixmap(matrix=fitz.Matrix(zoom, zoom)).tobytes('png')
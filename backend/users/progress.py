@@ -0,0 +1,303 @@
+"""学生六阶段进度的计算与快照维护。
+
+``compute_progress`` 是实时计算（与原 ``StudentProgressAPIView`` 的输出完全一致），
+``StudentProgress`` 快照表保存其结果，由 ``models.py`` 中的信号在提交/评审变动时刷新，
+进度接口只需按主键读一行。
+"""
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models import F, OuterRef, Subquery, Window
+from django.db.models.functions import RowNumber
+
+from .models import (
+    StudentProgress, TopicSelection, Proposal, ProposalReview,
+    MidtermCheck, MidtermReview, Thesis, ThesisReview,
+)
+
+
+THESIS_STAGES = ('first_review', 'second_review', 'final_submission')
+
+PENDING_MESSAGES = {
+    'proposal': '尚未提交开题报告',
+    'midterm': '尚未提交中期检查',
+    'first_review': '尚未提交论文初稿',
+    'second_review': '尚未提交论文修改稿',
+    'final_submission': '尚未提交论文终稿',
+}
+
+
+def _iso(value):
+    return value.isoformat() if value else None
+
+
+def topic_selection_progress(selection):
+    if selection is None:
+        return {
+            'status': 'pending',
+            'message': '尚未选题',
+        }
+    teacher = selection.topic.teacher
+    return {
+        'status': 'completed',
+        'topic_title': selection.topic.title,
+        'teacher_name': teacher.get_full_name() or teacher.username,
+        'selected_at': _iso(selection.selected_at),
+    }
+
+
+def stage_progress(stage, submitted_at=None, review=None):
+    """根据最新提交与其最新评审生成单个阶段的进度。
+
+    ``submitted_at`` 为 ``None`` 表示尚未提交；``review`` 可以是评审对象，也可以是带
+    ``result``/``score``/``feedback``/``reviewed_at`` 键的字典（批量计算时由注解得到）。
+    """
+    if submitted_at is None:
+        return {
+            'status': 'pending',
+            'message': PENDING_MESSAGES[stage],
+        }
+    if review is None:
+        return {
+            'status': 'in-progress',
+            'message': '已提交，等待审核',
+            'submitted_at': _iso(submitted_at),
+        }
+    if not isinstance(review, dict):
+        review = {
+            'result': review.result,
+            'score': review.score,
+            'feedback': review.feedback,
+            'reviewed_at': review.reviewed_at,
+        }
+    if review['result'] == 'pass':
+        return {
+            'status': 'completed',
+            'score': review['score'],
+            'reviewed_at': _iso(review['reviewed_at']),
+            'comments': review['feedback'],
+        }
+    if review['result'] == 'revise':
+        return {
+            'status': 'in-progress',
+            'message': '需要修改',
+            'score': review['score'],
+            'comments': review['feedback'],
+            'reviewed_at': _iso(review['reviewed_at']),
+        }
+    # fail
+    return {
+        'status': 'failed',
+        'message': '未通过',
+        'score': review['score'],
+        'comments': review['feedback'],
+        'reviewed_at': _iso(review['reviewed_at']),
+    }
+
+
+def _latest(queryset):
+    return queryset.order_by('-submitted_at', '-id').first()
+
+
+def _latest_review(queryset):
+    return queryset.order_by('-reviewed_at', '-id').first()
+
+
+def compute_progress(student):
+    """实时计算一个学生的六阶段进度（不读快照）。"""
+    progress = {}
+
+    selection = (
+        TopicSelection.objects.filter(student=student)
+        .select_related('topic__teacher')
+        .order_by('id')
+        .first()
+    )
+    progress['topic_selection'] = topic_selection_progress(selection)
+
+    proposal = _latest(Proposal.objects.filter(student=student))
+    review = _latest_review(ProposalReview.objects.filter(proposal=proposal)) if proposal else None
+    progress['proposal'] = stage_progress('proposal', proposal.submitted_at if proposal else None, review)
+
+    midterm = _latest(MidtermCheck.objects.filter(student=student))
+    review = _latest_review(MidtermReview.objects.filter(midterm=midterm)) if midterm else None
+    progress['midterm'] = stage_progress('midterm', midterm.submitted_at if midterm else None, review)
+
+    for stage in THESIS_STAGES:
+        thesis = _latest(Thesis.objects.filter(student=student, stage=stage))
+        review = _latest_review(ThesisReview.objects.filter(thesis=thesis, stage=stage)) if thesis else None
+        progress[stage] = stage_progress(stage, thesis.submitted_at if thesis else None, review)
+
+    return progress
+
+
+REVIEW_FIELDS = ('result', 'score', 'feedback', 'reviewed_at')
+
+
+def _latest_per_student(queryset, review_queryset, partition_by=('student_id',)):
+    """每个学生（每个分区）最新的一条提交，附带其最新评审的字段。
+
+    用 ``ROW_NUMBER()`` 窗口函数选出最新提交，用相关子查询取最新评审，一条 SQL 完成。
+    """
+    review_queryset = review_queryset.order_by('-reviewed_at', '-id')
+    annotations = {
+        f'review_{name}': Subquery(review_queryset.values(name)[:1]) for name in REVIEW_FIELDS
+    }
+    return (
+        queryset
+        .annotate(
+            row_number=Window(
+                RowNumber(),
+                partition_by=[F(name) for name in partition_by],
+                order_by=[F('submitted_at').desc(), F('id').desc()],
+            ),
+            **annotations,
+        )
+        .filter(row_number=1)
+        .order_by()
+        .values(*partition_by, 'submitted_at', *annotations)
+    )
+
+
+def _review_from_row(row):
+    if row['review_result'] is None:
+        return None
+    return {name: row[f'review_{name}'] for name in REVIEW_FIELDS}
+
+
+def compute_cohort_progress(student_ids):
+    """批量计算一组学生的六阶段进度，返回 ``{student_id: progress}``。
+
+    查询数量固定（选题、开题、中期、论文各一条），与学生人数无关；结果与
+    ``compute_progress`` 逐个计算完全一致。
+    """
+    student_ids = list(student_ids)
+    if not student_ids:
+        return {}
+
+    selections = {}
+    for selection in (
+        TopicSelection.objects.filter(student_id__in=student_ids)
+        .select_related('topic__teacher')
+        .order_by('id')
+    ):
+        selections.setdefault(selection.student_id, selection)
+
+    proposals = {
+        row['student_id']: row
+        for row in _latest_per_student(
+            Proposal.objects.filter(student_id__in=student_ids),
+            ProposalReview.objects.filter(proposal=OuterRef('pk')),
+        )
+    }
+    midterms = {
+        row['student_id']: row
+        for row in _latest_per_student(
+            MidtermCheck.objects.filter(student_id__in=student_ids),
+            MidtermReview.objects.filter(midterm=OuterRef('pk')),
+        )
+    }
+    theses = {
+        (row['student_id'], row['stage']): row
+        for row in _latest_per_student(
+            Thesis.objects.filter(student_id__in=student_ids, stage__in=THESIS_STAGES),
+            ThesisReview.objects.filter(thesis=OuterRef('pk'), stage=OuterRef('stage')),
+            partition_by=('student_id', 'stage'),
+        )
+    }
+
+    def build(stage, row):
+        if row is None:
+            return stage_progress(stage)
+        return stage_progress(stage, row['submitted_at'], _review_from_row(row))
+
+    result = {}
+    for student_id in student_ids:
+        progress = {
+            'topic_selection': topic_selection_progress(selections.get(student_id)),
+            'proposal': build('proposal', proposals.get(student_id)),
+            'midterm': build('midterm', midterms.get(student_id)),
+        }
+        for stage in THESIS_STAGES:
+            progress[stage] = build(stage, theses.get((student_id, stage)))
+        result[student_id] = progress
+    return result
+
+
+def refresh_progress(student_id):
+    """重新计算并写入一个学生的快照。
+
+    走批量计算的路径（查询条数固定），不逐阶段查询；每次提交、评审、选题都会经信号调用到这里。
+    """
+    if not User.objects.filter(pk=student_id).exists():
+        return None
+    data = compute_cohort_progress([student_id])[student_id]
+    StudentProgress.objects.update_or_create(student_id=student_id, defaults={'data': data})
+    return data
+
+
+def get_progress(student):
+    """读取快照；快照缺失时实时计算并补写。"""
+    data = (
+        StudentProgress.objects.filter(student_id=student.pk)
+        .values_list('data', flat=True)
+        .first()
+    )
+    if data is None:
+        data = refresh_progress(student.pk)
+    return data
+
+
+def student_queryset():
+    return User.objects.filter(profile__role='student').order_by('id')
+
+
+def _student_id_batches(batch_size):
+    batch = []
+    for student_id in student_queryset().values_list('id', flat=True).iterator(chunk_size=batch_size):
+        batch.append(student_id)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def rebuild_all(batch_size=500):
+    """清空并重建所有学生的快照，返回重建数量。"""
+    total = 0
+    with transaction.atomic():
+        StudentProgress.objects.all().delete()
+        for student_ids in _student_id_batches(batch_size):
+            cohort = compute_cohort_progress(student_ids)
+            StudentProgress.objects.bulk_create(
+                StudentProgress(student_id=student_id, data=data) for student_id, data in cohort.items()
+            )
+            total += len(cohort)
+    return total
+
+
+def refresh_many(student_ids, batch_size=500):
+    """批量刷新指定学生的快照（用于 ``bulk_create`` 等不触发信号的写入之后）。"""
+    student_ids = list(student_ids)
+    for start in range(0, len(student_ids), batch_size):
+        cohort = compute_cohort_progress(student_ids[start:start + batch_size])
+        StudentProgress.objects.bulk_create(
+            [StudentProgress(student_id=student_id, data=data) for student_id, data in cohort.items()],
+            update_conflicts=True,
+            unique_fields=['student'],
+            update_fields=['data', 'updated_at'],
+        )
+
+
+def find_inconsistent(batch_size=500):
+    """对比快照与实时计算，返回 ``(student_id, 快照, 实时结果)`` 列表；缺失快照记为 ``None``。"""
+    mismatches = []
+    for student_ids in _student_id_batches(batch_size):
+        live = compute_cohort_progress(student_ids)
+        stored = dict(
+            StudentProgress.objects.filter(student_id__in=student_ids).values_list('student_id', 'data')
+        )
+        for student_id in student_ids:
+            if stored.get(student_id) != live[student_id]:
+                mismatches.append((student_id, stored.get(student_id), live[student_id]))
+    return mismatches
@@ -0,0 +1,109 @@
+"""按调用位置记录 SQL。
+
+``QueryRecorder`` 在块内给当前线程的数据库连接装上 ``execute_wrapper``，记下每条 SQL 的参数、耗时和
+发出它的项目代码位置（调用栈里最靠近查询、不属于第三方包的一帧，如 ``users/serializers.py:137 in
+get_student_name``），``format_by_site`` 把它们按位置分组输出，用来定位“同一处代码逐行查询”。
+"""
+import os
+import sys
+import time
+from collections import namedtuple
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+from django.db.backends.utils import CursorWrapper
+
+
+Query = namedtuple('Query', 'sql params duration site')
+
+_ROOT = os.path.join(str(settings.BASE_DIR), '')
+_THIS_FILE = os.path.abspath(__file__)
+_EXECUTE_WITH_WRAPPERS = CursorWrapper._execute_with_wrappers.__code__
+
+
+def _is_project_file(filename):
+    return filename.startswith(_ROOT) and 'site-packages' not in filename and filename != _THIS_FILE
+
+
+def project_frames(limit=None, skip=1, query=False):
+    """当前调用栈里的项目代码帧（由内到外），每项为 ``(相对路径, 行号, 函数名)``。
+
+    ``query=True`` 用于 execute_wrapper 内部：从 Django 执行这条 SQL 的调用点往外算，跳过整条 wrapper 链
+    （链上其他 wrapper 也可能是项目代码，如压测统计 ``X-Query-Count`` 的计数函数）。
+    """
+    frames = []
+    frame = sys._getframe(skip)
+    if query:
+        while frame is not None and frame.f_code is not _EXECUTE_WITH_WRAPPERS:
+            frame = frame.f_back
+    while frame is not None and (limit is None or len(frames) < limit):
+        filename = frame.f_code.co_filename
+        if _is_project_file(filename):
+            frames.append((os.path.relpath(filename, _ROOT), frame.f_lineno, frame.f_code.co_name))
+        frame = frame.f_back
+    return frames
+
+
+def format_site(site):
+    return '%s:%d in %s' % site if site else '(项目外)'
+
+
+class QueryRecorder:
+    """上下文管理器：记录块内当前线程所有数据库连接执行的 SQL。
+
+    ``sites=False`` 时不取调用位置（省去逐条遍历调用栈的开销）。
+    """
+
+    def __init__(self, sites=True):
+        self.sites = sites
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        site = None
+        if self.sites:
+            frames = project_frames(limit=1, skip=2, query=True)
+            site = frames[0] if frames else None
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append(Query(sql, params, time.perf_counter() - started, site))
+
+    def __enter__(self):
+        self.stack = ExitStack()
+        for connection in connections.all():
+            self.stack.enter_context(connection.execute_wrapper(self))
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stack.close()
+
+    def __len__(self):
+        return len(self.queries)
+
+    @property
+    def duration(self):
+        return sum(query.duration for query in self.queries)
+
+    def by_site(self):
+        """``{调用位置: [Query, ...]}``，按条数从多到少。"""
+        groups = {}
+        for query in self.queries:
+            groups.setdefault(query.site, []).append(query)
+        return dict(sorted(groups.items(), key=lambda item: -len(item[1])))
+
+    def format_by_site(self, sql_limit=3):
+        """按调用位置分组的文本：每组给出条数和前 ``sql_limit`` 条不同的 SQL。"""
+        lines = []
+        for site, queries in self.by_site().items():
+            lines.append(f'{len(queries):>4} × {format_site(site)}')
+            seen = []
+            for query in queries:
+                if query.sql not in seen:
+                    seen.append(query.sql)
+            for sql in seen[:sql_limit]:
+                lines.append(f'         {sql}')
+            if len(seen) > sql_limit:
+                lines.append(f'         …另有 {len(seen) - sql_limit} 种')
+        return '\n'.join(lines)
@@ -0,0 +1,93 @@
+"""教师 → 学生可见范围。
+
+``TeacherStudent`` 物化了“学生选了该教师的课题”这一关系，教师视角的查询只需与它做一次
+索引连接，不必每次请求都构建 ``DISTINCT`` 子查询。``teacher_student_ids`` 在进程内缓存
+某位教师的学生 id 集合，本进程内的写操作在事务提交后使其失效（提交前失效的话，并发的读请求
+会把旧范围重新放回缓存），其他进程最多在 ``TEACHER_SCOPE_CACHE_TTL`` 秒后看到变化。
+缓存只用于展示；鉴权（如下载权限）用 ``teacher_has_student`` 直接查表。
+"""
+import threading
+import time
+from functools import partial
+
+from django.conf import settings
+from django.db import transaction
+
+from .models import TeacherStudent, TopicSelection
+
+
+_cache = {}
+_cache_lock = threading.Lock()
+
+
+def _ttl():
+    return getattr(settings, 'TEACHER_SCOPE_CACHE_TTL', 60)
+
+
+def invalidate(teacher_ids=None):
+    with _cache_lock:
+        if teacher_ids is None:
+            _cache.clear()
+            return
+        for teacher_id in teacher_ids:
+            _cache.pop(teacher_id, None)
+
+
+def sync_student_scope(student_ids):
+    """按 TopicSelection 重新计算这些学生所属的教师范围。"""
+    student_ids = list(student_ids)
+    if not student_ids:
+        return
+    with transaction.atomic():
+        old_teachers = set(
+            TeacherStudent.objects.filter(student_id__in=student_ids).values_list('teacher_id', flat=True)
+        )
+        pairs = set(
+            TopicSelection.objects.filter(student_id__in=student_ids)
+            .values_list('topic__teacher_id', 'student_id')
+        )
+        TeacherStudent.objects.filter(student_id__in=student_ids).delete()
+        TeacherStudent.objects.bulk_create(
+            [TeacherStudent(teacher_id=teacher_id, student_id=student_id) for teacher_id, student_id in pairs],
+            batch_size=1000,
+        )
+        transaction.on_commit(partial(invalidate, old_teachers | {teacher_id for teacher_id, _ in pairs}))
+
+
+def rebuild_all():
+    with transaction.atomic():
+        TeacherStudent.objects.all().delete()
+        pairs = TopicSelection.objects.values_list('topic__teacher_id', 'student_id').distinct()
+        TeacherStudent.objects.bulk_create(
+            (TeacherStudent(teacher_id=teacher_id, student_id=student_id) for teacher_id, student_id in pairs),
+            batch_size=1000,
+        )
+        transaction.on_commit(invalidate)
+
+
+def teacher_student_ids(teacher):
+    """某位教师可见的学生 id（frozenset），进程内缓存。"""
+    teacher_id = getattr(teacher, 'pk', teacher)
+    now = time.monotonic()
+    with _cache_lock:
+        entry = _cache.get(teacher_id)
+    if entry is not None and entry[0] > now:
+        return entry[1]
+    ids = frozenset(TeacherStudent.objects.filter(teacher_id=teacher_id).values_list('student_id', flat=True))
+    with _cache_lock:
+        _cache[teacher_id] = (now + _ttl(), ids)
+    return ids
+
+
+def teacher_has_student(teacher, student_id):
+    """教师当前是否能看到该学生（一次有索引的查询，不经过进程内缓存）。"""
+    return TeacherStudent.objects.filter(teacher=teacher, student_id=student_id).exists()
+
+
+def scope_to_teacher(queryset, teacher, field='student'):
+    """把查询集限制在教师可见的学生范围内（与 TeacherStudent 的一次连接）。
+
+    ``field`` 为指向学生的外键名；查询集本身就是 User 时传 ``None``。
+    """
+    lookup = f'{field}__scoped_teachers__teacher' if field else 'scoped_teachers__teacher'
+    return queryset.filter(**{lookup: teacher})
@@ -0,0 +1,114 @@
+"""学生姓名/学工号搜索索引。
+
+每个用户维护一行规范化搜索键（学工号、姓+名、名+姓，小写、去空白），由 ``models.py``
+中的 ``post_save`` 信号同步。查询时：
+
+* PostgreSQL：对搜索键做 ``LIKE '%q%'``，由 ``pg_trgm`` 的 GIN 索引加速（见迁移 0010）；
+* 其他后端（SQLite）：查 ``UserSearchToken`` 中长度 1~3 的 n-gram 词表。查询词不超过 3
+  个字符时是一次索引等值查找；更长时以最稀有的 3-gram 取候选，再用搜索键精确校验。
+
+匹配语义与原先的 ``icontains`` 四字段组合一致：子串匹配、不区分大小写。
+"""
+from django.db import connection, transaction
+
+from .models import UserSearchKey, UserSearchToken
+
+
+MAX_GRAM = 3
+GRAM_PROBE_LIMIT = 1000
+KEY_SEPARATOR = '\n'
+
+
+def normalize(text):
+    return ''.join((text or '').split()).casefold()
+
+
+def search_keys(username, first_name, last_name):
+    keys = []
+    for key in (username, (last_name or '') + (first_name or ''), (first_name or '') + (last_name or '')):
+        key = normalize(key)
+        if key and key not in keys:
+            keys.append(key)
+    return keys
+
+
+def ngrams(keys):
+    grams = set()
+    for key in keys:
+        for size in range(1, MAX_GRAM + 1):
+            for i in range(len(key) - size + 1):
+                grams.add(key[i:i + size])
+    return grams
+
+
+def uses_token_table():
+    return connection.vendor != 'postgresql'
+
+
+def index_users(users):
+    """为一批用户重建搜索键与 n-gram；搜索键未变化的用户跳过。返回实际更新的用户数。"""
+    users = list(users)
+    if not users:
+        return 0
+    existing = dict(
+        UserSearchKey.objects.filter(user_id__in=[u.pk for u in users]).values_list('user_id', 'key')
+    )
+    changed = {}
+    for user in users:
+        key = KEY_SEPARATOR.join(search_keys(user.username, user.first_name, user.last_name))
+        if existing.get(user.pk) != key:
+            changed[user.pk] = key
+    if not changed:
+        return 0
+
+    with transaction.atomic():
+        UserSearchKey.objects.bulk_create(
+            [UserSearchKey(user_id=user_id, key=key) for user_id, key in changed.items()],
+            update_conflicts=True,
+            unique_fields=['user'],
+            update_fields=['key'],
+        )
+        if uses_token_table():
+            UserSearchToken.objects.filter(user_id__in=list(changed)).delete()
+            # 每个用户几十个 n-gram，批量导入时有数十万行：直接 executemany，省去逐行构造模型和编译 SQL
+            qn = connection.ops.quote_name
+            with connection.cursor() as cursor:
+                cursor.executemany(
+                    f'INSERT INTO {qn(UserSearchToken._meta.db_table)} ({qn("user_id")}, {qn("token")}) '
+                    f'VALUES (%s, %s)',
+                    [
+                        (user_id, token)
+                        for user_id, key in changed.items()
+                        for token in ngrams(key.split(KEY_SEPARATOR))
+                    ],
+                )
+    return len(changed)
+
+
+def index_user(user):
+    return index_users([user])
+
+
+def matching_user_ids(query):
+    """返回匹配 ``query`` 的用户 id 子查询（``values('user_id')``），可直接用于 ``__in`` 过滤。"""
+    q = normalize(query)
+    if not q:
+        return None
+    if not uses_token_table():
+        return UserSearchKey.objects.filter(key__contains=q).values('user_id')
+    if len(q) <= MAX_GRAM:
+        return UserSearchToken.objects.filter(token=q).values('user_id')
+
+    # 从最稀有的 3-gram 出发取候选，再用完整搜索键校验子串；对高频片段（如学号前缀）
+    # 比对全部 3-gram 做 GROUP BY 求交快得多。频次探测有上限，只是一次短的索引范围扫描。
+    grams = sorted({q[i:i + MAX_GRAM] for i in range(len(q) - MAX_GRAM + 1)})
+    rarest = min(grams, key=lambda gram: UserSearchToken.objects.filter(token=gram)[:GRAM_PROBE_LIMIT].count())
+    candidates = UserSearchToken.objects.filter(token=rarest).values('user_id')
+    return UserSearchKey.objects.filter(user_id__in=candidates, key__contains=q).values('user_id')
+
+
+def filter_by_student_name(queryset, query, field='student'):
+    ids = matching_user_ids(query)
+    if ids is None:
+        return queryset
+    return queryset.filter(**{f'{field}__in': ids})
@@ -1,8 +1,10 @@
 from django.contrib.auth.models import User
+from django.db.models import Prefetch
 from rest_framework import serializers
 from .models import Profile, Thesis, ThesisReview
-from .models import Topic, TopicSelection
-from .models import Proposal, MidtermCheck, ProposalReview, MidtermReview
+from .models import Topic, TopicSelection, AllocationRound, UploadSession
+from .models import Proposal, MidtermCheck, ProposalReview, MidtermReview, SubmissionMetadata
+from .downloads import signed_download_url
 
 
 class UserSerializer(serializers.ModelSerializer):
@@ -42,6 +44,23 @@ class RegisterSerializer(serializers.Serializer):
         return user
 
 
+class EagerLoadingMixin:
+    """声明序列化一行数据所需的关联预取计划，列表视图通过 setup_eager_loading 统一应用"""
+    select_related_fields = ()
+    prefetch_related_fields = ()
+    defer_fields = ()
+
+    @classmethod
+    def setup_eager_loading(cls, queryset):
+        if cls.select_related_fields:
+            queryset = queryset.select_related(*cls.select_related_fields)
+        if cls.defer_fields:
+            queryset = queryset.defer(*cls.defer_fields)
+        if cls.prefetch_related_fields:
+            queryset = queryset.prefetch_related(*cls.prefetch_related_fields)
+        return queryset
+
+
 class LoginSerializer(serializers.Serializer):
     identifier = serializers.CharField()  # student_id or email
     password = serializers.CharField(write_only=True)
@@ -70,23 +89,54 @@ class ThesisReviewSerializer(serializers.ModelSerializer):
         return value
 
 
-class ThesisSerializer(serializers.ModelSerializer):
+class SubmissionMetadataSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = SubmissionMetadata
+        fields = ('status', 'size', 'sha256', 'page_count', 'text_length', 'processed_at')
+
+
+def submission_metadata(serializer, kind, obj):
+    """后台提取的文件信息（users.processing）；随列表 select_related 取出，不读文件。"""
+    meta = getattr(obj, 'metadata', None)
+    if meta is None:
+        return None
+    data = SubmissionMetadataSerializer(meta).data
+    request = serializer.context.get('request')
+    data['preview_url'] = None
+    if meta.preview and request and request.user.is_authenticated:
+        data['preview_url'] = signed_download_url(request, kind, obj, preview=True)
+    return data
+
+
+class ThesisSerializer(EagerLoadingMixin, serializers.ModelSerializer):
+    select_related_fields = ('student', 'metadata')
+    # 全文只在查重等场景使用，列表不取
+    defer_fields = ('metadata__text',)
+    prefetch_related_fields = (
+        Prefetch('reviews', queryset=ThesisReview.objects.select_related('reviewer')),
+    )
+
     student_name = serializers.SerializerMethodField()
     student_id = serializers.CharField(source='student.username', read_only=True)
     reviews = ThesisReviewSerializer(many=True, read_only=True)
     file_url = serializers.SerializerMethodField()
+    metadata = serializers.SerializerMethodField()
 
     class Meta:
         model = Thesis
-        fields = ('id', 'student_id', 'student_name', 'title', 'file', 'file_url', 'version', 'status', 'stage', 'submitted_at', 'updated_at', 'reviews')
+        fields = ('id', 'student_id', 'student_name', 'title', 'file', 'file_url', 'version', 'status', 'stage', 'submitted_at', 'updated_at', 'reviews', 'metadata')
         read_only_fields = ('id', 'submitted_at', 'updated_at')
 
     def get_file_url(self, obj):
+        # 受控下载地址（带签名，浏览器可直接打开），见 users.downloads
         request = self.context.get('request')
-        if obj.file and request:
-            return request.build_absolute_uri(obj.file.url)
+        if obj.file and request and request.user.is_authenticated:
+            return signed_download_url(request, 'thesis', obj)
         return None
 
+    def get_metadata(self, obj):
+        return submission_metadata(self, 'thesis', obj)
+
     def get_student_name(self, obj):
         # For Chinese names prefer last_name + first_name without space
         first = getattr(obj.student, 'first_name', '') or ''
@@ -101,28 +151,41 @@ class ThesisSerializer(serializers.ModelSerializer):
         return obj.student.username
 
 
-class ProposalSerializer(serializers.ModelSerializer):
+class ProposalSerializer(EagerLoadingMixin, serializers.ModelSerializer):
+    select_related_fields = ('student', 'metadata')
+    # 全文只在查重等场景使用，列表不取
+    defer_fields = ('metadata__text',)
+    prefetch_related_fields = (
+        Prefetch('reviews', queryset=ProposalReview.objects.select_related('reviewer')),
+    )
+
     student_id = serializers.CharField(source='student.username', read_only=True)
     student_name = serializers.SerializerMethodField()
     file_url = serializers.SerializerMethodField()
+    metadata = serializers.SerializerMethodField()
     reviews = serializers.SerializerMethodField()
 
     class Meta:
         model = Proposal
-        fields = ('id', 'student_id', 'student_name', 'title', 'file', 'file_url', 'status', 'submitted_at', 'updated_at', 'reviews')
+        fields = ('id', 'student_id', 'student_name', 'title', 'file', 'file_url', 'status', 'submitted_at', 'updated_at', 'reviews', 'metadata')
         read_only_fields = ('id', 'submitted_at', 'updated_at')
 
     def get_file_url(self, obj):
+        # 受控下载地址（带签名，浏览器可直接打开），见 users.downloads
         request = self.context.get('request')
-        if obj.file and request:
-            return request.build_absolute_uri(obj.file.url)
+        if obj.file and request and request.user.is_authenticated:
+            return signed_download_url(request, 'proposal', obj)
         return None
 
+    def get_metadata(self, obj):
+        return submission_metadata(self, 'proposal', obj)
+
     def get_reviews(self, obj):
         qs = getattr(obj, 'reviews', None)
         if qs is None:
             return []
-        return ProposalReviewSerializer(qs, many=True).data
+        # .all() reuses the prefetched reviews when the view applied setup_eager_loading
+        return ProposalReviewSerializer(qs.all(), many=True).data
     def get_student_name(self, obj):
         first = getattr(obj.student, 'first_name', '') or ''
         last = getattr(obj.student, 'last_name', '') or ''
@@ -133,28 +196,41 @@ class ProposalSerializer(serializers.ModelSerializer):
         return full_name if full_name else obj.student.username
 
 
-class MidtermCheckSerializer(serializers.ModelSerializer):
+class MidtermCheckSerializer(EagerLoadingMixin, serializers.ModelSerializer):
+    select_related_fields = ('student', 'metadata')
+    # 全文只在查重等场景使用，列表不取
+    defer_fields = ('metadata__text',)
+    prefetch_related_fields = (
+        Prefetch('reviews', queryset=MidtermReview.objects.select_related('reviewer')),
+    )
+
     student_id = serializers.CharField(source='student.username', read_only=True)
     student_name = serializers.SerializerMethodField()
     file_url = serializers.SerializerMethodField()
+    metadata = serializers.SerializerMethodField()
     reviews = serializers.SerializerMethodField()
 
     class Meta:
         model = MidtermCheck
-        fields = ('id', 'student_id', 'student_name', 'title', 'file', 'file_url', 'status', 'submitted_at', 'updated_at', 'reviews')
+        fields = ('id', 'student_id', 'student_name', 'title', 'file', 'file_url', 'status', 'submitted_at', 'updated_at', 'reviews', 'metadata')
         read_only_fields = ('id', 'submitted_at', 'updated_at')
 
     def get_file_url(self, obj):
+        # 受控下载地址（带签名，浏览器可直接打开），见 users.downloads
         request = self.context.get('request')
-        if obj.file and request:
-            return request.build_absolute_uri(obj.file.url)
+        if obj.file and request and request.user.is_authenticated:
+            return signed_download_url(request, 'midterm', obj)
         return None
 
+    def get_metadata(self, obj):
+        return submission_metadata(self, 'midterm', obj)
+
     def get_reviews(self, obj):
         qs = getattr(obj, 'reviews', None)
         if qs is None:
             return []
-        return MidtermReviewSerializer(qs, many=True).data
+        # .all() reuses the prefetched reviews when the view applied setup_eager_loading
+        return MidtermReviewSerializer(qs.all(), many=True).data
     def get_student_name(self, obj):
         first = getattr(obj.student, 'first_name', '') or ''
         last = getattr(obj.student, 'last_name', '') or ''
@@ -219,6 +295,17 @@ class MidtermReviewSerializer(serializers.ModelSerializer):
         return value
 
 
+
+class BulkReviewItemSerializer(serializers.Serializer):
+    """批量评审中的一项：``id`` 为被评审的论文 / 开题 / 中期记录"""
+    id = serializers.IntegerField()
+    result = serializers.ChoiceField(choices=ThesisReview.REVIEW_RESULT_CHOICES)
+    score = serializers.IntegerField(min_value=0, max_value=100, required=False, allow_null=True)
+    feedback = serializers.CharField(required=False, allow_blank=True, allow_null=True)
+    # 仅论文使用；缺省时取论文当前阶段
+    stage = serializers.ChoiceField(choices=Thesis.STAGE_CHOICES, required=False)
+
+
 class TopicSerializer(serializers.ModelSerializer):
     teacher_id = serializers.CharField(source='teacher.username', read_only=True)
     teacher_name = serializers.SerializerMethodField()
@@ -252,9 +339,71 @@ class TopicSerializer(serializers.ModelSerializer):
         return 'open'
 
     def get_is_selected(self, obj):
+        # list/detail views annotate `is_selected` via topic_queryset(); avoid a query per topic
+        annotated = getattr(obj, 'is_selected', None)
+        if annotated is not None:
+            return bool(annotated)
         request = self.context.get('request')
         if not request or not request.user.is_authenticated:
             return False
         user = request.user
         # student selected this topic?
         return TopicSelection.objects.filter(topic=obj, student=user).exists()
+
+
+class AllocationRoundSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = AllocationRound
+        fields = ('id', 'name', 'opens_at', 'closes_at', 'max_preferences', 'allocated_at')
+
+
+class TopicPreferenceSubmitSerializer(serializers.Serializer):
+    """按志愿顺序提交的课题 id 列表，第一个为第一志愿；提交即整体替换原有志愿。"""
+    topics = serializers.ListField(child=serializers.IntegerField(), allow_empty=True)
+
+    def validate_topics(self, value):
+        round = self.context['round']
+        if len(value) > round.max_preferences:
+            raise serializers.ValidationError(f'最多填报 {round.max_preferences} 个志愿')
+        if len(set(value)) != len(value):
+            raise serializers.ValidationError('志愿中不能有重复的课题')
+        missing = set(value) - set(Topic.objects.filter(pk__in=value).values_list('id', flat=True))
+        if missing:
+            raise serializers.ValidationError(f'课题不存在: {sorted(missing)}')
+        return value
+
+
+class UploadSessionSerializer(serializers.ModelSerializer):
+    offset = serializers.IntegerField(source='received', read_only=True)
+
+    class Meta:
+        model = UploadSession
+        fields = ('id', 'kind', 'filename', 'size', 'offset', 'crc32', 'status', 'object_id', 'created_at', 'updated_at')
+        read_only_fields = fields
+
+
+class UploadStartSerializer(serializers.Serializer):
+    """开始分块上传：文件信息 + 完成时要写入提交记录的字段（title / stage / version）"""
+    kind = serializers.ChoiceField(choices=UploadSession.KIND_CHOICES)
+    filename = serializers.CharField(max_length=255)
+    size = serializers.IntegerField(min_value=1)
+    title = serializers.CharField(max_length=255, required=False)
+    stage = serializers.CharField(max_length=30, required=False)
+    version = serializers.CharField(max_length=50, required=False)
+
+    def validate(self, attrs):
+        metadata = {name: attrs[name] for name in ('title', 'stage', 'version') if name in attrs}
+        # 先用对应提交类型的序列化器校验其余字段，避免传完大文件才发现字段不合法
+        target = SUBMISSION_SERIALIZERS[attrs['kind']](data=metadata, partial=True)
+        target.is_valid(raise_exception=True)
+        if attrs['kind'] == 'thesis' and 'title' not in metadata:
+            raise serializers.ValidationError({'title': 'This field is required.'})
+        attrs['metadata'] = metadata
+        return attrs
+
+
+SUBMISSION_SERIALIZERS = {
+    'thesis': ThesisSerializer,
+    'proposal': ProposalSerializer,
+    'midterm': MidtermCheckSerializer,
+}
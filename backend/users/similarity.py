@@ -0,0 +1,130 @@
+"""论文与开题报告的近似重复检测。
+
+两两比较全文是平方复杂度，这里用 MinHash + LSH（算法见 users.minhash）：
+
+* 每份提取出全文的论文 / 开题报告（``SubmissionMetadata.text``）存一份签名
+  （``SimilaritySignature``）和 ``bands`` 个桶键（``LSHBucket``，key 上有索引）；
+* 查询时只取与目标共享桶键的候选文档，比较签名估计 Jaccard 相似度，只为前 k 个加载提交记录；
+* 上传后处理（users.processing）完成时增量写入；生成参数变化或首次启用时用
+  ``reindex_similarity`` 多进程重建。
+
+参数见 ``settings.SIMILARITY_INDEX``。默认每份签名 192 个值、64 段 × 3 行，相似度为 J 的文档成为
+候选的概率是 1 - (1 - J³)^64：
+
+    J      0.05   0.1    0.15   0.2    0.3    0.33   0.4    0.5
+    概率   0.8%   6%     20%    40%    83%    91%    98.5%  ~100%
+
+阈值约在 0.25。共用学校模板的论文之间 J 约 0.1，约 6% 会成为候选，所以候选集仍随库的规模线性增长
+（大约是库的 6%，加上真正相近的文档）。段数越少、每段行数越多，曲线越陡、阈值越高。
+"""
+import multiprocessing
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+
+from . import minhash
+from .models import LSHBucket, SimilaritySignature, SubmissionMetadata
+
+
+DEFAULTS = {
+    'SHINGLE_SIZE': 5,   # 分片字符数
+    'NUM_PERM': 192,     # 签名长度
+    'BANDS': 64,         # LSH 段数，须整除 NUM_PERM；每段 NUM_PERM / BANDS 行
+}
+# 参与查重的提交类型（SubmissionMetadata 上的外键名）
+KINDS = ('thesis', 'proposal')
+
+
+def get_config():
+    return {**DEFAULTS, **getattr(settings, 'SIMILARITY_INDEX', {})}
+
+
+def params():
+    config = get_config()
+    return config['SHINGLE_SIZE'], config['NUM_PERM'], config['BANDS']
+
+
+def indexable():
+    return SubmissionMetadata.objects.filter(status='done').filter(
+        Q(thesis__isnull=False) | Q(proposal__isnull=False)
+    ).exclude(text='')
+
+
+def _store(results):
+    """写入 ``{metadata_id: minhash.compute 的结果}``，覆盖旧签名；结果为 ``None`` 的只删除。"""
+    with transaction.atomic():
+        SimilaritySignature.objects.filter(pk__in=list(results)).delete()
+        signatures, buckets = [], []
+        for pk, result in results.items():
+            if result is None:
+                continue
+            data, count, keys = result
+            signatures.append(SimilaritySignature(metadata_id=pk, signature=data, shingle_count=count))
+            buckets.extend(LSHBucket(signature_id=pk, key=key) for key in keys)
+        SimilaritySignature.objects.bulk_create(signatures)
+        LSHBucket.objects.bulk_create(buckets, batch_size=2000)
+    return len(signatures)
+
+
+def index(meta):
+    """为一份处理完成的提交（增量）建立索引，返回是否写入了签名。"""
+    if not (meta.thesis_id or meta.proposal_id):
+        return False
+    return bool(_store({meta.pk: minhash.compute(meta.text, *params())}))
+
+
+def similar(meta, k=10, exclude_student_id=None):
+    """与 ``meta`` 最相似的至多 ``k`` 份文档，返回 ``[(估计相似度, SubmissionMetadata), ...]``；
+    ``meta`` 还没有签名时返回 ``None``。"""
+    own = SimilaritySignature.objects.filter(pk=meta.pk).values_list('signature', flat=True).first()
+    if own is None:
+        return None
+    target = minhash.from_bytes(own)
+    candidates = (
+        LSHBucket.objects.filter(key__in=LSHBucket.objects.filter(signature_id=meta.pk).values('key'))
+        .exclude(signature_id=meta.pk).values('signature_id').distinct()
+    )
+    rows = SimilaritySignature.objects.filter(pk__in=candidates)
+    if exclude_student_id is not None:
+        rows = rows.exclude(metadata__thesis__student_id=exclude_student_id).exclude(
+            metadata__proposal__student_id=exclude_student_id
+        )
+    scored = [(minhash.estimate(target, minhash.from_bytes(signature)), pk)
+              for pk, signature in rows.values_list('pk', 'signature')]
+    scored.sort(key=lambda item: item[0], reverse=True)
+    top = [item for item in scored[:k] if item[0] > 0]
+    metas = (
+        SubmissionMetadata.objects.select_related('thesis__student', 'proposal__student').defer('text')
+        .in_bulk([pk for _, pk in top])
+    )
+    return [(score, metas[pk]) for score, pk in top if pk in metas]
+
+
+def reindex(workers=None, batch_size=500):
+    """重建全部签名：分批读全文，交给 ``workers`` 个进程计算，边算下一批边写上一批。返回写入数。"""
+    size, num_perm, bands = params()
+    pks = list(indexable().order_by('pk').values_list('pk', flat=True))
+    SimilaritySignature.objects.exclude(pk__in=indexable().values('pk')).delete()
+
+    def jobs(batch):
+        texts = indexable().filter(pk__in=batch).values_list('pk', 'text')
+        return [(pk, text, size, num_perm, bands) for pk, text in texts]
+
+    batches = [pks[i:i + batch_size] for i in range(0, len(pks), batch_size)]
+    written = 0
+    if not workers or workers <= 1:
+        for batch in batches:
+            written += _store(dict(map(minhash.compute_job, jobs(batch))))
+        return written
+
+    with multiprocessing.get_context('spawn').Pool(workers) as pool:
+        pending = None
+        for batch in batches:
+            result = pool.map_async(minhash.compute_job, jobs(batch), chunksize=8)
+            if pending is not None:
+                written += _store(dict(pending.get()))
+            pending = result
+        if pending is not None:
+            written += _store(dict(pending.get()))
+    return written
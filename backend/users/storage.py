@@ -0,0 +1,213 @@
+"""内容寻址、去重的文件存储。
+
+``ContentAddressedStorage`` 是 ``FileSystemStorage`` 的替代品，FileField 的用法与保存的
+文件名都不变（仍是 ``thesis/2026/05/论文.pdf`` 这样的名字），区别在于落盘方式：
+
+* 内容按 SHA-256 保存为 ``MEDIA_ROOT/blobs/ab/cd/<sha256>``，两级目录分片，单个目录不会堆积；
+* 文件名到内容的映射记在 ``StoredFile`` 表，``StoredBlob.refcount`` 为引用数。同一份 PDF
+  被开题、中期、多个论文版本重复上传时只占一份磁盘；
+* 删除文件名时引用数减一，归零才删除内容文件；
+* 表里没有记录的名字按普通文件处理，所以未迁移的旧文件照常可读，``rehome_media`` 命令负责
+  把它们搬进内容寻址目录。
+
+并发：引用计数只用条件 UPDATE 增减，内容文件的创建 / 删除都在持有该 blob 行锁的事务内
+完成（SQLite 下写事务本身串行），不会出现计数为正而文件已被删除的情况。文件名在
+``get_available_name()`` 之后被并发占用时换名重试。外层事务回滚会留下没有行的内容文件，
+``rehome_media --verify`` 负责清理。
+"""
+import hashlib
+import os
+import shutil
+import tempfile
+import time
+
+from django.core.files.move import file_move_safe
+from django.core.files.storage import FileSystemStorage
+from django.db import IntegrityError, transaction
+from django.db.models import F
+
+from .models import StoredBlob, StoredFile
+
+
+BLOB_DIR = 'blobs'
+READ_SIZE = 64 * 1024
+
+
+def blob_name(sha256):
+    return f'{BLOB_DIR}/{sha256[:2]}/{sha256[2:4]}/{sha256}'
+
+
+def hash_file(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for data in iter(lambda: f.read(READ_SIZE), b''):
+            digest.update(data)
+    return digest.hexdigest()
+
+
+class ContentAddressedStorage(FileSystemStorage):
+
+    def blob_path(self, sha256):
+        return super().path(blob_name(sha256))
+
+    def _stored(self, name):
+        return StoredFile.objects.filter(name=name).values_list('blob_id', flat=True).first()
+
+    # --- 写入 ---
+
+    def _spool(self, content):
+        """把上传内容写到 blobs/tmp 下的临时文件并计算哈希，返回 ``(临时路径, sha256, 大小)``。"""
+        tmp_dir = super().path(f'{BLOB_DIR}/tmp')
+        os.makedirs(tmp_dir, exist_ok=True)
+        digest = hashlib.sha256()
+        size = 0
+        if hasattr(content, 'temporary_file_path'):
+            # 已经落盘的上传文件（大文件上传、分块续传）：只读一遍算哈希，随后直接 rename
+            fd, tmp_path = tempfile.mkstemp(dir=tmp_dir)
+            os.close(fd)
+            file_move_safe(content.temporary_file_path(), tmp_path, allow_overwrite=True)
+            with open(tmp_path, 'rb') as f:
+                for data in iter(lambda: f.read(READ_SIZE), b''):
+                    digest.update(data)
+                    size += len(data)
+            return tmp_path, digest.hexdigest(), size
+
+        fd, tmp_path = tempfile.mkstemp(dir=tmp_dir)
+        with os.fdopen(fd, 'wb') as out:
+            if hasattr(content, 'seek'):
+                content.seek(0)
+            for data in content.chunks():
+                digest.update(data)
+                size += len(data)
+                out.write(data)
+        return tmp_path, digest.hexdigest(), size
+
+    def _reference(self, sha256, size):
+        """引用计数加一，没有这一内容的行时新建。须在事务内调用。"""
+        updated = StoredBlob.objects.filter(pk=sha256).update(refcount=F('refcount') + 1)
+        if not updated:
+            try:
+                with transaction.atomic():
+                    StoredBlob.objects.create(sha256=sha256, size=size, refcount=1)
+            except IntegrityError:
+                # 并发上传了同一内容，对方已建好行
+                StoredBlob.objects.filter(pk=sha256).update(refcount=F('refcount') + 1)
+
+    def _place(self, sha256, tmp_path):
+        """内容文件不存在时把临时文件移入，返回是否新增了内容文件。"""
+        path = self.blob_path(sha256)
+        if os.path.exists(path):
+            os.remove(tmp_path)
+            return False
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        os.replace(tmp_path, path)
+        if self.file_permissions_mode is not None:
+            os.chmod(path, self.file_permissions_mode)
+        return True
+
+    def _store(self, name, sha256, size, tmp_path):
+        """登记文件名并引用内容，返回是否新增了内容文件。
+
+        文件名行先插入、内容文件最后移入：名字冲突（``IntegrityError``）时事务回滚，磁盘上不会
+        留下没有 ``StoredBlob`` 行的内容文件。
+        """
+        with transaction.atomic():
+            self._reference(sha256, size)
+            StoredFile.objects.create(name=name, blob_id=sha256)
+            return self._place(sha256, tmp_path)
+
+    def _save(self, name, content):
+        tmp_path, sha256, size = self._spool(content)
+        try:
+            while True:
+                try:
+                    self._store(name, sha256, size, tmp_path)
+                    break
+                except IntegrityError:
+                    # get_available_name() 查过之后并发保存占用了同一名字（如截止前同月大量上传
+                    # thesis.pdf），与 FileSystemStorage._save 的 O_EXCL 循环一样换个名字重试
+                    name = self.get_available_name(name)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        return name
+
+    def adopt(self, name):
+        """把磁盘上已有的普通文件 ``name`` 收进内容寻址存储（rehome_media 使用），返回是否新增了内容。"""
+        legacy_path = super().path(name)
+        tmp_dir = super().path(f'{BLOB_DIR}/tmp')
+        os.makedirs(tmp_dir, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=tmp_dir)
+        os.close(fd)
+        shutil.copyfile(legacy_path, tmp_path)
+        sha256 = hash_file(tmp_path)
+        try:
+            created = self._store(name, sha256, os.path.getsize(tmp_path), tmp_path)
+        except IntegrityError:
+            # 另一个 rehome_media 进程已收录这个名字
+            created = False
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        try:
+            os.remove(legacy_path)
+        except FileNotFoundError:
+            pass
+        return created
+
+    def orphan_blobs(self, min_age=3600):
+        """``blobs/`` 下没有 ``StoredBlob`` 行的内容文件路径（外层事务回滚后遗留）。
+
+        只列出修改时间早于 ``min_age`` 秒的文件：刚移入、所在事务还没提交的内容文件不算。
+        """
+        root = super().path(BLOB_DIR)
+        cutoff = time.time() - min_age
+        candidates = {}
+        for directory, dirnames, filenames in os.walk(root):
+            if directory == root:
+                dirnames[:] = [d for d in dirnames if d != 'tmp']
+            for filename in filenames:
+                path = os.path.join(directory, filename)
+                if os.path.getmtime(path) < cutoff:
+                    candidates[filename] = path
+        known = set()
+        names = list(candidates)
+        for start in range(0, len(names), 500):
+            known.update(StoredBlob.objects.filter(pk__in=names[start:start + 500]).values_list('pk', flat=True))
+        return [path for sha256, path in sorted(candidates.items()) if sha256 not in known]
+
+    # --- 读取 ---
+
+    # FileSystemStorage 的 _open / size / get_modified_time 等都经由 path()，因此只需改写它
+
+    def path(self, name):
+        sha256 = self._stored(name)
+        if sha256 is None:
+            return super().path(name)
+        return self.blob_path(sha256)
+
+    def exists(self, name):
+        return StoredFile.objects.filter(name=name).exists() or super().exists(name)
+
+    # --- 删除 ---
+
+    def delete(self, name):
+        if not name:
+            raise ValueError('The name must be given to delete().')
+        if not self.release(name):
+            super().delete(name)
+
+    def release(self, name):
+        """释放内容寻址的文件名：引用数减一，归零时删除内容。``name`` 不在表中时返回 ``False``。"""
+        with transaction.atomic():
+            stored = StoredFile.objects.select_for_update().filter(name=name).first()
+            if stored is None:
+                return False
+            stored.delete()
+            StoredBlob.objects.filter(pk=stored.blob_id).update(refcount=F('refcount') - 1)
+            if StoredBlob.objects.filter(pk=stored.blob_id, refcount=0).delete()[0]:
+                try:
+                    os.remove(self.blob_path(stored.blob_id))
+                except FileNotFoundError:
+                    pass
+        return True
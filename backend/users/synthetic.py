@@ -0,0 +1,396 @@
+"""规模化的合成数据，用于压测与容量评估（``manage.py generate_data``）。
+
+与 ``seed_demo_data`` 的十几条演示数据不同，这里按参数生成接近生产规模的数据，分布参照真实学期：
+
+* 教师的课题数、课题的名额和热度都是偏态的（少数热门课题先被选满），约 88% 的学生选了课题；
+* 每个学生按开题 → 中期 → 论文一审 → 二审 → 终稿推进，评审结果约七成通过、两成要求修改、
+  一成不通过，未通过的重新提交（至多 ``versions`` 版），个人进度快慢不一，时间线截止到当前，
+  因此会有大量学生停在各个中间阶段、提交等待评审；
+* 文件大小服从对数正态分布（论文中位数约 3 MB）。每种提交只真正写入 ``blobs`` 份不同内容，
+  提交记录经内容寻址存储（users.storage）的 ``StoredFile`` 指向它们，下载、导出照常可用，
+  磁盘占用与学生数无关。
+
+所有行按批 ``executemany`` 写入（``insert_rows``），不触发逐行信号；信号原本维护的派生数据（Profile、搜索索引、
+教师范围、进度快照、课题已选人数）在写入时一并生成。学生按 ``batch_size`` 分块处理，内存占用与
+总规模无关。相同的 ``seed`` 生成相同的数据（时间均相对于运行时刻）。
+"""
+import hashlib
+import itertools
+import math
+import operator
+import os
+import random
+from collections import namedtuple
+from datetime import timedelta
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.files.storage import default_storage
+from django.core.management.color import no_style
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.db.models import F, Max
+from django.utils import timezone
+
+from . import scope
+from .models import (
+    MidtermCheck, MidtermReview, Profile, Proposal, ProposalReview, StoredBlob, StoredFile, SubmissionMetadata,
+    TeacherStudent, Thesis, ThesisReview, Topic, TopicSelection,
+)
+from .progress import refresh_many
+from .search import index_users
+
+
+SURNAMES = '王李张刘陈杨黄赵吴周徐孙马朱胡郭何高林罗郑梁谢宋唐许韩冯邓曹彭曾肖田董袁潘于蒋蔡余杜叶程苏魏吕丁任沈'
+GIVEN = '伟芳娜敏静丽强磊军洋勇艳杰娟涛明超秀霞平刚桂英华玉萍红娥玲芬燕彬鑫宇浩然子涵欣怡梓轩思雨晨阳佳琪博文诗雅一'
+TECHNIQUES = ('深度学习', '知识图谱', '区块链', '微服务', '强化学习', '联邦学习', '图神经网络', '大语言模型',
+              '边缘计算', '数字孪生', '计算机视觉', '时序预测')
+DOMAINS = ('校园二手交易', '医学影像分析', '智能问答', '交通流量预测', '个性化推荐', '课程评价', '网络异常检测',
+           '工业质检', '农作物病害识别', '舆情分析', '实验室预约', '图书馆座位管理')
+SUFFIXES = ('系统设计与实现', '方法研究', '平台开发', '算法优化')
+FEEDBACK = {
+    'pass': ('结构完整，论证充分。', '工作量饱满，同意进入下一阶段。', '整体良好，注意格式规范。'),
+    'revise': ('实验部分需补充对比数据。', '相关工作综述不足，请修改后重新提交。', '章节结构需调整。'),
+    'fail': ('研究内容与选题不符。', '工作量明显不足。', '核心方法存在明显错误。'),
+}
+RESULTS = (('pass', 0.72), ('revise', 0.2), ('fail', 0.08))
+SCORES = {'pass': (84, 6, 60, 100), 'revise': (72, 7, 50, 89), 'fail': (52, 8, 0, 59)}
+# (提交类型, 论文阶段, 进入该阶段的概率, 页数范围)
+STAGES = (
+    ('proposal', None, 0.97, (8, 20)),
+    ('midterm', None, 0.95, (10, 25)),
+    ('thesis', 'first_review', 0.95, (35, 90)),
+    ('thesis', 'second_review', 0.95, (35, 90)),
+    ('thesis', 'final_submission', 0.95, (35, 90)),
+)
+THESIS_STATUS = {
+    ('first_review', None): 'first_review', ('first_review', 'pass'): 'first_pass',
+    ('second_review', None): 'second_review', ('second_review', 'pass'): 'second_pass',
+    ('final_submission', None): 'final',
+}
+# 文件大小：对数正态分布的中位数（字节）与 sigma
+FILE_SIZES = {'proposal': (800_000, 0.7), 'midterm': (1_000_000, 0.7), 'thesis': (3_000_000, 0.6)}
+SELECTION_RATE = 0.88
+SEMESTER_DAYS = 200
+
+
+class GeneratorError(ValueError):
+    pass
+
+
+# 搜索索引只用到这几个属性，不必构造 User 实例
+Account = namedtuple('Account', 'pk username first_name last_name')
+# 这些类型的值原样交给数据库驱动，其余字段经 get_db_prep_save 转换
+PASSTHROUGH_TYPES = {
+    'CharField', 'TextField', 'FileField', 'IntegerField', 'BigIntegerField', 'SmallIntegerField',
+    'PositiveIntegerField', 'PositiveSmallIntegerField', 'ForeignKey', 'OneToOneField', 'AutoField', 'BigAutoField',
+}
+
+
+def insert_rows(model, rows, using=DEFAULT_DB_ALIAS):
+    """不构造模型实例的批量插入：``rows`` 为 ``{attname: 值}``，未给出的字段取模型默认值
+    （``auto_now`` / ``auto_now_add`` 取当前时间）。行里带主键时按给出的主键写入。
+
+    几十万行时 ``bulk_create`` 的大半时间花在逐行实例化模型、``pre_save`` 和编译 SQL 上；这里
+    每个字段的转换函数只确定一次，整批一条 ``executemany``。
+    """
+    if not rows:
+        return
+    connection = connections[using]
+    opts = model._meta
+    now = timezone.now()
+    fields = [field for field in opts.concrete_fields if field is not opts.auto_field or field.attname in rows[0]]
+    defaults, converters = {}, []
+    for index, field in enumerate(fields):
+        auto = getattr(field, 'auto_now', False) or getattr(field, 'auto_now_add', False)
+        defaults[field.attname] = now if auto else field.get_default()
+        kind = field.get_internal_type()
+        if kind == 'DateTimeField':
+            # 生成的时间都带时区，省掉 get_prep_value 里的时区检查
+            converters.append((index, lambda value: connection.ops.adapt_datetimefield_value(value)))
+        elif kind not in PASSTHROUGH_TYPES:
+            converters.append((index, lambda value, field=field: field.get_db_prep_save(value, connection)))
+    getter = operator.itemgetter(*defaults)
+    params = []
+    for row in rows:
+        values = list(getter({**defaults, **row}))
+        for index, convert in converters:
+            values[index] = convert(values[index])
+        params.append(values)
+    qn = connection.ops.quote_name
+    sql = (
+        f'INSERT INTO {qn(opts.db_table)} ({", ".join(qn(field.column) for field in fields)}) '
+        f'VALUES ({", ".join(["%s"] * len(fields))})'
+    )
+    with connection.cursor() as cursor:
+        cursor.executemany(sql, params)
+
+
+class Generator:
+    # 由生成器分配主键的表（其余表的主键由数据库生成）
+    ID_MODELS = (User, Topic, Proposal, MidtermCheck, Thesis)
+
+    def __init__(self, students, teachers, topics, versions=4, seed=0, prefix='syn', password='miku1314',
+                 blobs=8, max_file_mb=30, batch_size=5000, admins=2, progress=None):
+        if teachers < 1 or topics < 1 or students < 0 or versions < 1 or admins < 0:
+            raise GeneratorError('教师、课题数和版本数至少为 1')
+        self.students, self.teachers, self.topics, self.versions = students, teachers, topics, versions
+        self.admins = admins
+        self.prefix, self.blobs, self.batch_size = prefix, blobs, batch_size
+        self.max_file_size = max_file_mb * 1024 * 1024
+        self.rng = random.Random(seed)
+        self.password = make_password(password)
+        self.now = timezone.now()
+        self.start = self.now - timedelta(days=SEMESTER_DAYS)
+        self.progress = progress
+        self.counts = dict.fromkeys(
+            ('admins', 'teachers', 'students', 'topics', 'selections', 'proposals', 'midterms', 'theses', 'reviews',
+             'files'), 0)
+
+    # -- 基础工具 -------------------------------------------------------------
+
+    def days(self, low, high):
+        return timedelta(days=self.rng.uniform(low, high))
+
+    def name(self):
+        return self.rng.choice(SURNAMES) + ''.join(self.rng.choices(GIVEN, k=self.rng.choice((1, 2, 2))))
+
+    def score(self, result):
+        mean, sd, low, high = SCORES[result]
+        return max(low, min(high, round(self.rng.gauss(mean, sd))))
+
+    def allocate(self, model, count):
+        """为 ``model`` 预留 ``count`` 个连续主键。"""
+        first = self.next_id[model]
+        self.next_id[model] = first + count
+        return range(first, first + count)
+
+    def make_users(self, role, numbers, letter):
+        numbers = list(numbers)
+        users = [
+            {'id': pk, 'username': f'{self.prefix}-{letter}{n:06d}', 'first_name': self.name(),
+             'email': f'{self.prefix}-{letter}{n:06d}@example.edu', 'password': self.password,
+             'date_joined': self.start - self.days(0, 30)}
+            for pk, n in zip(self.allocate(User, len(numbers)), numbers)
+        ]
+        insert_rows(User, users)
+        insert_rows(Profile, [{'user_id': user['id'], 'role': role} for user in users])
+        index_users([Account(user['id'], user['username'], user['first_name'], '') for user in users])
+        return users
+
+    # -- 文件 -----------------------------------------------------------------
+
+    def make_blobs(self):
+        """每种提交写入 ``blobs`` 份内容，返回 ``{kind: [(sha256, size), ...]}``。"""
+        if not hasattr(default_storage, 'blob_path'):
+            raise GeneratorError('生成文件需要内容寻址存储（users.storage.ContentAddressedStorage）')
+        pools = {}
+        for kind, (median, sigma) in FILE_SIZES.items():
+            pool = []
+            for _ in range(self.blobs):
+                size = min(self.max_file_size, max(20_000, int(self.rng.lognormvariate(math.log(median), sigma))))
+                data = b'%PDF-1.4\n%' + self.rng.randbytes(size - 10)
+                sha256 = hashlib.sha256(data).hexdigest()
+                path = default_storage.blob_path(sha256)
+                if not os.path.exists(path):
+                    os.makedirs(os.path.dirname(path), exist_ok=True)
+                    with open(path, 'wb') as f:
+                        f.write(data)
+                pool.append((sha256, size))
+            StoredBlob.objects.bulk_create(
+                [StoredBlob(sha256=sha256, size=size, refcount=0) for sha256, size in pool], ignore_conflicts=True,
+            )
+            pools[kind] = pool
+        return pools
+
+    # -- 课题与选题 -----------------------------------------------------------
+
+    def make_topics(self, teachers):
+        """课题数按教师偏态分布，名额总量约为选题人数的 1.15 倍，热度按 Zipf 分布。"""
+        teacher_weights = [self.rng.lognormvariate(0, 0.8) for _ in teachers]
+        owners = self.rng.choices(teachers, weights=teacher_weights, k=self.topics)
+        mean_capacity = max(1.0, self.students * SELECTION_RATE * 1.15 / self.topics)
+        topics = []
+        for pk, owner in zip(self.allocate(Topic, self.topics), owners):
+            created_at = self.start - self.days(0, 30)
+            topics.append({
+                'id': pk, 'teacher_id': owner['id'],
+                'title': f'基于{self.rng.choice(TECHNIQUES)}的{self.rng.choice(DOMAINS)}{self.rng.choice(SUFFIXES)}',
+                'type': self.rng.choice(Topic.TYPE_CHOICES)[0],
+                'difficulty': self.rng.choices(Topic.DIFFICULTY_CHOICES, weights=(3, 5, 2))[0][0],
+                'max_students': max(1, round(self.rng.gammavariate(4, mean_capacity / 4))),
+                'description': '课题的研究背景、目标与预期成果。',
+                'requirements': '具备基础编程能力，认真负责。',
+                'created_at': created_at, 'updated_at': created_at,
+            })
+        popularity = list(range(1, self.topics + 1))
+        self.rng.shuffle(popularity)
+        self.topic_weights = list(itertools.accumulate(1 / rank ** 0.8 for rank in popularity))
+        return topics
+
+    def assign_topics(self, topics):
+        """为每个学生（按序号）选定课题下标或 ``None``，并据此填好 ``selected_students``。"""
+        remaining = [topic['max_students'] for topic in topics]
+        open_topics = list(range(len(topics)))
+        assignment = []
+        for _ in range(self.students):
+            choice = None
+            if open_topics and self.rng.random() < SELECTION_RATE:
+                for index in self.rng.choices(range(len(topics)), cum_weights=self.topic_weights, k=4):
+                    if remaining[index]:
+                        choice = index
+                        break
+                else:
+                    # 热门课题已满，随机退到仍有名额的课题（已满的顺手移出候选列表）
+                    while open_topics:
+                        position = self.rng.randrange(len(open_topics))
+                        if remaining[open_topics[position]]:
+                            choice = open_topics[position]
+                            break
+                        open_topics[position] = open_topics[-1]
+                        open_topics.pop()
+                if choice is not None:
+                    remaining[choice] -= 1
+            assignment.append(choice)
+        for topic, left in zip(topics, remaining):
+            topic['selected_students'] = topic['max_students'] - left
+        return assignment
+
+    # -- 学生进度 -------------------------------------------------------------
+
+    def timeline(self, selected_at):
+        """模拟一个学生的提交与评审：``[(kind, stage, version, submitted_at, (result, reviewed_at) | None)]``。"""
+        events = []
+        pace = self.rng.lognormvariate(0, 0.3)
+        t = selected_at
+        for kind, stage, rate, _ in STAGES:
+            if self.rng.random() > rate:
+                break
+            t += self.days(10, 30) * pace
+            for version in range(1, self.versions + 1):
+                if t > self.now:
+                    return events
+                if stage == 'final_submission':
+                    events.append((kind, stage, version, t, None))
+                    return events
+                reviewed_at = t + self.days(1, 10)
+                if reviewed_at > self.now or self.rng.random() < 0.05:
+                    events.append((kind, stage, version, t, None))
+                    return events
+                result = self.rng.choices([r for r, _ in RESULTS], weights=[w for _, w in RESULTS])[0]
+                events.append((kind, stage, version, t, (result, reviewed_at)))
+                if result == 'pass':
+                    t = reviewed_at
+                    break
+                if version == self.versions or self.rng.random() < 0.1:
+                    return events
+                t = reviewed_at + self.days(2, 10) * pace
+            else:
+                return events
+        return events
+
+    def make_students(self, first, count, assignment, topics, teachers, pools):
+        students = self.make_users('student', range(first + 1, first + count + 1), 's')
+        selections, scopes = [], []
+        submissions = {'proposal': [], 'midterm': [], 'thesis': []}
+        for number, student in enumerate(students, start=first):
+            index = assignment[number]
+            if index is None:
+                continue
+            topic = topics[index]
+            selected_at = topic['created_at'] + self.days(1, 20)
+            selections.append({'topic_id': topic['id'], 'student_id': student['id'], 'selected_at': selected_at})
+            scopes.append({'teacher_id': topic['teacher_id'], 'student_id': student['id']})
+            for kind, stage, version, submitted_at, review in self.timeline(selected_at):
+                reviewer = topic['teacher_id'] if self.rng.random() < 0.85 else self.rng.choice(teachers)['id']
+                submissions[kind].append((student, topic, stage, version, submitted_at, review, reviewer))
+
+        insert_rows(TopicSelection, selections)
+        insert_rows(TeacherStudent, scopes)
+        self.counts['selections'] += len(selections)
+        self.make_submissions(submissions, pools)
+        refresh_many([student['id'] for student in students], batch_size=len(students))
+        self.counts['students'] += len(students)
+
+    def make_submissions(self, submissions, pools):
+        models = {'proposal': Proposal, 'midterm': MidtermCheck, 'thesis': Thesis}
+        review_models = {'proposal': ProposalReview, 'midterm': MidtermReview, 'thesis': ThesisReview}
+        counters = {'proposal': 'proposals', 'midterm': 'midterms', 'thesis': 'theses'}
+        files, metadata, refs = [], [], {}
+        for kind, rows in submissions.items():
+            objects, reviews = [], []
+            pages = next(p for k, _, _, p in STAGES if k == kind)
+            for pk, (student, topic, stage, version, submitted_at, review, reviewer) in zip(
+                    self.allocate(models[kind], len(rows)), rows):
+                name = f'{kind}/{submitted_at:%Y/%m}/{student["username"]}_{stage or kind}_v{version}.pdf'
+                row = {'id': pk, 'student_id': student['id'], 'file': name, 'submitted_at': submitted_at,
+                       'updated_at': review[1] if review else submitted_at}
+                if kind == 'thesis':
+                    result = review[0] if review else None
+                    row.update(
+                        title=topic['title'], stage=stage, version=f'v{version}',
+                        status=THESIS_STATUS.get((stage, result), f'{stage.split("_")[0]}_fail'),
+                    )
+                objects.append(row)
+
+                sha256, size = self.rng.choice(pools[kind])
+                refs[sha256] = refs.get(sha256, 0) + 1
+                files.append({'name': name, 'blob_id': sha256, 'created_at': submitted_at})
+                metadata.append({
+                    f'{kind}_id': pk, 'file_name': name, 'status': 'done', 'size': size, 'sha256': sha256,
+                    'page_count': self.rng.randint(*pages), 'processed_at': submitted_at + timedelta(minutes=1),
+                })
+                if review is None:
+                    continue
+                result, reviewed_at = review
+                fields = {f'{kind}_id': pk, 'reviewer_id': reviewer, 'result': result, 'score': self.score(result),
+                          'feedback': self.rng.choice(FEEDBACK[result]), 'reviewed_at': reviewed_at}
+                if kind == 'thesis':
+                    fields['stage'] = stage
+                reviews.append(fields)
+            insert_rows(models[kind], objects)
+            insert_rows(review_models[kind], reviews)
+            self.counts[counters[kind]] += len(objects)
+            self.counts['reviews'] += len(reviews)
+
+        # 引用计数与本批文件记录同一事务提交，中途中断也不会留下计数为 0 却仍被引用的内容
+        insert_rows(StoredFile, files)
+        for sha256, count in refs.items():
+            StoredBlob.objects.filter(pk=sha256).update(refcount=F('refcount') + count)
+        insert_rows(SubmissionMetadata, metadata)
+        self.counts['files'] += len(files)
+
+    # -- 入口 -----------------------------------------------------------------
+
+    def run(self):
+        if User.objects.filter(username__startswith=f'{self.prefix}-').exists():
+            raise GeneratorError(f'已存在前缀为 {self.prefix}- 的账号，请换一个 --prefix 或先清空数据库')
+        self.next_id = {model: (model.objects.aggregate(top=Max('pk'))['top'] or 0) + 1 for model in self.ID_MODELS}
+        pools = self.make_blobs()
+        with transaction.atomic():
+            self.counts['admins'] = len(self.make_users('admin', range(1, self.admins + 1), 'a'))
+            teachers = self.make_users('teacher', range(1, self.teachers + 1), 't')
+            self.counts['teachers'] = len(teachers)
+            topics = self.make_topics(teachers)
+            assignment = self.assign_topics(topics)
+            insert_rows(Topic, topics)
+            self.counts['topics'] = len(topics)
+        for first in range(0, self.students, self.batch_size):
+            count = min(self.batch_size, self.students - first)
+            with transaction.atomic():
+                self.make_students(first, count, assignment, topics, teachers, pools)
+            if self.progress is not None:
+                self.progress(first + count, self.students)
+
+        with transaction.atomic():
+            # 主键由这里分配，写完后把数据库序列推到最大值之后（PostgreSQL 需要，SQLite 为空操作）
+            connection = connections[DEFAULT_DB_ALIAS]
+            with connection.cursor() as cursor:
+                for sql in connection.ops.sequence_reset_sql(no_style(), self.ID_MODELS):
+                    cursor.execute(sql)
+        scope.invalidate()
+        return self.counts
+
+
+def generate(students, teachers, topics, **options):
+    """生成一套合成数据，返回各类记录的数量。参数见 ``Generator``。"""
+    return Generator(students, teachers, topics, **options).run()
@@ -0,0 +1,9 @@
+from django.contrib.auth.models import User
+
+
+def make_user(username, role, **extra):
+    # no password: skipping the PBKDF2 hash keeps the suite fast
+    user = User.objects.create_user(username=username, email=f'{username}@example.com', **extra)
+    user.profile.role = role
+    user.profile.save()
+    return user
@@ -0,0 +1,114 @@
+from datetime import timedelta
+from io import StringIO
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from users.allocation import allocate, serial_dictatorship
+from users.models import AllocationRound, StudentProgress, TeacherStudent, Topic, TopicPreference, TopicSelection
+from users.tests.helpers import make_user
+
+
+class SerialDictatorshipTest(TestCase):
+    def test_deterministic_and_respects_capacity(self):
+        preferences = {student_id: [1, 2, 3] for student_id in range(10)}
+        first = serial_dictatorship(preferences, {1: 2, 2: 3, 3: 1}, seed=7)
+        second = serial_dictatorship(preferences, {1: 2, 2: 3, 3: 1}, seed=7)
+        self.assertEqual(first, second)
+
+        assignment, unassigned = first
+        self.assertEqual(len(assignment), 6)
+        self.assertEqual(len(unassigned), 4)
+        per_topic = [topic_id for topic_id, _ in assignment.values()]
+        self.assertEqual((per_topic.count(1), per_topic.count(2), per_topic.count(3)), (2, 3, 1))
+
+    def test_everyone_gets_best_available_choice(self):
+        # 名额足够时每个学生都拿到第一志愿
+        assignment, unassigned = serial_dictatorship({1: [10, 11], 2: [11, 10]}, {10: 1, 11: 1}, seed=0)
+        self.assertEqual(assignment, {1: (10, 1), 2: (11, 1)})
+        self.assertEqual(unassigned, [])
+
+
+class AllocationRoundTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        now = timezone.now()
+        self.round = AllocationRound.objects.create(
+            name='2026 春季', opens_at=now - timedelta(days=1), closes_at=now + timedelta(days=1),
+            max_preferences=3, seed=42,
+        )
+        self.teacher = make_user('t400', 'teacher')
+        self.topics = [
+            Topic.objects.create(teacher=self.teacher, title=f'课题{i}', max_students=2) for i in range(3)
+        ]
+        self.students = [make_user(f's40{i}', 'student') for i in range(6)]
+
+    def submit(self, student, topics):
+        self.client.force_authenticate(user=student)
+        return self.client.put('/api/auth/topics/preferences/', {'topics': topics}, format='json')
+
+    def test_submit_and_replace_preferences(self):
+        ids = [t.pk for t in self.topics]
+        resp = self.submit(self.students[0], ids)
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        self.assertEqual([p['topic_id'] for p in resp.data['topics']], ids)
+
+        resp = self.submit(self.students[0], ids[::-1][:2])
+        self.assertEqual([p['rank'] for p in resp.data['topics']], [1, 2])
+        self.assertEqual(TopicPreference.objects.filter(student=self.students[0]).count(), 2)
+
+        self.assertEqual(self.submit(self.students[0], [ids[0], ids[0]]).status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.submit(self.students[0], ids + [9999]).status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_first_come_first_served_is_closed_during_round(self):
+        self.client.force_authenticate(user=self.students[0])
+        resp = self.client.post(f'/api/auth/topics/{self.topics[0].pk}/select/')
+        self.assertEqual(resp.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(TopicSelection.objects.exists())
+
+    def test_allocation_writes_selections_counters_and_snapshots(self):
+        hot, warm, cold = self.topics
+        for student in self.students:
+            self.submit(student, [hot.pk, warm.pk, cold.pk])
+        # 已经选过题的学生不参与分配，也不占用额外名额
+        TopicSelection.objects.create(topic=cold, student=self.students[5])
+        Topic.objects.filter(pk=cold.pk).update(selected_students=1)
+
+        stats = allocate(self.round)
+        self.assertEqual(stats['skipped'], 1)
+        self.assertEqual(stats['assigned'], 5)
+        self.assertEqual(stats['ranks'], {1: 2, 2: 2, 3: 1})
+
+        counts = dict(Topic.objects.values_list('id', 'selected_students'))
+        self.assertEqual(counts, {hot.pk: 2, warm.pk: 2, cold.pk: 2})
+        for topic in self.topics:
+            self.assertEqual(topic.selections.count(), counts[topic.pk])
+
+        self.round.refresh_from_db()
+        self.assertIsNotNone(self.round.allocated_at)
+        self.assertEqual(TeacherStudent.objects.filter(teacher=self.teacher).count(), 6)
+        snapshot = StudentProgress.objects.get(student=self.students[0]).data
+        self.assertEqual(snapshot['topic_selection']['status'], 'completed')
+
+    def test_same_seed_same_result(self):
+        for student in self.students:
+            self.submit(student, [t.pk for t in self.topics])
+        first = allocate(self.round, dry_run=True)
+        self.assertFalse(TopicSelection.objects.exists())
+        self.assertEqual(allocate(self.round, dry_run=True), first)
+
+    def test_command(self):
+        self.submit(self.students[0], [self.topics[0].pk])
+        with self.assertRaises(CommandError):
+            call_command('allocate_topics', stdout=StringIO())
+
+        out = StringIO()
+        call_command('allocate_topics', round=self.round.pk, force=True, stdout=out)
+        self.assertIn('分配完成', out.getvalue())
+        self.assertTrue(TopicSelection.objects.filter(student=self.students[0], topic=self.topics[0]).exists())
+        with self.assertRaises(CommandError):
+            call_command('allocate_topics', round=self.round.pk, force=True, stdout=StringIO())
@@ -93,3 +93,73 @@ class AuthAPITest(TestCase):
         self.assertEqual(resp2.status_code, status.HTTP_200_OK)
         token2 = resp2.data.get('token')
         self.assertEqual(token1, token2)
+
+
+class CachedTokenAuthenticationTest(TestCase):
+    def setUp(self):
+        from users import authentication
+        authentication.clear()
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='s900', email='s900@example.com', password='pass123')
+        self.token = Token.objects.create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+
+    def test_warm_cache_costs_no_queries(self):
+        # cold: one joined query for token + user + profile
+        with self.assertNumQueries(1):
+            resp = self.client.get('/api/auth/me/')
+        self.assertEqual(resp.data['user']['role'], 'student')
+        with self.assertNumQueries(0):
+            resp = self.client.get('/api/auth/me/')
+        self.assertEqual(resp.data['user']['student_id'], 's900')
+
+    def test_role_change_invalidates(self):
+        self.client.get('/api/auth/me/')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.profile.role = 'teacher'
+            self.user.profile.save()
+        self.assertEqual(self.client.get('/api/auth/me/').data['user']['role'], 'teacher')
+
+    def test_token_delete_and_deactivation(self):
+        self.client.get('/api/auth/me/')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.is_active = False
+            self.user.save()
+        self.assertEqual(self.client.get('/api/auth/me/').status_code, status.HTTP_401_UNAUTHORIZED)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.is_active = True
+            self.user.save()
+        self.assertEqual(self.client.get('/api/auth/me/').status_code, status.HTTP_200_OK)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.token.delete()
+        self.assertEqual(self.client.get('/api/auth/me/').status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_invalidated_after_commit(self):
+        self.client.get('/api/auth/me/')
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.user.is_active = False
+            self.user.save()
+            # 提交前不清除：否则并发请求会在提交前把旧状态重新缓存一个 TTL
+            with self.assertNumQueries(0):
+                self.client.get('/api/auth/me/')
+        for callback in callbacks:
+            callback()
+        self.assertEqual(self.client.get('/api/auth/me/').status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_shared_cache_backend(self):
+        from users import authentication
+        settings = {'SHARED_CACHE': 'default', 'TTL': 60}
+        with self.settings(TOKEN_AUTH_CACHE=settings,
+                           CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}):
+            self.client.get('/api/auth/me/')
+            # another process: empty local cache, warm shared cache
+            authentication.clear()
+            with self.assertNumQueries(0):
+                self.assertEqual(self.client.get('/api/auth/me/').status_code, status.HTTP_200_OK)
+
+            authentication.clear()
+            with self.captureOnCommitCallbacks(execute=True):
+                self.user.profile.role = 'admin'
+                self.user.profile.save()
+            self.assertEqual(self.client.get('/api/auth/me/').data['user']['role'], 'admin')
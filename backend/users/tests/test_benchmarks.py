@@ -0,0 +1,64 @@
+import json
+import os
+import shutil
+import tempfile
+from io import StringIO
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase
+
+from users import benchmarks
+from users.models import Thesis, ThesisReview, Topic
+
+
+class SerializerBenchmarkTest(TestCase):
+    def test_run_measures_and_rolls_back(self):
+        users = User.objects.count()
+        report = benchmarks.run(sizes=(2, 6), repeat=1, min_time=0)
+        results = report['benchmarks']
+        self.assertEqual((User.objects.count(), Thesis.objects.count(), Topic.objects.count()), (users, 0, 0))
+        self.assertEqual(ThesisReview.objects.count(), 0)
+
+        for kind in ('thesis', 'proposal', 'midterm', 'topic'):
+            small, large = results[f'serializer.{kind}[2]'], results[f'serializer.{kind}[6]']
+            self.assertEqual(large['rows'], 6)
+            # 预取计划生效时 SQL 条数与行数无关
+            self.assertEqual(small['queries'], large['queries'], kind)
+            self.assertGreater(large['peak_kb'], 0)
+            self.assertGreaterEqual(large['median_ms'], large['min_ms'])
+        # 已有快照时进度接口不重新计算
+        self.assertLess(results['view.student_progress']['queries'],
+                        results['view.student_progress[no snapshot]']['queries'])
+        json.dumps(report)
+
+        with self.assertRaises(benchmarks.BenchmarkError):
+            benchmarks.run(sizes=(2,), only='nothing-matches')
+
+    def test_compare_with_tolerance(self):
+        def report(min_ms, peak_kb, queries):
+            return {'benchmarks': {'serializer.thesis[10]': {'min_ms': min_ms, 'peak_kb': peak_kb, 'queries': queries}}}
+
+        rows = benchmarks.compare(report(10, 100, 2), report(11, 110, 2), tolerance=0.15)
+        self.assertFalse(any(regressed for *_, regressed in rows))
+        rows = benchmarks.compare(report(10, 100, 2), report(20, 400, 3), tolerance=0.15)
+        self.assertEqual([metric for _, metric, *_, regressed in rows if regressed], ['min_ms', 'peak_kb', 'queries'])
+
+    def test_command_baseline(self):
+        tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp)
+        path = os.path.join(tmp, 'baseline.json')
+        out = StringIO()
+        call_command('bench_serializers', sizes='3', only='thesis', repeat=1, min_time=0, output=path, stdout=out)
+        self.assertIn('serializer.thesis[3]', out.getvalue())
+        self.assertNotIn('serializer.topic[3]', out.getvalue())
+
+        with open(path, encoding='utf-8') as f:
+            baseline = json.load(f)
+        baseline['benchmarks']['serializer.thesis[3]']['queries'] = 0
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(baseline, f)
+        with self.assertRaises(CommandError):
+            call_command('bench_serializers', sizes='3', only='thesis', repeat=1, min_time=0, baseline=path,
+                         tolerance=100, fail_on_regression=True, stdout=StringIO())
@@ -0,0 +1,106 @@
+import os
+import shutil
+import tempfile
+from urllib.parse import urlparse
+
+from django.core.files.base import ContentFile
+from django.test import TestCase, override_settings
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from users import scope
+from users.models import Thesis, Topic, TopicSelection
+from users.tests.helpers import make_user
+
+
+class SubmissionDownloadTest(TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp)
+        settings = override_settings(MEDIA_ROOT=self.tmp, MEDIA_DOWNLOAD_BACKEND='python')
+        settings.enable()
+        self.addCleanup(settings.disable)
+        scope.invalidate()
+
+        self.client = APIClient()
+        self.student = make_user('s600', 'student')
+        self.teacher = make_user('t600', 'teacher')
+        self.other_teacher = make_user('t601', 'teacher')
+        topic = Topic.objects.create(teacher=self.teacher, title='课题')
+        TopicSelection.objects.create(topic=topic, student=self.student)
+
+        self.content = bytes(range(256)) * 40
+        self.thesis = Thesis(student=self.student, title='初稿', stage='first_review')
+        self.thesis.file.save('paper.pdf', ContentFile(self.content))
+        self.url = f'/api/auth/files/thesis/{self.thesis.pk}/'
+
+    def get(self, user, url=None, **headers):
+        self.client.force_authenticate(user=user)
+        return self.client.get(url or self.url, **headers)
+
+    def body(self, resp):
+        return b''.join(resp.streaming_content) if resp.streaming else resp.content
+
+    def test_full_download_and_conditional_requests(self):
+        resp = self.get(self.student)
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        self.assertEqual(self.body(resp), self.content)
+        self.assertEqual(resp['Accept-Ranges'], 'bytes')
+        self.assertEqual(resp['Content-Type'], 'application/pdf')
+
+        etag = resp['ETag']
+        self.assertEqual(self.get(self.student, HTTP_IF_NONE_MATCH=etag).status_code,
+                         status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(self.get(self.student, HTTP_IF_MODIFIED_SINCE=resp['Last-Modified']).status_code,
+                         status.HTTP_304_NOT_MODIFIED)
+
+    def test_range_requests(self):
+        resp = self.get(self.student, HTTP_RANGE='bytes=100-199')
+        self.assertEqual(resp.status_code, status.HTTP_206_PARTIAL_CONTENT)
+        self.assertEqual(resp['Content-Range'], f'bytes 100-199/{len(self.content)}')
+        self.assertEqual(self.body(resp), self.content[100:200])
+
+        resp = self.get(self.student, HTTP_RANGE='bytes=-10')
+        self.assertEqual(self.body(resp), self.content[-10:])
+        resp = self.get(self.student, HTTP_RANGE='bytes=10000-')
+        self.assertEqual(self.body(resp), self.content[10000:])
+
+        resp = self.get(self.student, HTTP_RANGE=f'bytes={len(self.content)}-')
+        self.assertEqual(resp.status_code, status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE)
+
+        # If-Range 与当前版本不符时返回整文件
+        resp = self.get(self.student, HTTP_RANGE='bytes=0-9', HTTP_IF_RANGE='"stale"')
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+
+    def test_permissions(self):
+        self.assertEqual(self.get(self.teacher).status_code, status.HTTP_200_OK)
+        self.assertEqual(self.get(self.other_teacher).status_code, status.HTTP_403_FORBIDDEN)
+        self.assertEqual(self.get(make_user('s601', 'student')).status_code, status.HTTP_403_FORBIDDEN)
+        self.assertEqual(self.get(make_user('a600', 'admin')).status_code, status.HTTP_200_OK)
+        self.client.force_authenticate(user=None)
+        self.assertEqual(self.client.get(self.url).status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_signed_url_from_serializer(self):
+        file_url = self.get(self.teacher, '/api/auth/thesis/all-theses/').data['results'][0]['file_url']
+        self.client.force_authenticate(user=None)
+        parsed = urlparse(file_url)
+        self.assertTrue(parsed.path.endswith('/paper.pdf'))
+        resp = self.client.get(f'{parsed.path}?{parsed.query}')
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        self.assertEqual(self.body(resp), self.content)
+
+        self.assertEqual(self.client.get(f'{parsed.path}?sig=bogus').status_code, status.HTTP_403_FORBIDDEN)
+        # 签名绑定了文件，不能挪用到别的记录
+        other = Thesis.objects.create(student=self.student, title='二稿', file='thesis/x.pdf')
+        resp = self.client.get(f'/api/auth/files/thesis/{other.pk}/?{parsed.query}')
+        self.assertEqual(resp.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_offloaded_modes(self):
+        with self.settings(MEDIA_DOWNLOAD_BACKEND='nginx', MEDIA_ACCEL_REDIRECT_PREFIX='/protected/'):
+            resp = self.get(self.student)
+            relative = os.path.relpath(self.thesis.file.path, self.tmp)
+            self.assertEqual(resp['X-Accel-Redirect'], '/protected/' + relative)
+            self.assertEqual(resp.content, b'')
+        with self.settings(MEDIA_DOWNLOAD_BACKEND='sendfile'):
+            resp = self.get(self.student)
+            self.assertEqual(resp['X-Sendfile'], self.thesis.file.path)
@@ -0,0 +1,134 @@
+import csv
+import io
+import os
+import shutil
+import tempfile
+import zipfile
+from datetime import timedelta
+from io import StringIO
+
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from users import scope
+from users.models import MidtermCheck, Proposal, ProposalReview, Thesis, ThesisReview, Topic, TopicSelection
+from users.tests.helpers import make_user
+
+
+class SubmissionExportTest(TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp)
+        settings = override_settings(MEDIA_ROOT=self.tmp)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        scope.invalidate()
+
+        self.client = APIClient()
+        self.admin = make_user('a800', 'admin')
+        self.teacher = make_user('t800', 'teacher')
+        self.other_teacher = make_user('t801', 'teacher')
+        self.student = make_user('s800', 'student')
+        self.other_student = make_user('s801', 'student')
+        TopicSelection.objects.create(topic=Topic.objects.create(teacher=self.teacher, title='甲'),
+                                      student=self.student)
+        TopicSelection.objects.create(topic=Topic.objects.create(teacher=self.other_teacher, title='乙'),
+                                      student=self.other_student)
+
+        self.thesis = Thesis(student=self.student, title='初稿', stage='first_review')
+        self.thesis.file.save('paper.pdf', ContentFile(b'%PDF thesis'))
+        ThesisReview.objects.create(thesis=self.thesis, reviewer=self.teacher, stage='first_review',
+                                    result='revise', score=70, feedback='补充实验')
+        ThesisReview.objects.create(thesis=self.thesis, reviewer=self.teacher, stage='first_review',
+                                    result='pass', score=85, feedback='通过')
+        self.proposal = Proposal(student=self.other_student)
+        self.proposal.file.save('proposal.pdf', ContentFile(b'%PDF proposal'))
+        ProposalReview.objects.create(proposal=self.proposal, reviewer=self.other_teacher, result='pass', score=90)
+        MidtermCheck.objects.create(student=self.student)  # 没有文件
+
+    def download(self, user, query=''):
+        self.client.force_authenticate(user=user)
+        resp = self.client.get(f'/api/auth/export/submissions/{query}')
+        if resp.status_code != status.HTTP_200_OK:
+            return resp, None
+        return resp, zipfile.ZipFile(io.BytesIO(b''.join(resp.streaming_content)))
+
+    def rows(self, archive, name):
+        return list(csv.DictReader(io.StringIO(archive.read(name).decode('utf-8-sig'))))
+
+    def test_admin_exports_everything(self):
+        resp, archive = self.download(self.admin)
+        self.assertEqual(resp['Content-Type'], 'application/zip')
+        self.assertIn('attachment;', resp['Content-Disposition'])
+        self.assertIsNone(archive.testzip())
+
+        names = archive.namelist()
+        self.assertEqual(names[:2], ['manifest.csv', 'reviews.csv'])
+        thesis_name = f'thesis/s800/{self.thesis.pk}_{os.path.basename(self.thesis.file.name)}'
+        self.assertIn(thesis_name, names)
+        self.assertEqual(archive.read(thesis_name), b'%PDF thesis')
+        self.assertEqual(len(names), 4)
+
+        manifest = {(row['kind'], row['id']): row for row in self.rows(archive, 'manifest.csv')}
+        self.assertEqual(len(manifest), 3)
+        thesis_row = manifest[('thesis', str(self.thesis.pk))]
+        self.assertEqual(thesis_row['file'], thesis_name)
+        self.assertEqual((thesis_row['review_count'], thesis_row['latest_result'], thesis_row['latest_score']),
+                         ('2', 'pass', '85'))
+        self.assertEqual(thesis_row['latest_reviewer'], 't800')
+        midterm_row = next(row for key, row in manifest.items() if key[0] == 'midterm')
+        self.assertEqual((midterm_row['file'], midterm_row['review_count']), ('', '0'))
+
+        reviews = self.rows(archive, 'reviews.csv')
+        self.assertEqual([r['score'] for r in reviews if r['kind'] == 'thesis'], ['70', '85'])
+        self.assertEqual(len(reviews), 3)
+
+    def test_filters(self):
+        _, archive = self.download(self.teacher)
+        self.assertEqual({row['student_id'] for row in self.rows(archive, 'manifest.csv')}, {'s800'})
+
+        _, archive = self.download(self.admin, '?teacher=t801&kind=proposal')
+        self.assertEqual([(r['kind'], r['student_id']) for r in self.rows(archive, 'manifest.csv')],
+                         [('proposal', 's801')])
+
+        _, archive = self.download(self.admin, '?kind=thesis&stage=final_submission')
+        self.assertEqual(self.rows(archive, 'manifest.csv'), [])
+        # 只给 stage 时只导出论文
+        _, archive = self.download(self.admin, '?stage=first_review')
+        self.assertEqual([r['kind'] for r in self.rows(archive, 'manifest.csv')], ['thesis'])
+        self.assertEqual(len(archive.namelist()), 3)
+
+        Thesis.objects.filter(pk=self.thesis.pk).update(submitted_at=timezone.now() - timedelta(days=30))
+        since = (timezone.localdate() - timedelta(days=7)).isoformat()
+        _, archive = self.download(self.admin, f'?since={since}')
+        self.assertNotIn('thesis', {row['kind'] for row in self.rows(archive, 'manifest.csv')})
+
+    def test_permissions_and_bad_filters(self):
+        self.assertEqual(self.download(self.student)[0].status_code, status.HTTP_403_FORBIDDEN)
+        self.assertEqual(self.download(self.teacher, '?teacher=t801')[0].status_code, status.HTTP_403_FORBIDDEN)
+        self.assertEqual(self.download(self.admin, '?kind=report')[0].status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.download(self.admin, '?since=yesterday')[0].status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.download(self.admin, '?kind=proposal&stage=first_review')[0].status_code,
+                         status.HTTP_400_BAD_REQUEST)
+
+    def test_missing_file_flagged_in_manifest(self):
+        os.remove(self.proposal.file.path)
+        _, archive = self.download(self.admin)
+        manifest = {row['kind']: row for row in self.rows(archive, 'manifest.csv')}
+        self.assertEqual((manifest['proposal']['file'], manifest['proposal']['file_status']), ('', 'missing'))
+        self.assertEqual(manifest['thesis']['file_status'], 'ok')
+        self.assertEqual(manifest['midterm']['file_status'], '')
+        self.assertEqual(len(archive.namelist()), 3)
+
+    def test_command_writes_zip(self):
+        path = os.path.join(self.tmp, 'out.zip')
+        out = StringIO()
+        call_command('export_submissions', path, kind=['thesis'], teacher='t800', stdout=out)
+        self.assertIn('已写入', out.getvalue())
+        with zipfile.ZipFile(path) as archive:
+            self.assertEqual(len(archive.namelist()), 3)
+            self.assertEqual(self.rows(archive, 'manifest.csv')[0]['title'], '初稿')
@@ -0,0 +1,85 @@
+import json
+import shutil
+import tempfile
+
+from django.core.files.base import ContentFile
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from users import scope
+from users.models import Thesis, ThesisReview
+from users.tests.helpers import make_user
+
+
+def timings(response):
+    """``{名称: (毫秒, desc)}``"""
+    result = {}
+    for part in response['Server-Timing'].split(', '):
+        name, *params = part.split(';')
+        values = dict(param.split('=', 1) for param in params)
+        result[name] = (float(values['dur']), values.get('desc', '').strip('"'))
+    return result
+
+
+class RequestTimingMiddlewareTest(TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp)
+        settings = override_settings(MEDIA_ROOT=self.tmp)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        scope.invalidate()
+
+        self.admin = make_user('a900', 'admin')
+        teacher = make_user('t900', 'teacher')
+        for n in range(3):
+            thesis = Thesis(student=make_user(f's90{n}', 'student'), title=f'论文{n}', stage='first_review')
+            thesis.file.save('paper.pdf', ContentFile(b'%PDF timing'))
+            ThesisReview.objects.create(thesis=thesis, reviewer=teacher, stage='first_review', result='pass')
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.admin)
+
+    def test_server_timing_and_log_line(self):
+        with self.assertLogs('users.instrumentation', 'INFO') as logs:
+            response = self.client.get('/api/auth/thesis/all-theses/')
+        self.assertEqual(response.status_code, 200)
+        parts = timings(response)
+        self.assertEqual(list(parts), ['db', 'serialize', 'render', 'total'])
+        self.assertRegex(parts['db'][1], r'^\d+ queries$')
+        self.assertGreater(parts['serialize'][0] + parts['render'][0], 0)
+        self.assertGreaterEqual(parts['total'][0], parts['db'][0])
+
+        record = json.loads(logs.records[-1].getMessage())
+        self.assertEqual(logs.records[-1].levelname, 'INFO')
+        self.assertEqual(record['view'], 'all_theses')
+        self.assertEqual(record['status'], 200)
+        self.assertEqual(record['bytes'], len(response.content))
+        self.assertEqual(record['db_queries'], int(parts['db'][1].split()[0]))
+        self.assertNotIn('sql', record)
+
+    @override_settings(REQUEST_TIMING={'SLOW_MS': 0, 'SQL_LIMIT': 1})
+    def test_slow_request_logs_sql(self):
+        with self.assertLogs('users.instrumentation', 'WARNING') as logs:
+            self.client.get('/api/auth/thesis/all-theses/')
+        record = logs.records[-1].request_metrics
+        self.assertTrue(record['slow'])
+        self.assertEqual(len(record['sql']), 1)
+        self.assertIn('SELECT', record['sql'][0]['sql'])
+        self.assertEqual(record['sql_omitted'], record['db_queries'] - 1)
+
+    def test_streaming_response_logged_after_last_chunk(self):
+        with self.assertLogs('users.instrumentation', 'INFO') as logs:
+            response = self.client.get('/api/auth/export/submissions/')
+            self.assertIn('Server-Timing', response)
+            self.assertEqual(logs.records, [])
+            body = b''.join(response.streaming_content)
+        record = json.loads(logs.records[-1].getMessage())
+        self.assertEqual(record['bytes'], len(body))
+        # 文件清单、评审与文件本身的查询发生在流式阶段
+        self.assertGreater(record['db_queries'], int(timings(response)['db'][1].split()[0]))
+
+    @override_settings(REQUEST_TIMING={'HEADER': False})
+    def test_header_can_be_disabled(self):
+        response = self.client.get('/api/auth/me/')
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('Server-Timing', response)
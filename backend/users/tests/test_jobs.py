@@ -0,0 +1,112 @@
+import shutil
+import tempfile
+from datetime import timedelta
+from io import StringIO
+
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from users import jobs, processing
+from users.models import Job, SubmissionMetadata, Thesis
+from users.tests.helpers import make_user
+
+
+CALLS = []
+
+
+def record(value, tag=''):
+    CALLS.append((value, tag))
+
+
+def flaky():
+    raise RuntimeError('boom')
+
+
+class JobQueueTest(TestCase):
+    def setUp(self):
+        CALLS.clear()
+
+    def test_priority_and_delay_order(self):
+        jobs.enqueue(record, 'low')
+        jobs.enqueue(record, 'high', priority=5)
+        jobs.enqueue(record, 'later', priority=9, delay=timedelta(minutes=5))
+        jobs.enqueue('users.tests.test_jobs.record', 'other', queue='mail')
+
+        first = jobs.dequeue('w1')
+        self.assertEqual((first.args, first.status, first.attempts, first.locked_by), (['high'], 'running', 1, 'w1'))
+        self.assertTrue(jobs.execute(first))
+        self.assertEqual(Job.objects.get(pk=first.pk).status, 'done')
+
+        self.assertEqual(jobs.dequeue('w1').args, ['low'])
+        self.assertIsNone(jobs.dequeue('w1'))
+        later = jobs.dequeue('w1', now=timezone.now() + timedelta(minutes=6))
+        self.assertEqual(later.args, ['later'])
+        self.assertEqual(jobs.dequeue('w2', queues=['mail']).task, 'users.tests.test_jobs.record')
+
+    def test_enqueue_rejects_unknown_task(self):
+        with self.assertRaises(ImportError):
+            jobs.enqueue('users.tests.test_jobs.missing')
+
+    def test_retry_with_backoff_then_fail(self):
+        job = jobs.enqueue(flaky, max_attempts=2)
+        claimed = jobs.dequeue('w1')
+        with self.assertLogs('users.jobs', 'WARNING'):
+            self.assertFalse(jobs.execute(claimed))
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), ('queued', 1))
+        self.assertIn('RuntimeError: boom', job.last_error)
+        self.assertGreaterEqual(job.run_at - timezone.now(), timedelta(seconds=9))
+        self.assertIsNone(jobs.dequeue('w1'))
+
+        claimed = jobs.dequeue('w1', now=job.run_at)
+        with self.assertLogs('users.jobs', 'ERROR'):
+            self.assertFalse(jobs.execute(claimed))
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), ('failed', 2))
+        self.assertIsNotNone(job.finished_at)
+
+    def test_stale_running_jobs_are_requeued(self):
+        jobs.enqueue(record, 'lost')
+        claimed = jobs.dequeue('dead-worker')
+        Job.objects.filter(pk=claimed.pk).update(locked_at=timezone.now() - timedelta(hours=1))
+        self.assertEqual(jobs.requeue_stale(), 1)
+        self.assertEqual(Job.objects.get(pk=claimed.pk).status, 'queued')
+        # 原工作进程迟到的结果不会覆盖新状态
+        self.assertTrue(jobs.execute(claimed))
+        self.assertEqual(Job.objects.get(pk=claimed.pk).status, 'queued')
+
+    def test_run_jobs_burst(self):
+        for n in range(3):
+            jobs.enqueue(record, n, tag='x')
+        out = StringIO()
+        call_command('run_jobs', burst=True, stdout=out)
+        self.assertIn('已执行 3 个任务', out.getvalue())
+        self.assertEqual(sorted(CALLS), [(0, 'x'), (1, 'x'), (2, 'x')])
+        self.assertFalse(Job.objects.exclude(status='done').exists())
+
+        Job.objects.update(finished_at=timezone.now() - timedelta(days=30))
+        self.assertEqual(jobs.purge_finished(), 3)
+
+
+class QueuedProcessingTest(TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp)
+        settings = override_settings(MEDIA_ROOT=self.tmp, SUBMISSION_PROCESSING={'QUEUE': 'processing'})
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+    def test_processing_goes_through_queue(self):
+        thesis = Thesis(student=make_user('s990', 'student'), title='排队处理')
+        thesis.file.save('q.txt', ContentFile(b'queued'))
+        with self.captureOnCommitCallbacks(execute=True):
+            processing.schedule('thesis', thesis)
+        job = Job.objects.get()
+        self.assertEqual((job.task, job.args, job.queue), ('users.processing.process', ['thesis', thesis.pk],
+                                                           'processing'))
+        self.assertEqual(SubmissionMetadata.objects.get().status, 'pending')
+
+        call_command('run_jobs', queue=['processing'], burst=True, stdout=StringIO())
+        self.assertEqual(SubmissionMetadata.objects.get().size, 6)
@@ -0,0 +1,105 @@
+import json
+import os
+import shutil
+import tempfile
+from io import StringIO
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connections
+from django.test import TransactionTestCase, override_settings
+
+from users import loadtest, synthetic
+from users.models import Thesis
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'],
+                   SUBMISSION_PROCESSING={'ASYNC': False})
+class LoadTestHarnessTest(TransactionTestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp)
+        settings = override_settings(MEDIA_ROOT=self.tmp)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        synthetic.generate(30, 3, 6, seed=1, blobs=1, max_file_mb=1)
+        # 与 LiveServerTestCase 相同：服务线程共用测试的内存数据库连接
+        connection = connections['default']
+        connection.inc_thread_sharing()
+        self.addCleanup(connection.dec_thread_sharing)
+        self.override = {'default': connection}
+
+    def run_loadtest(self, **options):
+        options = {'sessions': 12, 'concurrency': 1, 'connections_override': self.override, **options}
+        return loadtest.run(**options)
+
+    def test_report_per_endpoint(self):
+        report = self.run_loadtest(mix={'student': 2, 'teacher': 1, 'admin': 1}, seed=3)
+        endpoints = report['endpoints']
+        self.assertEqual(endpoints['POST login/']['requests'], 12)
+        for label in ('GET progress/', 'GET topics/', 'GET thesis/all-theses/', 'GET progress/cohort/'):
+            self.assertIn(label, endpoints)
+        for label, stats in endpoints.items():
+            self.assertEqual(stats['errors'], 0, label)
+            latency = stats['latency_ms']
+            self.assertLessEqual(latency['p50'], latency['p95'])
+            self.assertLessEqual(latency['p95'], latency['p99'])
+            # 本地服务在响应头里带回 SQL 条数
+            self.assertGreaterEqual(stats['queries']['max'], 1, label)
+        self.assertEqual(report['total']['requests'], sum(s['requests'] for s in endpoints.values()))
+        self.assertEqual(sum(report['meta']['sessions_by_role'].values()), 12)
+        json.dumps(report)
+
+        # 同一种子、只读时两次运行发出相同的请求
+        first = self.run_loadtest(mix={'student': 2, 'teacher': 1, 'admin': 1}, seed=3, read_only=True)
+        second = self.run_loadtest(mix={'student': 2, 'teacher': 1, 'admin': 1}, seed=3, read_only=True)
+        self.assertEqual({k: v['requests'] for k, v in first['endpoints'].items()},
+                         {k: v['requests'] for k, v in second['endpoints'].items()})
+        self.assertEqual({k: v['queries'] for k, v in first['endpoints'].items()},
+                         {k: v['queries'] for k, v in second['endpoints'].items()})
+
+    def test_writes_and_read_only(self):
+        theses = Thesis.objects.count()
+        self.run_loadtest(mix={'student': 1}, sessions=20, read_only=True)
+        self.assertEqual(Thesis.objects.count(), theses)
+        report = self.run_loadtest(mix={'student': 1}, sessions=20)
+        submitted = report['endpoints']['POST thesis/submit/']
+        self.assertEqual(submitted['status'], {'201': submitted['requests']})
+        self.assertEqual(Thesis.objects.count(), theses + submitted['requests'])
+
+    def test_compare_flags_regressions(self):
+        def report(p95, queries, error_rate=0.0, requests=50):
+            return {'endpoints': {'GET topics/': {
+                'requests': requests, 'latency_ms': {'p95': p95}, 'queries': {'mean': queries},
+                'error_rate': error_rate,
+            }}}
+
+        rows = loadtest.compare(report(100, 2), report(110, 2))
+        self.assertFalse(any(regressed for *_, regressed in rows))
+        rows = loadtest.compare(report(100, 2), report(150, 12, 0.1))
+        self.assertEqual([metric for _, metric, *_, regressed in rows if regressed], ['p95_ms', 'queries', 'error_rate'])
+        # 样本太少不判断延迟
+        rows = loadtest.compare(report(100, 2, requests=3), report(150, 2, requests=3))
+        self.assertFalse(any(regressed for *_, regressed in rows))
+
+        with self.assertRaises(loadtest.LoadTestError):
+            loadtest.parse_mix('student=1,dean=2')
+
+    def test_command_output_and_compare(self):
+        path = os.path.join(self.tmp, 'report.json')
+        with self.assertRaises(CommandError):
+            call_command('loadtest_api', prefix='missing', sessions=1, stdout=StringIO(), stderr=StringIO())
+
+        # 命令自己启动服务时不共用连接，这里改为指向测试用的本地服务
+        with loadtest.LocalServer(connections_override=self.override) as server:
+            out = StringIO()
+            call_command('loadtest_api', url=server.url, sessions=4, concurrency=1, read_only=True, output=path,
+                         stdout=out, stderr=StringIO())
+            self.assertIn('GET progress/', out.getvalue())
+            with open(path, encoding='utf-8') as f:
+                self.assertEqual(json.load(f)['total']['requests'] > 0, True)
+            out = StringIO()
+            call_command('loadtest_api', url=server.url, sessions=4, concurrency=1, read_only=True,
+                         output=os.path.join(self.tmp, 'again.json'), compare=path, threshold=100, stdout=out,
+                         stderr=StringIO())
+            self.assertIn('与基准相比没有回归', out.getvalue())
@@ -0,0 +1,94 @@
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, override_settings
+
+from users.models import Thesis, ThesisReview
+from users.nplusone import HEADER, NPlusOneDetector, NPlusOneError, NPlusOneMiddleware
+from users.serializers import ThesisSerializer
+from users.tests.helpers import make_user
+
+
+def student_names():
+    names = []
+    for thesis in Thesis.objects.order_by('id'):
+        names.append(thesis.student.username)
+    return names
+
+
+class NPlusOneDetectorTest(TestCase):
+    def setUp(self):
+        teacher = make_user('t950', 'teacher')
+        for n in range(4):
+            thesis = Thesis.objects.create(student=make_user(f's95{n}', 'student'), title=f'论文{n}',
+                                           stage='first_review')
+            ThesisReview.objects.create(thesis=thesis, reviewer=teacher, stage='first_review', result='pass')
+
+    def test_forward_foreign_key(self):
+        with NPlusOneDetector() as detector:
+            student_names()
+        [detection] = detector.detections
+        self.assertEqual(detection.site[0], 'users/tests/test_nplusone.py')
+        self.assertEqual(detection.site[2], 'student_names')
+        self.assertEqual(detection.count, 4)
+        self.assertEqual(detection.suggestion, "Thesis: select_related('student')")
+        self.assertEqual(detection.stack[1][2], 'test_forward_foreign_key')
+
+        with NPlusOneDetector() as detector:
+            [thesis.student.username for thesis in Thesis.objects.select_related('student')]
+        self.assertEqual(detector.detections, [])
+
+    def test_reverse_foreign_key(self):
+        with NPlusOneDetector() as detector:
+            for thesis in Thesis.objects.all():
+                list(thesis.reviews.all())
+        [detection] = detector.detections
+        self.assertEqual(detection.suggestion, "Thesis: prefetch_related('reviews')")
+
+    def test_serializer_without_eager_loading(self):
+        with NPlusOneDetector() as detector:
+            ThesisSerializer(Thesis.objects.all(), many=True).data
+        fields = {detection.field: detection for detection in detector.detections}
+        # student_id 的 source 是 student.username，学生在 DRF 内部取值时被逐行加载
+        self.assertEqual(fields['ThesisSerializer.student_id'].suggestion, "Thesis: select_related('student')")
+        self.assertEqual(fields['ThesisSerializer.reviews'].suggestion, "Thesis: prefetch_related('reviews')")
+        metadata = fields['ThesisSerializer.metadata']
+        self.assertEqual((metadata.site[0], metadata.site[2]), ('users/serializers.py', 'submission_metadata'))
+        self.assertEqual(metadata.stack[1][2], 'get_metadata')
+        self.assertEqual(metadata.suggestion, "Thesis: select_related('metadata')")
+
+        with NPlusOneDetector() as detector:
+            ThesisSerializer(ThesisSerializer.setup_eager_loading(Thesis.objects.all()), many=True).data
+        self.assertEqual(detector.detections, [])
+
+    def test_same_parameters_and_ignore_are_not_reported(self):
+        thesis = Thesis.objects.first()
+        with NPlusOneDetector() as detector:
+            for _ in range(5):
+                Thesis.objects.get(pk=thesis.pk).student.username
+        self.assertEqual(detector.detections, [])
+
+        with NPlusOneDetector(ignore=['test_nplusone.py:']) as detector:
+            student_names()
+        self.assertEqual(detector.detections, [])
+
+    def middleware(self, mode):
+        with override_settings(NPLUSONE={'ENABLED': True, 'MODE': mode}):
+            return NPlusOneMiddleware(lambda request: HttpResponse(','.join(student_names())))
+
+    def test_middleware_modes(self):
+        request = RequestFactory().get('/api/auth/thesis/all-theses/')
+
+        response = self.middleware('header')(request)
+        self.assertIn("test_nplusone.py", response[HEADER])
+        self.assertIn("in student_names x4 -> Thesis: select_related('student')", response[HEADER])
+
+        with self.assertLogs('users.nplusone', 'WARNING') as logs:
+            response = self.middleware('log')(request)
+        self.assertNotIn(HEADER, response)
+        self.assertIn('GET /api/auth/thesis/all-theses/', logs.output[0])
+        self.assertIn('in student_names', logs.output[0])
+
+        with self.assertRaisesMessage(NPlusOneError, "select_related('student')"):
+            self.middleware('raise')(request)
+
+        with override_settings(NPLUSONE={'ENABLED': True, 'MODE': 'print'}), self.assertRaises(ValueError):
+            NPlusOneMiddleware(lambda request: HttpResponse())
@@ -0,0 +1,117 @@
+import hashlib
+import shutil
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from users import processing
+from users.models import SubmissionMetadata, Thesis
+from users.tests.helpers import make_user
+
+
+def make_pdf(pages):
+    kids = ' '.join(f'{n} 0 R' for n in range(3, 3 + pages))
+    objects = [
+        b'1 0 obj << /Type /Catalog /Pages 2 0 R >> endobj',
+        f'2 0 obj << /Type /Pages /Kids [{kids}] /Count {pages} >> endobj'.encode(),
+    ] + [f'{n} 0 obj << /Type /Page /Parent 2 0 R >> endobj'.encode() for n in range(3, 3 + pages)]
+    return b'%PDF-1.4\n' + b'\n'.join(objects) + b'\ntrailer << /Root 1 0 R >>\n%%EOF\n'
+
+
+class SubmissionProcessingTest(TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp)
+        settings = override_settings(MEDIA_ROOT=self.tmp, SUBMISSION_PROCESSING={'ASYNC': False})
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.client = APIClient()
+        self.student = make_user('s900', 'student')
+        self.admin = make_user('a900', 'admin')
+        self.pdf = make_pdf(3)
+
+    def submit(self, content, name='paper.pdf', title='初稿'):
+        self.client.force_authenticate(user=self.student)
+        with self.captureOnCommitCallbacks(execute=True):
+            resp = self.client.post('/api/auth/thesis/submit/', {
+                'title': title, 'file': SimpleUploadedFile(name, content),
+            }, format='multipart')
+        self.assertEqual(resp.status_code, status.HTTP_201_CREATED)
+        # 响应在处理前生成，此时是 pending
+        self.assertEqual(resp.data['metadata']['status'], 'pending')
+        return Thesis.objects.get(pk=resp.data['id'])
+
+    def listed_metadata(self):
+        self.client.force_authenticate(user=self.admin)
+        return self.client.get('/api/auth/thesis/all-theses/').data['results'][0]['metadata']
+
+    def test_submit_extracts_metadata(self):
+        thesis = self.submit(self.pdf)
+        meta = thesis.metadata
+        self.assertEqual(meta.status, 'done')
+        self.assertEqual((meta.size, meta.page_count), (len(self.pdf), 3))
+        self.assertEqual(meta.sha256, hashlib.sha256(self.pdf).hexdigest())
+        self.assertEqual(meta.file_name, thesis.file.name)
+
+        data = self.listed_metadata()
+        self.assertEqual((data['status'], data['page_count'], data['size']), ('done', 3, len(self.pdf)))
+        self.assertNotIn('text', data)
+
+    def test_non_pdf_and_reuse(self):
+        self.submit(b'plain text, not a pdf', name='notes.txt')
+        meta = SubmissionMetadata.objects.get()
+        self.assertEqual((meta.status, meta.page_count, meta.size), ('done', None, 21))
+
+        with mock.patch.object(processing, 'pdf_text', return_value='摘要 正文') as extract:
+            first = self.submit(self.pdf, title='v1')
+            second = self.submit(self.pdf, title='v2')
+        # 相同内容只解析一次，第二份直接复用
+        self.assertEqual(extract.call_count, 1)
+        self.assertEqual(second.metadata.text, '摘要 正文')
+        self.assertEqual(second.metadata.page_count, first.metadata.page_count)
+
+    def test_preview_served_through_signed_link(self):
+        with mock.patch.object(processing, 'pdf_preview', return_value=b'\x89PNG preview'):
+            thesis = self.submit(self.pdf)
+        self.assertTrue(thesis.metadata.preview.name.startswith('previews/'))
+
+        preview_url = self.listed_metadata()['preview_url']
+        self.client.force_authenticate(user=None)
+        path = preview_url.split('testserver', 1)[1]
+        resp = self.client.get(path)
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        self.assertEqual(b''.join(resp.streaming_content), b'\x89PNG preview')
+
+    def test_stale_result_is_not_written(self):
+        thesis = self.submit(self.pdf)
+        SubmissionMetadata.objects.filter(thesis=thesis).update(file_name='thesis/newer.pdf', status='pending')
+        processing.process('thesis', thesis.pk)
+        self.assertEqual(SubmissionMetadata.objects.get(thesis=thesis).status, 'pending')
+
+    def test_command_backfills_missing(self):
+        thesis = self.submit(self.pdf)
+        SubmissionMetadata.objects.all().delete()
+        out = StringIO()
+        call_command('process_submissions', workers=1, stdout=out)
+        self.assertIn('已处理 1 份提交', out.getvalue())
+        self.assertEqual(SubmissionMetadata.objects.get(thesis=thesis).page_count, 3)
+
+        call_command('process_submissions', workers=1, stdout=out)
+        self.assertIn('已处理 0 份提交', out.getvalue())
+
+    def test_poppler_preferred_over_pypdf(self):
+        # pypdf 是纯 Python，进程内解析会占住 GIL；有 poppler 时不用它
+        pypdf = mock.Mock()
+        pypdf.PdfReader.return_value.pages = ['p1', 'p2']
+        with mock.patch.dict('sys.modules', {'pypdf': pypdf}):
+            with mock.patch.object(processing, '_command', return_value=b'Title: x\nPages:          7\n'):
+                self.assertEqual(processing.pdf_page_count('paper.pdf'), 7)
+            pypdf.PdfReader.assert_not_called()
+            with mock.patch.object(processing, '_command', return_value=None):
+                self.assertEqual(processing.pdf_page_count('paper.pdf'), 2)
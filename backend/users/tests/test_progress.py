@@ -0,0 +1,162 @@
+from io import StringIO
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from users.models import (
+    Topic, TopicSelection, Proposal, ProposalReview, MidtermCheck, Thesis, ThesisReview, StudentProgress,
+)
+from users.progress import compute_progress
+from users.tests.helpers import make_user
+
+
+class StudentProgressSnapshotTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.student = make_user('s100', 'student', first_name='明', last_name='张')
+        self.teacher = make_user('t100', 'teacher', first_name='衡', last_name='赵')
+        token = Token.objects.create(user=self.student)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+
+    def snapshot(self):
+        return StudentProgress.objects.get(student=self.student).data
+
+    def test_snapshot_follows_submissions_and_reviews(self):
+        topic = Topic.objects.create(teacher=self.teacher, title='课题A')
+        TopicSelection.objects.create(topic=topic, student=self.student)
+        self.assertEqual(self.snapshot()['topic_selection']['topic_title'], '课题A')
+
+        proposal = Proposal.objects.create(student=self.student, file='proposal/p.pdf')
+        self.assertEqual(self.snapshot()['proposal']['message'], '已提交，等待审核')
+
+        review = ProposalReview.objects.create(proposal=proposal, reviewer=self.teacher, score=90, result='pass')
+        self.assertEqual(self.snapshot()['proposal']['status'], 'completed')
+        self.assertEqual(self.snapshot()['proposal']['score'], 90)
+
+        review.delete()
+        self.assertEqual(self.snapshot()['proposal']['status'], 'in-progress')
+
+        thesis = Thesis.objects.create(student=self.student, title='初稿', stage='first_review',
+                                       file='thesis/t.pdf')
+        ThesisReview.objects.create(thesis=thesis, reviewer=self.teacher, stage='first_review', result='fail')
+        self.assertEqual(self.snapshot()['first_review']['status'], 'failed')
+
+        thesis.delete()
+        self.assertEqual(self.snapshot()['first_review']['status'], 'pending')
+
+        topic.title = '课题B'
+        topic.save()
+        self.assertEqual(self.snapshot()['topic_selection']['topic_title'], '课题B')
+        self.assertEqual(self.snapshot(), compute_progress(self.student))
+
+    def test_snapshot_follows_teacher_rename(self):
+        topic = Topic.objects.create(teacher=self.teacher, title='课题A')
+        TopicSelection.objects.create(topic=topic, student=self.student)
+        self.assertEqual(self.snapshot()['topic_selection']['teacher_name'], '衡 赵')
+
+        self.teacher.first_name = '新'
+        self.teacher.save(update_fields=['first_name'])
+        self.assertEqual(self.snapshot()['topic_selection']['teacher_name'], '新 赵')
+        self.teacher.last_name = ''
+        self.teacher.first_name = ''
+        self.teacher.save()
+        self.assertEqual(self.snapshot()['topic_selection']['teacher_name'], 't100')
+
+    def test_progress_view_reads_snapshot(self):
+        MidtermCheck.objects.create(student=self.student)
+        self.client.get('/api/auth/progress/')
+        # token/role come from the warm auth cache: only the snapshot read
+        with self.assertNumQueries(1):
+            resp = self.client.get('/api/auth/progress/')
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        self.assertEqual(resp.data['midterm']['status'], 'in-progress')
+        self.assertEqual(resp.data['proposal']['status'], 'pending')
+
+    def test_progress_view_builds_missing_snapshot(self):
+        StudentProgress.objects.all().delete()
+        resp = self.client.get('/api/auth/progress/')
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        self.assertEqual(resp.data, compute_progress(self.student))
+        self.assertTrue(StudentProgress.objects.filter(student=self.student).exists())
+
+    def test_deleting_student_removes_snapshot(self):
+        Proposal.objects.create(student=self.student, file='proposal/p.pdf')
+        self.student.delete()
+        self.assertFalse(StudentProgress.objects.exists())
+
+    def test_rebuild_and_check_commands(self):
+        Proposal.objects.create(student=self.student, file='proposal/p.pdf')
+        StudentProgress.objects.filter(student=self.student).update(data={})
+
+        with self.assertRaises(CommandError):
+            call_command('check_progress', stdout=StringIO())
+
+        call_command('rebuild_progress', stdout=StringIO())
+        out = StringIO()
+        call_command('check_progress', stdout=out)
+        self.assertIn('一致', out.getvalue())
+        self.assertEqual(self.snapshot(), compute_progress(self.student))
+
+
+class CohortProgressTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.teacher = make_user('t200', 'teacher')
+        self.other_teacher = make_user('t201', 'teacher')
+        self.admin = make_user('a200', 'admin')
+        self.topic = Topic.objects.create(teacher=self.teacher, title='课题', max_students=50)
+        self.other_topic = Topic.objects.create(teacher=self.other_teacher, title='其他课题', max_students=50)
+
+    def add_students(self, count, topic):
+        students = []
+        for i in range(count):
+            student = make_user(f'{topic.pk}-{len(students)}-{User.objects.count()}', 'student')
+            TopicSelection.objects.create(topic=topic, student=student)
+            proposal = Proposal.objects.create(student=student, file='proposal/p.pdf')
+            ProposalReview.objects.create(proposal=proposal, reviewer=self.teacher, result='revise', score=60)
+            if i % 2:
+                ProposalReview.objects.create(proposal=proposal, reviewer=self.teacher, result='pass', score=85)
+                MidtermCheck.objects.create(student=student)
+            if i % 3 == 0:
+                Thesis.objects.create(student=student, title='v1', stage='first_review', file='thesis/1.pdf')
+                latest = Thesis.objects.create(student=student, title='v2', stage='first_review', file='thesis/2.pdf')
+                ThesisReview.objects.create(thesis=latest, reviewer=self.teacher, stage='first_review', result='pass')
+            students.append(student)
+        return students
+
+    def get_cohort(self, user, **params):
+        self.client.force_authenticate(user=user)
+        return self.client.get('/api/auth/progress/cohort/', params)
+
+    def test_cohort_matches_single_student_computation(self):
+        students = self.add_students(6, self.topic)
+        resp = self.get_cohort(self.admin, page_size=100)
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        self.assertEqual(resp.data['count'], 6)
+        by_id = {item['student_id']: item['progress'] for item in resp.data['results']}
+        for student in students:
+            self.assertEqual(by_id[student.username], compute_progress(student))
+
+    def test_teacher_scope_and_role_check(self):
+        mine = self.add_students(2, self.topic)
+        self.add_students(3, self.other_topic)
+        resp = self.get_cohort(self.teacher)
+        self.assertEqual(sorted(item['student_id'] for item in resp.data['results']),
+                         sorted(s.username for s in mine))
+        self.assertEqual(self.get_cohort(self.admin).data['count'], 5)
+        self.assertEqual(self.get_cohort(mine[0]).status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_query_count_does_not_grow_with_cohort_size(self):
+        self.add_students(2, self.topic)
+        # count + page + selections + proposals + midterms + theses
+        with self.assertNumQueries(6):
+            self.get_cohort(self.admin, page_size=100)
+        self.add_students(12, self.topic)
+        with self.assertNumQueries(6):
+            resp = self.get_cohort(self.admin, page_size=100)
+        self.assertEqual(len(resp.data['results']), 14)
@@ -0,0 +1,259 @@
+"""每个接口的 SQL 条数预算。
+
+``CASES`` 为 users/urls.py 里的每个 URL（按方法）声明预算，并说明怎样调用它。测试分别在小规模和大规模
+夹具上各调用一遍：条数随规模增长（``per_row`` 为 0 时）或超出预算都算失败，失败信息里给出按调用位置
+分组的 SQL。新增 URL 时必须在这里补上预算，否则 ``test_every_url_has_a_budget`` 失败。
+"""
+import os
+import shutil
+import tempfile
+from collections import namedtuple
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import transaction
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from users import scope
+from users.models import (
+    AllocationRound, MidtermCheck, MidtermReview, Proposal, ProposalReview, SubmissionMetadata, Thesis, ThesisReview,
+    Topic, TopicSelection,
+)
+from users.querylog import QueryRecorder
+from users.tests.helpers import make_user
+from users.urls import urlpatterns
+
+
+SMALL, LARGE = 2, 7
+
+
+class Budget(namedtuple('Budget', 'queries per_row', defaults=(0,))):
+    """最多 ``queries + per_row × 行数`` 条；``per_row`` 为 0 表示条数不能随规模增长。"""
+
+    def limit(self, rows):
+        return self.queries + self.per_row * rows
+
+
+class Call(namedtuple('Call', 'user path data format headers', defaults=(None, None, None, None))):
+    pass
+
+
+Case = namedtuple('Case', 'name method budget call')
+World = namedtuple('World', 'size admin teacher student free_student others topics theses proposals midterms')
+
+
+def upload(name='paper.pdf'):
+    return SimpleUploadedFile(name, b'%PDF-1.4 budget', content_type='application/pdf')
+
+
+def start_upload(client, world):
+    client.force_authenticate(user=world.student)
+    data = {'kind': 'thesis', 'filename': 'paper.pdf', 'size': 5, 'title': '分块上传', 'stage': 'first_review'}
+    return client.post('/api/auth/uploads/', data, format='json').data['id']
+
+
+def finished_upload(client, world):
+    session_id = start_upload(client, world)
+    client.put(f'/api/auth/uploads/{session_id}/', data=b'%PDF-', content_type='application/octet-stream',
+               HTTP_UPLOAD_OFFSET='0')
+    return session_id
+
+
+def open_round(world):
+    now = timezone.now()
+    AllocationRound.objects.create(name='志愿', opens_at=now - timedelta(days=1), closes_at=now + timedelta(days=1))
+
+
+def reviews(items):
+    return {'reviews': [{'id': item.pk, 'result': 'pass', 'score': 90} for item in items]}
+
+
+def roster(size):
+    return SimpleUploadedFile('roster.csv', ('学号,姓名\n' + ''.join(f'r{n:04d},学生{n}\n' for n in range(size))).encode())
+
+
+def signed(path, client, world, pk):
+    """从列表接口里取签名下载链接（浏览器直接打开的方式）。"""
+    client.force_authenticate(user=world.student)
+    data = client.get('/api/auth/' + path).data
+    items = data['results'] if isinstance(data, dict) else data
+    url = next(item['file_url'] for item in items if item['id'] == pk)
+    client.force_authenticate(user=None)
+    return url[url.index('/api/'):]
+
+
+# 调用函数在计数之外执行，可以先用 client 做准备（开上传会话、取签名链接等），返回要计数的那次请求
+CASES = [
+    Case('register', 'POST', Budget(16), lambda c, w: Call(None, 'register/', {
+        'student_id': 'new001', 'email': 'new001@example.com', 'role': 'student', 'password': 'secret123'})),
+    Case('login', 'POST', Budget(6), lambda c, w: Call(None, 'login/', {'identifier': w.student.username,
+                                                                           'password': 'secret123'})),
+    Case('me', 'GET', Budget(0), lambda c, w: Call(w.student, 'me/')),
+    Case('roster_import', 'POST', Budget(11), lambda c, w: Call(w.admin, 'users/import/', {'file': roster(w.size)},
+                                                               'multipart')),
+
+    Case('thesis_submit', 'POST', Budget(26), lambda c, w: Call(w.student, 'thesis/submit/', {
+        'title': '新版本', 'stage': 'first_review', 'file': upload()}, 'multipart')),
+    Case('thesis_detail', 'GET', Budget(2), lambda c, w: Call(w.student, 'thesis/detail/')),
+    Case('my_thesis', 'GET', Budget(2), lambda c, w: Call(w.student, 'thesis/my-thesis/')),
+    Case('all_theses', 'GET', Budget(2), lambda c, w: Call(w.admin, 'thesis/all-theses/')),
+    Case('all_theses', 'GET', Budget(2), lambda c, w: Call(w.teacher, 'thesis/all-theses/?username=学生')),
+    Case('thesis_review', 'POST', Budget(13), lambda c, w: Call(w.teacher, f'thesis/{w.theses[0].pk}/review/', {
+        'stage': 'first_review', 'result': 'pass', 'score': 90}, 'json')),
+    Case('thesis_similar', 'GET', Budget(4), lambda c, w: Call(w.teacher, f'thesis/{w.theses[0].pk}/similar/')),
+    Case('thesis_bulk_review', 'POST', Budget(9), lambda c, w: Call(w.teacher, 'thesis/reviews/bulk/',
+                                                                    reviews(w.theses), 'json')),
+
+    Case('proposal_submit', 'POST', Budget(26), lambda c, w: Call(w.student, 'proposal/submit/', {
+        'file': upload()}, 'multipart')),
+    Case('my_proposals', 'GET', Budget(2), lambda c, w: Call(w.student, 'proposal/my-proposals/')),
+    Case('all_proposals', 'GET', Budget(2), lambda c, w: Call(w.admin, 'proposal/all-proposals/')),
+    Case('proposal_review', 'POST', Budget(13), lambda c, w: Call(w.teacher, f'proposal/{w.proposals[0].pk}/review/',
+                                                                 {'result': 'pass', 'score': 90}, 'json')),
+    Case('proposal_bulk_review', 'POST', Budget(9), lambda c, w: Call(w.teacher, 'proposal/reviews/bulk/',
+                                                                      reviews(w.proposals), 'json')),
+
+    Case('midterm_submit', 'POST', Budget(26), lambda c, w: Call(w.student, 'midterm/submit/', {
+        'file': upload()}, 'multipart')),
+    Case('my_midterms', 'GET', Budget(2), lambda c, w: Call(w.student, 'midterm/my-midterms/')),
+    Case('all_midterms', 'GET', Budget(2), lambda c, w: Call(w.admin, 'midterm/all-midterms/')),
+    Case('midterm_review', 'POST', Budget(13), lambda c, w: Call(w.teacher, f'midterm/{w.midterms[0].pk}/review/',
+                                                                {'result': 'pass', 'score': 90}, 'json')),
+    Case('midterm_bulk_review', 'POST', Budget(9), lambda c, w: Call(w.teacher, 'midterm/reviews/bulk/',
+                                                                     reviews(w.midterms), 'json')),
+
+    Case('upload_start', 'POST', Budget(5), lambda c, w: Call(w.student, 'uploads/', {
+        'kind': 'thesis', 'filename': 'paper.pdf', 'size': 5, 'title': '分块上传', 'stage': 'first_review'}, 'json')),
+    Case('upload_session', 'GET', Budget(1), lambda c, w: Call(w.student, f'uploads/{start_upload(c, w)}/')),
+    Case('upload_session', 'PUT', Budget(4), lambda c, w: Call(
+        w.student, f'uploads/{start_upload(c, w)}/', b'%PDF-', 'raw', {'HTTP_UPLOAD_OFFSET': '0'})),
+    Case('upload_session', 'DELETE', Budget(2), lambda c, w: Call(w.student, f'uploads/{start_upload(c, w)}/')),
+    Case('upload_complete', 'POST', Budget(32), lambda c, w: Call(
+        w.student, f'uploads/{finished_upload(c, w)}/complete/', {}, 'json')),
+
+    Case('file_download', 'GET', Budget(3), lambda c, w: Call(w.teacher, f'files/thesis/{w.theses[0].pk}/')),
+    Case('file_download', 'GET', Budget(3), lambda c, w: Call(
+        None, signed('thesis/my-thesis/', c, w, w.theses[0].pk))),
+    Case('file_preview', 'GET', Budget(3), lambda c, w: Call(w.student, f'files/thesis/{w.theses[0].pk}/preview/')),
+    Case('file_download_named', 'GET', Budget(2), lambda c, w: Call(
+        w.admin, f'files/proposal/{w.proposals[0].pk}/paper.pdf')),
+    Case('export_submissions', 'GET', Budget(9), lambda c, w: Call(w.teacher, 'export/submissions/')),
+
+    Case('my_topics', 'GET', Budget(1), lambda c, w: Call(w.teacher, 'topics/my-topics/')),
+    Case('topics_list_create', 'GET', Budget(1), lambda c, w: Call(w.student, 'topics/')),
+    Case('topics_list_create', 'POST', Budget(2), lambda c, w: Call(w.teacher, 'topics/', {
+        'title': '新课题', 'max_students': 2}, 'json')),
+    Case('topic_detail', 'GET', Budget(1), lambda c, w: Call(w.student, f'topics/{w.topics[0].pk}/')),
+    Case('topic_detail', 'PUT', Budget(15), lambda c, w: Call(w.teacher, f'topics/{w.topics[0].pk}/', {
+        'title': '改名', 'max_students': w.size + 5}, 'json')),
+    Case('topic_detail', 'DELETE', Budget(4), lambda c, w: Call(w.teacher, f'topics/{w.topics[-1].pk}/')),
+    Case('topic_select', 'POST', Budget(23), lambda c, w: Call(w.free_student, f'topics/{w.topics[-1].pk}/select/')),
+    Case('topic_select', 'DELETE', Budget(19), lambda c, w: Call(w.student, f'topics/{w.topics[0].pk}/select/')),
+    Case('topic_students', 'GET', Budget(3), lambda c, w: Call(w.teacher, f'topics/{w.topics[0].pk}/students/')),
+    Case('topic_preferences', 'GET', Budget(2), lambda c, w: open_round(w) or Call(w.student, 'topics/preferences/')),
+    Case('topic_preferences', 'PUT', Budget(7), lambda c, w: open_round(w) or Call(
+        w.student, 'topics/preferences/', {'topics': [topic.pk for topic in w.topics[:3]]}, 'json')),
+
+    Case('student_progress', 'GET', Budget(1), lambda c, w: Call(w.student, 'progress/')),
+    Case('cohort_progress', 'GET', Budget(6), lambda c, w: Call(w.admin, 'progress/cohort/')),
+    Case('cohort_progress', 'GET', Budget(6), lambda c, w: Call(w.teacher, 'progress/cohort/')),
+]
+
+
+def build_world(size):
+    """``size`` 决定行数：学生本人的各类提交数、课题数、选了教师课题的其他学生数。"""
+    admin = make_user(f'a{size}', 'admin')
+    teacher = make_user(f't{size}', 'teacher', first_name='老师')
+    student = make_user(f's{size}', 'student', first_name='学生甲')
+    student.set_password('secret123')
+    student.save()
+    free_student = make_user(f'f{size}', 'student')
+    others = [make_user(f'o{size}-{n}', 'student', first_name=f'学生{n}') for n in range(size)]
+    topics = [Topic.objects.create(teacher=teacher, title=f'课题{n}', max_students=size + 2) for n in range(size)]
+    for member in [student, *others]:
+        TopicSelection.objects.create(topic=topics[0], student=member)
+    Topic.objects.filter(pk=topics[0].pk).update(selected_students=size + 1)
+
+    name = default_storage.save('thesis/paper.pdf', ContentFile(b'%PDF-1.4 budget fixture'))
+    preview = default_storage.save('previews/paper.png', ContentFile(b'\x89PNG budget'))
+
+    def submissions(model, review_model, parent, **fields):
+        rows = []
+        for owner in [student] * size + others:
+            row = model.objects.create(student=owner, file=name, **fields)
+            for result in ('revise', 'pass'):
+                extra = {'stage': 'first_review'} if review_model is ThesisReview else {}
+                review_model.objects.create(**{parent: row}, reviewer=teacher, result=result, score=80, **extra)
+            SubmissionMetadata.objects.create(**{parent: row}, file_name=name, status='done', preview=preview)
+            rows.append(row)
+        return rows
+
+    theses = submissions(Thesis, ThesisReview, 'thesis', title='论文', stage='first_review')
+    proposals = submissions(Proposal, ProposalReview, 'proposal')
+    midterms = submissions(MidtermCheck, MidtermReview, 'midterm')
+    return World(size, admin, teacher, student, free_student, others, topics, theses, proposals, midterms)
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'],
+                   SUBMISSION_PROCESSING={'ASYNC': False}, MEDIA_DOWNLOAD_BACKEND='python')
+class QueryBudgetTest(TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp)
+        settings = override_settings(MEDIA_ROOT=os.path.join(self.tmp, 'media'),
+                                     CHUNKED_UPLOAD_DIR=os.path.join(self.tmp, 'sessions'))
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+    def measure(self, size):
+        """在 ``size`` 规模的夹具上逐个调用，返回 ``[(状态码, QueryRecorder)]``；每次调用都在保存点里回滚。"""
+        results = []
+        with transaction.atomic():
+            world = build_world(size)
+            for case in CASES:
+                savepoint = transaction.savepoint()
+                client = APIClient()
+                call = case.call(client, world)
+                client.force_authenticate(user=call.user)
+                # 缓存（教师范围、token）每次都从空开始，两种规模下条件相同
+                cache.clear()
+                scope.invalidate()
+                kwargs = {'path': '/api/auth/' + call.path if not call.path.startswith('/') else call.path,
+                          **(call.headers or {})}
+                if call.format == 'raw':
+                    kwargs.update(data=call.data, content_type='application/octet-stream')
+                elif call.data is not None:
+                    kwargs.update(data=call.data, format=call.format)
+                with QueryRecorder() as recorder:
+                    response = getattr(client, case.method.lower())(**kwargs)
+                    if response.streaming:
+                        b''.join(response.streaming_content)
+                results.append((response.status_code, recorder))
+                transaction.savepoint_rollback(savepoint)
+            transaction.set_rollback(True)
+        return results
+
+    def test_every_url_has_a_budget(self):
+        missing = {pattern.name for pattern in urlpatterns} - {case.name for case in CASES}
+        self.assertFalse(missing, f'这些 URL 没有声明 SQL 预算：{sorted(missing)}')
+
+    def test_query_counts_within_budget(self):
+        small, large = self.measure(SMALL), self.measure(LARGE)
+        failures = []
+        for case, (small_status, small_queries), (status, queries) in zip(CASES, small, large):
+            title = f'{case.method} {case.name}'
+            if status >= 400 or small_status >= 400:
+                failures.append(f'{title}: 返回 {small_status} / {status}，没有走到正常路径')
+                continue
+            if case.budget.per_row == 0 and len(queries) > len(small_queries):
+                failures.append(f'{title}: SQL 条数随规模增长 {len(small_queries)} → {len(queries)}'
+                                f'（{SMALL} → {LARGE} 行）\n{queries.format_by_site()}')
+            elif len(queries) > case.budget.limit(LARGE):
+                failures.append(f'{title}: {len(queries)} 条，超出预算 {case.budget.limit(LARGE)}\n'
+                                f'{queries.format_by_site()}')
+        self.assertFalse(failures, '\n\n' + '\n\n'.join(failures))
@@ -0,0 +1,183 @@
+import io
+import os
+import shutil
+import tempfile
+import zipfile
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth.hashers import check_password
+from django.contrib.auth.models import User
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import IntegrityError
+from django.test import TestCase, override_settings
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from users import roster
+from users.models import Profile, UserSearchKey
+from users.search import matching_user_ids
+from users.tests.helpers import make_user
+
+
+ROSTER = (
+    '学号,姓名,邮箱,角色,密码\n'
+    '20240001,张三,zs@example.com,学生,\n'
+    '20240002,李四,ls@example.com,,secret123\n'
+    'T001,王老师,wang@example.com,教师,\n'
+    '20240001,重复,dup@example.com,学生,\n'
+    '20240003,赵六,not-an-email,学生,\n'
+    '20240004,钱七,qq@example.com,校长,\n'
+)
+
+
+def make_xlsx(rows):
+    """最小的 XLSX：一个工作表，字符串用内联字符串，数字直接写值。"""
+    def cell(ref, value):
+        if isinstance(value, (int, float)):
+            return f'<c r="{ref}"><v>{value}</v></c>'
+        return f'<c r="{ref}" t="inlineStr"><is><t>{value}</t></is></c>'
+
+    body = ''.join(
+        f'<row r="{r}">' + ''.join(cell(f'{chr(65 + c)}{r}', v) for c, v in enumerate(row)) + '</row>'
+        for r, row in enumerate(rows, start=1)
+    )
+    main = 'http://schemas.openxmlformats.org/spreadsheetml/2006/main'
+    rel = 'http://schemas.openxmlformats.org/officeDocument/2006/relationships'
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w') as archive:
+        archive.writestr('xl/workbook.xml', f'<workbook xmlns="{main}" xmlns:r="{rel}"><sheets>'
+                                            f'<sheet name="名单" sheetId="1" r:id="rId1"/></sheets></workbook>')
+        archive.writestr('xl/_rels/workbook.xml.rels',
+                         '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+                         '<Relationship Id="rId1" Target="worksheets/sheet1.xml"/></Relationships>')
+        archive.writestr('xl/worksheets/sheet1.xml', f'<worksheet xmlns="{main}"><sheetData>{body}</sheetData></worksheet>')
+    return buffer.getvalue()
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class RosterImportTest(TestCase):
+    def test_import_creates_accounts_without_signals(self):
+        stats = roster.import_roster(ROSTER.encode(), 'roster.csv', default_password='init1234', workers=1)
+        self.assertEqual((stats['created'], stats['updated']), (3, 0))
+        self.assertEqual([line for line, _ in stats['errors']], [5, 6, 7])
+
+        student = User.objects.get(username='20240001')
+        self.assertEqual((student.first_name, student.email, student.profile.role), ('张三', 'zs@example.com', 'student'))
+        self.assertTrue(check_password('init1234', student.password))
+        self.assertTrue(check_password('secret123', User.objects.get(username='20240002').password))
+        # 默认密码逐个账号加盐，看不出哪些账号仍在用它
+        self.assertNotEqual(student.password, User.objects.get(username='T001').password)
+        self.assertEqual(User.objects.get(username='T001').profile.role, 'teacher')
+        self.assertEqual(Profile.objects.count(), 3)
+        # 信号不触发时搜索索引照常建立
+        self.assertEqual(UserSearchKey.objects.count(), 3)
+        self.assertIn(student.pk, User.objects.filter(pk__in=matching_user_ids('张三')).values_list('pk', flat=True))
+
+    def test_upsert_existing_accounts(self):
+        existing = make_user('20240001', 'teacher', first_name='旧名')
+        existing.set_password('keep-me')
+        existing.save()
+
+        stats = roster.import_roster(ROSTER.encode(), 'roster.csv', workers=1)
+        self.assertEqual((stats['created'], stats['updated']), (2, 1))
+        existing.refresh_from_db()
+        self.assertEqual((existing.first_name, existing.profile.role), ('张三', 'student'))
+        # 没有单独给出密码的已有账号保留原密码；新账号未给默认密码时不可登录
+        self.assertTrue(existing.check_password('keep-me'))
+        self.assertFalse(User.objects.get(username='T001').has_usable_password())
+
+        stats = roster.import_roster(ROSTER.encode(), 'roster.csv', workers=1)
+        # 单独给出密码的行每次都会重设密码
+        self.assertEqual((stats['created'], stats['updated'], stats['unchanged']), (0, 1, 2))
+        stats = roster.import_roster('学号,姓名\n20240001,新名\n'.encode(), update_existing=False, workers=1)
+        self.assertEqual(stats['skipped'], 1)
+        self.assertEqual(User.objects.get(username='20240001').first_name, '张三')
+
+    def test_duplicate_and_taken_emails(self):
+        make_user('t961', 'teacher')
+        make_user('t962', 'teacher')
+        data = ('学号,姓名,邮箱,角色\n'
+                '20240020,甲,a@example.com,学生\n'
+                '20240021,乙,A@Example.com,学生\n'
+                '20240022,丙,T961@example.com,学生\n'
+                't962,王老师,t962@example.com,教师\n').encode()
+        stats = roster.import_roster(data, 'roster.csv', workers=1)
+        # 账号自己的邮箱不算冲突
+        self.assertEqual((stats['created'], stats['updated']), (1, 1))
+        self.assertEqual(stats['errors'], [(3, '邮箱重复：A@Example.com'),
+                                           (4, '邮箱已被账号 t961 使用：T961@example.com')])
+        self.assertFalse(User.objects.filter(username__in=['20240021', '20240022']).exists())
+
+        with self.assertRaisesMessage(roster.RosterError, '默认密码少于'):
+            roster.import_roster(data, 'roster.csv', default_password='123', dry_run=True)
+
+    def test_concurrent_import_conflicts_reported(self):
+        real_bulk_create = User.objects.bulk_create
+
+        def bulk_create(users, *args, **kwargs):
+            # 另一次导入已先建好 20240002
+            if any(user.username == '20240002' for user in users):
+                raise IntegrityError('UNIQUE constraint failed: auth_user.username')
+            return real_bulk_create(users, *args, **kwargs)
+
+        with mock.patch.object(User.objects, 'bulk_create', side_effect=bulk_create):
+            stats = roster.import_roster(ROSTER.encode(), 'roster.csv', default_password='init1234', workers=1)
+        self.assertEqual(stats['created'], 2)
+        self.assertEqual(stats['errors'][0], (3, '学号与同时进行的导入冲突：20240002'))
+        self.assertEqual(sorted(User.objects.values_list('username', flat=True)), ['20240001', 'T001'])
+        self.assertEqual(Profile.objects.count(), 2)
+
+    def test_xlsx_and_gbk_csv(self):
+        data = make_xlsx([['学号', '姓名', '角色'], [20240010, '孙八', '学生'], [20240011, '周九', '教师']])
+        stats = roster.import_roster(data, 'roster.xlsx', workers=1)
+        self.assertEqual(stats['created'], 2)
+        self.assertEqual(User.objects.get(username='20240011').profile.role, 'teacher')
+
+        stats = roster.import_roster('学号;姓名\n20240012;吴十\n'.encode('gbk'), 'roster.csv', workers=1)
+        self.assertEqual(stats['created'], 1)
+        self.assertEqual(User.objects.get(username='20240012').first_name, '吴十')
+
+        with self.assertRaises(roster.RosterError):
+            roster.import_roster('姓名\n张三\n'.encode())
+
+    def test_passwords_hashed_on_process_pool(self):
+        passwords = [f'password-{n}' for n in range(roster.POOL_THRESHOLD + 4)]
+        hashes = roster.hash_passwords(passwords, workers=2)
+        self.assertEqual(len(set(hashes)), len(passwords))
+        self.assertTrue(all(check_password(p, h) for p, h in zip(passwords, hashes)))
+
+    def test_command_reports_progress(self):
+        tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp)
+        path = os.path.join(tmp, 'roster.csv')
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write('username,name\n' + ''.join(f'2024{n:04d},学生{n}\n' for n in range(25)))
+        out = StringIO()
+        call_command('import_roster', path, default_password='init1234', batch_size=10, workers=1, stdout=out)
+        self.assertIn('已写入 20 / 25', out.getvalue())
+        self.assertIn('新建: 25', out.getvalue())
+        self.assertEqual(Profile.objects.filter(role='student').count(), 25)
+
+    def test_admin_api(self):
+        client = APIClient()
+        client.force_authenticate(user=make_user('t960', 'teacher'))
+        upload = SimpleUploadedFile('roster.csv', ROSTER.encode(), content_type='text/csv')
+        self.assertEqual(client.post('/api/auth/users/import/', {'file': upload}).status_code,
+                         status.HTTP_403_FORBIDDEN)
+
+        client.force_authenticate(user=make_user('a960', 'admin'))
+        upload = SimpleUploadedFile('roster.csv', ROSTER.encode(), content_type='text/csv')
+        resp = client.post('/api/auth/users/import/', {'file': upload, 'dry_run': 'true'})
+        self.assertEqual((resp.status_code, resp.data['created']), (status.HTTP_200_OK, 3))
+        self.assertFalse(User.objects.filter(username='20240001').exists())
+
+        upload = SimpleUploadedFile('roster.csv', ROSTER.encode(), content_type='text/csv')
+        with mock.patch.object(roster, 'hash_passwords', wraps=roster.hash_passwords) as hash_passwords:
+            resp = client.post('/api/auth/users/import/', {'file': upload, 'default_password': 'init1234'})
+        # 网页请求只起少量哈希进程
+        self.assertEqual(hash_passwords.call_args.kwargs['workers'], roster.WEB_WORKERS)
+        self.assertEqual(resp.data['created'], 3)
+        self.assertEqual(resp.data['errors'][0], {'line': 5, 'detail': '学号重复：20240001'})
+        self.assertTrue(User.objects.get(username='T001').check_password('init1234'))
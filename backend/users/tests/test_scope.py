@@ -0,0 +1,61 @@
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from users import scope
+from users.models import Proposal, TeacherStudent, Topic, TopicSelection
+from users.tests.helpers import make_user
+
+
+class TeacherScopeTest(TestCase):
+    def setUp(self):
+        scope.invalidate()
+        self.client = APIClient()
+        self.teacher = make_user('t700', 'teacher')
+        self.other = make_user('t701', 'teacher')
+        self.student = make_user('s700', 'student')
+        self.topic = Topic.objects.create(teacher=self.teacher, title='课题')
+
+    def scoped_pairs(self):
+        return set(TeacherStudent.objects.values_list('teacher_id', 'student_id'))
+
+    def test_scope_follows_selections_and_teacher_changes(self):
+        selection = TopicSelection.objects.create(topic=self.topic, student=self.student)
+        self.assertEqual(self.scoped_pairs(), {(self.teacher.pk, self.student.pk)})
+        self.assertEqual(scope.teacher_student_ids(self.teacher), {self.student.pk})
+
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.topic.teacher = self.other
+            self.topic.save()
+        self.assertEqual(self.scoped_pairs(), {(self.other.pk, self.student.pk)})
+        # 缓存在提交后才失效，但鉴权直接查表，旧教师立刻失去权限
+        self.assertFalse(scope.teacher_has_student(self.teacher, self.student.pk))
+        self.assertEqual(scope.teacher_student_ids(self.teacher), {self.student.pk})
+        for callback in callbacks:
+            callback()
+        # the cached lookup for the previous teacher was invalidated
+        self.assertEqual(scope.teacher_student_ids(self.teacher), frozenset())
+
+        selection.delete()
+        self.assertEqual(self.scoped_pairs(), set())
+
+    def test_cached_lookup_is_query_free_when_warm(self):
+        TopicSelection.objects.create(topic=self.topic, student=self.student)
+        scope.teacher_student_ids(self.teacher)
+        with self.assertNumQueries(0):
+            self.assertIn(self.student.pk, scope.teacher_student_ids(self.teacher.pk))
+
+    def test_list_view_filters_through_scope_join(self):
+        TopicSelection.objects.create(topic=self.topic, student=self.student)
+        outsider = make_user('s701', 'student')
+        Proposal.objects.create(student=self.student, file='proposal/p.pdf')
+        Proposal.objects.create(student=outsider, file='proposal/p.pdf')
+
+        self.client.force_authenticate(user=self.teacher)
+        with CaptureQueriesContext(connection) as ctx:
+            resp = self.client.get('/api/auth/proposal/all-proposals/')
+        self.assertEqual([item['student_id'] for item in resp.data['results']], ['s700'])
+        sql = ctx.captured_queries[0]['sql']
+        self.assertIn('users_teacherstudent', sql)
+        self.assertNotIn('DISTINCT', sql)
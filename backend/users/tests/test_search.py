@@ -0,0 +1,43 @@
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from users.models import Thesis, UserSearchToken
+from users.search import matching_user_ids
+from users.tests.helpers import make_user
+
+
+class StudentSearchTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.admin = make_user('a600', 'admin')
+        self.zhang = make_user('20210001', 'student', first_name='明', last_name='张')
+        self.smith = make_user('20210002', 'student', first_name='John', last_name='Smith')
+        self.other = make_user('20229999', 'student', first_name='悦', last_name='徐')
+        for student in (self.zhang, self.smith, self.other):
+            Thesis.objects.create(student=student, title='论文', file='thesis/t.pdf')
+        self.client.force_authenticate(user=self.admin)
+
+    def search(self, query):
+        return sorted(matching_user_ids(query).values_list('user_id', flat=True))
+
+    def test_substring_matching(self):
+        self.assertEqual(self.search('张'), [self.zhang.pk])
+        self.assertEqual(self.search('张明'), [self.zhang.pk])
+        self.assertEqual(self.search('明张'), [self.zhang.pk])
+        self.assertEqual(self.search('2021'), [self.zhang.pk, self.smith.pk])
+        self.assertEqual(self.search('10001'), [self.zhang.pk])
+        self.assertEqual(self.search('JOHN smith'), [self.smith.pk])
+        self.assertEqual(self.search('mith'), [self.smith.pk])
+        self.assertEqual(self.search('smithx'), [])
+        self.assertIsNone(matching_user_ids('  '))
+
+    def test_index_follows_renames(self):
+        self.zhang.last_name = '李'
+        self.zhang.save()
+        self.assertEqual(self.search('张'), [])
+        self.assertEqual(self.search('李明'), [self.zhang.pk])
+        self.assertFalse(UserSearchToken.objects.filter(user=self.zhang, token='张').exists())
+
+    def test_list_view_filters_by_name(self):
+        resp = self.client.get('/api/auth/thesis/all-theses/', {'username': '徐悦'})
+        self.assertEqual([item['student_id'] for item in resp.data['results']], ['20229999'])
@@ -0,0 +1,110 @@
+import random
+import shutil
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from users import minhash, processing, scope, similarity
+from users.models import LSHBucket, Proposal, SimilaritySignature, SubmissionMetadata, Thesis, Topic, TopicSelection
+from users.tests.helpers import make_user
+
+
+CHARS = [chr(c) for c in range(0x4e00, 0x4e00 + 3000)]
+
+
+def random_text(rng, length=6000):
+    return ''.join(rng.choice(CHARS) for _ in range(length))
+
+
+class SimilarityIndexTest(TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp)
+        settings = override_settings(MEDIA_ROOT=self.tmp, SUBMISSION_PROCESSING={'ASYNC': False})
+        settings.enable()
+        self.addCleanup(settings.disable)
+        scope.invalidate()
+
+        self.client = APIClient()
+        self.teacher = make_user('t950', 'teacher')
+        self.author = make_user('s950', 'student')
+        self.copier = make_user('s951', 'student')
+        self.stranger = make_user('s952', 'student')
+        TopicSelection.objects.create(topic=Topic.objects.create(teacher=self.teacher, title='课题'),
+                                      student=self.author)
+
+        rng = random.Random(7)
+        self.original = random_text(rng)
+        self.thesis = self.add(Thesis, self.author, self.original, title='原文')
+        # 一半内容相同
+        self.copy = self.add(Proposal, self.copier, self.original[:3000] + random_text(rng, 3000))
+        self.unrelated = self.add(Thesis, self.stranger, random_text(rng), title='无关')
+        self.own_version = self.add(Thesis, self.author, self.original, title='原文二稿')
+
+    def add(self, model, student, text, **fields):
+        obj = model.objects.create(student=student, file=f'{model.__name__.lower()}/{random.random()}.pdf', **fields)
+        kind = 'thesis' if model is Thesis else 'proposal'
+        meta = SubmissionMetadata.objects.create(**{kind: obj}, file_name=obj.file.name, status='done', text=text)
+        similarity.index(meta)
+        return obj
+
+    def similar(self, thesis, query=''):
+        self.client.force_authenticate(user=self.teacher)
+        return self.client.get(f'/api/auth/thesis/{thesis.pk}/similar/{query}')
+
+    def test_top_matches(self):
+        resp = self.similar(self.thesis)
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        self.assertTrue(resp.data['indexed'])
+        results = resp.data['results']
+        self.assertEqual([(r['kind'], r['id']) for r in results], [('proposal', self.copy.pk)])
+        # 半数内容相同的两份文档，分片 Jaccard 约为 1/3
+        self.assertAlmostEqual(results[0]['similarity'], 1 / 3, delta=0.12)
+        self.assertEqual(results[0]['student_id'], 's951')
+
+        results = self.similar(self.thesis, '?include_own=1').data['results']
+        self.assertEqual(results[0]['id'], self.own_version.pk)
+        self.assertEqual(results[0]['similarity'], 1.0)
+
+    def test_estimate_tracks_true_jaccard(self):
+        size, num_perm, bands = similarity.params()
+        a, b = minhash.shingles(self.original, size), minhash.shingles(self.original[:4000], size)
+        estimate = minhash.estimate(minhash.signature(a, num_perm), minhash.signature(b, num_perm))
+        self.assertAlmostEqual(estimate, len(a & b) / len(a | b), delta=0.12)
+
+    def test_permissions_and_unindexed(self):
+        self.client.force_authenticate(user=self.author)
+        self.assertEqual(self.client.get(f'/api/auth/thesis/{self.thesis.pk}/similar/').status_code,
+                         status.HTTP_403_FORBIDDEN)
+        # 不在范围内的论文
+        self.assertEqual(self.similar(self.unrelated).status_code, status.HTTP_403_FORBIDDEN)
+
+        pending = Thesis.objects.create(student=self.author, title='待处理', file='thesis/p.pdf')
+        resp = self.similar(pending)
+        self.assertEqual((resp.data['indexed'], resp.data['results']), (False, []))
+
+    def test_processing_indexes_incrementally(self):
+        with mock.patch.object(processing, 'pdf_text', return_value=self.original[:5000]):
+            thesis = Thesis(student=self.author, title='新版本')
+            thesis.file.save('new.pdf', ContentFile(b'%PDF-1.4 new version'))
+            with self.captureOnCommitCallbacks(execute=True):
+                processing.schedule('thesis', thesis)
+        self.assertTrue(SimilaritySignature.objects.filter(metadata__thesis=thesis).exists())
+        results = self.similar(thesis, '?include_own=1').data['results']
+        self.assertEqual(results[0]['id'], self.thesis.pk)
+
+    def test_reindex_command(self):
+        SimilaritySignature.objects.all().delete()
+        self.assertFalse(LSHBucket.objects.exists())
+        out = StringIO()
+        call_command('reindex_similarity', workers=2, batch_size=2, stdout=out)
+        self.assertIn('4 份文档', out.getvalue())
+        _, num_perm, bands = similarity.params()
+        self.assertEqual(LSHBucket.objects.count(), 4 * bands)
+        self.assertEqual(self.similar(self.thesis).data['results'][0]['id'], self.copy.pk)
@@ -0,0 +1,142 @@
+import os
+import shutil
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from django.core.files.base import ContentFile
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from users.models import Proposal, StoredBlob, StoredFile, Thesis
+from users.storage import ContentAddressedStorage, blob_name
+from users.tests.helpers import make_user
+
+
+class ContentAddressedStorageTest(TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp)
+        settings = override_settings(MEDIA_ROOT=self.tmp)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.student = make_user('s700', 'student')
+
+    def blob_files(self):
+        return sorted(
+            name for _, _, names in os.walk(os.path.join(self.tmp, 'blobs')) for name in names
+        )
+
+    def test_identical_uploads_share_one_blob(self):
+        content = b'%PDF-1.7 same paper' * 100
+        proposal = Proposal(student=self.student)
+        proposal.file.save('paper.pdf', ContentFile(content))
+        first = Thesis(student=self.student, title='v1')
+        first.file.save('paper.pdf', ContentFile(content))
+        second = Thesis(student=self.student, title='v2')
+        second.file.save('paper.pdf', ContentFile(content))
+
+        # FileField 里的名字照旧，按 upload_to 生成且互不相同
+        self.assertTrue(first.file.name.startswith('thesis/'))
+        self.assertNotEqual(first.file.name, second.file.name)
+        self.assertEqual(len(self.blob_files()), 1)
+        blob = StoredBlob.objects.get()
+        self.assertEqual((blob.refcount, blob.size), (3, len(content)))
+        self.assertTrue(first.file.path.endswith(blob_name(blob.sha256)))
+        with second.file.open('rb') as f:
+            self.assertEqual(f.read(), content)
+        self.assertEqual(second.file.size, len(content))
+
+    def test_refcounted_delete(self):
+        content = b'draft'
+        theses = []
+        for title in ('v1', 'v2'):
+            thesis = Thesis(student=self.student, title=title)
+            thesis.file.save('draft.pdf', ContentFile(content))
+            theses.append(thesis)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            theses[0].delete()
+        self.assertEqual(StoredBlob.objects.get().refcount, 1)
+        self.assertEqual(len(self.blob_files()), 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            theses[1].delete()
+        self.assertFalse(StoredBlob.objects.exists())
+        self.assertFalse(StoredFile.objects.exists())
+        self.assertEqual(self.blob_files(), [])
+
+    def test_rehome_existing_media(self):
+        content = b'legacy paper'
+        for name in ('thesis/2025/01/a.pdf', 'proposal/2025/01/b.pdf'):
+            os.makedirs(os.path.join(self.tmp, os.path.dirname(name)), exist_ok=True)
+            with open(os.path.join(self.tmp, name), 'wb') as f:
+                f.write(content)
+        thesis = Thesis.objects.create(student=self.student, title='旧论文', file='thesis/2025/01/a.pdf')
+        Proposal.objects.create(student=self.student, file='proposal/2025/01/b.pdf')
+        Thesis.objects.create(student=self.student, title='丢失', file='thesis/2025/01/missing.pdf')
+
+        out = StringIO()
+        call_command('rehome_media', stdout=out)
+        self.assertIn('已迁移 2 个文件', out.getvalue())
+        self.assertIn('缺失 1 个', out.getvalue())
+        self.assertFalse(os.path.exists(os.path.join(self.tmp, 'thesis/2025/01/a.pdf')))
+        self.assertEqual(StoredBlob.objects.get().refcount, 2)
+
+        thesis.refresh_from_db()
+        self.assertEqual(thesis.file.name, 'thesis/2025/01/a.pdf')
+        with thesis.file.open('rb') as f:
+            self.assertEqual(f.read(), content)
+
+        StoredBlob.objects.update(refcount=7)
+        call_command('rehome_media', verify=True, stdout=StringIO())
+        self.assertEqual(StoredBlob.objects.get().refcount, 2)
+
+    def test_name_taken_concurrently_is_retried(self):
+        storage = Thesis._meta.get_field('file').storage
+        first = storage.save('thesis/2026/05/thesis.pdf', ContentFile(b'first'))
+        # 模拟另一个请求在 exists() 检查之后抢先插入了同一名字：第一次检查落空
+        answers, real_exists = [False], ContentAddressedStorage.exists
+
+        def exists(storage, name):
+            return answers.pop() if answers else real_exists(storage, name)
+
+        with mock.patch.object(ContentAddressedStorage, 'exists', exists):
+            second = storage.save('thesis/2026/05/thesis.pdf', ContentFile(b'second'))
+        self.assertEqual(first, 'thesis/2026/05/thesis.pdf')
+        self.assertNotEqual(second, first)
+        self.assertEqual(StoredFile.objects.count(), 2)
+        self.assertEqual(len(self.blob_files()), 2)
+        self.assertEqual(sorted(StoredBlob.objects.values_list('refcount', flat=True)), [1, 1])
+        with storage.open(second) as f:
+            self.assertEqual(f.read(), b'second')
+
+    def test_orphan_blobs_removed_by_verify(self):
+        storage = Thesis._meta.get_field('file').storage
+        path = storage.blob_path('ab' * 32)
+        os.makedirs(os.path.dirname(path))
+        with open(path, 'wb') as f:
+            f.write(b'rolled back')
+        self.assertEqual(storage.orphan_blobs(), [])
+        os.utime(path, (0, 0))
+        out = StringIO()
+        call_command('rehome_media', verify=True, stdout=out)
+        self.assertIn('删除无主内容文件 1 个', out.getvalue())
+        self.assertFalse(os.path.exists(path))
+
+    @override_settings(SUBMISSION_PROCESSING={'ASYNC': False})
+    def test_replacing_thesis_file_releases_old_name(self):
+        thesis = Thesis(student=self.student, title='v1')
+        thesis.file.save('draft.pdf', ContentFile(b'old draft'))
+        old_name = thesis.file.name
+        client = APIClient()
+        client.force_authenticate(user=self.student)
+        with self.captureOnCommitCallbacks(execute=True):
+            resp = client.patch('/api/auth/thesis/detail/',
+                                {'file': SimpleUploadedFile('draft.pdf', b'new draft')}, format='multipart')
+        self.assertEqual(resp.status_code, 200)
+        self.assertFalse(StoredFile.objects.filter(name=old_name).exists())
+        self.assertEqual(list(StoredBlob.objects.values_list('refcount', flat=True)), [1])
+        self.assertEqual(len(self.blob_files()), 1)
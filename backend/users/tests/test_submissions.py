@@ -0,0 +1,181 @@
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from users.models import (
+    Topic, TopicSelection, Proposal, ProposalReview, MidtermCheck, MidtermReview, Thesis, ThesisReview,
+)
+from users.tests.helpers import make_user
+
+
+class SubmissionListQueryTest(TestCase):
+    endpoints = (
+        '/api/auth/thesis/all-theses/',
+        '/api/auth/proposal/all-proposals/',
+        '/api/auth/midterm/all-midterms/',
+    )
+
+    def setUp(self):
+        self.client = APIClient()
+        self.admin = make_user('a400', 'admin')
+        self.teacher = make_user('t400', 'teacher', first_name='衡', last_name='赵')
+        self.topic = Topic.objects.create(teacher=self.teacher, title='课题', max_students=100)
+
+    def add_students(self, count):
+        for _ in range(count):
+            student = make_user(f's4{Proposal.objects.count():03d}', 'student', first_name='明')
+            TopicSelection.objects.create(topic=self.topic, student=student)
+            proposal = Proposal.objects.create(student=student, file='proposal/p.pdf')
+            midterm = MidtermCheck.objects.create(student=student, file='midterm/m.pdf')
+            thesis = Thesis.objects.create(student=student, title='初稿', file='thesis/t.pdf')
+            for result in ('revise', 'pass'):
+                ProposalReview.objects.create(proposal=proposal, reviewer=self.teacher, result=result)
+                MidtermReview.objects.create(midterm=midterm, reviewer=self.teacher, result=result)
+                ThesisReview.objects.create(thesis=thesis, reviewer=self.teacher, stage='first_review', result=result)
+
+    def assert_constant_queries(self, user, expected):
+        self.client.force_authenticate(user=user)
+        self.add_students(2)
+        for url in self.endpoints:
+            with self.assertNumQueries(expected):
+                self.client.get(url)
+        self.add_students(10)
+        for url in self.endpoints:
+            with self.assertNumQueries(expected):
+                resp = self.client.get(url)
+            results = resp.data['results']
+            self.assertEqual(len(results), 12)
+            self.assertEqual(results[0]['student_name'], '明')
+            self.assertEqual(results[0]['reviews'][0]['reviewer_name'], '赵衡' if 'thesis' not in url else '衡')
+
+    def test_admin_lists_cost_constant_queries(self):
+        # submissions joined with student + reviews joined with reviewer
+        self.assert_constant_queries(self.admin, 2)
+
+    def test_teacher_lists_cost_constant_queries(self):
+        self.assert_constant_queries(self.teacher, 2)
+
+
+class SubmissionKeysetPaginationTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.admin = make_user('a500', 'admin')
+        self.student = make_user('s500', 'student')
+        self.client.force_authenticate(user=self.admin)
+        self.theses = [
+            Thesis.objects.create(student=self.student, title=f'v{i}', file='thesis/t.pdf') for i in range(12)
+        ]
+        # identical timestamps must still page deterministically via the id tie-breaker
+        Thesis.objects.filter(pk__in=[t.pk for t in self.theses[4:8]]).update(submitted_at=self.theses[4].submitted_at)
+
+    def test_pages_cover_every_row_once(self):
+        seen = []
+        url = '/api/auth/thesis/all-theses/?page_size=5'
+        pages = []
+        while url:
+            resp = self.client.get(url)
+            pages.append(resp.data)
+            seen.extend(item['id'] for item in resp.data['results'])
+            url = resp.data['next']
+        self.assertEqual(len(pages), 3)
+        self.assertEqual(len(seen), 12)
+        self.assertEqual(sorted(seen), sorted(t.pk for t in self.theses))
+        self.assertIsNone(pages[0]['previous'])
+
+        # walking back from the last page returns the same rows
+        resp = self.client.get(pages[2]['previous'])
+        self.assertEqual(resp.data['results'], pages[1]['results'])
+
+    def test_default_first_page_is_bounded(self):
+        Thesis.objects.bulk_create(
+            Thesis(student=self.student, title='bulk', file='thesis/t.pdf') for _ in range(60)
+        )
+        resp = self.client.get('/api/auth/thesis/all-theses/')
+        self.assertEqual(len(resp.data['results']), 50)
+        self.assertIsNotNone(resp.data['next'])
+
+    def test_invalid_cursor(self):
+        resp = self.client.get('/api/auth/thesis/all-theses/?cursor=garbage')
+        self.assertEqual(resp.status_code, 404)
+
+
+class BulkReviewTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.teacher = make_user('t450', 'teacher')
+        other_teacher = make_user('t451', 'teacher')
+        topic = Topic.objects.create(teacher=self.teacher, title='课题', max_students=100)
+        self.midterms = []
+        for n in range(20):
+            student = make_user(f's45{n:02d}', 'student')
+            TopicSelection.objects.create(topic=topic, student=student)
+            self.midterms.append(MidtermCheck.objects.create(student=student, file='midterm/m.pdf'))
+        outsider = make_user('s4599', 'student')
+        TopicSelection.objects.create(topic=Topic.objects.create(teacher=other_teacher, title='别人的'), student=outsider)
+        self.foreign = MidtermCheck.objects.create(student=outsider, file='midterm/m.pdf')
+        self.client.force_authenticate(user=self.teacher)
+
+    def post(self, url, reviews):
+        return self.client.post(url, {'reviews': reviews}, format='json')
+
+    def test_whole_stack_in_one_request(self):
+        reviews = [{'id': m.pk, 'result': 'pass', 'score': 80 + n % 10, 'feedback': '好'}
+                   for n, m in enumerate(self.midterms)]
+        resp = self.post('/api/auth/midterm/reviews/bulk/', reviews)
+        self.assertEqual(resp.status_code, 201)
+        self.assertEqual(resp.data['created'], 20)
+        self.assertEqual(MidtermReview.objects.filter(reviewer=self.teacher).count(), 20)
+        self.assertEqual({r['status'] for r in resp.data['results']}, {'created'})
+        # bulk_create 不触发信号，进度快照仍须更新
+        student = self.midterms[0].student
+        self.assertEqual(student.progress_snapshot.data['midterm']['status'], 'completed')
+
+    def test_query_count_does_not_grow_with_batch(self):
+        def count(midterms):
+            with CaptureQueriesContext(connection) as ctx:
+                self.post('/api/auth/midterm/reviews/bulk/', [{'id': m.pk, 'result': 'revise'} for m in midterms])
+            return len(ctx.captured_queries)
+        self.assertEqual(count(self.midterms[:2]), count(self.midterms[2:]))
+
+    def test_per_item_errors(self):
+        resp = self.post('/api/auth/midterm/reviews/bulk/', [
+            {'id': self.midterms[0].pk, 'result': 'pass', 'score': 90},
+            {'id': self.midterms[1].pk, 'result': 'maybe'},
+            {'id': self.midterms[2].pk, 'result': 'pass', 'score': 101},
+            {'id': self.foreign.pk, 'result': 'pass'},
+            {'id': 999999, 'result': 'pass'},
+            {'id': self.midterms[0].pk, 'result': 'fail'},
+        ])
+        self.assertEqual(resp.status_code, 207)
+        self.assertEqual((resp.data['created'], resp.data['failed']), (1, 5))
+        results = resp.data['results']
+        self.assertEqual(results[0]['status'], 'created')
+        self.assertIn('result', results[1]['errors'])
+        self.assertIn('score', results[2]['errors'])
+        self.assertEqual(results[3]['errors']['id'], ['Permission denied'])
+        self.assertEqual(results[4]['errors']['id'], ['Not found'])
+        self.assertEqual(results[5]['errors']['id'], ['同一批次中重复'])
+        self.assertEqual(MidtermReview.objects.count(), 1)
+
+        resp = self.post('/api/auth/midterm/reviews/bulk/', [{'id': self.foreign.pk, 'result': 'pass'}])
+        self.assertEqual(resp.status_code, 400)
+
+    def test_thesis_stage_and_permissions(self):
+        thesis = Thesis.objects.create(student=self.midterms[0].student, title='论文', file='thesis/t.pdf',
+                                       stage='second_review')
+        proposal = Proposal.objects.create(student=self.midterms[1].student, file='proposal/p.pdf')
+        resp = self.post('/api/auth/thesis/reviews/bulk/', [
+            {'id': thesis.pk, 'result': 'revise'},
+        ])
+        self.assertEqual(resp.status_code, 201)
+        self.assertEqual(ThesisReview.objects.get().stage, 'second_review')
+        self.assertEqual(self.post('/api/auth/proposal/reviews/bulk/', [{'id': proposal.pk, 'result': 'pass'}])
+                         .status_code, 201)
+
+        self.client.force_authenticate(user=self.midterms[0].student)
+        self.assertEqual(self.post('/api/auth/thesis/reviews/bulk/', [{'id': thesis.pk, 'result': 'pass'}])
+                         .status_code, 403)
+        self.client.force_authenticate(user=self.teacher)
+        self.assertEqual(self.client.post('/api/auth/thesis/reviews/bulk/', {'reviews': []}, format='json')
+                         .status_code, 400)
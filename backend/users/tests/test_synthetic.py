@@ -0,0 +1,94 @@
+import shutil
+import tempfile
+from io import StringIO
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db.models import Count
+from django.test import TestCase, override_settings
+
+from users import synthetic
+from users.models import (
+    MidtermCheck, Proposal, StoredBlob, StoredFile, StudentProgress, SubmissionMetadata, TeacherStudent, Thesis,
+    Topic, TopicSelection,
+)
+from users.progress import find_inconsistent
+from users.search import matching_user_ids
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class SyntheticDataTest(TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp)
+        settings = override_settings(MEDIA_ROOT=self.tmp)
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+    def generate(self, **options):
+        options = {'seed': 1, 'blobs': 2, 'max_file_mb': 1, 'batch_size': 25, **options}
+        return synthetic.generate(60, 4, 10, **options)
+
+    def test_counts_and_derived_data(self):
+        counts = self.generate()
+        self.assertEqual(counts['students'], User.objects.filter(profile__role='student').count())
+        self.assertEqual(counts['selections'], TopicSelection.objects.count())
+        self.assertEqual(counts['theses'], Thesis.objects.count())
+        submissions = Proposal.objects.count() + MidtermCheck.objects.count() + Thesis.objects.count()
+        self.assertEqual(counts['files'], submissions)
+
+        # 课题上的已选学生与选题记录一致，且不超过容量
+        for topic in Topic.objects.annotate(chosen=Count('selections')):
+            self.assertEqual(topic.selected_students, topic.chosen)
+            self.assertLessEqual(topic.chosen, topic.max_students)
+        self.assertEqual(TeacherStudent.objects.count(), counts['selections'])
+
+        # 每份文件都登记在内容寻址存储里，引用计数与实际引用一致，内容可读
+        self.assertEqual(StoredFile.objects.count(), submissions)
+        self.assertEqual(SubmissionMetadata.objects.filter(status='done').count(), submissions)
+        for blob in StoredBlob.objects.annotate(actual=Count('files')):
+            self.assertEqual(blob.refcount, blob.actual)
+        thesis = Thesis.objects.first()
+        with thesis.file.open('rb') as f:
+            self.assertTrue(f.read(5).startswith(b'%PDF'))
+
+        # 进度快照与实时计算一致，搜索索引可用，账号可以登录
+        self.assertEqual(StudentProgress.objects.count(), counts['students'])
+        self.assertEqual(find_inconsistent(), [])
+        student = User.objects.get(username='syn-s000001')
+        self.assertTrue(User.objects.filter(pk__in=matching_user_ids(student.last_name + student.first_name), pk=student.pk).exists())
+        self.assertTrue(student.check_password('miku1314'))
+
+    def test_same_seed_same_data_and_prefix_guard(self):
+        self.generate()
+        first = list(TopicSelection.objects.order_by('student__username').values_list('student__username', 'topic__title'))
+        with self.assertRaises(synthetic.GeneratorError):
+            self.generate()
+        self.generate(prefix='again')
+        second = list(
+            TopicSelection.objects.filter(student__username__startswith='again-')
+            .order_by('student__username').values_list('student__username', 'topic__title')
+        )
+        self.assertEqual([(u.replace('syn-', ''), t) for u, t in first], [(u.replace('again-', ''), t) for u, t in second])
+
+    def test_interrupted_run_keeps_refcounts(self):
+        def progress(done, total):
+            if done >= 25:
+                raise KeyboardInterrupt
+
+        with self.assertRaises(KeyboardInterrupt):
+            self.generate(progress=progress)
+        # 已提交的批次里，每份文件的内容都已计入引用，不会被当作孤儿回收
+        self.assertTrue(StoredFile.objects.exists())
+        for blob in StoredBlob.objects.annotate(actual=Count('files')):
+            self.assertEqual(blob.refcount, blob.actual)
+
+    def test_command(self):
+        out = StringIO()
+        call_command('generate_data', students=30, teachers=3, topics=5, batch_size=20, blobs=1, max_file_mb=1,
+                     stdout=out)
+        self.assertIn('学生 20 / 30', out.getvalue())
+        self.assertIn('合成数据生成完成', out.getvalue())
+        with self.assertRaises(CommandError):
+            call_command('generate_data', students=30, teachers=3, topics=5, stdout=StringIO())
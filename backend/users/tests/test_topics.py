@@ -0,0 +1,103 @@
+from django.contrib.auth.models import User
+from django.db import IntegrityError, transaction
+from django.test import TestCase
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from users.models import StudentProgress, Topic, TopicSelection
+from users.tests.helpers import make_user
+
+
+class TopicListQueryTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.student = make_user('s300', 'student')
+        self.teachers = [make_user(f't30{i}', 'teacher', first_name='师', last_name=str(i)) for i in range(3)]
+        self.client.force_authenticate(user=self.student)
+
+    def create_topics(self, count):
+        for i in range(count):
+            Topic.objects.create(teacher=self.teachers[i % 3], title=f'课题{Topic.objects.count()}', max_students=2)
+
+    def test_list_query_count_is_constant(self):
+        self.create_topics(3)
+        with self.assertNumQueries(1):
+            resp = self.client.get('/api/auth/topics/')
+        self.assertEqual(len(resp.data['results']), 3)
+
+        self.create_topics(30)
+        with self.assertNumQueries(1):
+            resp = self.client.get('/api/auth/topics/')
+        self.assertEqual(len(resp.data['results']), 33)
+        self.assertTrue(all(item['teacher_name'] for item in resp.data['results']))
+
+    def test_is_selected_annotation(self):
+        self.create_topics(3)
+        chosen = Topic.objects.order_by('id').first()
+        TopicSelection.objects.create(topic=chosen, student=self.student)
+
+        resp = self.client.get('/api/auth/topics/')
+        selected = {item['id']: item['is_selected'] for item in resp.data['results']}
+        self.assertTrue(selected.pop(chosen.id))
+        self.assertFalse(any(selected.values()))
+
+        with self.assertNumQueries(1):
+            resp = self.client.get(f'/api/auth/topics/{chosen.id}/')
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        self.assertTrue(resp.data['is_selected'])
+
+
+class TopicSelectTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.teacher = make_user('t310', 'teacher')
+        self.students = [make_user(f's31{i}', 'student') for i in range(3)]
+        self.topic = Topic.objects.create(teacher=self.teacher, title='热门课题', max_students=2)
+
+    def select(self, student, topic=None, method='post'):
+        self.client.force_authenticate(user=student)
+        url = f'/api/auth/topics/{(topic or self.topic).pk}/select/'
+        return getattr(self.client, method)(url)
+
+    def test_capacity_is_never_exceeded(self):
+        self.assertEqual(self.select(self.students[0]).status_code, status.HTTP_201_CREATED)
+        self.assertEqual(self.select(self.students[1]).status_code, status.HTTP_201_CREATED)
+        resp = self.select(self.students[2])
+        self.assertEqual(resp.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(resp.data['detail'], '课题已满')
+        self.topic.refresh_from_db()
+        self.assertEqual(self.topic.selected_students, 2)
+        self.assertEqual(self.topic.selections.count(), 2)
+
+    def test_one_selection_per_student(self):
+        other = Topic.objects.create(teacher=self.teacher, title='另一个课题', max_students=2)
+        self.assertEqual(self.select(self.students[0]).status_code, status.HTTP_201_CREATED)
+        self.assertEqual(self.select(self.students[0], other).status_code, status.HTTP_400_BAD_REQUEST)
+        other.refresh_from_db()
+        self.assertEqual(other.selected_students, 0)
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            TopicSelection.objects.create(topic=other, student=self.students[0])
+
+    def test_deselect_releases_seat(self):
+        self.select(self.students[0])
+        self.assertEqual(self.select(self.students[0], method='delete').status_code, status.HTTP_200_OK)
+        self.assertEqual(self.select(self.students[0], method='delete').status_code,
+                         status.HTTP_400_BAD_REQUEST)
+        self.topic.refresh_from_db()
+        self.assertEqual(self.topic.selected_students, 0)
+        self.assertEqual(self.select(self.students[1]).status_code, status.HTTP_201_CREATED)
+
+    def test_unknown_topic(self):
+        self.client.force_authenticate(user=self.students[0])
+        self.assertEqual(self.client.post('/api/auth/topics/9999/select/').status_code,
+                         status.HTTP_404_NOT_FOUND)
+
+    def test_bulk_deleting_students_and_teacher(self):
+        for student in self.students[:2]:
+            self.select(student)
+        User.objects.filter(username__in=[s.username for s in self.students[:1]]).delete()
+        self.assertFalse(StudentProgress.objects.filter(student_id=self.students[0].pk).exists())
+
+        self.teacher.delete()
+        snapshot = StudentProgress.objects.get(student=self.students[1]).data
+        self.assertEqual(snapshot['topic_selection']['status'], 'pending')
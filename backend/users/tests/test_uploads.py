@@ -0,0 +1,166 @@
+import hashlib
+import os
+import shutil
+import tempfile
+import zlib
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from users import processing, uploads
+from users.models import MidtermCheck, Thesis, UploadSession
+from users.serializers import ThesisSerializer
+from users.tests.helpers import make_user
+
+
+class ChunkedUploadTest(TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp)
+        settings = override_settings(
+            MEDIA_ROOT=os.path.join(self.tmp, 'media'),
+            CHUNKED_UPLOAD_DIR=os.path.join(self.tmp, 'sessions'),
+            CHUNKED_UPLOAD_CHUNK_SIZE=1024,
+            SUBMISSION_PROCESSING={'ASYNC': False},
+        )
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+        self.client = APIClient()
+        self.student = make_user('s500', 'student')
+        self.client.force_authenticate(user=self.student)
+        self.content = os.urandom(2500)
+
+    def start(self, **extra):
+        data = {'kind': 'thesis', 'filename': 'thesis.pdf', 'size': len(self.content),
+                'title': '论文初稿', 'stage': 'first_review', **extra}
+        return self.client.post('/api/auth/uploads/', data, format='json')
+
+    def put_chunk(self, session_id, offset, data, **headers):
+        return self.client.put(f'/api/auth/uploads/{session_id}/', data=data,
+                               content_type='application/octet-stream',
+                               HTTP_UPLOAD_OFFSET=str(offset), **headers)
+
+    def test_resumable_upload_creates_thesis(self):
+        resp = self.start()
+        self.assertEqual(resp.status_code, status.HTTP_201_CREATED)
+        session_id = resp.data['id']
+
+        self.assertEqual(self.put_chunk(session_id, 0, self.content[:1024]).data['offset'], 1024)
+        # 重传已确认的块（连接中断后客户端不确定是否成功）得到 409 与当前偏移量
+        resp = self.put_chunk(session_id, 0, self.content[:1024])
+        self.assertEqual(resp.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(resp['Upload-Offset'], '1024')
+
+        self.assertEqual(self.client.get(f'/api/auth/uploads/{session_id}/').data['offset'], 1024)
+        sha = hashlib.sha256(self.content[1024:2048]).hexdigest()
+        self.put_chunk(session_id, 1024, self.content[1024:2048], HTTP_UPLOAD_CHECKSUM=f'sha256={sha}')
+        self.put_chunk(session_id, 2048, self.content[2048:])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            resp = self.client.post(f'/api/auth/uploads/{session_id}/complete/',
+                                    {'crc32': zlib.crc32(self.content)}, format='json')
+        self.assertEqual(resp.status_code, status.HTTP_201_CREATED)
+        thesis = Thesis.objects.get(pk=resp.data['id'])
+        self.assertEqual(thesis.stage, 'first_review')
+        with thesis.file.open('rb') as f:
+            self.assertEqual(f.read(), self.content)
+        self.assertFalse(os.listdir(os.path.join(self.tmp, 'sessions')))
+
+        resp = self.client.post(f'/api/auth/uploads/{session_id}/complete/', format='json')
+        self.assertEqual(resp.status_code, status.HTTP_409_CONFLICT)
+
+    def test_rejects_bad_chunks(self):
+        session_id = self.start().data['id']
+        # 超过单块上限
+        self.assertEqual(self.put_chunk(session_id, 0, self.content[:2000]).status_code,
+                         status.HTTP_400_BAD_REQUEST)
+        resp = self.put_chunk(session_id, 0, self.content[:1024], HTTP_UPLOAD_CHECKSUM='sha256=00')
+        self.assertEqual(resp.status_code, 422)
+        self.assertEqual(UploadSession.objects.get(pk=session_id).received, 0)
+        # 未传完不能完成
+        self.put_chunk(session_id, 0, self.content[:1024])
+        resp = self.client.post(f'/api/auth/uploads/{session_id}/complete/', format='json')
+        self.assertEqual(resp.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(resp.data['offset'], 1024)
+
+        # 整体校验值格式错误为 400，不一致为 422，会话仍可重新完成
+        self.put_chunk(session_id, 1024, self.content[1024:2048])
+        self.put_chunk(session_id, 2048, self.content[2048:])
+        complete = f'/api/auth/uploads/{session_id}/complete/'
+        self.assertEqual(self.client.post(complete, {'crc32': 'abc'}, format='json').status_code,
+                         status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.client.post(complete, {'crc32': zlib.crc32(self.content) ^ 1}, format='json')
+                         .status_code, 422)
+        self.assertEqual(self.client.post(complete, {'crc32': zlib.crc32(self.content)}, format='json')
+                         .status_code, status.HTTP_201_CREATED)
+
+    def test_failed_finalize_keeps_part_file(self):
+        session_id = self.start().data['id']
+        for offset in range(0, len(self.content), 1024):
+            self.put_chunk(session_id, offset, self.content[offset:offset + 1024])
+        session = UploadSession.objects.get(pk=session_id)
+        context = {'request': None}
+        # 文件已存入存储之后才出错：事务回滚，.part 与会话都要能重新完成
+        with mock.patch.object(processing, 'schedule', side_effect=RuntimeError('boom')):
+            with self.assertRaises(RuntimeError):
+                uploads.finalize(session, ThesisSerializer, context)
+        session.refresh_from_db()
+        self.assertEqual(session.status, 'uploading')
+        self.assertEqual(os.listdir(os.path.join(self.tmp, 'sessions')), [f'{session_id}.part'])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            uploads.finalize(session, ThesisSerializer, context)
+        with Thesis.objects.get(student=self.student).file.open('rb') as f:
+            self.assertEqual(f.read(), self.content)
+        self.assertEqual(os.listdir(os.path.join(self.tmp, 'sessions')), [])
+
+    def test_open_session_limits(self):
+        with self.settings(CHUNKED_UPLOAD_MAX_SESSIONS=2):
+            first = self.start().data['id']
+            self.start()
+            resp = self.start()
+            self.assertEqual(resp.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+            # 过期的会话不占名额
+            UploadSession.objects.filter(pk=first).update(updated_at=timezone.now() - timedelta(days=2))
+            self.assertEqual(self.start().status_code, status.HTTP_201_CREATED)
+        with self.settings(CHUNKED_UPLOAD_MAX_RESERVED=len(self.content) * 2):
+            self.assertEqual(self.start().status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+
+    def test_start_validation_and_ownership(self):
+        self.assertEqual(self.start(title='').status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.start(stage='unknown').status_code, status.HTTP_400_BAD_REQUEST)
+        with self.settings(CHUNKED_UPLOAD_MAX_SIZE=100):
+            self.assertEqual(self.start().status_code, status.HTTP_400_BAD_REQUEST)
+
+        session_id = self.start(kind='midterm').data['id']
+        other = make_user('s501', 'student')
+        self.client.force_authenticate(user=other)
+        self.assertEqual(self.client.get(f'/api/auth/uploads/{session_id}/').status_code,
+                         status.HTTP_404_NOT_FOUND)
+
+        self.client.force_authenticate(user=self.student)
+        self.put_chunk(session_id, 0, self.content[:1024])
+        self.put_chunk(session_id, 1024, self.content[1024:2048])
+        self.put_chunk(session_id, 2048, self.content[2048:])
+        resp = self.client.post(f'/api/auth/uploads/{session_id}/complete/', format='json')
+        self.assertEqual(resp.status_code, status.HTTP_201_CREATED)
+        self.assertTrue(MidtermCheck.objects.filter(student=self.student).exists())
+
+    def test_garbage_collection(self):
+        stale_id = self.start().data['id']
+        self.put_chunk(stale_id, 0, self.content[:1024])
+        fresh_id = self.start().data['id']
+        UploadSession.objects.filter(pk=stale_id).update(updated_at=timezone.now() - timedelta(days=2))
+
+        out = StringIO()
+        call_command('cleanup_uploads', stdout=out)
+        self.assertIn('1 个上传会话', out.getvalue())
+        self.assertEqual([str(pk) for pk in UploadSession.objects.values_list('pk', flat=True)], [fresh_id])
+        self.assertEqual(os.listdir(os.path.join(self.tmp, 'sessions')), [f'{fresh_id}.part'])
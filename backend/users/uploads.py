@@ -0,0 +1,251 @@
+"""分块续传上传。
+
+流程：``start`` 建立会话 → 按偏移量多次 ``write_chunk`` → ``finalize`` 生成提交记录。
+
+* 每块边读请求体边写入临时块文件，同时在会话已有的 CRC32 基础上累加校验值（客户端可在
+  ``Upload-Checksum`` 头里附带该块的 SHA-256 逐块核对）；读网络的过程中不持有任何锁；
+* 块写完后用一条 ``UPDATE ... WHERE received = offset`` 推进会话，抢到的请求才把块追加到
+  ``.part`` 文件，偏移量不符的请求得到 409 与当前偏移量，客户端据此续传；
+* ``finalize`` 把 ``.part`` 文件的硬链接交给原有的 Thesis/Proposal/MidtermCheck 序列化器做校验与保存，
+  本地文件存储下是一次 rename，不再复制；``.part`` 在事务提交后才删除，保存中途失败时会话可重新完成；
+* 每个学生同时未完成的会话数与预留的总字节数有上限（``CHUNKED_UPLOAD_MAX_SESSIONS`` /
+  ``CHUNKED_UPLOAD_MAX_RESERVED``），会话按声明的大小预留磁盘；
+* ``collect_garbage`` 删除长时间无进展的会话及其临时文件（``cleanup_uploads`` 命令）。
+"""
+import hashlib
+import os
+import shutil
+import uuid
+import zlib
+from datetime import timedelta
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.files.uploadedfile import UploadedFile
+from django.db import transaction
+from django.utils import timezone
+
+from . import processing
+from .models import UploadSession
+
+
+READ_SIZE = 64 * 1024
+
+
+class UploadError(Exception):
+    def __init__(self, detail, status_code=400, offset=None):
+        super().__init__(detail)
+        self.detail = detail
+        self.status_code = status_code
+        self.offset = offset
+
+
+def upload_dir():
+    path = Path(getattr(settings, 'CHUNKED_UPLOAD_DIR', Path(settings.BASE_DIR) / 'upload_sessions'))
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
+
+def max_upload_size():
+    return getattr(settings, 'CHUNKED_UPLOAD_MAX_SIZE', 200 * 1024 * 1024)
+
+
+def max_chunk_size():
+    return getattr(settings, 'CHUNKED_UPLOAD_CHUNK_SIZE', 8 * 1024 * 1024)
+
+
+def max_open_sessions():
+    return getattr(settings, 'CHUNKED_UPLOAD_MAX_SESSIONS', 3)
+
+
+def max_reserved_size():
+    return getattr(settings, 'CHUNKED_UPLOAD_MAX_RESERVED', 2 * max_upload_size())
+
+
+def session_expiry():
+    return timedelta(seconds=getattr(settings, 'CHUNKED_UPLOAD_EXPIRY', 24 * 3600))
+
+
+def part_path(session):
+    return upload_dir() / f'{session.pk}.part'
+
+
+def start(student, kind, filename, size, metadata):
+    if size <= 0 or size > max_upload_size():
+        raise UploadError(f'文件大小必须在 1 ~ {max_upload_size()} 字节之间')
+    with transaction.atomic():
+        # 锁住学生行，同一学生并发开始的上传逐个计数
+        User.objects.select_for_update().filter(pk=student.pk).exists()
+        open_sessions = UploadSession.objects.filter(
+            student=student, status='uploading', updated_at__gte=timezone.now() - session_expiry(),
+        )
+        sizes = list(open_sessions.values_list('size', flat=True))
+        if len(sizes) >= max_open_sessions():
+            raise UploadError(f'未完成的上传最多 {max_open_sessions()} 个，请先完成或取消已有上传', status_code=429)
+        if sum(sizes) + size > max_reserved_size():
+            raise UploadError('未完成的上传占用空间过多，请先完成或取消已有上传', status_code=429)
+        session = UploadSession.objects.create(
+            student=student, kind=kind, filename=os.path.basename(filename), size=size, metadata=metadata,
+        )
+    part_path(session).touch()
+    return session
+
+
+def _parse_checksum(header):
+    # 形如 "sha256=<hex>"
+    if not header:
+        return None
+    algorithm, _, value = header.partition('=')
+    if algorithm.strip().lower() != 'sha256' or not value:
+        raise UploadError('Upload-Checksum 仅支持 sha256=<hex>')
+    return value.strip().lower()
+
+
+def write_chunk(session, offset, stream, checksum_header=None):
+    """把请求体作为 ``offset`` 处的一块写入会话，返回新的偏移量。"""
+    if session.status != 'uploading':
+        raise UploadError('上传已完成', status_code=409, offset=session.received)
+    if offset != session.received:
+        raise UploadError('偏移量不匹配，请从当前偏移量续传', status_code=409, offset=session.received)
+    expected_sha256 = _parse_checksum(checksum_header)
+
+    limit = min(max_chunk_size(), session.size - offset)
+    chunk_path = upload_dir() / f'{session.pk}.{offset}.{uuid.uuid4().hex}.chunk'
+    crc = session.crc32
+    sha256 = hashlib.sha256()
+    length = 0
+    try:
+        with open(chunk_path, 'wb') as chunk:
+            while True:
+                data = stream.read(READ_SIZE)
+                if not data:
+                    break
+                length += len(data)
+                if length > limit:
+                    raise UploadError(f'分块过大：本块最多 {limit} 字节')
+                crc = zlib.crc32(data, crc)
+                sha256.update(data)
+                chunk.write(data)
+        if length == 0:
+            raise UploadError('空分块')
+        if expected_sha256 and sha256.hexdigest() != expected_sha256:
+            raise UploadError('分块校验失败', status_code=422, offset=offset)
+
+        with transaction.atomic():
+            claimed = UploadSession.objects.filter(pk=session.pk, status='uploading', received=offset).update(
+                received=offset + length, crc32=crc, updated_at=timezone.now(),
+            )
+            if not claimed:
+                session.refresh_from_db(fields=['received'])
+                raise UploadError('偏移量不匹配，请从当前偏移量续传', status_code=409, offset=session.received)
+            with open(part_path(session), 'r+b') as part, open(chunk_path, 'rb') as chunk:
+                # 截掉上次中断残留的尾部，再追加本块
+                part.truncate(offset)
+                part.seek(offset)
+                while True:
+                    data = chunk.read(READ_SIZE)
+                    if not data:
+                        break
+                    part.write(data)
+    finally:
+        chunk_path.unlink(missing_ok=True)
+
+    session.received = offset + length
+    session.crc32 = crc
+    return session.received
+
+
+class SessionFile(UploadedFile):
+    """指向 ``.part`` 文件硬链接的上传文件；提供 ``temporary_file_path`` 让文件系统存储直接 rename。
+
+    存储移走的是链接，``.part`` 本身留到事务提交后再删；文件系统不支持硬链接时退回复制。
+    """
+
+    def __init__(self, session):
+        path = upload_dir() / f'{session.pk}.{uuid.uuid4().hex}.link'
+        try:
+            os.link(part_path(session), path)
+        except OSError:
+            shutil.copyfile(part_path(session), path)
+        super().__init__(
+            file=open(path, 'rb'), name=session.filename,
+            content_type='application/octet-stream', size=session.size,
+        )
+        self.path = path
+
+    def temporary_file_path(self):
+        return str(self.path)
+
+    def close(self):
+        super().close()
+        # 存储已移走时不存在；保存失败时删掉链接，.part 不受影响
+        self.path.unlink(missing_ok=True)
+
+
+def finalize(session, serializer_class, context, expected_crc32=None):
+    """校验完整性并生成提交记录，返回序列化器（已保存）。"""
+    if session.status != 'uploading':
+        raise UploadError('上传已完成', status_code=409, offset=session.received)
+    if session.received != session.size:
+        raise UploadError('文件尚未传完', status_code=409, offset=session.received)
+    if expected_crc32 is not None:
+        try:
+            expected_crc32 = int(expected_crc32)
+        except (TypeError, ValueError):
+            raise UploadError('校验值格式不正确', status_code=400)
+        if expected_crc32 != session.crc32:
+            raise UploadError('文件校验失败', status_code=422)
+
+    upload = SessionFile(session)
+    try:
+        serializer = serializer_class(data={**session.metadata, 'file': upload}, context=context)
+        serializer.is_valid(raise_exception=True)
+        with transaction.atomic():
+            claimed = UploadSession.objects.filter(pk=session.pk, status='uploading').update(
+                status='completed', updated_at=timezone.now(),
+            )
+            if not claimed:
+                raise UploadError('上传已完成', status_code=409)
+            instance = serializer.save(student=session.student)
+            UploadSession.objects.filter(pk=session.pk).update(object_id=instance.pk)
+            processing.schedule(session.kind, instance)
+            # 提交之前出错时会话回到 uploading，.part 还在，可以重新完成
+            path = part_path(session)
+            transaction.on_commit(lambda: path.unlink(missing_ok=True))
+    finally:
+        upload.close()
+    session.status = 'completed'
+    session.object_id = instance.pk
+    return serializer
+
+
+def discard(session):
+    part_path(session).unlink(missing_ok=True)
+    session.delete()
+
+
+def collect_garbage(max_age=None, now=None):
+    """删除超过 ``max_age`` 无进展的未完成会话、同样过期的已完成会话记录，以及无主临时文件。
+
+    返回 ``(删除的会话数, 删除的文件数)``。
+    """
+    now = now or timezone.now()
+    cutoff = now - (max_age or session_expiry())
+    stale = UploadSession.objects.filter(updated_at__lt=cutoff)
+    removed_files = 0
+    for pk in stale.filter(status='uploading').values_list('pk', flat=True).iterator():
+        path = upload_dir() / f'{pk}.part'
+        if path.exists():
+            path.unlink()
+            removed_files += 1
+    removed_sessions, _ = stale.delete()
+
+    live = {str(pk) for pk in UploadSession.objects.filter(status='uploading').values_list('pk', flat=True)}
+    cutoff_ts = cutoff.timestamp()
+    for path in upload_dir().iterdir():
+        if path.name.split('.', 1)[0] in live or path.stat().st_mtime >= cutoff_ts:
+            continue
+        path.unlink(missing_ok=True)
+        removed_files += 1
+    return removed_sessions, removed_files
@@ -3,41 +3,65 @@ from .views import (
     RegisterAPIView, LoginAPIView, MeAPIView,
     ThesisSubmitAPIView, ThesisDetailAPIView,
     StudentThesesListAPIView, AllThesesListAPIView,
-    ThesisReviewAPIView,
+    ThesisReviewAPIView, ThesisSimilarAPIView,
     ProposalSubmitAPIView, MyProposalsListAPIView,
     AllProposalsListAPIView, ProposalReviewAPIView,
     MidtermSubmitAPIView, MyMidtermsListAPIView,
     AllMidtermsListAPIView, MidtermReviewAPIView,
-    StudentProgressAPIView,
+    StudentProgressAPIView, CohortProgressAPIView,
+    UploadSessionStartAPIView, UploadSessionAPIView, UploadSessionCompleteAPIView,
+    SubmissionFileDownloadAPIView, SubmissionExportAPIView,
+    ThesisBulkReviewAPIView, ProposalBulkReviewAPIView, MidtermBulkReviewAPIView,
+    RosterImportAPIView,
 )
 from .views import TopicListCreateAPIView, TopicDetailAPIView, MyTopicsListAPIView, TopicStudentsAPIView
-from .views import TopicSelectAPIView
+from .views import TopicSelectAPIView, TopicPreferenceAPIView
 
 urlpatterns = [
     path('register/', RegisterAPIView.as_view(), name='register'),
     path('login/', LoginAPIView.as_view(), name='login'),
     path('me/', MeAPIView.as_view(), name='me'),
+    path('users/import/', RosterImportAPIView.as_view(), name='roster_import'),
     path('thesis/submit/', ThesisSubmitAPIView.as_view(), name='thesis_submit'),
     path('thesis/detail/', ThesisDetailAPIView.as_view(), name='thesis_detail'),
     path('thesis/my-thesis/', StudentThesesListAPIView.as_view(), name='my_thesis'),
     path('thesis/all-theses/', AllThesesListAPIView.as_view(), name='all_theses'),
     path('thesis/<int:thesis_id>/review/', ThesisReviewAPIView.as_view(), name='thesis_review'),
+    path('thesis/<int:thesis_id>/similar/', ThesisSimilarAPIView.as_view(), name='thesis_similar'),
+    path('thesis/reviews/bulk/', ThesisBulkReviewAPIView.as_view(), name='thesis_bulk_review'),
     # Proposal submission endpoints
     path('proposal/submit/', ProposalSubmitAPIView.as_view(), name='proposal_submit'),
     path('proposal/my-proposals/', MyProposalsListAPIView.as_view(), name='my_proposals'),
     path('proposal/all-proposals/', AllProposalsListAPIView.as_view(), name='all_proposals'),
     path('proposal/<int:proposal_id>/review/', ProposalReviewAPIView.as_view(), name='proposal_review'),
+    path('proposal/reviews/bulk/', ProposalBulkReviewAPIView.as_view(), name='proposal_bulk_review'),
     # Midterm submission endpoints
     path('midterm/submit/', MidtermSubmitAPIView.as_view(), name='midterm_submit'),
     path('midterm/my-midterms/', MyMidtermsListAPIView.as_view(), name='my_midterms'),
     path('midterm/all-midterms/', AllMidtermsListAPIView.as_view(), name='all_midterms'),
     path('midterm/<int:midterm_id>/review/', MidtermReviewAPIView.as_view(), name='midterm_review'),
+    path('midterm/reviews/bulk/', MidtermBulkReviewAPIView.as_view(), name='midterm_bulk_review'),
+    # Resumable chunked uploads (thesis / proposal / midterm)
+    path('uploads/', UploadSessionStartAPIView.as_view(), name='upload_start'),
+    path('uploads/<uuid:session_id>/', UploadSessionAPIView.as_view(), name='upload_session'),
+    path('uploads/<uuid:session_id>/complete/', UploadSessionCompleteAPIView.as_view(), name='upload_complete'),
+    # Permission-checked file download (Range / ETag / X-Accel-Redirect)
+    path('files/<str:kind>/<int:pk>/', SubmissionFileDownloadAPIView.as_view(), name='file_download'),
+    path('files/<str:kind>/<int:pk>/preview/', SubmissionFileDownloadAPIView.as_view(), {'preview': True},
+         name='file_preview'),
+    # same view; the trailing file name only makes links readable (the frontend shows the last path segment)
+    path('files/<str:kind>/<int:pk>/<str:filename>', SubmissionFileDownloadAPIView.as_view(),
+         name='file_download_named'),
+    # Streaming ZIP export of submission files + review manifest
+    path('export/submissions/', SubmissionExportAPIView.as_view(), name='export_submissions'),
     # Topic endpoints for teacher topic management
     path('topics/my-topics/', MyTopicsListAPIView.as_view(), name='my_topics'),
     path('topics/', TopicListCreateAPIView.as_view(), name='topics_list_create'),
     path('topics/<int:pk>/', TopicDetailAPIView.as_view(), name='topic_detail'),
     path('topics/<int:pk>/select/', TopicSelectAPIView.as_view(), name='topic_select'),
     path('topics/<int:pk>/students/', TopicStudentsAPIView.as_view(), name='topic_students'),
+    path('topics/preferences/', TopicPreferenceAPIView.as_view(), name='topic_preferences'),
     # Student progress endpoint
     path('progress/', StudentProgressAPIView.as_view(), name='student_progress'),
+    path('progress/cohort/', CohortProgressAPIView.as_view(), name='cohort_progress'),
 ]
@@ -1,3 +1,6 @@
+import random
+import time
+
 from django.contrib.auth.models import User
 from django.contrib.auth import authenticate
 from rest_framework import generics, status
@@ -8,15 +11,33 @@ from rest_framework.parsers import MultiPartParser, FormParser
 
 from .serializers import RegisterSerializer, LoginSerializer, UserSerializer, ThesisSerializer, ThesisReviewSerializer, TopicSerializer
 from .serializers import ProposalSerializer, MidtermCheckSerializer
-from .serializers import ProposalReviewSerializer, MidtermReviewSerializer
+from .serializers import ProposalReviewSerializer, MidtermReviewSerializer, BulkReviewItemSerializer
+from .serializers import AllocationRoundSerializer, TopicPreferenceSubmitSerializer
+from .serializers import UploadSessionSerializer, UploadStartSerializer, SUBMISSION_SERIALIZERS
 from .models import Thesis, ThesisReview, Topic, TopicSelection
-from .models import Proposal, MidtermCheck
+from .models import Proposal, MidtermCheck, ProposalReview, MidtermReview
+from .models import AllocationRound, Profile, SubmissionMetadata, TopicPreference, UploadSession, release_file_name
+from . import downloads, export, processing, roster, similarity, uploads
 from .serializers import TopicSerializer
 from .models import Topic
-from django.db.models import Q
-from django.db.models.functions import Concat
+from .progress import get_progress, compute_cohort_progress, refresh_many
+from .search import filter_by_student_name
+from .scope import scope_to_teacher
+from .pagination import CohortProgressPagination, SubmissionKeysetPagination, TopicKeysetPagination
+from django.db import IntegrityError, OperationalError, transaction
+from django.db.models import Case, Exists, F, OuterRef, Value, When
+from django.http import StreamingHttpResponse
+from django.utils import timezone
 from rest_framework.permissions import IsAuthenticated
-from rest_framework.authentication import TokenAuthentication
+from .authentication import CachedTokenAuthentication
+
+
+class EagerLoadingViewMixin:
+    """列表视图应用序列化器声明的 select_related / prefetch_related 计划，查询数与行数无关"""
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        return self.get_serializer_class().setup_eager_loading(queryset)
 
 
 class RegisterAPIView(generics.CreateAPIView):
@@ -74,7 +95,7 @@ class LoginAPIView(APIView):
 
 
 class MeAPIView(APIView):
-    authentication_classes = (TokenAuthentication,)
+    authentication_classes = (CachedTokenAuthentication,)
     permission_classes = (IsAuthenticated,)
 
     def get(self, request, *args, **kwargs):
@@ -93,7 +114,7 @@ class MeAPIView(APIView):
 
 class ThesisSubmitAPIView(generics.CreateAPIView):
     serializer_class = ThesisSerializer
-    authentication_classes = (TokenAuthentication,)
+    authentication_classes = (CachedTokenAuthentication,)
     permission_classes = (IsAuthenticated,)
     parser_classes = (MultiPartParser, FormParser)
 
@@ -113,17 +134,28 @@ class ThesisSubmitAPIView(generics.CreateAPIView):
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
     def perform_create(self, serializer):
-        serializer.save(student=self.request.user)
+        instance = serializer.save(student=self.request.user)
+        processing.schedule('thesis', instance)
 
 
 class ThesisDetailAPIView(generics.RetrieveUpdateAPIView):
     serializer_class = ThesisSerializer
-    authentication_classes = (TokenAuthentication,)
+    authentication_classes = (CachedTokenAuthentication,)
     permission_classes = (IsAuthenticated,)
     parser_classes = (MultiPartParser, FormParser)
 
     def get_object(self):
-        return Thesis.objects.filter(student=self.request.user).order_by('-submitted_at').first()
+        qs = ThesisSerializer.setup_eager_loading(Thesis.objects.filter(student=self.request.user))
+        return qs.order_by('-submitted_at').first()
+
+    def perform_update(self, serializer):
+        old_file = serializer.instance.file.name
+        instance = serializer.save()
+        if 'file' in serializer.validated_data:
+            if old_file and old_file != instance.file.name:
+                # 被替换的文件名不再有记录引用，归还内容寻址存储的引用计数
+                release_file_name(instance.file.storage, old_file)
+            processing.schedule('thesis', instance)
 
     def get_serializer_context(self):
         context = super().get_serializer_context()
@@ -131,9 +163,9 @@ class ThesisDetailAPIView(generics.RetrieveUpdateAPIView):
         return context
 
 
-class StudentThesesListAPIView(generics.ListAPIView):
+class StudentThesesListAPIView(EagerLoadingViewMixin, generics.ListAPIView):
     serializer_class = ThesisSerializer
-    authentication_classes = (TokenAuthentication,)
+    authentication_classes = (CachedTokenAuthentication,)
     permission_classes = (IsAuthenticated,)
 
     def get_queryset(self):
@@ -148,10 +180,11 @@ class StudentThesesListAPIView(generics.ListAPIView):
         return context
 
 
-class AllThesesListAPIView(generics.ListAPIView):
+class AllThesesListAPIView(EagerLoadingViewMixin, generics.ListAPIView):
     serializer_class = ThesisSerializer
-    authentication_classes = (TokenAuthentication,)
+    authentication_classes = (CachedTokenAuthentication,)
     permission_classes = (IsAuthenticated,)
+    pagination_class = SubmissionKeysetPagination
 
     def get_queryset(self):
         # 管理员看所有论文，教师只看选了自己课程的学生的论文
@@ -159,25 +192,15 @@ class AllThesesListAPIView(generics.ListAPIView):
             qs = Thesis.objects.all()
         elif self.request.user.profile.role == 'teacher':
             # 教师只能查看选了自己课程的学生的论文
-            students_with_my_topics = User.objects.filter(
-                selected_topics__topic__teacher=self.request.user
-            ).distinct()
-            qs = Thesis.objects.filter(student__in=students_with_my_topics)
+            qs = scope_to_teacher(Thesis.objects.all(), self.request.user)
         else:
             return Thesis.objects.none()
         
         # 支持按学生名称搜索
         query = self.request.query_params.get('username')
         if query:
-            q = query.strip()
-            # annotate concatenated last_name+first_name for full-name search
-            qs = qs.annotate(student_full_name=Concat('student__last_name', 'student__first_name'))
-            qs = qs.filter(
-                Q(student__username__icontains=q) |
-                Q(student__first_name__icontains=q) |
-                Q(student__last_name__icontains=q) |
-                Q(student_full_name__icontains=q)
-            )
+            # 走 users.search 维护的搜索键索引，匹配学工号、姓名（姓+名 / 名+姓）子串
+            qs = filter_by_student_name(qs, query)
         return qs
 
     def get_serializer_context(self):
@@ -188,7 +211,7 @@ class AllThesesListAPIView(generics.ListAPIView):
 
 class ThesisReviewAPIView(generics.CreateAPIView):
     serializer_class = ThesisReviewSerializer
-    authentication_classes = (TokenAuthentication,)
+    authentication_classes = (CachedTokenAuthentication,)
     permission_classes = (IsAuthenticated,)
 
     def create(self, request, thesis_id, *args, **kwargs):
@@ -213,9 +236,53 @@ class ThesisReviewAPIView(generics.CreateAPIView):
         serializer.save(reviewer=self.request.user)
 
 
+
+class ThesisSimilarAPIView(APIView):
+    """与某篇论文最相似的论文 / 开题报告（MinHash 估计的 Jaccard 相似度），见 users.similarity。
+
+    ``?k=`` 返回条数（默认 10，最多 50）；默认排除同一学生自己的其他版本，``?include_own=1`` 时保留。
+    """
+    authentication_classes = (CachedTokenAuthentication,)
+    permission_classes = (IsAuthenticated,)
+
+    def get(self, request, thesis_id, *args, **kwargs):
+        if request.user.profile.role not in ['teacher', 'admin']:
+            return Response({'detail': 'Permission denied'}, status=status.HTTP_403_FORBIDDEN)
+        thesis = Thesis.objects.filter(pk=thesis_id).only('id', 'student_id').first()
+        if thesis is None:
+            return Response({'detail': 'Thesis not found'}, status=status.HTTP_404_NOT_FOUND)
+        if not downloads.can_download(request.user, thesis):
+            return Response({'detail': 'Permission denied'}, status=status.HTTP_403_FORBIDDEN)
+        try:
+            k = min(max(int(request.query_params.get('k', 10)), 1), 50)
+        except ValueError:
+            return Response({'detail': 'k 必须是整数'}, status=status.HTTP_400_BAD_REQUEST)
+        include_own = request.query_params.get('include_own') in ('1', 'true')
+
+        meta = SubmissionMetadata.objects.filter(thesis=thesis).only('id').first()
+        matches = None
+        if meta is not None:
+            matches = similarity.similar(meta, k=k, exclude_student_id=None if include_own else thesis.student_id)
+        results = []
+        for score, other in matches or ():
+            kind = 'thesis' if other.thesis_id else 'proposal'
+            document = getattr(other, kind)
+            results.append({
+                'kind': kind,
+                'id': document.pk,
+                'student_id': document.student.username,
+                'student_name': (document.student.last_name + document.student.first_name).strip()
+                or document.student.username,
+                'title': document.title,
+                'submitted_at': document.submitted_at,
+                'similarity': round(score, 3),
+            })
+        return Response({'thesis_id': thesis.pk, 'indexed': matches is not None, 'results': results})
+
+
 class ProposalSubmitAPIView(generics.CreateAPIView):
     serializer_class = ProposalSerializer
-    authentication_classes = (TokenAuthentication,)
+    authentication_classes = (CachedTokenAuthentication,)
     permission_classes = (IsAuthenticated,)
     parser_classes = (MultiPartParser, FormParser)
 
@@ -233,12 +300,13 @@ class ProposalSubmitAPIView(generics.CreateAPIView):
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
     def perform_create(self, serializer):
-        serializer.save(student=self.request.user)
+        instance = serializer.save(student=self.request.user)
+        processing.schedule('proposal', instance)
 
 
-class MyProposalsListAPIView(generics.ListAPIView):
+class MyProposalsListAPIView(EagerLoadingViewMixin, generics.ListAPIView):
     serializer_class = ProposalSerializer
-    authentication_classes = (TokenAuthentication,)
+    authentication_classes = (CachedTokenAuthentication,)
     permission_classes = (IsAuthenticated,)
 
     def get_queryset(self):
@@ -254,7 +322,7 @@ class MyProposalsListAPIView(generics.ListAPIView):
 
 class MidtermSubmitAPIView(generics.CreateAPIView):
     serializer_class = MidtermCheckSerializer
-    authentication_classes = (TokenAuthentication,)
+    authentication_classes = (CachedTokenAuthentication,)
     permission_classes = (IsAuthenticated,)
     parser_classes = (MultiPartParser, FormParser)
 
@@ -272,12 +340,13 @@ class MidtermSubmitAPIView(generics.CreateAPIView):
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
     def perform_create(self, serializer):
-        serializer.save(student=self.request.user)
+        instance = serializer.save(student=self.request.user)
+        processing.schedule('midterm', instance)
 
 
-class MyMidtermsListAPIView(generics.ListAPIView):
+class MyMidtermsListAPIView(EagerLoadingViewMixin, generics.ListAPIView):
     serializer_class = MidtermCheckSerializer
-    authentication_classes = (TokenAuthentication,)
+    authentication_classes = (CachedTokenAuthentication,)
     permission_classes = (IsAuthenticated,)
 
     def get_queryset(self):
@@ -291,34 +360,26 @@ class MyMidtermsListAPIView(generics.ListAPIView):
         return context
 
 
-class AllProposalsListAPIView(generics.ListAPIView):
+class AllProposalsListAPIView(EagerLoadingViewMixin, generics.ListAPIView):
     serializer_class = ProposalSerializer
-    authentication_classes = (TokenAuthentication,)
+    authentication_classes = (CachedTokenAuthentication,)
     permission_classes = (IsAuthenticated,)
+    pagination_class = SubmissionKeysetPagination
 
     def get_queryset(self):
         if self.request.user.profile.role == 'admin':
             qs = Proposal.objects.all()
         elif self.request.user.profile.role == 'teacher':
             # 教师只能查看选了自己课程的学生的提交
-            students_with_my_topics = User.objects.filter(
-                selected_topics__topic__teacher=self.request.user
-            ).distinct()
-            qs = Proposal.objects.filter(student__in=students_with_my_topics)
+            qs = scope_to_teacher(Proposal.objects.all(), self.request.user)
         else:
             return Proposal.objects.none()
         
         # 支持按学生名称搜索
         query = self.request.query_params.get('username')
         if query:
-            q = query.strip()
-            qs = qs.annotate(student_full_name=Concat('student__last_name', 'student__first_name'))
-            qs = qs.filter(
-                Q(student__username__icontains=q) |
-                Q(student__first_name__icontains=q) |
-                Q(student__last_name__icontains=q) |
-                Q(student_full_name__icontains=q)
-            )
+            # 走 users.search 维护的搜索键索引，匹配学工号、姓名（姓+名 / 名+姓）子串
+            qs = filter_by_student_name(qs, query)
         return qs
 
     def get_serializer_context(self):
@@ -327,34 +388,26 @@ class AllProposalsListAPIView(generics.ListAPIView):
         return context
 
 
-class AllMidtermsListAPIView(generics.ListAPIView):
+class AllMidtermsListAPIView(EagerLoadingViewMixin, generics.ListAPIView):
     serializer_class = MidtermCheckSerializer
-    authentication_classes = (TokenAuthentication,)
+    authentication_classes = (CachedTokenAuthentication,)
     permission_classes = (IsAuthenticated,)
+    pagination_class = SubmissionKeysetPagination
 
     def get_queryset(self):
         if self.request.user.profile.role == 'admin':
             qs = MidtermCheck.objects.all()
         elif self.request.user.profile.role == 'teacher':
             # 教师只能查看选了自己课程的学生的提交
-            students_with_my_topics = User.objects.filter(
-                selected_topics__topic__teacher=self.request.user
-            ).distinct()
-            qs = MidtermCheck.objects.filter(student__in=students_with_my_topics)
+            qs = scope_to_teacher(MidtermCheck.objects.all(), self.request.user)
         else:
             return MidtermCheck.objects.none()
         
         # 支持按学生名称搜索
         query = self.request.query_params.get('username')
         if query:
-            q = query.strip()
-            qs = qs.annotate(student_full_name=Concat('student__last_name', 'student__first_name'))
-            qs = qs.filter(
-                Q(student__username__icontains=q) |
-                Q(student__first_name__icontains=q) |
-                Q(student__last_name__icontains=q) |
-                Q(student_full_name__icontains=q)
-            )
+            # 走 users.search 维护的搜索键索引，匹配学工号、姓名（姓+名 / 名+姓）子串
+            qs = filter_by_student_name(qs, query)
         return qs
 
     def get_serializer_context(self):
@@ -365,7 +418,7 @@ class AllMidtermsListAPIView(generics.ListAPIView):
 
 class ProposalReviewAPIView(generics.CreateAPIView):
     serializer_class = ProposalReviewSerializer
-    authentication_classes = (TokenAuthentication,)
+    authentication_classes = (CachedTokenAuthentication,)
     permission_classes = (IsAuthenticated,)
 
     def create(self, request, proposal_id, *args, **kwargs):
@@ -388,7 +441,7 @@ class ProposalReviewAPIView(generics.CreateAPIView):
 
 class MidtermReviewAPIView(generics.CreateAPIView):
     serializer_class = MidtermReviewSerializer
-    authentication_classes = (TokenAuthentication,)
+    authentication_classes = (CachedTokenAuthentication,)
     permission_classes = (IsAuthenticated,)
 
     def create(self, request, midterm_id, *args, **kwargs):
@@ -409,18 +462,339 @@ class MidtermReviewAPIView(generics.CreateAPIView):
         serializer.save(reviewer=self.request.user)
 
 
+
+class BulkReviewAPIView(APIView):
+    """批量评审：body ``{ reviews: [{ id, result, score?, feedback? }, ...] }``，``id`` 为被评审的记录。
+
+    全部条目先一起校验，教师范围检查只用一条查询，有效条目在一个事务里 ``bulk_create``；
+    响应逐项给出结果（``created`` 及 ``review_id``，或 ``error`` 及原因）。全部成功返回 201，
+    部分成功返回 207，全部失败返回 400。
+    """
+    authentication_classes = (CachedTokenAuthentication,)
+    permission_classes = (IsAuthenticated,)
+    model = None
+    review_model = None
+    parent_field = None
+    target_fields = ('id', 'student_id')
+    max_items = 500
+
+    def build_review(self, data, target, reviewer):
+        return self.review_model(
+            **{f'{self.parent_field}_id': target['id']}, reviewer=reviewer,
+            result=data['result'], score=data.get('score'), feedback=data.get('feedback'),
+        )
+
+    def post(self, request, *args, **kwargs):
+        if request.user.profile.role not in ['teacher', 'admin']:
+            return Response({'detail': 'Only teachers can review submissions'}, status=status.HTTP_403_FORBIDDEN)
+        items = request.data.get('reviews') if isinstance(request.data, dict) else None
+        if not isinstance(items, list) or not items:
+            return Response({'detail': 'reviews 须为非空列表'}, status=status.HTTP_400_BAD_REQUEST)
+        if len(items) > self.max_items:
+            return Response({'detail': f'每次最多 {self.max_items} 条'}, status=status.HTTP_400_BAD_REQUEST)
+
+        results = [None] * len(items)
+        valid = {}
+        seen = set()
+        for index, item in enumerate(items):
+            serializer = BulkReviewItemSerializer(data=item)
+            if not serializer.is_valid():
+                item_id = item.get('id') if isinstance(item, dict) else None
+                results[index] = {'index': index, 'id': item_id, 'status': 'error', 'errors': serializer.errors}
+            elif serializer.validated_data['id'] in seen:
+                results[index] = {'index': index, 'id': serializer.validated_data['id'], 'status': 'error',
+                                  'errors': {'id': ['同一批次中重复']}}
+            else:
+                seen.add(serializer.validated_data['id'])
+                valid[index] = serializer.validated_data
+
+        # 范围检查：一条查询取出当前用户可评审的记录，找不到的再区分不存在与无权限
+        targets = self.model.objects.filter(pk__in=seen)
+        if request.user.profile.role == 'teacher':
+            targets = scope_to_teacher(targets, request.user)
+        targets = {row['id']: row for row in targets.values(*self.target_fields)}
+        missing = seen - targets.keys()
+        existing = set(self.model.objects.filter(pk__in=missing).values_list('pk', flat=True)) if missing else set()
+
+        reviews, indexes = [], []
+        for index, data in valid.items():
+            target = targets.get(data['id'])
+            if target is None:
+                reason = 'Permission denied' if data['id'] in existing else 'Not found'
+                results[index] = {'index': index, 'id': data['id'], 'status': 'error', 'errors': {'id': [reason]}}
+                continue
+            reviews.append(self.build_review(data, target, request.user))
+            indexes.append(index)
+
+        if reviews:
+            with transaction.atomic():
+                created = self.review_model.objects.bulk_create(reviews)
+                # bulk_create 不触发 post_save，进度快照在这里按学生批量刷新
+                refresh_many(sorted({targets[valid[index]['id']]['student_id'] for index in indexes}))
+            for index, review in zip(indexes, created):
+                results[index] = {'index': index, 'id': valid[index]['id'], 'status': 'created', 'review_id': review.pk}
+
+        if len(reviews) == len(items):
+            code = status.HTTP_201_CREATED
+        elif reviews:
+            code = status.HTTP_207_MULTI_STATUS
+        else:
+            code = status.HTTP_400_BAD_REQUEST
+        return Response({'created': len(reviews), 'failed': len(items) - len(reviews), 'results': results}, status=code)
+
+
+class ThesisBulkReviewAPIView(BulkReviewAPIView):
+    model = Thesis
+    review_model = ThesisReview
+    parent_field = 'thesis'
+    target_fields = ('id', 'student_id', 'stage')
+
+    def build_review(self, data, target, reviewer):
+        review = super().build_review(data, target, reviewer)
+        review.stage = data.get('stage') or target['stage']
+        return review
+
+
+class ProposalBulkReviewAPIView(BulkReviewAPIView):
+    model = Proposal
+    review_model = ProposalReview
+    parent_field = 'proposal'
+
+
+class MidtermBulkReviewAPIView(BulkReviewAPIView):
+    model = MidtermCheck
+    review_model = MidtermReview
+    parent_field = 'midterm'
+
+
+class UploadSessionMixin:
+    authentication_classes = (CachedTokenAuthentication,)
+    permission_classes = (IsAuthenticated,)
+
+    def get_session(self, request, session_id):
+        return UploadSession.objects.filter(pk=session_id, student=request.user).first()
+
+    def upload_error(self, exc):
+        data = {'detail': exc.detail}
+        if exc.offset is not None:
+            data['offset'] = exc.offset
+        response = Response(data, status=exc.status_code)
+        if exc.offset is not None:
+            response['Upload-Offset'] = str(exc.offset)
+        return response
+
+
+class UploadSessionStartAPIView(UploadSessionMixin, APIView):
+    """开始分块续传：返回会话 id，之后按偏移量 PUT 分块，最后 POST complete/"""
+
+    def post(self, request, *args, **kwargs):
+        if request.user.profile.role != 'student':
+            return Response({'detail': 'Only students can upload submissions'}, status=status.HTTP_403_FORBIDDEN)
+        serializer = UploadStartSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        try:
+            session = uploads.start(request.user, data['kind'], data['filename'], data['size'], data['metadata'])
+        except uploads.UploadError as exc:
+            return self.upload_error(exc)
+        payload = UploadSessionSerializer(session).data
+        payload['chunk_size'] = uploads.max_chunk_size()
+        return Response(payload, status=status.HTTP_201_CREATED)
+
+
+class UploadSessionAPIView(UploadSessionMixin, APIView):
+    """GET 查询当前偏移量；PUT 上传一块（请求体为原始字节，偏移量放在 Upload-Offset 头）；DELETE 放弃"""
+
+    def get(self, request, session_id, *args, **kwargs):
+        session = self.get_session(request, session_id)
+        if session is None:
+            return Response({'detail': 'Not found'}, status=status.HTTP_404_NOT_FOUND)
+        response = Response(UploadSessionSerializer(session).data)
+        response['Upload-Offset'] = str(session.received)
+        return response
+
+    def put(self, request, session_id, *args, **kwargs):
+        session = self.get_session(request, session_id)
+        if session is None:
+            return Response({'detail': 'Not found'}, status=status.HTTP_404_NOT_FOUND)
+        try:
+            offset = int(request.headers.get('Upload-Offset', request.query_params.get('offset', '')))
+        except ValueError:
+            return Response({'detail': '缺少 Upload-Offset'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            # 直接从请求流读取，不经过 DRF 解析器，也不把整块读进内存
+            new_offset = uploads.write_chunk(session, offset, request, request.headers.get('Upload-Checksum'))
+        except uploads.UploadError as exc:
+            return self.upload_error(exc)
+        response = Response({'offset': new_offset, 'size': session.size})
+        response['Upload-Offset'] = str(new_offset)
+        return response
+
+    def delete(self, request, session_id, *args, **kwargs):
+        session = self.get_session(request, session_id)
+        if session is None:
+            return Response({'detail': 'Not found'}, status=status.HTTP_404_NOT_FOUND)
+        uploads.discard(session)
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+class UploadSessionCompleteAPIView(UploadSessionMixin, APIView):
+    """所有分块传完后生成对应的 Thesis / Proposal / MidtermCheck，返回与整文件提交相同的数据"""
+
+    def post(self, request, session_id, *args, **kwargs):
+        session = self.get_session(request, session_id)
+        if session is None:
+            return Response({'detail': 'Not found'}, status=status.HTTP_404_NOT_FOUND)
+        try:
+            serializer = uploads.finalize(
+                session, SUBMISSION_SERIALIZERS[session.kind], {'request': request},
+                expected_crc32=request.data.get('crc32'),
+            )
+        except uploads.UploadError as exc:
+            return self.upload_error(exc)
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
+
+
+class SubmissionFileDownloadAPIView(APIView):
+    """下载论文/开题/中期文件（或其首页预览图）：学生本人、范围内的教师和管理员可下载；支持 Range 与条件请求。
+
+    认证方式为 Token 头，或序列化器签发的 ``?sig=`` 限时签名（浏览器直接打开链接时）。
+    """
+    authentication_classes = (CachedTokenAuthentication,)
+    permission_classes = ()
+
+    def get(self, request, kind, pk, *args, preview=False, **kwargs):
+        model = downloads.MODELS.get(kind)
+        if model is None:
+            return Response({'detail': 'Not found'}, status=status.HTTP_404_NOT_FOUND)
+
+        user = request.user
+        token = request.query_params.get('sig')
+        if token:
+            user_id = downloads.user_from_signature(kind, pk, token)
+            if user_id is None:
+                return Response({'detail': '下载链接无效或已过期'}, status=status.HTTP_403_FORBIDDEN)
+            if not user.is_authenticated or user.pk != user_id:
+                user = User.objects.select_related('profile').filter(pk=user_id, is_active=True).first()
+        if user is None or not user.is_authenticated:
+            return Response({'detail': 'Authentication credentials were not provided.'},
+                            status=status.HTTP_401_UNAUTHORIZED)
+
+        obj = model.objects.filter(pk=pk).only('id', 'student_id', 'file').first()
+        if obj is None or not obj.file:
+            return Response({'detail': 'Not found'}, status=status.HTTP_404_NOT_FOUND)
+        if not downloads.can_download(user, obj):
+            return Response({'detail': 'Permission denied'}, status=status.HTTP_403_FORBIDDEN)
+
+        field = obj.file
+        if preview:
+            meta = SubmissionMetadata.objects.filter(**{kind: obj}).only('id', 'preview').first()
+            if meta is None or not meta.preview:
+                return Response({'detail': 'Not found'}, status=status.HTTP_404_NOT_FOUND)
+            field = meta.preview
+        response = downloads.serve(request._request, field)
+        if response is None:
+            return Response({'detail': '文件不存在'}, status=status.HTTP_404_NOT_FOUND)
+        return response
+
+
+class SubmissionExportAPIView(APIView):
+    """流式导出 ZIP：所选提交的文件 + manifest.csv / reviews.csv。
+
+    查询参数：``kind``（可多次给出，默认全部）、``stage``（论文阶段）、``teacher``（教师工号，仅管理员可指定）、
+    ``since`` / ``until``（按提交时间，日期或日期时间）。教师只能导出自己范围内的学生。
+    """
+    authentication_classes = (CachedTokenAuthentication,)
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, *args, **kwargs):
+        role = request.user.profile.role
+        if role not in ('teacher', 'admin'):
+            return Response({'detail': 'Permission denied'}, status=status.HTTP_403_FORBIDDEN)
+        teacher = None
+        username = request.query_params.get('teacher')
+        if role == 'teacher':
+            if username and username != request.user.username:
+                return Response({'detail': 'Permission denied'}, status=status.HTTP_403_FORBIDDEN)
+            teacher = request.user
+        elif username:
+            teacher = User.objects.filter(username=username, profile__role='teacher').first()
+            if teacher is None:
+                return Response({'detail': '教师不存在'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            filters = export.build_filters(
+                kinds=request.query_params.getlist('kind'),
+                stage=request.query_params.get('stage'),
+                teacher=teacher,
+                since=request.query_params.get('since'),
+                until=request.query_params.get('until'),
+            )
+        except export.ExportFilterError as exc:
+            return Response({'detail': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+
+        response = StreamingHttpResponse(export.stream_zip(filters), content_type='application/zip')
+        response['Content-Disposition'] = f'attachment; filename="{export.export_filename(filters)}"'
+        response['Cache-Control'] = 'no-store'
+        # 关闭 nginx 的响应缓冲，字节生成后立即发往客户端
+        response['X-Accel-Buffering'] = 'no'
+        return response
+
+
+class RosterImportAPIView(APIView):
+    """管理员上传名单（CSV / XLSX）批量开通或更新账号，见 users.roster。
+
+    表单字段：``file``；可选 ``role``（无角色列时的默认角色）、``default_password``、
+    ``update``（默认 true，false 时已有账号不变）、``dry_run``（只校验）。
+    """
+    authentication_classes = (CachedTokenAuthentication,)
+    permission_classes = [IsAuthenticated]
+    parser_classes = (MultiPartParser, FormParser)
+
+    def post(self, request, *args, **kwargs):
+        if request.user.profile.role != 'admin':
+            return Response({'detail': 'Permission denied'}, status=status.HTTP_403_FORBIDDEN)
+        upload = request.FILES.get('file')
+        if upload is None:
+            return Response({'detail': '缺少名单文件 file'}, status=status.HTTP_400_BAD_REQUEST)
+        role = request.data.get('role') or 'student'
+        if role not in dict(Profile.ROLE_CHOICES):
+            return Response({'detail': f'未知角色：{role}'}, status=status.HTTP_400_BAD_REQUEST)
+
+        def flag(name, default):
+            return str(request.data.get(name, default)).lower() in ('1', 'true', 'yes', 'on')
+
+        try:
+            stats = roster.import_roster(
+                upload.read(), filename=upload.name, default_role=role,
+                default_password=request.data.get('default_password') or None,
+                update_existing=flag('update', True), dry_run=flag('dry_run', False), workers=roster.WEB_WORKERS,
+            )
+        except roster.RosterError as exc:
+            return Response({'detail': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        stats['errors'] = [{'line': line, 'detail': reason} for line, reason in stats['errors']]
+        return Response(stats, status=status.HTTP_200_OK)
+
+
+def topic_queryset(user):
+    """课题查询集：预取教师并注解当前用户是否已选，序列化时不再逐行查询"""
+    return Topic.objects.select_related('teacher').annotate(
+        is_selected=Exists(TopicSelection.objects.filter(topic=OuterRef('pk'), student=user))
+    )
+
+
 class TopicListCreateAPIView(generics.ListCreateAPIView):
     serializer_class = TopicSerializer
-    authentication_classes = (TokenAuthentication,)
+    authentication_classes = (CachedTokenAuthentication,)
     permission_classes = (IsAuthenticated,)
+    pagination_class = TopicKeysetPagination
 
     def get_queryset(self):
         # GET: students see all topics; teachers see their own topics
         user = self.request.user
         if user.profile.role == 'teacher':
-            return Topic.objects.filter(teacher=user)
+            return topic_queryset(user).filter(teacher=user)
         # student or admin: show all topics
-        return Topic.objects.all()
+        return topic_queryset(user)
 
     def get_serializer_context(self):
         context = super().get_serializer_context()
@@ -439,13 +813,13 @@ class TopicListCreateAPIView(generics.ListCreateAPIView):
 
 class TopicDetailAPIView(generics.RetrieveUpdateDestroyAPIView):
     serializer_class = TopicSerializer
-    authentication_classes = (TokenAuthentication,)
+    authentication_classes = (CachedTokenAuthentication,)
     permission_classes = (IsAuthenticated,)
 
     def get_object(self):
         pk = self.kwargs.get('pk')
         try:
-            return Topic.objects.get(id=pk)
+            return topic_queryset(self.request.user).get(id=pk)
         except Topic.DoesNotExist:
             return None
 
@@ -478,70 +852,138 @@ class TopicDetailAPIView(generics.RetrieveUpdateDestroyAPIView):
 
 
 class TopicSelectAPIView(APIView):
-    authentication_classes = (TokenAuthentication,)
+    """选题 / 取消选题。
+
+    名额占用是一条带容量条件的 ``UPDATE ... SET selected_students = selected_students + 1``，
+    与创建 TopicSelection 在同一事务中完成；“每个学生只能选一个课题”由数据库唯一约束保证。
+    遇到锁冲突（SQLite 的 database is locked、PostgreSQL 的死锁/锁超时）时做有限次退避重试。
+    """
+    authentication_classes = (CachedTokenAuthentication,)
     permission_classes = (IsAuthenticated,)
+    max_attempts = 5
+    retry_backoff = 0.02
+
+    def with_retry(self, func, *args):
+        for attempt in range(self.max_attempts):
+            try:
+                return func(*args)
+            except OperationalError:
+                if attempt == self.max_attempts - 1:
+                    return Response({'detail': '选题人数过多，请稍后重试'}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+                time.sleep(self.retry_backoff * (2 ** attempt) * (1 + random.random()))
 
     def post(self, request, pk, *args, **kwargs):
         # only students may select
         if request.user.profile.role != 'student':
             return Response({'detail': 'Only students can select topics'}, status=status.HTTP_403_FORBIDDEN)
 
-        try:
-            topic = Topic.objects.get(id=pk)
-        except Topic.DoesNotExist:
-            return Response({'detail': 'Topic not found'}, status=status.HTTP_404_NOT_FOUND)
+        # 志愿填报轮次开放到分配完成之间，由 allocate_topics 统一分配
+        if AllocationRound.objects.pending().exists():
+            return Response({'detail': '当前为志愿填报阶段，请提交课题志愿'}, status=status.HTTP_400_BAD_REQUEST)
 
-        # check if student already selected any topic
+        # fast path: check if student already selected any topic (the unique constraint is the real guard)
         if TopicSelection.objects.filter(student=request.user).exists():
             return Response({'detail': '学生已选择过课题，不能重复选择'}, status=status.HTTP_400_BAD_REQUEST)
+        return self.with_retry(self.select, request.user, pk)
 
-        # check capacity
-        if topic.selected_students >= (topic.max_students or 1):
-            return Response({'detail': '课题已满'}, status=status.HTTP_400_BAD_REQUEST)
-
-        # create selection
-        sel = TopicSelection.objects.create(topic=topic, student=request.user)
-        # increment counter
-        topic.selected_students = (topic.selected_students or 0) + 1
-        topic.save()
+    def select(self, user, pk):
+        # max_students 为 0 时按 1 个名额处理（与原先的 `max_students or 1` 一致）
+        capacity = Case(When(max_students=0, then=Value(1)), default=F('max_students'))
+        try:
+            with transaction.atomic():
+                updated = Topic.objects.filter(pk=pk, selected_students__lt=capacity).update(
+                    selected_students=F('selected_students') + 1, updated_at=timezone.now(),
+                )
+                if not updated:
+                    if not Topic.objects.filter(pk=pk).exists():
+                        return Response({'detail': 'Topic not found'}, status=status.HTTP_404_NOT_FOUND)
+                    return Response({'detail': '课题已满'}, status=status.HTTP_400_BAD_REQUEST)
+                TopicSelection.objects.create(topic_id=pk, student=user)
+        except IntegrityError:
+            # 并发请求中另一条已先选成功；事务回滚，名额不被占用
+            return Response({'detail': '学生已选择过课题，不能重复选择'}, status=status.HTTP_400_BAD_REQUEST)
         return Response({'detail': '选择成功'}, status=status.HTTP_201_CREATED)
 
     def delete(self, request, pk, *args, **kwargs):
         # only students may deselect
         if request.user.profile.role != 'student':
             return Response({'detail': 'Only students can deselect topics'}, status=status.HTTP_403_FORBIDDEN)
-
-        try:
-            topic = Topic.objects.get(id=pk)
-        except Topic.DoesNotExist:
+        return self.with_retry(self.deselect, request.user, pk)
+
+    def deselect(self, user, pk):
+        with transaction.atomic():
+            deleted, _ = TopicSelection.objects.filter(topic_id=pk, student=user).delete()
+            if deleted:
+                Topic.objects.filter(pk=pk, selected_students__gt=0).update(
+                    selected_students=F('selected_students') - 1, updated_at=timezone.now(),
+                )
+        if deleted:
+            return Response({'detail': '取消选择成功'}, status=status.HTTP_200_OK)
+        if not Topic.objects.filter(pk=pk).exists():
             return Response({'detail': 'Topic not found'}, status=status.HTTP_404_NOT_FOUND)
+        return Response({'detail': '未选择此课题'}, status=status.HTTP_400_BAD_REQUEST)
 
-        # find and delete the selection
-        try:
-            selection = TopicSelection.objects.get(topic=topic, student=request.user)
-            selection.delete()
-            # decrement counter
-            topic.selected_students = max(0, (topic.selected_students or 1) - 1)
-            topic.save()
-            return Response({'detail': '取消选择成功'}, status=status.HTTP_200_OK)
-        except TopicSelection.DoesNotExist:
-            return Response({'detail': '未选择此课题'}, status=status.HTTP_400_BAD_REQUEST)
+
+class TopicPreferenceAPIView(APIView):
+    """学生查看 / 提交当前轮次的课题志愿（PUT 整体替换）"""
+    authentication_classes = (CachedTokenAuthentication,)
+    permission_classes = (IsAuthenticated,)
+
+    def current_round(self):
+        return AllocationRound.objects.accepting().order_by('closes_at').first()
+
+    def payload(self, round, user):
+        preferences = (
+            TopicPreference.objects.filter(round=round, student=user)
+            .select_related('topic')
+            .order_by('rank')
+        )
+        return {
+            'round': AllocationRoundSerializer(round).data,
+            'topics': [
+                {'rank': p.rank, 'topic_id': p.topic_id, 'title': p.topic.title} for p in preferences
+            ],
+        }
+
+    def get(self, request, *args, **kwargs):
+        if request.user.profile.role != 'student':
+            return Response({'detail': 'Only students can submit preferences'}, status=status.HTTP_403_FORBIDDEN)
+        round = self.current_round()
+        if round is None:
+            return Response({'detail': '当前没有开放的志愿填报轮次'}, status=status.HTTP_404_NOT_FOUND)
+        return Response(self.payload(round, request.user), status=status.HTTP_200_OK)
+
+    def put(self, request, *args, **kwargs):
+        if request.user.profile.role != 'student':
+            return Response({'detail': 'Only students can submit preferences'}, status=status.HTTP_403_FORBIDDEN)
+        round = self.current_round()
+        if round is None:
+            return Response({'detail': '当前没有开放的志愿填报轮次'}, status=status.HTTP_404_NOT_FOUND)
+        serializer = TopicPreferenceSubmitSerializer(data=request.data, context={'round': round})
+        serializer.is_valid(raise_exception=True)
+        with transaction.atomic():
+            TopicPreference.objects.filter(round=round, student=request.user).delete()
+            TopicPreference.objects.bulk_create([
+                TopicPreference(round=round, student=request.user, topic_id=topic_id, rank=rank)
+                for rank, topic_id in enumerate(serializer.validated_data['topics'], start=1)
+            ])
+        return Response(self.payload(round, request.user), status=status.HTTP_200_OK)
 
 
 class MyTopicsListAPIView(generics.ListAPIView):
     serializer_class = TopicSerializer
-    authentication_classes = (TokenAuthentication,)
+    authentication_classes = (CachedTokenAuthentication,)
     permission_classes = (IsAuthenticated,)
 
     def get_queryset(self):
         # Only teachers can have topics
         if self.request.user.profile.role == 'teacher':
-            return Topic.objects.filter(teacher=self.request.user)
+            return topic_queryset(self.request.user).filter(teacher=self.request.user)
         return Topic.objects.none()
 
 
 class TopicStudentsAPIView(APIView):
-    authentication_classes = (TokenAuthentication,)
+    authentication_classes = (CachedTokenAuthentication,)
     permission_classes = (IsAuthenticated,)
 
     def get(self, request, pk, *args, **kwargs):
@@ -575,7 +1017,7 @@ class TopicStudentsAPIView(APIView):
 
 class StudentProgressAPIView(APIView):
     """获取学生进度信息的API视图"""
-    authentication_classes = (TokenAuthentication,)
+    authentication_classes = (CachedTokenAuthentication,)
     permission_classes = (IsAuthenticated,)
 
     def get(self, request, *args, **kwargs):
@@ -583,239 +1025,34 @@ class StudentProgressAPIView(APIView):
         if request.user.profile.role != 'student':
             return Response({'detail': '只有学生可以查看进度'}, status=status.HTTP_403_FORBIDDEN)
 
-        from .models import ProposalReview, MidtermReview
-        
-        progress = {}
-        
-        # 1. 检查选题
-        topic_selection = TopicSelection.objects.filter(student=request.user).first()
-        if topic_selection:
-            progress['topic_selection'] = {
-                'status': 'completed',
-                'topic_title': topic_selection.topic.title,
-                'teacher_name': topic_selection.topic.teacher.get_full_name() or topic_selection.topic.teacher.username,
-                'selected_at': topic_selection.selected_at.isoformat() if topic_selection.selected_at else None,
-            }
-        else:
-            progress['topic_selection'] = {
-                'status': 'pending',
-                'message': '尚未选题',
-            }
-
-        # 2. 检查开题报告
-        proposals = Proposal.objects.filter(student=request.user).order_by('-submitted_at')
-        if proposals.exists():
-            latest_proposal = proposals.first()
-            proposal_reviews = ProposalReview.objects.filter(proposal=latest_proposal).order_by('-reviewed_at')
-            
-            if proposal_reviews.exists():
-                latest_review = proposal_reviews.first()
-                if latest_review.result == 'pass':
-                    progress['proposal'] = {
-                        'status': 'completed',
-                        'score': latest_review.score,
-                        'reviewed_at': latest_review.reviewed_at.isoformat() if latest_review.reviewed_at else None,
-                        'comments': latest_review.feedback,
-                    }
-                elif latest_review.result == 'revise':
-                    progress['proposal'] = {
-                        'status': 'in-progress',
-                        'message': '需要修改',
-                        'score': latest_review.score,
-                        'comments': latest_review.feedback,
-                        'reviewed_at': latest_review.reviewed_at.isoformat() if latest_review.reviewed_at else None,
-                    }
-                else:  # fail
-                    progress['proposal'] = {
-                        'status': 'failed',
-                        'message': '未通过',
-                        'score': latest_review.score,
-                        'comments': latest_review.feedback,
-                        'reviewed_at': latest_review.reviewed_at.isoformat() if latest_review.reviewed_at else None,
-                    }
-            else:
-                progress['proposal'] = {
-                    'status': 'in-progress',
-                    'message': '已提交，等待审核',
-                    'submitted_at': latest_proposal.submitted_at.isoformat() if latest_proposal.submitted_at else None,
-                }
-        else:
-            progress['proposal'] = {
-                'status': 'pending',
-                'message': '尚未提交开题报告',
-            }
-
-        # 3. 检查中期检查
-        midterms = MidtermCheck.objects.filter(student=request.user).order_by('-submitted_at')
-        if midterms.exists():
-            latest_midterm = midterms.first()
-            midterm_reviews = MidtermReview.objects.filter(midterm=latest_midterm).order_by('-reviewed_at')
-            
-            if midterm_reviews.exists():
-                latest_review = midterm_reviews.first()
-                if latest_review.result == 'pass':
-                    progress['midterm'] = {
-                        'status': 'completed',
-                        'score': latest_review.score,
-                        'reviewed_at': latest_review.reviewed_at.isoformat() if latest_review.reviewed_at else None,
-                        'comments': latest_review.feedback,
-                    }
-                elif latest_review.result == 'revise':
-                    progress['midterm'] = {
-                        'status': 'in-progress',
-                        'message': '需要修改',
-                        'score': latest_review.score,
-                        'comments': latest_review.feedback,
-                        'reviewed_at': latest_review.reviewed_at.isoformat() if latest_review.reviewed_at else None,
-                    }
-                else:  # fail
-                    progress['midterm'] = {
-                        'status': 'failed',
-                        'message': '未通过',
-                        'score': latest_review.score,
-                        'comments': latest_review.feedback,
-                        'reviewed_at': latest_review.reviewed_at.isoformat() if latest_review.reviewed_at else None,
-                    }
-            else:
-                progress['midterm'] = {
-                    'status': 'in-progress',
-                    'message': '已提交，等待审核',
-                    'submitted_at': latest_midterm.submitted_at.isoformat() if latest_midterm.submitted_at else None,
-                }
-        else:
-            progress['midterm'] = {
-                'status': 'pending',
-                'message': '尚未提交中期检查',
-            }
-
-        # 4. 检查论文初稿（一审）
-        theses = Thesis.objects.filter(student=request.user).order_by('-submitted_at')
-        first_review_theses = theses.filter(stage='first_review')
-        if first_review_theses.exists():
-            latest_thesis = first_review_theses.first()
-            thesis_reviews = ThesisReview.objects.filter(thesis=latest_thesis, stage='first_review').order_by('-reviewed_at')
-            
-            if thesis_reviews.exists():
-                latest_review = thesis_reviews.first()
-                if latest_review.result == 'pass':
-                    progress['first_review'] = {
-                        'status': 'completed',
-                        'score': latest_review.score,
-                        'reviewed_at': latest_review.reviewed_at.isoformat() if latest_review.reviewed_at else None,
-                        'comments': latest_review.feedback,
-                    }
-                elif latest_review.result == 'revise':
-                    progress['first_review'] = {
-                        'status': 'in-progress',
-                        'message': '需要修改',
-                        'score': latest_review.score,
-                        'comments': latest_review.feedback,
-                        'reviewed_at': latest_review.reviewed_at.isoformat() if latest_review.reviewed_at else None,
-                    }
-                else:  # fail
-                    progress['first_review'] = {
-                        'status': 'failed',
-                        'message': '未通过',
-                        'score': latest_review.score,
-                        'comments': latest_review.feedback,
-                        'reviewed_at': latest_review.reviewed_at.isoformat() if latest_review.reviewed_at else None,
-                    }
-            else:
-                progress['first_review'] = {
-                    'status': 'in-progress',
-                    'message': '已提交，等待审核',
-                    'submitted_at': latest_thesis.submitted_at.isoformat() if latest_thesis.submitted_at else None,
-                }
-        else:
-            progress['first_review'] = {
-                'status': 'pending',
-                'message': '尚未提交论文初稿',
-            }
-
-        # 5. 检查论文修改（二审）
-        second_review_theses = theses.filter(stage='second_review')
-        if second_review_theses.exists():
-            latest_thesis = second_review_theses.first()
-            thesis_reviews = ThesisReview.objects.filter(thesis=latest_thesis, stage='second_review').order_by('-reviewed_at')
-            
-            if thesis_reviews.exists():
-                latest_review = thesis_reviews.first()
-                if latest_review.result == 'pass':
-                    progress['second_review'] = {
-                        'status': 'completed',
-                        'score': latest_review.score,
-                        'reviewed_at': latest_review.reviewed_at.isoformat() if latest_review.reviewed_at else None,
-                        'comments': latest_review.feedback,
-                    }
-                elif latest_review.result == 'revise':
-                    progress['second_review'] = {
-                        'status': 'in-progress',
-                        'message': '需要修改',
-                        'score': latest_review.score,
-                        'comments': latest_review.feedback,
-                        'reviewed_at': latest_review.reviewed_at.isoformat() if latest_review.reviewed_at else None,
-                    }
-                else:  # fail
-                    progress['second_review'] = {
-                        'status': 'failed',
-                        'message': '未通过',
-                        'score': latest_review.score,
-                        'comments': latest_review.feedback,
-                        'reviewed_at': latest_review.reviewed_at.isoformat() if latest_review.reviewed_at else None,
-                    }
-            else:
-                progress['second_review'] = {
-                    'status': 'in-progress',
-                    'message': '已提交，等待审核',
-                    'submitted_at': latest_thesis.submitted_at.isoformat() if latest_thesis.submitted_at else None,
-                }
-        else:
-            progress['second_review'] = {
-                'status': 'pending',
-                'message': '尚未提交论文修改稿',
-            }
-
-        # 6. 检查论文终稿
-        final_theses = theses.filter(stage='final_submission')
-        if final_theses.exists():
-            latest_thesis = final_theses.first()
-            thesis_reviews = ThesisReview.objects.filter(thesis=latest_thesis, stage='final_submission').order_by('-reviewed_at')
-            
-            if thesis_reviews.exists():
-                latest_review = thesis_reviews.first()
-                if latest_review.result == 'pass':
-                    progress['final_submission'] = {
-                        'status': 'completed',
-                        'score': latest_review.score,
-                        'reviewed_at': latest_review.reviewed_at.isoformat() if latest_review.reviewed_at else None,
-                        'comments': latest_review.feedback,
-                    }
-                elif latest_review.result == 'revise':
-                    progress['final_submission'] = {
-                        'status': 'in-progress',
-                        'message': '需要修改',
-                        'score': latest_review.score,
-                        'comments': latest_review.feedback,
-                        'reviewed_at': latest_review.reviewed_at.isoformat() if latest_review.reviewed_at else None,
-                    }
-                else:  # fail
-                    progress['final_submission'] = {
-                        'status': 'failed',
-                        'message': '未通过',
-                        'score': latest_review.score,
-                        'comments': latest_review.feedback,
-                        'reviewed_at': latest_review.reviewed_at.isoformat() if latest_review.reviewed_at else None,
-                    }
-            else:
-                progress['final_submission'] = {
-                    'status': 'in-progress',
-                    'message': '已提交，等待审核',
-                    'submitted_at': latest_thesis.submitted_at.isoformat() if latest_thesis.submitted_at else None,
-                }
-        else:
-            progress['final_submission'] = {
-                'status': 'pending',
-                'message': '尚未提交论文终稿',
-            }
+        return Response(get_progress(request.user), status=status.HTTP_200_OK)
+
 
-        return Response(progress, status=status.HTTP_200_OK)
+class CohortProgressAPIView(generics.GenericAPIView):
+    """批量查看学生进度：管理员查看全部学生，教师查看选了自己课题的学生"""
+    authentication_classes = (CachedTokenAuthentication,)
+    permission_classes = (IsAuthenticated,)
+    pagination_class = CohortProgressPagination
+
+    def get_queryset(self):
+        user = self.request.user
+        qs = User.objects.filter(profile__role='student')
+        if user.profile.role == 'teacher':
+            qs = scope_to_teacher(qs, user, field=None)
+        return qs.only('id', 'username', 'first_name', 'last_name').order_by('username', 'id')
+
+    def get(self, request, *args, **kwargs):
+        if request.user.profile.role not in ['teacher', 'admin']:
+            return Response({'detail': '只有教师和管理员可以查看学生进度'}, status=status.HTTP_403_FORBIDDEN)
+
+        page = self.paginate_queryset(self.get_queryset())
+        cohort = compute_cohort_progress(student.pk for student in page)
+        results = []
+        for student in page:
+            name = (student.last_name + student.first_name).strip() or student.username
+            results.append({
+                'student_id': student.username,
+                'name': name,
+                'progress': cohort[student.pk],
+            })
+        return self.get_paginated_response(results)
@@ -12,7 +12,7 @@ import {
   DialogTitle,
   DialogFooter,
 } from '../ui/dialog';
-import { apiFetch } from '../../utils/api';
+import { apiFetch, apiFetchAll } from '../../utils/api';
 
 type Topic = {
   id: number;
@@ -43,7 +43,7 @@ export function TopicSelection() {
     setLoading(true);
     setError('');
     try {
-      const data = await apiFetch('/api/auth/topics/');
+      const data = await apiFetchAll('/api/auth/topics/');
       setTopics(Array.isArray(data) ? data : []);
     } catch (err: any) {
       setError(err?.data?.detail || (err?.data || err?.toString()) || '加载课题失败');
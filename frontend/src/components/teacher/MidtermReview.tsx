@@ -7,7 +7,7 @@ import { Textarea } from '../ui/textarea';
 import { Badge } from '../ui/badge';
 import { FileText, CheckCircle2, XCircle, Download } from 'lucide-react';
 import { Dialog, DialogContent, DialogDescription, DialogFooter, DialogHeader, DialogTitle } from '../ui/dialog';
-import { apiFetch } from '../../utils/api';
+import { apiFetch, apiFetchAll } from '../../utils/api';
 
 type Review = {
   id: number;
@@ -48,7 +48,7 @@ export function MidtermReview() {
       if (studentName && studentName.trim() !== '') {
         url += `?username=${encodeURIComponent(studentName.trim())}`;
       }
-      const data = await apiFetch(url);
+      const data = await apiFetchAll(url);
       setReports(Array.isArray(data) ? data : []);
     } catch (e: any) {
       setError(e?.data?.detail || '加载中期列表失败');
@@ -14,7 +14,7 @@ import {
   DialogHeader,
   DialogTitle,
 } from '../ui/dialog';
-import { apiFetch } from '../../utils/api';
+import { apiFetch, apiFetchAll } from '../../utils/api';
 
 type Review = {
   id: number;
@@ -55,7 +55,7 @@ export function ProposalReview() {
       if (studentName && studentName.trim() !== '') {
         url += `?username=${encodeURIComponent(studentName.trim())}`;
       }
-      const data = await apiFetch(url);
+      const data = await apiFetchAll(url);
       setProposals(Array.isArray(data) ? data : []);
     } catch (e: any) {
       setError(e?.data?.detail || '加载开题列表失败');
@@ -14,7 +14,7 @@ import {
   DialogTitle,
 } from '../ui/dialog';
 import { Input } from '../ui/input';
-import { apiFetch } from '../../utils/api';
+import { apiFetch, apiFetchAll } from '../../utils/api';
 
 type Review = {
   id: number;
@@ -125,7 +125,7 @@ export function ThesisReview() {
       if (username && username.trim() !== '') {
         url += `?username=${encodeURIComponent(username.trim())}`;
       }
-      const data = await apiFetch(url);
+      const data = await apiFetchAll(url);
       setTheses(data || []);
     } catch (err: any) {
       setError(err?.data?.detail || '加载论文列表失败');
@@ -50,3 +50,17 @@ export async function apiUpload(path: string, formData: FormData, options: Reque
   if (!res.ok) throw { status: res.status, data: text };
   return text;
 }
+
+// Cursor-paginated list endpoints return `{ next, previous, results }`;
+// follow `next` until exhausted and return the concatenated results.
+export async function apiFetchAll(path: string, options: RequestInit = {}) {
+  const items: any[] = [];
+  let next: string | null = path;
+  while (next) {
+    const data: any = await apiFetch(next, options);
+    if (Array.isArray(data)) return data;
+    items.push(...(data?.results || []));
+    next = data?.next ? (() => { const u = new URL(data.next); return u.pathname + u.search; })() : null;
+  }
+  return items;
+}